@@ -40,6 +40,7 @@ struct Response {
     source: NodeId,
     destination: NodeId,
     graph_id: String,
+    algorithm: String,
 }
 
 async fn function_handler(event: LambdaEvent<Request>) -> Result<Response, Error> {
@@ -125,6 +126,7 @@ async fn function_handler(event: LambdaEvent<Request>) -> Result<Response, Error
         source: source,
         destination: destination,
         graph_id: event.payload.key,
+        algorithm: event.payload.algorithm,
     };
 
     Ok(resp)
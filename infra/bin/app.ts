@@ -11,7 +11,9 @@ const databaseStack = new DatabaseStack(app, "DatabaseStack");
 const sfnStack = new SfnStack(app, "SfnStack", {
   graphsPlotsBucket: storageStack.graphsPlotsBucket,
   graphsBucket: storageStack.graphsBucket,
-  graphsDatabase: databaseStack.graphsDatabase
+  graphsDatabase: databaseStack.graphsDatabase,
+  geocodingDatabase: databaseStack.geocodingDatabase,
+  resultsDatabase: databaseStack.resultsDatabase
 });
 const apiStack = new ApiStack(app, "ApiStack", {
   graphsStateMachine: sfnStack.graphsStateMachine
@@ -25,11 +25,12 @@ export class ApiStack extends cdk.Stack {
     const graphsLambdaUrl = new python.PythonFunction(this, "graphsLambdaUrl", {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: "lambda_handler",
-      timeout: cdk.Duration.minutes(5),
+      timeout: cdk.Duration.seconds(30),
       entry: path.join(__dirname, "lambdas"),
       index: "lambda_function.py",
       environment: {
-        "GRAPHS_STATE_MACHINE_ARN": props.graphsStateMachine.stateMachineArn
+        "GRAPHS_STATE_MACHINE_ARN": props.graphsStateMachine.stateMachineArn,
+        "SYNC_WAIT": "10"
       }
     });
 
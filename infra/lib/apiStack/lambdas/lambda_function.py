@@ -1,51 +1,171 @@
+from __future__ import annotations
+
 import json
+import re
 import boto3
 import os
 import time
 
-from typing import Dict, Optional
+from uuid import uuid4
+from typing import TYPE_CHECKING, Dict, Optional, TypedDict
+
+if TYPE_CHECKING:
+    # Only the type checker has the stubs, the lambda is deployed with boto3 alone.
+    from mypy_boto3_stepfunctions.type_defs import DescribeExecutionOutputTypeDef
 
 sfn_client = boto3.client("stepfunctions")
 GRAPHS_STATE_MACHINE_ARN = os.environ["GRAPHS_STATE_MACHINE_ARN"]
+# Submissions wait this long in seconds for short jobs before answering 202.
+SYNC_WAIT = float(os.environ.get("SYNC_WAIT", "10"))
+# Polls start fast and back off, so short jobs are not rounded up to a fixed interval.
+FIRST_POLL_INTERVAL = 0.2
+MAX_POLL_INTERVAL = 1.0
+POLL_BACKOFF = 1.3
+# Seconds clients should wait before asking again for a running execution.
+RETRY_AFTER = 3
+
+RUNNING = "RUNNING"
+EXECUTION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Fields of the JSON bodies, the stage and url of a status may be unknown.
+Body = Dict[str, Optional[str]]
+
+
+class Event(TypedDict, total=False):
+    """
+    The fields of the function url event the API reads.
+    """
+
+    rawPath: str
+    queryStringParameters: Optional[Dict[str, str]]
+
 
+class _Response(TypedDict):
+    statusCode: int
+    headers: Dict[str, str]
 
-def lambda_handler(
-    event: Dict[str, Dict[str, str]], _: Dict[str, str]
-) -> Dict[str, int | str | Dict[str, str]]:
-    if "queryStringParameters" not in event:
-        body_message: Dict[str, str] = {"message": "Bad request"}
-        return {"statusCode": 400, "body": json.dumps(body_message)}
 
-    input_data: Dict[str, Dict[str, str]] = {
-        "querystring": event["queryStringParameters"]
+class Response(_Response, total=False):
+    """
+    Function url response, redirects have no body.
+    """
+
+    body: str
+
+
+def response(status_code: int, body: Body, headers: Optional[Dict[str, str]] = None) -> Response:
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "body": json.dumps(body),
     }
 
-    response = sfn_client.start_execution(
-        stateMachineArn=GRAPHS_STATE_MACHINE_ARN, input=json.dumps(input_data)
-    )
 
-    execution_arn = response["executionArn"]
+def execution_arn(execution_id: str) -> str:
+    prefix, state_machine = GRAPHS_STATE_MACHINE_ARN.rsplit(":stateMachine:", 1)
+    return f"{prefix}:execution:{state_machine}:{execution_id}"
+
+
+def execution_url(description: DescribeExecutionOutputTypeDef) -> Optional[str]:
+    """
+    Plot url in the output of a succeeded execution.
+    """
+    if description["status"] != "SUCCEEDED":
+        return None
+    execution_output: Dict[str, str] = json.loads(description.get("output", "{}"))
+    json_output: Dict[str, str] = json.loads(execution_output.get("body") or "{}")
+    return json_output.get("url")
+
 
+def current_stage(execution_id: str) -> Optional[str]:
+    """
+    Name of the last state the execution entered.
+    """
+    events = sfn_client.get_execution_history(
+        executionArn=execution_arn(execution_id), reverseOrder=True, maxResults=20
+    )["events"]
+    for event in events:
+        if "stateEnteredEventDetails" in event:
+            stage: str = event["stateEnteredEventDetails"]["name"]
+            return stage
+    return None
+
+
+def wait_for_execution(execution_id: str, timeout: float) -> DescribeExecutionOutputTypeDef:
+    deadline = time.monotonic() + timeout
+    interval = FIRST_POLL_INTERVAL
     while True:
-        execution_status = sfn_client.describe_execution(executionArn=execution_arn)[
-            "status"
-        ]
-        if execution_status in ["SUCCEEDED", "FAILED", "TIMED_OUT"]:
-            break
-        time.sleep(3)
-
-    execution_output: Dict[str, str] = json.loads(
-        sfn_client.describe_execution(executionArn=execution_arn)["output"]
-    )
-    json_execution: str = execution_output.get("body", "")
-    json_output: Dict[str, str] = json.loads(json_execution)
-    url: Optional[str] = json_output.get("url")
+        description = sfn_client.describe_execution(executionArn=execution_arn(execution_id))
+        remaining = deadline - time.monotonic()
+        if description["status"] != RUNNING or remaining <= 0:
+            return description
+        time.sleep(min(interval, remaining))
+        interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
 
-    if url is None:
-        body_message = {"message": "Failed to generate a path"}
-        return {
-            "statusCode": 400,
-            "body": json.dumps(body_message),
-        }
 
+def result_response(execution_id: str, description: DescribeExecutionOutputTypeDef) -> Response:
+    """
+    Redirects to the plot once it is ready.
+    """
+    if description["status"] == RUNNING:
+        return response(
+            202,
+            {
+                "execution_id": execution_id,
+                "status": RUNNING,
+                "status_url": f"/status?id={execution_id}",
+                "result_url": f"/result?id={execution_id}",
+            },
+            {"Location": f"/result?id={execution_id}", "Retry-After": str(RETRY_AFTER)},
+        )
+    url = execution_url(description)
+    if url is None:
+        return response(400, {"message": "Failed to generate a path", "status": description["status"]})
     return {"statusCode": 302, "headers": {"Location": url}}
+
+
+def submit(query: Dict[str, str]) -> Response:
+    execution_id = uuid4().hex
+    sfn_client.start_execution(
+        stateMachineArn=GRAPHS_STATE_MACHINE_ARN,
+        name=execution_id,
+        input=json.dumps({"querystring": query}),
+    )
+    return result_response(execution_id, wait_for_execution(execution_id, SYNC_WAIT))
+
+
+def status(execution_id: str) -> Response:
+    description = sfn_client.describe_execution(executionArn=execution_arn(execution_id))
+    body: Body = {
+        "execution_id": execution_id,
+        "status": description["status"],
+        "started": description["startDate"].isoformat(),
+    }
+    if description["status"] == RUNNING:
+        body["stage"] = current_stage(execution_id)
+    else:
+        body["url"] = execution_url(description)
+        if "stopDate" in description:
+            body["stopped"] = description["stopDate"].isoformat()
+    return response(200, body)
+
+
+def lambda_handler(event: Event, _: Dict[str, str]) -> Response:
+    path = event.get("rawPath") or "/"
+    query = event.get("queryStringParameters")
+    if path in ["/status", "/result"]:
+        execution_id = (query or {}).get("id", "")
+        if not EXECUTION_ID.match(execution_id):
+            return response(400, {"message": "Bad execution id"})
+        try:
+            if path == "/status":
+                return status(execution_id)
+            return result_response(
+                execution_id, sfn_client.describe_execution(executionArn=execution_arn(execution_id))
+            )
+        except sfn_client.exceptions.ExecutionDoesNotExist:
+            return response(404, {"message": "Execution not found"})
+
+    if query is None:
+        return response(400, {"message": "Bad request"})
+    return submit(query)
@@ -0,0 +1,22 @@
+import os
+
+from typing import Iterator
+
+import pytest
+from botocore.stub import Stubber
+
+# The lambda reads its configuration when it is imported.
+os.environ.setdefault("GRAPHS_STATE_MACHINE_ARN", "arn:aws:states:us-east-1:000000000000:stateMachine:graphs")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import lambda_function  # noqa: E402
+
+
+@pytest.fixture
+def sfn() -> Iterator[Stubber]:
+    """
+    Step Functions stub, every expected call must be made.
+    """
+    with Stubber(lambda_function.sfn_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
@@ -0,0 +1,125 @@
+import json
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import pytest
+from botocore.stub import ANY, Stubber
+
+import lambda_function as api
+
+EXECUTION_ID = "0123456789abcdef0123456789abcdef"
+EXECUTION_ARN = "arn:aws:states:us-east-1:000000000000:execution:graphs:" + EXECUTION_ID
+STATE_MACHINE_ARN = "arn:aws:states:us-east-1:000000000000:stateMachine:graphs"
+PLOT_URL = "https://example.com/plot.png"
+STARTED = datetime(2024, 5, 13, 8, 30, tzinfo=timezone.utc)
+STOPPED = datetime(2024, 5, 13, 8, 31, tzinfo=timezone.utc)
+
+
+def describe(sfn: Stubber, status: str, url: Optional[str] = None, execution_arn: object = EXECUTION_ARN) -> None:
+    description: Dict[str, object] = {
+        "executionArn": EXECUTION_ARN,
+        "stateMachineArn": STATE_MACHINE_ARN,
+        "status": status,
+        "startDate": STARTED,
+    }
+    if status != api.RUNNING:
+        description["stopDate"] = STOPPED
+        body = json.dumps({"url": url} if url else {"message": "Failed"})
+        description["output"] = json.dumps({"statusCode": 200, "body": body})
+    sfn.add_response("describe_execution", description, {"executionArn": execution_arn})
+
+
+def test_status_of_a_running_execution(sfn: Stubber) -> None:
+    describe(sfn, api.RUNNING)
+    events = [
+        {"timestamp": STARTED, "type": "TaskStateEntered", "id": 3, "stateEnteredEventDetails": {"name": "getGraph"}},
+        {"timestamp": STARTED, "type": "ExecutionStarted", "id": 1},
+    ]
+    sfn.add_response(
+        "get_execution_history",
+        {"events": events},
+        {"executionArn": EXECUTION_ARN, "reverseOrder": True, "maxResults": 20},
+    )
+    result = api.status(EXECUTION_ID)
+    assert result["statusCode"] == 200
+    assert json.loads(result["body"]) == {
+        "execution_id": EXECUTION_ID,
+        "status": api.RUNNING,
+        "started": STARTED.isoformat(),
+        "stage": "getGraph",
+    }
+
+
+def test_status_of_a_succeeded_execution(sfn: Stubber) -> None:
+    describe(sfn, "SUCCEEDED", PLOT_URL)
+    body = json.loads(api.status(EXECUTION_ID)["body"])
+    assert body["url"] == PLOT_URL
+    assert body["stopped"] == STOPPED.isoformat()
+    assert "stage" not in body
+
+
+def test_result_redirects_to_the_plot(sfn: Stubber) -> None:
+    describe(sfn, "SUCCEEDED", PLOT_URL)
+    result = api.lambda_handler({"rawPath": "/result", "queryStringParameters": {"id": EXECUTION_ID}}, {})
+    assert result == {"statusCode": 302, "headers": {"Location": PLOT_URL}}
+
+
+def test_result_of_a_running_execution(sfn: Stubber) -> None:
+    describe(sfn, api.RUNNING)
+    result = api.lambda_handler({"rawPath": "/result", "queryStringParameters": {"id": EXECUTION_ID}}, {})
+    assert result["statusCode"] == 202
+    assert result["headers"]["Location"] == f"/result?id={EXECUTION_ID}"
+    assert result["headers"]["Retry-After"] == str(api.RETRY_AFTER)
+    assert json.loads(result["body"])["status_url"] == f"/status?id={EXECUTION_ID}"
+
+
+@pytest.mark.parametrize("status", ["FAILED", "SUCCEEDED"])
+def test_result_without_a_plot(sfn: Stubber, status: str) -> None:
+    describe(sfn, status)
+    result = api.lambda_handler({"rawPath": "/result", "queryStringParameters": {"id": EXECUTION_ID}}, {})
+    assert result["statusCode"] == 400
+    assert json.loads(result["body"]) == {"message": "Failed to generate a path", "status": status}
+
+
+@pytest.mark.parametrize("path", ["/status", "/result"])
+def test_missing_execution(sfn: Stubber, path: str) -> None:
+    sfn.add_client_error("describe_execution", "ExecutionDoesNotExist", expected_params={"executionArn": EXECUTION_ARN})
+    result = api.lambda_handler({"rawPath": path, "queryStringParameters": {"id": EXECUTION_ID}}, {})
+    assert result["statusCode"] == 404
+
+
+@pytest.mark.parametrize("query", [None, {}, {"id": "../x"}, {"id": EXECUTION_ID.upper()}])
+def test_bad_execution_ids(sfn: Stubber, query: Optional[Dict[str, str]]) -> None:
+    result = api.lambda_handler({"rawPath": "/status", "queryStringParameters": query}, {})
+    assert result["statusCode"] == 400
+
+
+def test_submit_waits_for_short_jobs(sfn: Stubber) -> None:
+    query = {"source": "a", "dest": "b"}
+    sfn.add_response(
+        "start_execution",
+        {"executionArn": EXECUTION_ARN, "startDate": STARTED},
+        {"stateMachineArn": STATE_MACHINE_ARN, "name": ANY, "input": json.dumps({"querystring": query})},
+    )
+    describe(sfn, "SUCCEEDED", PLOT_URL, execution_arn=ANY)
+    result = api.lambda_handler({"rawPath": "/", "queryStringParameters": query}, {})
+    assert result == {"statusCode": 302, "headers": {"Location": PLOT_URL}}
+
+
+def test_submit_answers_202_for_long_jobs(sfn: Stubber, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(api, "SYNC_WAIT", 0.0)
+    sfn.add_response(
+        "start_execution",
+        {"executionArn": EXECUTION_ARN, "startDate": STARTED},
+        {"stateMachineArn": STATE_MACHINE_ARN, "name": ANY, "input": ANY},
+    )
+    describe(sfn, api.RUNNING, execution_arn=ANY)
+    result = api.lambda_handler({"rawPath": "/", "queryStringParameters": {"source": "a", "dest": "b"}}, {})
+    assert result["statusCode"] == 202
+    assert api.EXECUTION_ID.match(json.loads(result["body"])["execution_id"])
+
+
+def test_submit_without_a_query(sfn: Stubber) -> None:
+    result = api.lambda_handler({"rawPath": "/"}, {})
+    assert result["statusCode"] == 400
@@ -4,6 +4,8 @@ import { Construct } from 'constructs';
 
 export class DatabaseStack extends cdk.Stack {
   public readonly graphsDatabase: dynamo.Table;
+  public readonly geocodingDatabase: dynamo.Table;
+  public readonly resultsDatabase: dynamo.Table;
   constructor(scope: Construct, id: string, props?: cdk.StackProps) {
     super(scope, id, props);
 
@@ -13,5 +15,24 @@ export class DatabaseStack extends cdk.Stack {
       partitionKey: {name: "Country", type: dynamo.AttributeType.STRING},
       sortKey: {name: "City", type: dynamo.AttributeType.STRING},
     });
+
+    this.geocodingDatabase = new dynamo.Table(this, "geocodingTable", {
+      tableName: "geocodingTable",
+      billingMode: dynamo.BillingMode.PAY_PER_REQUEST,
+      partitionKey: {name: "Key", type: dynamo.AttributeType.STRING},
+      timeToLiveAttribute: "ExpiresAt",
+    });
+
+    this.resultsDatabase = new dynamo.Table(this, "resultsTable", {
+      tableName: "resultsTable",
+      billingMode: dynamo.BillingMode.PAY_PER_REQUEST,
+      partitionKey: {name: "RouteKey", type: dynamo.AttributeType.STRING},
+      timeToLiveAttribute: "ExpiresAt",
+    });
+    this.resultsDatabase.addGlobalSecondaryIndex({
+      indexName: "GraphIdIndex",
+      partitionKey: {name: "GraphId", type: dynamo.AttributeType.STRING},
+      projectionType: dynamo.ProjectionType.KEYS_ONLY,
+    });
   }
 }
@@ -1,27 +1,258 @@
+import os
+import json
 import osmnx as ox
-from typing import Optional, Dict, cast
+from typing import List, Optional, Dict, Tuple, cast
 
-from lambdas.getGraph.utils import get_lat_lon, get_current_location, haversine, get_ids
+from lambdas.getGraph.utils import (
+    get_lat_lon,
+    get_current_location,
+    find_city,
+    get_ids,
+    resolve_pair,
+    executor,
+    timed,
+    get_compact_graph,
+    get_edge_weights,
+    get_landmarks,
+    get_spatial_index,
+    get_speed_profiles,
+    get_batch_graph,
+    snap_nodes,
+    store_document,
+    get_hierarchy,
+    store_solution,
+    s3_client,
+    PATHS_BUCKET_NAME,
+)
 from lambdas.getGraph.modules.coordinates import Coordinates
 
 from modules.graph import NodeId, EdgeId
-from modules.event import Event, EventQueryString, EventCoords, EventAddress, Algorithms
+from modules.event import (
+    Event,
+    EventQueryString,
+    EventCoords,
+    EventAddress,
+    EventBatch,
+    Algorithms,
+    RoutingProfiles,
+)
+from modules.routing import (
+    SEARCHES,
+    TIME_DEPENDENT_SEARCHES,
+    SearchResult,
+    a_star,
+    bidirectional_dijkstra,
+    bounded_dijkstra,
+    time_dependent_a_star,
+)
+from modules.contraction import query_hierarchy
+from modules.delta import parse_graph_ref
+from modules.geo import haversine_km
+from modules.isochrone import DEFAULT_ISOCHRONE_MINUTES, isochrone_features, parse_minutes
+from modules.matrix import dump_matrix, travel_matrix
+from modules.results import plot_url, result_cache
+from modules.traffic import parse_departure
+from modules.weights import DEFAULT_ROUTING_PROFILE, ROUTING_PROFILES
 
+# Algorithms also implemented by the algorithms lambda.
+RUST_ALGORITHMS = {"bfs", "dijkstra", "a_star", "a_star_enhanced"}
+# Routes up to this straight-line distance in km are solved in this lambda.
+IN_PROCESS_MAX_DISTANCE = float(os.environ.get("IN_PROCESS_MAX_DISTANCE", "5"))
+# Sources and destinations of a batch, each.
+BATCH_MAX_POINTS = 250
 
-def lambda_handler(
-    raw_event: Event, _: Dict[str, str]
-) -> Optional[Dict[str, NodeId | EdgeId | str]]:
+Response = Dict[str, NodeId | EdgeId | str | float]
+
+
+def in_process_only(
+    graph_id: str, departure: Optional[float], profile: RoutingProfiles
+) -> bool:
+    """
+    The algorithms lambda only reads full graphs, the fastest route and no traffic.
+    """
+    _, version = parse_graph_ref(graph_id)
+    return version > 0 or departure is not None or profile != DEFAULT_ROUTING_PROFILE
+
+
+def solve_in_process(
+    graph_id: str,
+    source: NodeId,
+    destination: NodeId,
+    algorithm: Algorithms,
+    distance: float,
+    departure: Optional[float] = None,
+    profile: RoutingProfiles = DEFAULT_ROUTING_PROFILE,
+) -> Optional[Response]:
+    # Routes the algorithms lambda can not solve are always solved here.
+    only_here = in_process_only(graph_id, departure, profile)
+    if algorithm not in SEARCHES and algorithm != "contraction_hierarchies" and not only_here:
+        return None
+    if algorithm in RUST_ALGORITHMS and distance > IN_PROCESS_MAX_DISTANCE and not only_here:
+        return None
+    # Traffic changes travel times, it only applies to the fastest route.
+    time_dependent = departure is not None and algorithm != "bfs" and profile == DEFAULT_ROUTING_PROFILE
+    # Hierarchies are built on travel times.
+    use_hierarchy = (
+        algorithm == "contraction_hierarchies" and not time_dependent and profile == DEFAULT_ROUTING_PROFILE
+    )
+    if use_hierarchy:
+        hierarchy_result = executor.submit(get_hierarchy, graph_id)
+    graph = get_compact_graph(graph_id)
+    if graph is None:
+        return None
+    solution: Optional[SearchResult]
+    if time_dependent:
+        # Hierarchies and bidirectional searches assume fixed weights, A* stands in for them.
+        solution = TIME_DEPENDENT_SEARCHES.get(algorithm, time_dependent_a_star)(
+            graph,
+            get_speed_profiles(graph_id, graph),
+            source,
+            destination,
+            cast(float, departure),
+            get_landmarks(graph_id, graph),
+        )
+    elif use_hierarchy:
+        hierarchy = hierarchy_result.result()
+        if hierarchy is None:
+            solution = bidirectional_dijkstra(graph, source, destination)
+        else:
+            solution = query_hierarchy(hierarchy, graph, source, destination)
+    else:
+        weights = get_edge_weights(graph_id, graph, profile)
+        if algorithm == "contraction_hierarchies":
+            solution = bidirectional_dijkstra(graph, source, destination, weights)
+        else:
+            # A* enhanced only runs in the algorithms lambda, A* stands in for it.
+            solution = SEARCHES.get(algorithm, a_star)(graph, source, destination, weights)
+    if solution is None:
+        print("Failed to find a path")
+        return None
+    response: Response = {
+        "iterations": solution.iterations,
+        "weight": solution.weight,
+        "solution_key": store_solution(graph, solution),
+        "source": source,
+        "destination": destination,
+        "graph_id": graph_id,
+        "algorithm": algorithm,
+    }
+    if departure is not None:
+        response["departure"] = departure
+    if profile != DEFAULT_ROUTING_PROFILE:
+        response["profile"] = profile
+    return response
+
+
+def parse_points(raw_points: str) -> List[Coordinates]:
+    points: List[Coordinates] = []
+    for raw_point in raw_points.split(";"):
+        lat, lon = raw_point.split(",")
+        points.append(Coordinates(latitude=float(lat), longitude=float(lon)))
+    return points
+
+
+def solve_batch(event: EventBatch) -> Optional[Response]:
+    """
+    Travel times and distances between every source and destination, without plots.
+    """
+    try:
+        sources = parse_points(event["sources"])
+        destinations = parse_points(event["destinations"])
+    except (KeyError, ValueError):
+        print("Batch points must be lat,lon separated by ;")
+        return None
+    if len(sources) > BATCH_MAX_POINTS or len(destinations) > BATCH_MAX_POINTS:
+        print(f"Batches take at most {BATCH_MAX_POINTS} sources and destinations")
+        return None
+
+    points = sources + destinations
+    with timed("Batch graph"):
+        graph_id = get_batch_graph(points)
+    compact_graph_result = executor.submit(get_compact_graph, graph_id)
+    with timed("Snapping"):
+        nodes = snap_nodes(get_spatial_index(graph_id), points)
+    graph = compact_graph_result.result()
+    if graph is None:
+        return None
+    with timed(f"Matrix of {len(sources)}x{len(destinations)}"):
+        matrix = travel_matrix(graph, nodes[: len(sources)], nodes[len(sources):])
+    url = store_document("matrix", dump_matrix(graph_id, matrix))
+    return {"statusCode": 200, "body": json.dumps({"url": url})}
+
+
+def solve_isochrone(
+    graph_id: str, source: NodeId, raw_minutes: str, plot: bool
+) -> Optional[Response]:
+    """
+    Area reachable from `source` within every budget, plotted through plotPath on demand.
+    """
+    try:
+        minutes = parse_minutes(raw_minutes)
+    except ValueError as error:
+        print(f"Invalid isochrone budgets {raw_minutes}: {error}")
+        return None
+    graph = get_compact_graph(graph_id)
+    if graph is None:
+        return None
+    with timed("Bounded search"):
+        reachability = bounded_dijkstra(graph, source, minutes[-1] / 60)
+    if reachability is None:
+        return None
+    url = store_document("isochrone", isochrone_features(graph, reachability, minutes))
+    if not plot:
+        return {"statusCode": 200, "body": json.dumps({"url": url})}
+    return {
+        "iterations": reachability.search.iterations,
+        "weight": reachability.search.weight,
+        "solution_key": store_solution(graph, reachability.search),
+        "source": source,
+        "destination": source,
+        "graph_id": graph_id,
+        "algorithm": "isochrone",
+        "isochrone_url": url,
+    }
+
+
+def lambda_handler(raw_event: Event, _: Dict[str, str]) -> Optional[Response]:
     if "querystring" in raw_event:
         raw_event = cast(EventQueryString, raw_event)
         event: EventCoords | EventAddress = raw_event["querystring"]  # type: ignore
     else:
         event = cast(EventCoords | EventAddress, raw_event)
 
+    if "sources" in event and "destinations" in event:
+        return solve_batch(cast(EventBatch, event))
+
     algorithm: Algorithms = event.get("algorithm") or "dijkstra"
+    if algorithm == "isochrone":
+        # Isochrones only have a source, it is resolved as a route to itself.
+        if "source" in event:
+            event = cast(EventAddress, {**event, "dest": event["source"]})  # type: ignore
+        else:
+            event = cast(
+                EventCoords,
+                {**event, "dest_lat": event["source_lat"], "dest_lon": event["source_lon"]},  # type: ignore
+            )
+    departure: Optional[float] = None
+    raw_departure = event.get("departure_time")
+    if raw_departure:
+        try:
+            departure = parse_departure(raw_departure)
+        except ValueError:
+            print(f"Invalid departure time {raw_departure}, expected a local time as 2024-05-13T08:30")
+            return None
+    profile: RoutingProfiles = event.get("profile") or DEFAULT_ROUTING_PROFILE
+    if profile not in ROUTING_PROFILES:
+        print(f"Unknown routing profile {profile}, expected one of {', '.join(ROUTING_PROFILES)}")
+        return None
     if "source" in event and "dest" in event:
         event_with_address = cast(EventAddress, event)
-        source_coordinates = get_lat_lon(event_with_address["source"])  # type: ignore
-        dest_coordinates = get_lat_lon(event_with_address["dest"])  # type: ignore
+        with timed("Geocoding"):
+            source_coordinates, dest_coordinates = resolve_pair(
+                get_lat_lon,
+                event_with_address["source"],
+                event_with_address["dest"],
+            )
         if source_coordinates is None or dest_coordinates is None:
             print("Not able to find the address for you source or dest")
             return None
@@ -37,16 +268,32 @@ def lambda_handler(
         event_with_coords = cast(EventCoords, event)
 
     source_coordinates = Coordinates(
-        latitude=float(event_with_coords["source_lat"]),  # type: ignore
-        longitude=float(event_with_coords["source_lon"]),  # type: ignore
+        latitude=float(event_with_coords["source_lat"]),
+        longitude=float(event_with_coords["source_lon"]),
     )
     destination_coordinates = Coordinates(
-        latitude=float(event_with_coords["dest_lat"]),  # type: ignore
-        longitude=float(event_with_coords["dest_lon"]),  # type: ignore
+        latitude=float(event_with_coords["dest_lat"]),
+        longitude=float(event_with_coords["dest_lon"]),
     )
 
-    source_location = get_current_location(source_coordinates)
-    destination_location = get_current_location(destination_coordinates)
+    # Points inside the boundary of a stored city need no reverse geocoding.
+    with timed("City boundaries"):
+        source_boundary = find_city(source_coordinates)
+        destination_boundary = find_city(destination_coordinates)
+    source_location: Tuple[Optional[str], Optional[str]]
+    destination_location: Tuple[Optional[str], Optional[str]]
+    if (
+        source_boundary is not None
+        and destination_boundary is not None
+        and source_boundary.graph_id == destination_boundary.graph_id
+    ):
+        source_location = (source_boundary.city, source_boundary.country)
+        destination_location = source_location
+    else:
+        with timed("Reverse geocoding"):
+            source_location, destination_location = resolve_pair(
+                get_current_location, source_coordinates, destination_coordinates
+            )
 
     source_city, source_country = source_location
     destination_city, destination_country = destination_location
@@ -64,25 +311,63 @@ def lambda_handler(
         print("Invalid locations")
         return None
 
+    distance = float(
+        haversine_km(
+            source_coordinates.latitude,
+            source_coordinates.longitude,
+            destination_coordinates.latitude,
+            destination_coordinates.longitude,
+        )
+    )
     use_distance: Optional[float]
     if source_city != destination_city or source_country != destination_country:
         print("Source and destination are not in the same city/country")
-        use_distance = haversine(
-            source_coordinates,
-            destination_coordinates,
-        )
-        print("Not possible to cache, downloading by distance")
+        use_distance = distance
+        print("Not in one city, using the tiles around the route")
     else:
         use_distance = None
 
     ox.config(use_cache=True, cache_folder="/tmp/osmnx_cache")
-    graph_id, source, destination = get_ids(
-        source_country,
-        source_city,
-        source_coordinates,
-        destination_coordinates,
-        use_distance,
-    )
+    with timed("Graph and nodes"):
+        graph_id, source, destination = get_ids(
+            source_country,
+            source_city,
+            source_coordinates,
+            destination_coordinates,
+            use_distance,
+        )
+
+    if algorithm == "isochrone":
+        return solve_isochrone(
+            graph_id,
+            source,
+            event.get("minutes") or DEFAULT_ISOCHRONE_MINUTES,
+            event.get("plot") == "true",
+        )
+
+    if result_cache is not None:
+        solution_key = result_cache.get(graph_id, source, destination, algorithm, departure, profile)
+        if solution_key is not None:
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"url": plot_url(s3_client, PATHS_BUCKET_NAME, solution_key)}),
+            }
+
+    with timed("In-process search"):
+        solution = solve_in_process(
+            graph_id,
+            source,
+            destination,
+            algorithm,
+            distance,
+            departure,
+            profile,
+        )
+    if solution is not None:
+        return solution
+    if in_process_only(graph_id, departure, profile):
+        # The algorithms lambda fails on versioned graphs and ignores profiles and traffic.
+        return {"statusCode": 404, "body": json.dumps({"message": "No path found"})}
 
     return {
         "source": source,
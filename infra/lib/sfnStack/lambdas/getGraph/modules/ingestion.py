@@ -0,0 +1,227 @@
+import re
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union, cast
+
+from modules.graph import HIGHWAY_CLASSES, NodeId, CompactGraph, OsmGraph, build_compact_graph
+
+DEFAULT_MAX_SPEED = 30
+
+MaxSpeedTag = Union[str, Tuple[str, ...]]
+
+SPEED_UNITS: Dict[str, float] = {
+    "": 1.0,
+    "km/h": 1.0,
+    "kmh": 1.0,
+    "kph": 1.0,
+    "mph": 1.609344,
+    "knots": 1.852,
+}
+
+# Implicit limits of the `maxspeed=<country>:<zone>` codes, from the OSM wiki.
+ZONE_SPEEDS: Dict[str, int] = {
+    "AT:urban": 50,
+    "AT:rural": 100,
+    "AT:trunk": 100,
+    "AT:motorway": 130,
+    "BE:urban": 50,
+    "BE:rural": 70,
+    "BE:motorway": 120,
+    "CH:urban": 50,
+    "CH:rural": 80,
+    "CH:trunk": 100,
+    "CH:motorway": 120,
+    "CZ:urban": 50,
+    "CZ:rural": 90,
+    "CZ:trunk": 110,
+    "CZ:motorway": 130,
+    "DE:urban": 50,
+    "DE:rural": 100,
+    "DE:bicycle_road": 30,
+    "DE:motorway": 130,
+    "DK:urban": 50,
+    "DK:rural": 80,
+    "DK:motorway": 130,
+    "ES:urban": 50,
+    "ES:rural": 90,
+    "ES:trunk": 100,
+    "ES:motorway": 120,
+    "FI:urban": 50,
+    "FI:rural": 80,
+    "FI:motorway": 120,
+    "FR:urban": 50,
+    "FR:rural": 80,
+    "FR:trunk": 110,
+    "FR:motorway": 130,
+    "GB:nsl_single": 97,
+    "GB:nsl_dual": 113,
+    "GB:motorway": 113,
+    "IT:urban": 50,
+    "IT:rural": 90,
+    "IT:trunk": 110,
+    "IT:motorway": 130,
+    "NL:urban": 50,
+    "NL:rural": 80,
+    "NL:trunk": 100,
+    "NL:motorway": 130,
+    "PL:urban": 50,
+    "PL:rural": 90,
+    "PL:trunk": 100,
+    "PL:motorway": 140,
+    "PT:urban": 50,
+    "PT:rural": 90,
+    "PT:trunk": 100,
+    "PT:motorway": 120,
+    "RO:urban": 50,
+    "RO:rural": 90,
+    "RO:trunk": 100,
+    "RO:motorway": 130,
+    "RU:urban": 60,
+    "RU:rural": 90,
+    "RU:living_street": 20,
+    "RU:motorway": 110,
+    "UA:urban": 50,
+    "UA:rural": 90,
+    "UA:living_street": 20,
+    "UA:motorway": 130,
+}
+
+# Fallback for zones of countries missing in `ZONE_SPEEDS`.
+ZONE_DEFAULT_SPEEDS: Dict[str, int] = {
+    "urban": 50,
+    "rural": 90,
+    "trunk": 100,
+    "motorway": 120,
+    "living_street": 20,
+    "walk": 7,
+    # Roads without limit, e.g. German motorways, use the advisory speed.
+    "none": 130,
+}
+
+SPEED_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*([a-z/]*)$")
+ZONE_PATTERN = re.compile(r"^[a-z]{2}:zone:?(\d+)$")
+
+
+@lru_cache(maxsize=None)
+def parse_max_speed(tag: MaxSpeedTag) -> Optional[int]:
+    """
+    Normalizes an OSM `maxspeed` tag to km/h.
+
+    Args:
+        tag: Raw tag, e.g. `"50"`, `"30 mph"`, `"RU:urban"`, `"50;70"`, or a
+            tuple of them when osmnx merged several ways into one edge.
+
+    Returns:
+        The lowest speed found in km/h, None if no value is understood.
+    """
+    if isinstance(tag, tuple):
+        values = [parse_max_speed(value) for value in tag]
+    elif ";" in tag:
+        values = [parse_max_speed(value) for value in tag.split(";")]
+    else:
+        values = [_parse_single_max_speed(tag)]
+    speeds: List[int] = [speed for speed in values if speed is not None]
+    return min(speeds) if speeds else None
+
+
+def _parse_single_max_speed(tag: str) -> Optional[int]:
+    value = tag.strip()
+    if value in ZONE_SPEEDS:
+        return ZONE_SPEEDS[value]
+    value = value.lower()
+    if value in ZONE_DEFAULT_SPEEDS:
+        return ZONE_DEFAULT_SPEEDS[value]
+    speed = SPEED_PATTERN.match(value)
+    if speed is not None:
+        number, unit = speed.groups()
+        if unit not in SPEED_UNITS:
+            return None
+        return round(float(number) * SPEED_UNITS[unit])
+    zone = ZONE_PATTERN.match(value)
+    if zone is not None:
+        return int(zone.group(1))
+    if ":" in value:
+        return ZONE_DEFAULT_SPEEDS.get(value.split(":", 1)[1])
+    return None
+
+
+def normalize_max_speeds(
+    tags: Iterable[object], default: int = DEFAULT_MAX_SPEED
+) -> npt.NDArray[np.float64]:
+    """
+    Normalizes a column of `maxspeed` tags parsing each distinct tag once.
+    """
+    codes, distinct_tags = pd.factorize(
+        pd.Series(
+            [tuple(tag) if isinstance(tag, list) else tag for tag in tags],
+            dtype=object,
+        ),
+        use_na_sentinel=True,
+    )
+    lookup = np.array(
+        [parse_max_speed(_max_speed_tag(tag)) or default for tag in distinct_tags]
+        + [default],
+        dtype=np.float64,
+    )
+    # Missing tags have code -1, which picks the trailing default.
+    return lookup[codes]
+
+
+def highway_class(tag: object) -> int:
+    """
+    Index of an osmnx `highway` tag in `HIGHWAY_CLASSES`, the first road of a list.
+    """
+    if isinstance(tag, (list, tuple)):
+        tag = tag[0] if tag else None
+    road = str(tag).removesuffix("_link")
+    return HIGHWAY_CLASSES.index(road) if road in HIGHWAY_CLASSES else 0
+
+
+def normalize_highways(tags: Iterable[object]) -> npt.NDArray[np.uint8]:
+    """
+    Classes of a column of `highway` tags, each distinct tag is classified once.
+    """
+    codes, distinct_tags = pd.factorize(
+        pd.Series(
+            [tuple(tag) if isinstance(tag, list) else tag for tag in tags],
+            dtype=object,
+        ),
+        use_na_sentinel=True,
+    )
+    lookup = np.array([highway_class(tag) for tag in distinct_tags] + [0], dtype=np.uint8)
+    return lookup[codes]
+
+
+def _max_speed_tag(tag: object) -> MaxSpeedTag:
+    if isinstance(tag, tuple):
+        return tuple(str(value) for value in tag)
+    return str(tag)
+
+
+def ingest_graph(graph: OsmGraph) -> CompactGraph:
+    """
+    Converts an osmnx graph reading every node and edge attribute in one pass.
+    """
+    node_ids, node_data = zip(*graph.nodes(data=True))
+    sources: List[NodeId] = []
+    targets: List[NodeId] = []
+    edge_data: List[Dict[str, object]] = []
+    for u, neighbours in graph.adjacency():
+        for v, parallel_edges in neighbours.items():
+            for data in parallel_edges.values():
+                sources.append(u)
+                targets.append(v)
+                edge_data.append(cast(Dict[str, object], data))
+    return build_compact_graph(
+        node_ids=np.array(node_ids, dtype=np.int64),
+        lat=np.array([data["y"] for data in node_data], dtype=np.float64),
+        lon=np.array([data["x"] for data in node_data], dtype=np.float64),
+        sources=np.array(sources, dtype=np.int64),
+        targets=np.array(targets, dtype=np.int64),
+        length=np.array([data["length"] for data in edge_data], dtype=np.float64),
+        maxspeed=normalize_max_speeds([data.get("maxspeed") for data in edge_data]),
+        highway=normalize_highways([data.get("highway") for data in edge_data]),
+    )
@@ -1,42 +1,143 @@
 import os
-import math
 import json
-import requests
+import time
 import boto3
+import shutil
 
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from uuid import uuid4
 import osmnx as ox
 from networkx import MultiDiGraph
-from networkx import Graph as NGraph
-from typing import Tuple, Optional, Dict, List, Union, cast
+from typing import BinaryIO, Callable, Iterator, List, Mapping, Tuple, TypeVar, Optional, Dict, cast
 
 from lambdas.getGraph.modules.coordinates import Coordinates
-
-from modules.graph import NodeId, EdgeId, Node, Edge, Graph
+from lambdas.getGraph.modules.ingestion import ingest_graph
+
+from modules.graph import (
+    NodeId,
+    CompactGraph,
+    OsmGraph,
+    dump_compact_graph,
+    dump_graph_json,
+    graph_nbytes,
+    open_compact_graph,
+)
+from modules.boundaries import (
+    CityBoundary,
+    add_boundary,
+    build_boundary,
+    dump_boundaries,
+    find_boundary,
+    load_boundaries,
+)
+from modules.cache import graph_cache, multidigraph_nbytes
+from modules.delta import GraphDelta, apply_deltas, delta_key, graph_ref, load_delta, parse_graph_ref
+from modules.geocoding import default_client
+from modules.geometry import EdgeGeometry, build_edge_geometry, dump_edge_geometry
+from modules.graphml import read_graphml, write_graphml
+from modules.landmarks import Landmarks, build_landmarks, dump_landmarks, landmarks_nbytes, open_landmarks
+from modules.results import PLOT_URL_EXPIRATION, result_cache
+from modules.routing import (
+    EdgeWeights,
+    GraphAdjacency,
+    SearchResult,
+    adjacency_nbytes,
+    build_adjacency,
+    travel_times,
+)
+from modules.tiles import (
+    Tile,
+    area_tiles,
+    corridor_id,
+    corridor_tiles,
+    stitch_tiles,
+    tile_bounds,
+    tile_id,
+)
+from modules.trace import dump_trace
+from modules.weights import open_weight_column, profile_weights, write_weight_column
+from modules.traffic import (
+    GraphProfiles,
+    bind_profiles,
+    dump_speed_profiles,
+    open_speed_profiles,
+    speed_profiles_nbytes,
+    typical_profiles,
+)
+from modules.spatial import (
+    SpatialIndex,
+    build_spatial_index,
+    dump_spatial_index,
+    open_spatial_index,
+    spatial_index_nbytes,
+    nearest_node,
+    snap,
+)
+from modules.contraction import (
+    ContractionHierarchy,
+    build_hierarchy,
+    dump_hierarchy,
+    load_hierarchy,
+)
 
 GRAPHS_TABLE_NAME = os.environ["GRAPHS_TABLE_NAME"]
 GRAPHS_BUCKET_NAME = os.environ["GRAPHS_BUCKET"]
+PATHS_BUCKET_NAME = os.environ["PATHS_BUCKET"]
+# Contract new city graphs right after downloading them.
+BUILD_CONTRACTION_HIERARCHY = os.environ.get("BUILD_CONTRACTION_HIERARCHY") == "true"
+# Coordinates further than this in meters from any node of the graph are rejected.
+SNAP_MAX_DISTANCE = 200
+# Convex hulls of every city graph in the graphs table.
+BOUNDARIES_KEY = "boundaries.json"
+# GraphML uploads buffer at most max_concurrency chunks in memory.
+GRAPHML_TRANSFER = TransferConfig(multipart_chunksize=8 * 2**20, max_concurrency=4)
+# Largest area a batch is routed on when its points are not in one city.
+BATCH_MAX_TILES = 64
+# Threads for the lookups of the source and destination and the prefetches.
+RESOLVE_WORKERS = 4
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 dynamodb = boto3.resource("dynamodb")
 graphs_table = dynamodb.Table(GRAPHS_TABLE_NAME)
 
 s3 = boto3.resource("s3")
+s3_client = boto3.client("s3")
 graphs_bucket = s3.Bucket(GRAPHS_BUCKET_NAME)
+paths_bucket = s3.Bucket(PATHS_BUCKET_NAME)
+
+geocoder = default_client()
+# Loaded once per container, see `get_boundaries`.
+city_boundaries: Optional[Dict[str, CityBoundary]] = None
+executor = ThreadPoolExecutor(max_workers=RESOLVE_WORKERS)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        print(f"{stage} took {(time.perf_counter() - start) * 1000:.0f} ms")
 
-HEADERS = {"User-Agent": "GraphMapsApplication/1.0"}
+
+def resolve_pair(function: Callable[[T], R], source: T, destination: T) -> Tuple[R, R]:
+    """
+    Calls `function` for the source and destination concurrently.
+    """
+    destination_result = executor.submit(function, destination)
+    return function(source), destination_result.result()
 
 
 def get_current_location(
     coordinates: Coordinates,
 ) -> Tuple[Optional[str], Optional[str]]:
-    latitude, longitude = (
-        round(coordinates.latitude, 6),
-        round(coordinates.longitude, 6),
-    )
-    url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={latitude}&lon={longitude}"
-    response = requests.get(url, headers=HEADERS)
-    data: Dict[str, Dict[str, str]] = response.json()
-    if "address" not in data:
+    data = geocoder.reverse(coordinates.latitude, coordinates.longitude)
+    if data is None or "address" not in data:
         return (None, None)
     address = data["address"]
     city: Optional[str] = address.get("city", None)
@@ -45,110 +146,366 @@ def get_current_location(
 
 
 def get_lat_lon(address: str) -> Optional[Coordinates]:
-    url = "https://nominatim.openstreetmap.org/search"
-    params: Dict[str, str | int] = {"q": address, "format": "json", "limit": 1}
-    response = requests.get(url, params=params, headers=HEADERS)
-    if response.status_code == 200 and response.json():
-        location = response.json()[0]
+    locations = geocoder.search({"q": address, "limit": 1})
+    if locations:
+        location = locations[0]
         return Coordinates(
             latitude=float(location["lat"]), longitude=float(location["lon"])
         )
     return None
 
 
-def get_max_speed(
-    edge: Dict[str, List[str] | str | int], min_max_speed_allowed: int = 30
-) -> int:
-    max_speed = min_max_speed_allowed
-    if "maxspeed" in edge:
-        max_speeds = edge["maxspeed"]
-        if isinstance(max_speeds, list):
-            speeds: List[int] = [
-                int(speed) for speed in max_speeds if speed and speed.isnumeric()
-            ]
-            if len(speeds) > 0:
-                max_speed = min(speeds)
-        elif isinstance(max_speeds, str) and max_speeds.isnumeric():
-            max_speed = int(max_speeds)
-        elif isinstance(max_speeds, int):
-            max_speed = max_speeds
-    return max_speed
-
-
-def generate_graph(graph: MultiDiGraph) -> Graph:
-    all_edges: Dict[EdgeId, Edge] = dict()
-    to_node_by_node: Dict[NodeId, List[NodeId]] = dict()
-    for edge in cast(List[Tuple[NodeId, NodeId, float]], graph.edges):
-        u, v, _ = edge
-        current_edge: Dict[str, List[str] | str | int] = graph.edges[edge]  # type: ignore
-        all_edges[(u, v)] = Edge(
-            id=(u, v),
-            length=cast(float, current_edge["length"]),
-            maxspeed=get_max_speed(current_edge),
-        )
-        if u not in to_node_by_node:
-            to_node_by_node[u] = []
-        to_node_by_node[u].append(v)
-    all_nodes: Dict[NodeId, Node] = {
-        node: Node(
-            id=node,
-            next_nodes=to_node_by_node.get(node, []),
-            lat=graph.nodes[node]["y"],
-            lon=graph.nodes[node]["x"],
-        )
-        for node in cast(List[NodeId], graph.nodes)
+def generate_graph(graph: OsmGraph) -> CompactGraph:
+    return ingest_graph(graph)
+
+
+def graph_files(
+    graph: CompactGraph,
+    key: str,
+    geometry: Optional[EdgeGeometry] = None,
+    hierarchy: bool = False,
+    landmarks: bool = False,
+) -> Dict[str, bytes]:
+    """
+    Every object stored for a graph besides the GraphML, by bucket key.
+
+    The contraction hierarchy and the landmarks take long to build, only the
+    scripts ask for them, graphs stored by the lambda do without.
+    """
+    nodes, edges = dump_graph_json(graph)
+    files = {
+        f"graph-{key}.bin": dump_compact_graph(graph),
+        f"nodes-{key}.json": json.dumps(nodes).encode(),
+        f"edges-{key}.json": json.dumps(edges).encode(),
+        f"index-{key}.bin": dump_spatial_index(build_spatial_index(graph)),
     }
-    return Graph(nodes=all_nodes, edges=all_edges)
+    if geometry is not None:
+        files[f"geometry-{key}.bin"] = dump_edge_geometry(geometry)
+    if hierarchy:
+        files[f"ch-{key}.bin"] = dump_hierarchy(build_hierarchy(graph))
+    if landmarks:
+        files[f"landmarks-{key}.bin"] = dump_landmarks(build_landmarks(graph, travel_times(graph)))
+    return files
 
 
-def store_graph(graph: Graph, key: str) -> None:
-    nodes: Dict[str, Dict[str, str]] = {
-        "Nodes": {
-            str(node): f"{node_data.lat},{node_data.lon}"
-            for node, node_data in graph.nodes.items()
-        }
-    }
-    edges: Dict[str, Dict[str, str]] = {
-        "Edges": {
-            ",".join(str(x) for x in edge_id): ",".join(
-                [str(edge.length), str(edge.maxspeed)]
-            )
-            for edge_id, edge in graph.edges.items()
-        }
-    }
-    graphs_bucket.put_object(Key=f"nodes-{key}.json", Body=json.dumps(nodes))
-    graphs_bucket.put_object(Key=f"edges-{key}.json", Body=json.dumps(edges))
+def store_graph(
+    graph: CompactGraph, key: str, geometry: Optional[EdgeGeometry] = None
+) -> None:
+    for file_key, body in graph_files(graph, key, geometry).items():
+        graphs_bucket.put_object(Key=file_key, Body=body)
+    # Paths solved on a previous graph with this id may no longer be shortest.
+    if result_cache is not None:
+        result_cache.invalidate(key)
+
 
+def store_spatial_index(index: SpatialIndex, key: str) -> None:
+    graphs_bucket.put_object(Key=f"index-{key}.bin", Body=dump_spatial_index(index))
 
-def download_graph(country: str, city: str) -> Tuple[MultiDiGraph, str]:
-    G: MultiDiGraph = cast(
-        MultiDiGraph,
+
+def store_hierarchy(graph: CompactGraph, key: str) -> None:
+    hierarchy = build_hierarchy(graph)
+    graphs_bucket.put_object(Key=f"ch-{key}.bin", Body=dump_hierarchy(hierarchy))
+
+
+def fetch_city_graph(country: str, city: str) -> OsmGraph:
+    return cast(
+        OsmGraph,
         ox.graph_from_place({"city": city, "country": country}, network_type="drive"),
     )
+
+
+def upload_graphml(G: OsmGraph, key: str) -> None:
+    """
+    Compresses the GraphML of `G` into a multipart upload through a pipe.
+    """
+    read_fd, write_fd = os.pipe()
+
+    def write() -> None:
+        with open(write_fd, "wb") as writer:
+            write_graphml(G, writer)
+
+    # Own thread, callers may already run on `executor`.
+    with open(read_fd, "rb") as reader, ThreadPoolExecutor(max_workers=1) as writer_pool:
+        writing = writer_pool.submit(write)
+        graphs_bucket.upload_fileobj(reader, f"{key}.graphml.gz", Config=GRAPHML_TRANSFER)
+    try:
+        writing.result()
+    except BaseException:
+        # The upload saw a truncated document as a complete one.
+        graphs_bucket.Object(f"{key}.graphml.gz").delete()
+        raise
+
+
+def download_graph(country: str, city: str) -> Tuple[OsmGraph, str]:
+    G = fetch_city_graph(country, city)
     key: str = uuid4().hex
-    # TODO: Send it directly to S3
-    ox.save_graphml(G, f"/tmp/{key}.graphml")
-    graphs_bucket.upload_file(f"/tmp/{key}.graphml", f"{key}.graphml")
+    upload_graphml(G, key)
     return G, key
 
 
-def download_graph_by_distance(
-    center: Coordinates, distance: float
-) -> Tuple[MultiDiGraph, str]:
-    G: MultiDiGraph = ox.graph_from_point(
-        (center.latitude, center.longitude), dist=int(distance)
+def download_tile(tile: Tile) -> OsmGraph:
+    north, south, east, west = tile_bounds(tile)
+    try:
+        # Roads of a tile often only connect through its neighbours, keep every piece.
+        return ox.graph_from_bbox(
+            bbox=(north, south, east, west),
+            network_type="drive",
+            retain_all=True,
+            truncate_by_edge=True,
+        )
+    except ValueError:
+        # Sea or no roads, osmnx raises its InsufficientResponseError, a
+        # ValueError, and the bounds of grid tiles are always valid. Stored
+        # empty so it is not downloaded again.
+        return MultiDiGraph(crs=ox.settings.default_crs)
+
+
+def get_tile(tile: Tile) -> OsmGraph:
+    key = f"{tile_id(tile)}.graphml.gz"
+    try:
+        return graph_cache.get_streamed(
+            key, lambda: open_object(key), read_graphml, multidigraph_nbytes
+        )
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        print(f"Downloading tile {tile}")
+    G = download_tile(tile)
+    upload_graphml(G, tile_id(tile))
+    return G
+
+
+def get_corridor(source: Coordinates, destination: Coordinates) -> str:
+    """
+    Graph id of the tiles around both points, stitching and storing them once.
+    """
+    return get_tiled_graph(
+        corridor_tiles(
+            source.latitude, source.longitude, destination.latitude, destination.longitude
+        )
     )
-    key: str = uuid4().hex
-    ox.save_graphml(G, f"/tmp/{key}.graphml")
-    graphs_bucket.upload_file(f"/tmp/{key}.graphml", f"{key}.graphml")
-    return G, key
 
 
-def get_multidigraph(graph_id: str) -> MultiDiGraph:
-    graphs_bucket.download_file(
-        Key=f"{graph_id}.graphml", Filename=f"/tmp/{graph_id}.graphml"
+def get_tiled_graph(tiles: List[Tile]) -> str:
+    graph_id = corridor_id(tiles)
+    if get_compact_graph(graph_id) is not None:
+        return graph_id
+    with timed(f"Stitching {len(tiles)} tiles"):
+        G = stitch_tiles(list(executor.map(get_tile, tiles)))
+    if G.number_of_nodes() == 0:
+        raise ValueError("No roads between source and destination")
+    graph = generate_graph(G)
+    store_graph(graph, graph_id, build_edge_geometry(G, graph))
+    return graph_id
+
+
+def download_object(key: str, filename: str) -> None:
+    raw_object = graphs_bucket.Object(key).get()
+    with open(filename, "wb") as f:
+        shutil.copyfileobj(raw_object["Body"], f)
+
+
+def open_object(key: str) -> Tuple[BinaryIO, int]:
+    raw_object = graphs_bucket.Object(key).get()
+    return cast(BinaryIO, raw_object["Body"]), raw_object["ContentLength"]
+
+
+def get_multidigraph(graph_id: str) -> OsmGraph:
+    key = f"{graph_id}.graphml.gz"
+    try:
+        return graph_cache.get_streamed(
+            key, lambda: open_object(key), read_graphml, multidigraph_nbytes
+        )
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        print(f"No compressed GraphML for {graph_id}, compressing it")
+    # Graphs stored before the GraphML was compressed.
+    legacy_key = f"{graph_id}.graphml"
+    G = graph_cache.get_streamed(
+        legacy_key,
+        lambda: open_object(legacy_key),
+        lambda stream: read_graphml(stream, compressed=False),
+        multidigraph_nbytes,
+    )
+    upload_graphml(G, graph_id)
+    return G
+
+
+def get_delta(graph_id: str, version: int) -> GraphDelta:
+    raw_delta = graphs_bucket.Object(delta_key(graph_id, version)).get()
+    return load_delta(raw_delta["Body"].read())
+
+
+def compose_graph(graph_id: str, version: int, filename: str) -> None:
+    """
+    Writes version `version` of a graph, its base with every delta up to it.
+    """
+    base = get_compact_graph(graph_id)
+    if base is None:
+        raise ValueError(f"No base graph for {graph_ref(graph_id, version)}")
+    deltas = [get_delta(graph_id, delta) for delta in range(1, version + 1)]
+    graph, _ = apply_deltas(base, deltas)
+    with open(filename, "wb") as f:
+        f.write(dump_compact_graph(graph))
+
+
+def get_compact_graph(graph_id: str) -> Optional[CompactGraph]:
+    key = f"graph-{graph_id}.bin"
+    base_id, version = parse_graph_ref(graph_id)
+    if version > 0:
+        return graph_cache.get(
+            key,
+            lambda filename: compose_graph(base_id, version, filename),
+            open_compact_graph,
+            graph_nbytes,
+        )
+    try:
+        return graph_cache.get(
+            key,
+            lambda filename: download_object(key, filename),
+            open_compact_graph,
+            graph_nbytes,
+        )
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        print(f"No compact graph for {graph_id}")
+        return None
+
+
+def download_speed_profiles(key: str, filename: str) -> None:
+    try:
+        download_object(key, filename)
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        print(f"No {key}, using the typical speed profiles")
+        with open(filename, "wb") as f:
+            f.write(dump_speed_profiles(typical_profiles()))
+
+
+def get_speed_profiles(graph_id: str, graph: CompactGraph) -> GraphProfiles:
+    # Overrides are kept by node ids, every version of a graph uses the profiles of its base.
+    key = f"profiles-{parse_graph_ref(graph_id)[0]}.bin"
+    profiles = graph_cache.get(
+        key,
+        lambda filename: download_speed_profiles(key, filename),
+        open_speed_profiles,
+        speed_profiles_nbytes,
+    )
+    return bind_profiles(graph, profiles)
+
+
+def get_landmarks(graph_id: str, graph: CompactGraph) -> Optional[Landmarks]:
+    # Deltas may shorten paths, the landmarks of the base would overestimate them.
+    if parse_graph_ref(graph_id)[1] > 0:
+        return None
+    key = f"landmarks-{graph_id}.bin"
+    try:
+        landmarks = graph_cache.get(
+            key,
+            lambda filename: download_object(key, filename),
+            open_landmarks,
+            landmarks_nbytes,
+        )
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        print(f"No landmarks for {graph_id}")
+        return None
+    if landmarks.from_landmark.shape[1] != len(graph.node_ids):
+        print(f"Landmarks of {graph_id} are not for this graph")
+        return None
+    return landmarks
+
+
+def get_adjacency(graph_id: str, graph: CompactGraph) -> GraphAdjacency:
+    return graph_cache.get_derived(
+        f"adjacency-{graph_id}", lambda: build_adjacency(graph), adjacency_nbytes
+    )
+
+
+def get_edge_weights(graph_id: str, graph: CompactGraph, profile: str) -> EdgeWeights:
+    # Computed once per container, every profile of a graph shares its adjacency.
+    column = graph_cache.get(
+        f"weights-{profile}-{graph_id}.npy",
+        lambda filename: write_weight_column(graph, profile, filename),
+        open_weight_column,
+        lambda column: column.nbytes,
+    )
+    return profile_weights(
+        graph, profile, column, get_landmarks(graph_id, graph), get_adjacency(graph_id, graph)
+    )
+
+
+def get_spatial_index(graph_id: str) -> SpatialIndex:
+    key = f"index-{graph_id}.bin"
+    try:
+        # Kept parsed, loading rebuilds the tree.
+        return graph_cache.get(
+            key,
+            lambda filename: download_object(key, filename),
+            open_spatial_index,
+            spatial_index_nbytes,
+        )
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        # Indexes pickled as index-{graph_id}.pkl before are never loaded.
+        print(f"No spatial index for {graph_id}, building it")
+    graph = get_compact_graph(graph_id)
+    if graph is None:
+        # Graphs stored before the compact format, backfill every file.
+        G = get_multidigraph(graph_id)
+        graph = generate_graph(G)
+        store_graph(graph, graph_id, build_edge_geometry(G, graph))
+        return build_spatial_index(graph)
+    index = build_spatial_index(graph)
+    store_spatial_index(index, graph_id)
+    return index
+
+
+def get_boundaries(reload: bool = False) -> Dict[str, CityBoundary]:
+    global city_boundaries
+    if city_boundaries is None or reload:
+        try:
+            raw_boundaries = graphs_bucket.Object(BOUNDARIES_KEY).get()
+            city_boundaries = load_boundaries(raw_boundaries["Body"].read())
+        except graphs_bucket.meta.client.exceptions.NoSuchKey:
+            print("No city boundaries yet")
+            city_boundaries = {}
+    return city_boundaries
+
+
+def store_boundary(country: str, city: str, graph_id: str, graph: CompactGraph) -> None:
+    """
+    Adds the graph to the boundaries, re-reading them to keep the other containers' cities.
+    """
+    boundaries = get_boundaries(reload=True)
+    if graph_id in boundaries:
+        return
+    boundary = build_boundary(country, city, graph_id, graph)
+    if boundary is None:
+        print(f"No boundary for {city}, {country}")
+        return
+    add_boundary(boundaries, boundary)
+    graphs_bucket.put_object(Key=BOUNDARIES_KEY, Body=dump_boundaries(boundaries))
+
+
+def find_city(coordinates: Coordinates) -> Optional[CityBoundary]:
+    return find_boundary(get_boundaries(), coordinates.latitude, coordinates.longitude)
+
+
+def register_graph(country: str, city: str, graph_id: str, graph: CompactGraph) -> None:
+    graphs_table.put_item(Item={"Country": country, "City": city, "GraphId": graph_id})
+    store_boundary(country, city, graph_id, graph)
+
+
+def get_hierarchy(graph_id: str) -> Optional[ContractionHierarchy]:
+    try:
+        raw_hierarchy = graphs_bucket.Object(f"ch-{graph_id}.bin").get()
+    except graphs_bucket.meta.client.exceptions.NoSuchKey:
+        print(f"No contraction hierarchy for {graph_id}")
+        return None
+    return load_hierarchy(raw_hierarchy["Body"].read())
+
+
+def store_solution(graph: CompactGraph, solution: SearchResult) -> str:
+    current_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    solution_key = f"{current_time}_{uuid4()}"
+    paths_bucket.put_object(
+        Key=f"trace-{solution_key}.zst", Body=dump_trace(graph, solution)
     )
-    return ox.load_graphml(f"/tmp/{graph_id}.graphml")
+    return solution_key
 
 
 def get_graph_id(country: str, city: str) -> Optional[str]:
@@ -156,26 +513,47 @@ def get_graph_id(country: str, city: str) -> Optional[str]:
 
     item: Dict[str, str] = cast(Dict[str, str], response.get("Item", {}))
     graph_id: Optional[str] = item.get("GraphId", None)
-    return graph_id
+    if graph_id is None:
+        return None
+    # Refreshed graphs are read as their base with the deltas up to `Version`.
+    return graph_ref(graph_id, int(item.get("Version", 0)))
 
 
-def get_graph(country: str, city: str) -> Tuple[MultiDiGraph, str]:
+def get_graph(country: str, city: str) -> Tuple[OsmGraph, str]:
     graph_id = get_graph_id(country, city)
     if graph_id is None:
         G, graph_id = download_graph(country, city)
-        graph: Graph = generate_graph(G)
-        store_graph(graph, graph_id)
-        graphs_table.put_item(
-            Item={"Country": country, "City": city, "GraphId": graph_id}
-        )
+        graph: CompactGraph = generate_graph(G)
+        store_graph(graph, graph_id, build_edge_geometry(G, graph))
+        if BUILD_CONTRACTION_HIERARCHY:
+            store_hierarchy(graph, graph_id)
+        register_graph(country, city, graph_id, graph)
     else:
         G = get_multidigraph(graph_id)
 
     return G, graph_id
 
 
-def get_node_id(graph: Union[MultiDiGraph, NGraph], location: Coordinates) -> NodeId:
-    return cast(NodeId, ox.nearest_nodes(graph, location.longitude, location.latitude))  # type: ignore
+def get_node_ids(
+    graph: OsmGraph, source: Coordinates, destination: Coordinates
+) -> Tuple[NodeId, NodeId]:
+    """
+    Nearest nodes of both points, osmnx builds its tree once for the pair.
+    """
+    node_ids = ox.nearest_nodes(
+        graph,
+        [source.longitude, destination.longitude],
+        [source.latitude, destination.latitude],
+    )
+    return int(node_ids[0]), int(node_ids[1])
+
+
+def snap_node(index: SpatialIndex, location: Coordinates) -> NodeId:
+    node_id, distance = nearest_node(index, location.latitude, location.longitude)
+    if distance > SNAP_MAX_DISTANCE:
+        print(f"Not found a valid node around {location} in {SNAP_MAX_DISTANCE}m around")
+        raise ValueError(f"Nearest node is {distance:.0f}m away")
+    return node_id
 
 
 def get_ids(
@@ -189,59 +567,81 @@ def get_ids(
         graph_id = get_graph_id(country, city)
         if graph_id is None:
             G, graph_id = download_graph(country, city)
-            graph: Graph = generate_graph(G)
-            store_graph(graph, graph_id)
-            graphs_table.put_item(
-                Item={"Country": country, "City": city, "GraphId": graph_id}
+            graph: CompactGraph = generate_graph(G)
+            store_graph(graph, graph_id, build_edge_geometry(G, graph))
+            if BUILD_CONTRACTION_HIERARCHY:
+                store_hierarchy(graph, graph_id)
+            register_graph(country, city, graph_id, graph)
+            source, destination = get_node_ids(
+                G, source_coordinates, destination_coordinates
             )
-            source = get_node_id(G, source_coordinates)
-            destination = get_node_id(G, destination_coordinates)
             return graph_id, source, destination
         else:
-            try:
-                source_graph = ox.graph_from_point(
-                    (source_coordinates.latitude, source_coordinates.longitude),
-                    dist=200,
-                    network_type="drive",
-                )
-                destination_graph = ox.graph_from_point(
-                    (
-                        destination_coordinates.latitude,
-                        destination_coordinates.longitude,
-                    ),
-                    dist=200,
-                    network_type="drive",
-                )
-            except ValueError as err:
-                print(
-                    "Not found a valid node around source or destination in 200m around"
-                )
-                print(err)
-                raise
-            source = get_node_id(source_graph, source_coordinates)
-            destination = get_node_id(destination_graph, destination_coordinates)
+            # The search needs the compact graph, download it while snapping.
+            compact_graph_result = executor.submit(get_compact_graph, graph_id)
+            with timed("Spatial index"):
+                index = get_spatial_index(graph_id)
+            source = snap_node(index, source_coordinates)
+            destination = snap_node(index, destination_coordinates)
+            with timed("Compact graph"):
+                compact_graph = compact_graph_result.result()
+            base_id, _ = parse_graph_ref(graph_id)
+            if base_id not in get_boundaries() and compact_graph is not None:
+                # Cities stored before the boundaries, or by another container.
+                store_boundary(country, city, base_id, compact_graph)
             return graph_id, source, destination
     else:
-        latitude = (source_coordinates.latitude + destination_coordinates.longitude) / 2
-        longitude = (
-            source_coordinates.longitude + destination_coordinates.longitude
-        ) / 2
-        G, graph_id = download_graph_by_distance(
-            Coordinates(latitude=latitude, longitude=longitude), 2 * 1000 * use_distance
-        )
-        graph: Graph = generate_graph(G)  # type: ignore
-        store_graph(graph, graph_id)
-        source = get_node_id(G, source_coordinates)
-        destination = get_node_id(G, destination_coordinates)
+        graph_id = get_corridor(source_coordinates, destination_coordinates)
+        index = get_spatial_index(graph_id)
+        source = snap_node(index, source_coordinates)
+        destination = snap_node(index, destination_coordinates)
         return graph_id, source, destination
 
 
-def haversine(source: Coordinates, destination: Coordinates) -> float:
-    earth_radius: float = 6371.0088
-    delta_lat: float = destination.latitude - source.latitude
-    delta_lon: float = destination.longitude - source.longitude
-    dist: float = pow(math.sin((delta_lat / 2)), 2) + math.cos(
-        source.latitude
-    ) * math.cos(destination.latitude) * pow(math.sin(delta_lon / 2), 2)
-    haversine_kernel: float = 2 * math.asin(math.sqrt(dist))
-    return earth_radius * haversine_kernel
+def get_batch_graph(points: List[Coordinates]) -> str:
+    """
+    Graph of the city holding every point, or of the tiles around them.
+    """
+    boundaries = [find_city(point) for point in points]
+    graph_ids = {None if boundary is None else boundary.graph_id for boundary in boundaries}
+    if len(graph_ids) == 1 and None not in graph_ids:
+        boundary = cast(CityBoundary, boundaries[0])
+        return get_graph_id(boundary.country, boundary.city) or boundary.graph_id
+    tiles = area_tiles(
+        [point.latitude for point in points], [point.longitude for point in points]
+    )
+    if len(tiles) > BATCH_MAX_TILES:
+        raise ValueError(f"Batch spans {len(tiles)} tiles, at most {BATCH_MAX_TILES}")
+    return get_tiled_graph(tiles)
+
+
+def snap_nodes(index: SpatialIndex, points: List[Coordinates]) -> List[Optional[NodeId]]:
+    """
+    Nearest node of every point in one query, None when further than `SNAP_MAX_DISTANCE`.
+    """
+    node_ids, distances = snap(
+        index, [point.latitude for point in points], [point.longitude for point in points]
+    )
+    return [
+        int(node_id) if distance <= SNAP_MAX_DISTANCE else None
+        for node_id, distance in zip(node_ids.tolist(), distances.tolist())
+    ]
+
+
+def store_document(kind: str, document: Mapping[str, object]) -> str:
+    """
+    Uploads a JSON answer, too large for the Step Functions payload, and
+    returns a presigned url of it.
+    """
+    current_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    document_key = f"{kind}-{current_time}_{uuid4()}.json"
+    paths_bucket.put_object(
+        Key=document_key,
+        Body=json.dumps(document).encode(),
+        ContentType="application/json",
+    )
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": PATHS_BUCKET_NAME, "Key": document_key},
+        ExpiresIn=PLOT_URL_EXPIRATION,
+    )
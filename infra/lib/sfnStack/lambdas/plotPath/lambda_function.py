@@ -1,14 +1,18 @@
 import json
 
 from dataclasses import dataclass
-from networkx import MultiDiGraph
-from typing import Dict, Union, cast
+from typing import Dict, Optional, Union, cast
 
 from modules.graph import NodeId
+from modules.results import result_cache
+from modules.weights import DEFAULT_ROUTING_PROFILE
 from lambdas.plotPath.utils import (
+    get_basemap,
+    get_edge_geometry,
     get_graph_data,
-    get_multidigraph,
     get_path,
+    get_speed_profiles,
+    plot_reachable,
     reconstruct_path,
 )
 
@@ -21,6 +25,10 @@ class Event:
     source: NodeId
     destination: NodeId
     graph_id: str
+    algorithm: Optional[str]
+    isochrone_url: Optional[str]
+    departure: Optional[float]
+    profile: Optional[str]
 
 
 def lambda_handler(event: Event, _: Dict[str, str]) -> Dict[str, Union[int, str]]:
@@ -31,23 +39,59 @@ def lambda_handler(event: Event, _: Dict[str, str]) -> Dict[str, Union[int, str]
         source=event["source"],  # type: ignore
         destination=event["destination"],  # type: ignore
         graph_id=event["graph_id"],  # type: ignore
+        algorithm=event.get("algorithm"),  # type: ignore
+        isochrone_url=event.get("isochrone_url"),  # type: ignore
+        departure=event.get("departure"),  # type: ignore
+        profile=event.get("profile"),  # type: ignore
     )
-    G: MultiDiGraph = get_multidigraph(event_graph.graph_id)
-    path, visited, active = get_path(event_graph.solution_key)
-    nodes, edges = get_graph_data(event_graph.graph_id)
+    graph = get_graph_data(event_graph.graph_id)
+    path, visited, active = get_path(event_graph.solution_key, graph)
+    geometry = get_edge_geometry(event_graph.graph_id, graph)
+    basemap = get_basemap(event_graph.graph_id, graph, geometry)
+
+    if event_graph.algorithm == "isochrone":
+        # The budget of the largest isochrone is the weight, in hours.
+        s3_url = plot_reachable(
+            graph,
+            event_graph.source,
+            visited,
+            active,
+            event_graph.solution_key,
+            event_graph.weight * 60,
+            geometry,
+            basemap,
+        )
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"url": s3_url, "geojson": event_graph.isochrone_url}),
+        }
 
     s3_url = reconstruct_path(
-        G,
-        nodes,
-        edges,
+        graph,
         event_graph.source,
         event_graph.destination,
         path,
         visited,
         active,
         event_graph.solution_key,
+        geometry,
+        basemap,
+        event_graph.departure,
+        None if event_graph.departure is None else get_speed_profiles(event_graph.graph_id, graph),
+        event_graph.profile,
     )
 
+    if result_cache is not None and event_graph.algorithm is not None:
+        result_cache.put(
+            event_graph.graph_id,
+            event_graph.source,
+            event_graph.destination,
+            event_graph.algorithm,
+            event_graph.solution_key,
+            event_graph.departure,
+            event_graph.profile or DEFAULT_ROUTING_PROFILE,
+        )
+
     return {
         "statusCode": 200,
         "body": json.dumps(cast(Dict[str, str], {"url": s3_url})),
@@ -0,0 +1,371 @@
+import io
+import numpy as np
+import numpy.typing as npt
+import matplotlib.pyplot as plt
+
+from dataclasses import dataclass
+from matplotlib.axes import Axes
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from modules.graph import CompactGraph, EdgeId, edge_mask, edge_sources
+from modules.geometry import EdgeGeometry
+from modules.plot import (
+    POINT_ALPHA,
+    POINT_SIZE,
+    NODE_ALPHA,
+    NODE_SIZE,
+    PathEdge,
+    UnvisitedEdge,
+    ActiveEdge,
+    VisitedEdge,
+)
+
+BACKGROUND_COLOR = "#000000"
+FIGURE_SIZE: Tuple[float, float] = (8, 8)
+# Relative margin around the graph, as `ox.plot_graph`.
+PADDING: float = 0.02
+
+# Resolution of a full city plot, cropped plots scale down to `MIN_DPI`.
+FULL_DPI = 300
+MIN_DPI = 100
+# Margin around the searched area, relative to its size and in degrees (about 300 m).
+VIEWPORT_MARGIN: float = 0.1
+MIN_VIEWPORT_MARGIN: float = 0.003
+
+UNVISITED, ACTIVE, VISITED, PATH = 0, 1, 2, 3
+EdgeStyle = Union[Type[UnvisitedEdge], Type[ActiveEdge], Type[VisitedEdge], Type[PathEdge]]
+# Drawn in this order, so the path stays on top.
+EDGE_STYLES: List[EdgeStyle] = [UnvisitedEdge, ActiveEdge, VisitedEdge, PathEdge]
+
+# Basemap tiles per side and size of each tile in pixels.
+BASEMAP_GRID = 8
+BASEMAP_TILE_PIXELS = 512
+
+Segments = npt.NDArray[np.float64] | List[npt.NDArray[np.float64]]
+# west, south, east, north
+Bounds = Tuple[float, float, float, float]
+
+
+def grid_tile_bounds(bounds: Bounds, rows: int, cols: int, row: int, col: int) -> Bounds:
+    """
+    Bounds of a tile of a `rows * cols` grid over `bounds`, row 0 is the northernmost one.
+    """
+    west, south, east, north = bounds
+    width, height = (east - west) / cols, (north - south) / rows
+    return (
+        west + col * width,
+        north - (row + 1) * height,
+        west + (col + 1) * width,
+        north - row * height,
+    )
+
+
+@dataclass
+class Basemap:
+    """
+    Unvisited network pre-rendered as a grid of tiles over `bounds`.
+
+    `load_tile(row, col)` returns the image of a tile, row 0 is the
+    northernmost one, so only the tiles needed for a plot are loaded.
+    """
+
+    bounds: Bounds
+    rows: int
+    cols: int
+    load_tile: Callable[[int, int], npt.NDArray[np.float32]]
+
+    def tile_bounds(self, row: int, col: int) -> Bounds:
+        return grid_tile_bounds(self.bounds, self.rows, self.cols, row, col)
+
+    def tiles_in(self, viewport: Bounds) -> List[Tuple[int, int]]:
+        west, south, east, north = self.bounds
+        width, height = (east - west) / self.cols, (north - south) / self.rows
+        first_col = int(np.clip((viewport[0] - west) // width, 0, self.cols - 1))
+        last_col = int(np.clip((viewport[2] - west) // width, 0, self.cols - 1))
+        first_row = int(np.clip((north - viewport[3]) // height, 0, self.rows - 1))
+        last_row = int(np.clip((north - viewport[1]) // height, 0, self.rows - 1))
+        return [
+            (row, col)
+            for row in range(first_row, last_row + 1)
+            for col in range(first_col, last_col + 1)
+        ]
+
+
+def edge_classes(
+    graph: CompactGraph,
+    edges_in_path: Iterable[EdgeId],
+    visited: npt.NDArray[np.bool_],
+    active: npt.NDArray[np.bool_],
+) -> npt.NDArray[np.int8]:
+    """
+    Class of every edge, a path edge is never drawn as visited or active.
+    """
+    classes = np.full(len(graph.targets), UNVISITED, dtype=np.int8)
+    classes[active] = ACTIVE
+    classes[visited] = VISITED
+    classes[edge_mask(graph, edges_in_path)] = PATH
+    return classes
+
+
+def edge_segments(graph: CompactGraph, geometry: Optional[EdgeGeometry]) -> Segments:
+    """
+    Polyline of every edge as (lon, lat) points.
+
+    Without geometry every edge is a straight (E, 2, 2) segment array.
+    """
+    sources = edge_sources(graph)
+    starts = np.column_stack([graph.lon[sources], graph.lat[sources]])
+    ends = np.column_stack([graph.lon[graph.targets], graph.lat[graph.targets]])
+    if geometry is None or len(geometry.lat) == 0:
+        return np.stack([starts, ends], axis=1)
+
+    # Interleave the end nodes around the interior points of each edge.
+    n_edges = len(graph.targets)
+    offsets = geometry.offsets + 2 * np.arange(n_edges + 1)
+    points = np.empty((offsets[-1], 2), dtype=np.float64)
+    is_interior = np.ones(offsets[-1], dtype=bool)
+    is_interior[offsets[:-1]] = False
+    is_interior[offsets[1:] - 1] = False
+    points[offsets[:-1]] = starts
+    points[offsets[1:] - 1] = ends
+    points[is_interior] = np.column_stack([geometry.lon, geometry.lat])
+    return np.split(points, offsets[1:-1])
+
+
+def segment_bounds(segments: Segments) -> npt.NDArray[np.float64]:
+    """
+    (E, 4) array with the west, south, east and north bound of every edge.
+    """
+    if isinstance(segments, np.ndarray):
+        return np.column_stack([segments.min(axis=1), segments.max(axis=1)])
+    lengths = np.array([len(segment) for segment in segments], dtype=np.int64)
+    points = np.concatenate(segments)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return np.column_stack(
+        [np.minimum.reduceat(points, starts), np.maximum.reduceat(points, starts)]
+    )
+
+
+def _select(segments: Segments, mask: npt.NDArray[np.bool_]) -> Segments:
+    if isinstance(segments, np.ndarray):
+        return segments[mask]
+    return [segments[index] for index in np.flatnonzero(mask)]
+
+
+def _total_bounds(bounds: npt.NDArray[np.float64]) -> Bounds:
+    return (
+        float(bounds[:, 0].min()),
+        float(bounds[:, 1].min()),
+        float(bounds[:, 2].max()),
+        float(bounds[:, 3].max()),
+    )
+
+
+def _graph_bounds(graph: CompactGraph, bounds: npt.NDArray[np.float64]) -> Bounds:
+    if len(bounds):
+        return _total_bounds(bounds)
+    return (
+        float(graph.lon.min()),
+        float(graph.lat.min()),
+        float(graph.lon.max()),
+        float(graph.lat.max()),
+    )
+
+
+def _padded(bounds: Bounds) -> Bounds:
+    west, south, east, north = bounds
+    padding_ns, padding_ew = (north - south) * PADDING, (east - west) * PADDING
+    return west - padding_ew, south - padding_ns, east + padding_ew, north + padding_ns
+
+
+def search_viewport(
+    graph: CompactGraph,
+    classes: npt.NDArray[np.int8],
+    bounds: npt.NDArray[np.float64],
+    source: int,
+    destination: int,
+) -> Bounds:
+    """
+    Bounds of the path, the visited edges and both end points, with a margin.
+    """
+    searched = bounds[(classes == PATH) | (classes == VISITED)]
+    points = np.array(
+        [
+            [graph.lon[source], graph.lat[source]] * 2,
+            [graph.lon[destination], graph.lat[destination]] * 2,
+        ]
+    )
+    west, south, east, north = _total_bounds(np.concatenate([searched, points]))
+    margin_ew = max((east - west) * VIEWPORT_MARGIN, MIN_VIEWPORT_MARGIN)
+    margin_ns = max((north - south) * VIEWPORT_MARGIN, MIN_VIEWPORT_MARGIN)
+    return west - margin_ew, south - margin_ns, east + margin_ew, north + margin_ns
+
+
+def viewport_dpi(viewport: Bounds, full: Bounds) -> int:
+    """
+    DPI for a crop of the graph, lower than `FULL_DPI` as the crop gets smaller.
+    """
+    fraction = max(
+        (viewport[2] - viewport[0]) / max(full[2] - full[0], 1e-9),
+        (viewport[3] - viewport[1]) / max(full[3] - full[1], 1e-9),
+    )
+    return int(np.clip(round(FULL_DPI * np.sqrt(fraction)), MIN_DPI, FULL_DPI))
+
+
+def _intersects(bounds: npt.NDArray[np.float64], viewport: Bounds) -> npt.NDArray[np.bool_]:
+    west, south, east, north = viewport
+    return np.asarray(
+        (bounds[:, 2] >= west)
+        & (bounds[:, 0] <= east)
+        & (bounds[:, 3] >= south)
+        & (bounds[:, 1] <= north)
+    )
+
+
+def _draw_edges(
+    ax: Axes,
+    segments: Segments,
+    classes: npt.NDArray[np.int8],
+    visible: npt.NDArray[np.bool_],
+    drawn_classes: Iterable[int],
+) -> None:
+    for edge_class in drawn_classes:
+        mask = visible & (classes == edge_class)
+        if not mask.any():
+            continue
+        style = EDGE_STYLES[edge_class]
+        ax.add_collection(
+            LineCollection(
+                _select(segments, mask),  # type: ignore
+                colors=style.color,
+                linewidths=style.linewidth,
+                alpha=style.alpha,
+                zorder=1,
+            )
+        )
+
+
+def _draw_nodes(ax: Axes, graph: CompactGraph, viewport: Bounds) -> None:
+    west, south, east, north = viewport
+    inside = (graph.lon >= west) & (graph.lon <= east) & (graph.lat >= south) & (graph.lat <= north)
+    ax.scatter(
+        x=graph.lon[inside],
+        y=graph.lat[inside],
+        s=NODE_SIZE,
+        c="white",
+        alpha=NODE_ALPHA,
+        edgecolor="none",
+        zorder=1,
+    )
+
+
+def _configure_ax(ax: Axes, limits: Bounds) -> None:
+    """
+    Same axis setup as `ox.plot_graph` for unprojected graphs.
+    """
+    west, south, east, north = limits
+    ax.set_ylim((south, north))
+    ax.set_xlim((west, east))
+    ax.margins(0)
+    ax.tick_params(which="both", direction="in")
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+    ax.set_aspect(1 / np.cos((south + north) / 2 / 180 * np.pi))
+
+
+def render_graph(
+    graph: CompactGraph,
+    classes: npt.NDArray[np.int8],
+    source: int,
+    destination: int,
+    title: str,
+    geometry: Optional[EdgeGeometry] = None,
+    crop: bool = False,
+    basemap: Optional[Basemap] = None,
+) -> Tuple[Figure, int]:
+    """
+    Draws the graph with one `LineCollection` per edge class.
+
+    Matches the look of `ox.plot_graph` with the styles of `modules.plot`.
+    With `crop` only the searched area is drawn, edges outside of it are
+    culled and the DPI is scaled down. With a `basemap` the unvisited edges
+    and nodes come from its tiles and only the search is drawn.
+
+    Returns the figure and the DPI to save it with.
+    """
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE, facecolor=BACKGROUND_COLOR, frameon=False)
+    ax.set_facecolor(BACKGROUND_COLOR)
+
+    segments = edge_segments(graph, geometry)
+    bounds = segment_bounds(segments)
+    full = _graph_bounds(graph, bounds)
+    limits = _padded(full)
+    dpi = FULL_DPI
+    if crop:
+        limits = search_viewport(graph, classes, bounds, source, destination)
+        dpi = viewport_dpi(limits, full)
+    visible = _intersects(bounds, limits)
+
+    if basemap is None:
+        _draw_edges(ax, segments, classes, visible, range(len(EDGE_STYLES)))
+        _draw_nodes(ax, graph, limits)
+    else:
+        for row, col in basemap.tiles_in(limits):
+            tile_west, tile_south, tile_east, tile_north = basemap.tile_bounds(row, col)
+            ax.imshow(
+                basemap.load_tile(row, col),
+                extent=(tile_west, tile_east, tile_south, tile_north),
+                aspect="auto",
+                interpolation="bilinear",
+                zorder=0,
+            )
+        _draw_edges(ax, segments, classes, visible, [ACTIVE, VISITED, PATH])
+
+    ax.scatter(
+        x=graph.lon[[source, destination]],
+        y=graph.lat[[source, destination]],
+        s=POINT_SIZE,
+        c=["blue", "red"],
+        alpha=POINT_ALPHA,
+        edgecolor="none",
+        zorder=1,
+    )
+    _configure_ax(ax, limits)
+    ax.set_title(title, color="#3b528b", fontsize=10)
+    return fig, dpi
+
+
+def render_basemap(
+    graph: CompactGraph,
+    geometry: Optional[EdgeGeometry] = None,
+    grid: int = BASEMAP_GRID,
+    pixels: int = BASEMAP_TILE_PIXELS,
+) -> Tuple[Bounds, Dict[Tuple[int, int], bytes]]:
+    """
+    Renders the unvisited network as `grid * grid` PNG tiles.
+    """
+    segments = edge_segments(graph, geometry)
+    bounds = segment_bounds(segments)
+    limits = _padded(_graph_bounds(graph, bounds))
+    classes = np.full(len(bounds), UNVISITED, dtype=np.int8)
+    tiles: Dict[Tuple[int, int], bytes] = dict()
+    for row in range(grid):
+        for col in range(grid):
+            tile = grid_tile_bounds(limits, grid, grid, row, col)
+            fig = plt.figure(figsize=(pixels / FULL_DPI, pixels / FULL_DPI), dpi=FULL_DPI)
+            fig.patch.set_facecolor(BACKGROUND_COLOR)
+            ax = fig.add_axes((0, 0, 1, 1))
+            ax.set_facecolor(BACKGROUND_COLOR)
+            _draw_edges(ax, segments, classes, _intersects(bounds, tile), [UNVISITED])
+            _draw_nodes(ax, graph, tile)
+            _configure_ax(ax, tile)
+            ax.set_aspect("auto")
+            buffer = io.BytesIO()
+            fig.savefig(buffer, dpi=FULL_DPI, format="png")
+            plt.close(fig)
+            tiles[(row, col)] = buffer.getvalue()
+    return limits, tiles
@@ -2,30 +2,64 @@ import os
 
 from mypy_boto3_dynamodb import DynamoDBServiceResource
 from mypy_boto3_s3 import S3ServiceResource
-import osmnx as ox
 import boto3
 import json
 import io
+import shutil
 import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+import numpy as np
+import numpy.typing as npt
 
-from networkx import MultiDiGraph
 from typing import Optional, Dict, List, Set, Tuple, cast
 
-from modules.graph import NodeId, EdgeId, Edge
-from modules.plot import (
-    POINT_ALPHA,
-    POINT_SIZE,
-    NODE_ALPHA,
-    NODE_SIZE,
-    PathEdge,
-    UnvisitedEdge,
-    ActiveEdge,
-    VisitedEdge,
+from modules.graph import (
+    NodeId,
+    EdgeId,
+    CompactGraph,
+    edge_index,
+    edge_mask,
+    graph_nbytes,
+    load_graph_json,
+    node_indices,
+    dump_compact_graph,
+    open_compact_graph,
+)
+from modules.cache import graph_cache
+from modules.delta import GraphDelta, apply_deltas, delta_key, graph_ref, load_delta, parse_graph_ref
+from modules.results import plot_url
+from modules.trace import load_trace
+from modules.traffic import (
+    GraphProfiles,
+    bind_profiles,
+    dump_speed_profiles,
+    edge_travel_times,
+    format_departure,
+    open_speed_profiles,
+    speed_profiles_nbytes,
+    typical_profiles,
+)
+from modules.geometry import (
+    EdgeGeometry,
+    dump_edge_geometry,
+    edge_geometry_nbytes,
+    open_edge_geometry,
+)
+from lambdas.plotPath.render import (
+    BASEMAP_GRID,
+    Basemap,
+    edge_classes,
+    render_basemap,
+    render_graph,
 )
 
 GRAPHS_TABLE_NAME = os.environ["GRAPHS_TABLE_NAME"]
 GRAPHS_BUCKET_NAME = os.environ["GRAPHS_BUCKET"]
 PATHS_BUCKET_NAME = os.environ["PATHS_BUCKET"]
+# Crop plots to the searched area instead of drawing the whole city.
+PLOT_CROP = os.environ.get("PLOT_CROP") == "true"
+# Draw the unvisited network from pre-rendered tiles, built on the first plot of a graph.
+PLOT_BASEMAP = os.environ.get("PLOT_BASEMAP") == "true"
 
 dynamodb: DynamoDBServiceResource = boto3.resource("dynamodb")
 graphs_table = dynamodb.Table(GRAPHS_TABLE_NAME)
@@ -35,20 +69,129 @@ graphs_bucket = s3.Bucket(GRAPHS_BUCKET_NAME)
 paths_bucket = s3.Bucket(PATHS_BUCKET_NAME)
 
 
-Color = Tuple[float, float, float, float] | str
+def download_object(key: str, filename: str) -> None:
+    raw_object = s3_client.get_object(Bucket=GRAPHS_BUCKET_NAME, Key=key)
+    with open(filename, "wb") as f:
+        shutil.copyfileobj(raw_object["Body"], f)
+
+
+def get_deltas(graph_id: str, version: int) -> List[GraphDelta]:
+    return [
+        load_delta(
+            s3_client.get_object(Bucket=GRAPHS_BUCKET_NAME, Key=delta_key(graph_id, delta))["Body"].read()
+        )
+        for delta in range(1, version + 1)
+    ]
+
+
+def compose_graph(graph_id: str, version: int, filename: str) -> None:
+    graph, _ = apply_deltas(get_graph_data(graph_id), get_deltas(graph_id, version))
+    with open(filename, "wb") as f:
+        f.write(dump_compact_graph(graph))
+
+
+def compose_edge_geometry(graph_id: str, version: int, filename: str) -> None:
+    base = get_graph_data(graph_id)
+    base_geometry = get_edge_geometry(graph_id, base)
+    if base_geometry is None:
+        raise ValueError(f"No edge geometry for {graph_ref(graph_id, version)}")
+    _, geometry = apply_deltas(base, get_deltas(graph_id, version), base_geometry)
+    with open(filename, "wb") as f:
+        f.write(dump_edge_geometry(cast(EdgeGeometry, geometry)))
 
 
-def get_multidigraph(graph_id: str) -> MultiDiGraph:
-    graphs_bucket.download_file(
-        Key=f"{graph_id}.graphml", Filename=f"/tmp/{graph_id}.graphml"
+def get_edge_geometry(graph_id: str, graph: CompactGraph) -> Optional[EdgeGeometry]:
+    key = f"geometry-{graph_id}.bin"
+    base_id, version = parse_graph_ref(graph_id)
+    try:
+        geometry = graph_cache.get(
+            key,
+            (
+                (lambda filename: compose_edge_geometry(base_id, version, filename))
+                if version > 0
+                else (lambda filename: download_object(key, filename))
+            ),
+            open_edge_geometry,
+            edge_geometry_nbytes,
+        )
+    except (s3_client.exceptions.NoSuchKey, ValueError):
+        print(f"No edge geometry for {graph_id}, drawing straight edges")
+        return None
+    if len(geometry.offsets) != len(graph.targets) + 1:
+        print(f"Edge geometry of {graph_id} does not match the graph")
+        return None
+    return geometry
+
+
+def download_speed_profiles(key: str, filename: str) -> None:
+    try:
+        download_object(key, filename)
+    except s3_client.exceptions.NoSuchKey:
+        print(f"No {key}, using the typical speed profiles")
+        with open(filename, "wb") as f:
+            f.write(dump_speed_profiles(typical_profiles()))
+
+
+def get_speed_profiles(graph_id: str, graph: CompactGraph) -> GraphProfiles:
+    key = f"profiles-{parse_graph_ref(graph_id)[0]}.bin"
+    profiles = graph_cache.get(
+        key,
+        lambda filename: download_speed_profiles(key, filename),
+        open_speed_profiles,
+        speed_profiles_nbytes,
     )
+    return bind_profiles(graph, profiles)
 
-    return ox.load_graphml(f"/tmp/{graph_id}.graphml")
+
+def get_basemap(
+    graph_id: str, graph: CompactGraph, geometry: Optional[EdgeGeometry]
+) -> Optional[Basemap]:
+    if not PLOT_BASEMAP:
+        return None
+    prefix = f"basemap-{graph_id}"
+    try:
+        raw_index = s3_client.get_object(Bucket=GRAPHS_BUCKET_NAME, Key=f"{prefix}/index.json")
+        index: Dict[str, List[float] | int] = json.load(raw_index["Body"])
+    except s3_client.exceptions.NoSuchKey:
+        print(f"No basemap for {graph_id}, rendering it")
+        bounds, tiles = render_basemap(graph, geometry)
+        for (row, col), tile in tiles.items():
+            s3_client.put_object(
+                Bucket=GRAPHS_BUCKET_NAME,
+                Key=f"{prefix}/{row}-{col}.png",
+                Body=tile,
+                ContentType="image/png",
+            )
+        index = {"bounds": list(bounds), "rows": BASEMAP_GRID, "cols": BASEMAP_GRID}
+        s3_client.put_object(
+            Bucket=GRAPHS_BUCKET_NAME, Key=f"{prefix}/index.json", Body=json.dumps(index)
+        )
+
+    def load_tile(row: int, col: int) -> npt.NDArray[np.float32]:
+        raw_tile = s3_client.get_object(Bucket=GRAPHS_BUCKET_NAME, Key=f"{prefix}/{row}-{col}.png")
+        return cast(npt.NDArray[np.float32], mpimg.imread(io.BytesIO(raw_tile["Body"].read())))
+
+    west, south, east, north = cast(List[float], index["bounds"])
+    return Basemap(
+        bounds=(west, south, east, north),
+        rows=cast(int, index["rows"]),
+        cols=cast(int, index["cols"]),
+        load_tile=load_tile,
+    )
 
 
 def get_path(
-    solution_key: str,
-) -> Tuple[Dict[NodeId, Optional[NodeId]], Set[EdgeId], Set[EdgeId]]:
+    solution_key: str, graph: CompactGraph
+) -> Tuple[Dict[NodeId, Optional[NodeId]], npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+    try:
+        raw_trace = s3_client.get_object(
+            Bucket=PATHS_BUCKET_NAME, Key=f"trace-{solution_key}.zst"
+        )
+        trace_path, visited_mask, active_mask = load_trace(graph, raw_trace["Body"])  # type: ignore
+        return cast(Dict[NodeId, Optional[NodeId]], trace_path), visited_mask, active_mask
+    except s3_client.exceptions.NoSuchKey:
+        print(f"No trace for {solution_key}, reading JSON solution")
+
     objects = {
         name: s3_client.get_object(
             Bucket=PATHS_BUCKET_NAME, Key=f"{name}-{solution_key}.json"
@@ -60,101 +203,70 @@ def get_path(
     raw_active: List[List[NodeId]] = json.load(objects["active"]["Body"])
 
     path: Dict[NodeId, Optional[NodeId]] = {int(k): v for k, v in raw_path.items()}
-    visited: Set[EdgeId] = {(k[0], k[1]) for k in raw_visited}
-    active: Set[EdgeId] = {(k[0], k[1]) for k in raw_active}
+    visited = edge_mask(graph, ((k[0], k[1]) for k in raw_visited))
+    active = edge_mask(graph, ((k[0], k[1]) for k in raw_active))
     return path, visited, active
 
 
-def get_graph_data(graph_id: str) -> Tuple[List[NodeId], Dict[EdgeId, Edge]]:
+def get_graph_data(graph_id: str) -> CompactGraph:
+    key = f"graph-{graph_id}.bin"
+    base_id, version = parse_graph_ref(graph_id)
+    if version > 0:
+        # Refreshed graphs are their base with every delta up to the version.
+        return graph_cache.get(
+            key,
+            lambda filename: compose_graph(base_id, version, filename),
+            open_compact_graph,
+            graph_nbytes,
+        )
+    try:
+        return graph_cache.get(
+            key,
+            lambda filename: download_object(key, filename),
+            open_compact_graph,
+            graph_nbytes,
+        )
+    except s3_client.exceptions.NoSuchKey:
+        print(f"No compact graph for {graph_id}, reading JSON graph")
+
     [raw_nodes, raw_edges] = [
         s3_client.get_object(Bucket=GRAPHS_BUCKET_NAME, Key=f"{data}-{graph_id}.json")
         for data in ["nodes", "edges"]
     ]
 
-    nodes: Dict[str, str] = json.load(raw_nodes["Body"])
+    nodes: Dict[str, Dict[str, str]] = json.load(raw_nodes["Body"])
     edges: Dict[str, Dict[str, str]] = json.load(raw_edges["Body"])
-
-    graph_nodes: List[NodeId] = [int(node) for node in nodes["Nodes"]]
-    graph_edges: Dict[EdgeId, Edge] = dict()
-    for edge_id, edge in edges["Edges"].items():
-        u, v = edge_id.split(",")
-        graph_edge_id: EdgeId = (int(u), int(v))
-        length, maxspeed = edge.split(",")
-        graph_edge = Edge(
-            id=graph_edge_id, length=float(length), maxspeed=int(maxspeed)
-        )
-        graph_edges[graph_edge_id] = graph_edge
-
-    return graph_nodes, graph_edges
+    return load_graph_json(nodes, edges)
 
 
 def save_graph(
-    graph: MultiDiGraph,
+    graph: CompactGraph,
     edges_in_path: Set[EdgeId],
-    visited: Set[EdgeId],
-    active: Set[EdgeId],
+    visited: npt.NDArray[np.bool_],
+    active: npt.NDArray[np.bool_],
     source: NodeId,
     destination: NodeId,
     solution_key: str,
-    dist: float,
-    time: str,
+    title: str,
+    geometry: Optional[EdgeGeometry] = None,
+    basemap: Optional[Basemap] = None,
 ) -> str:
-    node_size: List[float] = []
-    node_alpha: List[float] = []
-    node_color: List[Color] = []
-    for node in cast(List[NodeId], graph.nodes):
-        if node in (source, destination):
-            node_size.append(POINT_SIZE)
-            node_alpha.append(POINT_ALPHA)
-            if node == source:
-                node_color.append("blue")
-            else:
-                node_color.append("red")
-        else:
-            node_size.append(NODE_SIZE)
-            node_alpha.append(NODE_ALPHA)
-            node_color.append("white")
-    edge_alpha: List[float] = []
-    edge_color: List[str | Tuple[float, float, float, float]] = []
-    edge_linewidth: List[float] = []
-    for edge in graph.edges:
-        edge_id = (edge[0], edge[1])
-        if edge_id in edges_in_path:
-            edge_color.append(PathEdge.color)
-            edge_alpha.append(PathEdge.alpha)
-            edge_linewidth.append(PathEdge.linewidth)
-        elif edge_id in visited:
-            edge_color.append(VisitedEdge.color)
-            edge_alpha.append(VisitedEdge.alpha)
-            edge_linewidth.append(VisitedEdge.linewidth)
-        elif edge_id in active:
-            edge_color.append(ActiveEdge.color)
-            edge_alpha.append(ActiveEdge.alpha)
-            edge_linewidth.append(ActiveEdge.linewidth)
-        else:
-            edge_color.append(UnvisitedEdge.color)
-            edge_alpha.append(UnvisitedEdge.alpha)
-            edge_linewidth.append(UnvisitedEdge.linewidth)
-
-    fig, ax = ox.plot_graph(
+    source_index, destination_index = node_indices(graph, [source, destination]).tolist()
+    fig, dpi = render_graph(
         graph,
-        node_size=node_size,  # type: ignore
-        node_alpha=node_alpha,  # type: ignore
-        edge_color=edge_color,  # type: ignore
-        edge_alpha=edge_alpha,
-        edge_linewidth=edge_linewidth,  # type: ignore
-        node_color=node_color,  # type: ignore
-        bgcolor="#000000",
-        show=False,
-        close=False,
+        edge_classes(graph, edges_in_path, visited, active),
+        source_index,
+        destination_index,
+        title,
+        geometry,
+        crop=PLOT_CROP,
+        basemap=basemap,
     )
-    title: str = "\n".join([f"Distance: {dist} km", f"Time: {time}"])
-    ax.set_title(title, color="#3b528b", fontsize=10)
 
     buffer = io.BytesIO()
 
-    plt.savefig(buffer, dpi=300, format="png")
-    plt.close()
+    fig.savefig(buffer, dpi=dpi, format="png")
+    plt.close(fig)
 
     buffer.seek(0)
     paths_bucket.put_object(
@@ -162,28 +274,27 @@ def save_graph(
     )
     buffer.close()
 
-    response = s3_client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": PATHS_BUCKET_NAME, "Key": f"{solution_key}.png"},
-        ExpiresIn=300,
-    )
-    return str(response)
+    return plot_url(s3_client, PATHS_BUCKET_NAME, solution_key)
 
 
 def reconstruct_path(
-    G: MultiDiGraph,
-    nodes: List[NodeId],
-    edges: Dict[EdgeId, Edge],
+    graph: CompactGraph,
     source: NodeId,
     destination: NodeId,
     path: Dict[NodeId, Optional[NodeId]],
-    visited: Set[EdgeId],
-    active: Set[EdgeId],
+    visited: npt.NDArray[np.bool_],
+    active: npt.NDArray[np.bool_],
     solution_key: str,
+    geometry: Optional[EdgeGeometry] = None,
+    basemap: Optional[Basemap] = None,
+    departure: Optional[float] = None,
+    profiles: Optional[GraphProfiles] = None,
+    profile: Optional[str] = None,
 ) -> str:
     dist: float = 0
     time: float = 0
     edges_in_path: Set[EdgeId] = set()
+    path_edges: List[int] = []
     current_node_id: NodeId = destination
     while current_node_id != source:
         previous_node_id: Optional[NodeId] = path.get(current_node_id, None)
@@ -191,26 +302,66 @@ def reconstruct_path(
             break
         current_edge_id: EdgeId = (previous_node_id, current_node_id)
         edges_in_path.add(current_edge_id)
-        current_edge: Edge = edges[current_edge_id]
-        current_length = current_edge.length
-        current_maxspeed = current_edge.maxspeed
+        current_edge = edge_index(graph, current_edge_id)
+        if current_edge is None:
+            raise KeyError(current_edge_id)
+        path_edges.append(current_edge)
+        current_length = float(graph.length[current_edge])
+        current_maxspeed = float(graph.maxspeed[current_edge])
         dist += current_length / 1000
         time += (current_length / 1000) / current_maxspeed
         current_node_id = previous_node_id
+    title: List[str] = [] if profile is None else [f"Profile: {profile}"]
+    if departure is not None and profiles is not None:
+        # Edges are entered in order from the source, each at the time the previous one ends.
+        time = 0
+        for edge in reversed(path_edges):
+            time += float(
+                edge_travel_times(graph, profiles, np.array([edge], dtype=np.int64), departure + time)[0]
+            )
+        title.append(f"Departure: {format_departure(departure)}")
     time_in_sec = int(time * 60 * 60)
     formatted_time = f"{time_in_sec // 60} min {time_in_sec%60} sec"
     print(f"Total dist = {dist} km")
     print(f"Total time = {formatted_time}")
     print(f"Speed average = {dist / time}")
     s3_url = save_graph(
-        G,
+        graph,
         edges_in_path,
         visited,
         active,
         source,
         destination,
         solution_key,
-        dist,
-        formatted_time,
+        "\n".join([*title, f"Distance: {dist} km", f"Time: {formatted_time}"]),
+        geometry,
+        basemap,
     )
     return s3_url
+
+
+def plot_reachable(
+    graph: CompactGraph,
+    source: NodeId,
+    visited: npt.NDArray[np.bool_],
+    active: npt.NDArray[np.bool_],
+    solution_key: str,
+    minutes: float,
+    geometry: Optional[EdgeGeometry] = None,
+    basemap: Optional[Basemap] = None,
+) -> str:
+    """
+    Plots an isochrone, the reached edges as visited and the frontier as active.
+    """
+    return save_graph(
+        graph,
+        set(),
+        visited,
+        active,
+        source,
+        source,
+        solution_key,
+        f"Reachable in {minutes:g} min",
+        geometry,
+        basemap,
+    )
@@ -0,0 +1,131 @@
+import json
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass, field
+from scipy.spatial import ConvexHull, QhullError
+from typing import Dict, Optional, Tuple
+
+from modules.graph import Buffer, CompactGraph
+
+BOUNDARIES_FORMAT_VERSION = 1
+# Hull vertices are stored with 6 decimals, about 0.1 m.
+COORDINATE_DECIMALS = 6
+
+
+@dataclass
+class CityBoundary:
+    """
+    Convex hull of the nodes of a city graph.
+
+    `hull` rows are (lat, lon) vertices, counter-clockwise in the (lat, lon) plane.
+    """
+
+    country: str
+    city: str
+    graph_id: str
+    hull: npt.NDArray[np.float64]
+    # Bounding box as plain floats, cheaper to reject than the hull sides.
+    bbox: Tuple[float, float, float, float] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.bbox = (
+            float(self.hull[:, 0].min()),
+            float(self.hull[:, 0].max()),
+            float(self.hull[:, 1].min()),
+            float(self.hull[:, 1].max()),
+        )
+
+    @property
+    def area(self) -> float:
+        lat, lon = self.hull[:, 0], self.hull[:, 1]
+        return float(np.dot(lat, np.roll(lon, -1)) - np.dot(lon, np.roll(lat, -1))) / 2
+
+    def contains(self, lat: float, lon: float) -> bool:
+        min_lat, max_lat, min_lon, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        start = self.hull
+        end = np.roll(self.hull, -1, axis=0)
+        # Inside a counter-clockwise convex polygon the point is left of every side.
+        cross = (end[:, 0] - start[:, 0]) * (lon - start[:, 1]) - (
+            end[:, 1] - start[:, 1]
+        ) * (lat - start[:, 0])
+        return bool((cross >= 0).all())
+
+
+def build_boundary(
+    country: str, city: str, graph_id: str, graph: CompactGraph
+) -> Optional[CityBoundary]:
+    """
+    None for graphs too small or too thin to have an area.
+    """
+    points = np.column_stack([graph.lat, graph.lon]).astype(np.float64)
+    try:
+        hull = ConvexHull(points)
+    except (QhullError, ValueError):
+        return None
+    # Qhull lists the vertices of 2-D hulls counter-clockwise.
+    return CityBoundary(
+        country=country,
+        city=city,
+        graph_id=graph_id,
+        hull=np.round(points[hull.vertices], COORDINATE_DECIMALS),
+    )
+
+
+def add_boundary(boundaries: Dict[str, CityBoundary], boundary: CityBoundary) -> None:
+    """
+    Replaces any older graph of the same city.
+    """
+    for graph_id, other in list(boundaries.items()):
+        if (other.country, other.city) == (boundary.country, boundary.city):
+            del boundaries[graph_id]
+    boundaries[boundary.graph_id] = boundary
+
+
+def dump_boundaries(boundaries: Dict[str, CityBoundary]) -> bytes:
+    return json.dumps(
+        {
+            "version": BOUNDARIES_FORMAT_VERSION,
+            "cities": [
+                {
+                    "country": boundary.country,
+                    "city": boundary.city,
+                    "graph_id": boundary.graph_id,
+                    "hull": boundary.hull.tolist(),
+                }
+                for boundary in boundaries.values()
+            ],
+        }
+    ).encode()
+
+
+def load_boundaries(buffer: Buffer) -> Dict[str, CityBoundary]:
+    """
+    Boundaries by graph id.
+    """
+    data = json.loads(bytes(buffer))
+    if data.get("version") != BOUNDARIES_FORMAT_VERSION:
+        raise ValueError(f"Unsupported boundaries version {data.get('version')}")
+    return {
+        city["graph_id"]: CityBoundary(
+            country=city["country"],
+            city=city["city"],
+            graph_id=city["graph_id"],
+            hull=np.asarray(city["hull"], dtype=np.float64).reshape(-1, 2),
+        )
+        for city in data["cities"]
+    }
+
+
+def find_boundary(
+    boundaries: Dict[str, CityBoundary], lat: float, lon: float
+) -> Optional[CityBoundary]:
+    """
+    Smallest boundary containing the point, hulls of neighbouring cities can overlap.
+    """
+    found = [boundary for boundary in boundaries.values() if boundary.contains(lat, lon)]
+    if not found:
+        return None
+    return min(found, key=lambda boundary: boundary.area)
@@ -0,0 +1,250 @@
+import io
+import os
+import shutil
+import threading
+
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Tuple, TypeVar, cast
+
+from modules.graph import OsmGraph
+
+T = TypeVar("T")
+
+CACHE_DIRECTORY = os.environ.get("GRAPH_CACHE_DIRECTORY", "/tmp/graph-cache")
+CACHE_MEMORY_BUDGET = int(os.environ.get("GRAPH_CACHE_MEMORY_MB", "512")) * 2**20
+CACHE_DISK_BUDGET = int(os.environ.get("GRAPH_CACHE_DISK_MB", "512")) * 2**20
+
+# Heap used by a parsed osmnx graph, measured with tracemalloc on `ox.load_graphml`.
+MULTIDIGRAPH_EDGE_BYTES = 1024
+MULTIDIGRAPH_NODE_BYTES = 512
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+    memory_bytes: int = 0
+    disk_bytes: int = 0
+
+
+class TeeReader(io.RawIOBase):
+    """
+    Copies everything read from `source` to `sink`.
+    """
+
+    def __init__(self, source: BinaryIO, sink: BinaryIO) -> None:
+        self.source = source
+        self.sink = sink
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        data = self.source.read(len(buffer))
+        self.sink.write(data)
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class GraphCache:
+    """
+    Two tier LRU cache of parsed graphs that lives across warm invocations.
+
+    Parsed values are kept in memory up to `memory_budget` bytes, the raw
+    files they come from are kept in `directory` up to `disk_budget` bytes.
+    """
+
+    def __init__(self, directory: str, memory_budget: int, disk_budget: int) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory: OrderedDict[str, Tuple[object, int]] = OrderedDict()
+        self.disk: OrderedDict[str, int] = OrderedDict()
+        self.stats = CacheStats()
+        # Guards the LRU bookkeeping only, files are downloaded and parsed under
+        # their own lock so different graphs are fetched concurrently.
+        self.lock = threading.Lock()
+        self.file_locks: Dict[str, threading.Lock] = {}
+        # Files left by a previous instance of the cache, oldest first.
+        for path in sorted(self.directory.iterdir(), key=lambda path: path.stat().st_atime):
+            if path.suffix == ".part":
+                # Interrupted download.
+                path.unlink()
+                continue
+            self.disk[path.name] = path.stat().st_size
+            self.stats.disk_bytes += path.stat().st_size
+
+    def get(
+        self,
+        filename: str,
+        download: Callable[[str], None],
+        load: Callable[[str], T],
+        size: Callable[[T], int],
+    ) -> T:
+        """
+        Returns the parsed `filename`, calling `download(path)` on a miss.
+        """
+        with self._file_lock(filename):
+            with self.lock:
+                if filename in self.memory:
+                    return cast(T, self._memory_hit(filename))
+                on_disk = self._disk_hit(filename)
+
+            path = self.directory / filename
+            if not on_disk:
+                partial = path.with_name(f"{filename}.part")
+                try:
+                    download(partial.as_posix())
+                except BaseException:
+                    partial.unlink(missing_ok=True)
+                    raise
+                partial.rename(path)
+                self._add_file(filename)
+
+            value = load(path.as_posix())
+            with self.lock:
+                self._evict_disk(filename)
+                self._store(filename, value, size(value))
+            return value
+
+    def get_streamed(
+        self,
+        filename: str,
+        open_stream: Callable[[], Tuple[BinaryIO, int]],
+        load: Callable[[BinaryIO], T],
+        size: Callable[[T], int],
+    ) -> T:
+        """
+        Like `get`, but parses `filename` while it is downloaded.
+
+        `open_stream()` returns the remote stream and its length. The disk tier
+        gets a copy of the stream when it fits, it is never required.
+        """
+        with self._file_lock(filename):
+            with self.lock:
+                if filename in self.memory:
+                    return cast(T, self._memory_hit(filename))
+                on_disk = self._disk_hit(filename)
+
+            path = self.directory / filename
+            if on_disk:
+                with open(path, "rb") as f:
+                    value = load(f)
+            else:
+                stream, length = open_stream()
+                if length > self.disk_budget:
+                    value = load(stream)
+                else:
+                    partial = path.with_name(f"{filename}.part")
+                    try:
+                        with open(partial, "wb") as sink:
+                            value = load(cast(BinaryIO, io.BufferedReader(TeeReader(stream, sink))))
+                            # The parser may stop before the end of the stream.
+                            shutil.copyfileobj(stream, sink)
+                    except BaseException:
+                        partial.unlink(missing_ok=True)
+                        raise
+                    partial.rename(path)
+                    self._add_file(filename)
+
+            with self.lock:
+                self._evict_disk(filename)
+                self._store(filename, value, size(value))
+            return value
+
+    def get_derived(self, name: str, build: Callable[[], T], size: Callable[[T], int]) -> T:
+        """
+        Like `get` for values computed from other entries, kept in memory only.
+        """
+        with self._file_lock(name):
+            with self.lock:
+                if name in self.memory:
+                    return cast(T, self._memory_hit(name))
+                self.stats.misses += 1
+
+            value = build()
+            with self.lock:
+                self._store(name, value, size(value))
+            return value
+
+    def _file_lock(self, filename: str) -> threading.Lock:
+        with self.lock:
+            return self.file_locks.setdefault(filename, threading.Lock())
+
+    def _memory_hit(self, filename: str) -> object:
+        self.memory.move_to_end(filename)
+        if filename in self.disk:
+            self.disk.move_to_end(filename)
+        self.stats.memory_hits += 1
+        return self.memory[filename][0]
+
+    def _disk_hit(self, filename: str) -> bool:
+        """
+        Whether `filename` is on disk, counting the hit or the miss.
+        """
+        if filename in self.disk:
+            self.disk.move_to_end(filename)
+            self.stats.disk_hits += 1
+            return True
+        self.stats.misses += 1
+        return False
+
+    def _add_file(self, filename: str) -> None:
+        with self.lock:
+            self.disk[filename] = (self.directory / filename).stat().st_size
+            self.stats.disk_bytes += self.disk[filename]
+
+    def _store(self, filename: str, value: object, value_size: int) -> None:
+        if value_size > self.memory_budget:
+            return
+        self.memory[filename] = (value, value_size)
+        self.stats.memory_bytes += value_size
+        if self.stats.memory_bytes > self.memory_budget:
+            while self.stats.memory_bytes > self.memory_budget:
+                self._evict_memory(next(iter(self.memory)))
+            self.log()
+
+    def _evict_memory(self, filename: str) -> None:
+        _, evicted_size = self.memory.pop(filename)
+        self.stats.memory_bytes -= evicted_size
+        self.stats.memory_evictions += 1
+
+    def _evict_disk(self, loaded: str) -> None:
+        # The newest file goes too when it does not fit alone, it is already
+        # loaded. Files other threads are still reading stay, and values that
+        # may map their file leave memory first, the space only comes back
+        # once they are unmapped.
+        evictions = self.stats.disk_evictions
+        for filename in list(self.disk):
+            if self.stats.disk_bytes <= self.disk_budget:
+                break
+            file_lock = self.file_locks.get(filename)
+            if filename != loaded and file_lock is not None and file_lock.locked():
+                continue
+            if filename in self.memory:
+                self._evict_memory(filename)
+            evicted_size = self.disk.pop(filename)
+            (self.directory / filename).unlink(missing_ok=True)
+            self.stats.disk_bytes -= evicted_size
+            self.stats.disk_evictions += 1
+        if self.stats.disk_evictions > evictions:
+            self.log()
+
+    def log(self) -> None:
+        print(f"Graph cache: {asdict(self.stats)}")
+
+
+def multidigraph_nbytes(graph: OsmGraph) -> int:
+    return (
+        graph.number_of_nodes() * MULTIDIGRAPH_NODE_BYTES
+        + graph.number_of_edges() * MULTIDIGRAPH_EDGE_BYTES
+    )
+
+
+graph_cache = GraphCache(CACHE_DIRECTORY, CACHE_MEMORY_BUDGET, CACHE_DISK_BUDGET)
@@ -0,0 +1,416 @@
+import heapq
+import struct
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from modules.graph import (
+    Buffer,
+    CompactGraph,
+    NodeId,
+    ColumnReader,
+    dump_columns,
+    node_index,
+)
+from modules.routing import SearchResult, travel_times
+
+HIERARCHY_FORMAT_MAGIC = b"CHRC"
+HIERARCHY_FORMAT_VERSION = 1
+# magic, version, reserved, number of nodes, upward edges, downward edges
+HIERARCHY_HEADER = struct.Struct("<4sHHqqq")
+
+# Nodes settled by a witness search before it gives up and adds the shortcut.
+DEFAULT_WITNESS_LIMIT = 200
+
+# Original edges have no middle node.
+NO_MIDDLE = -1
+
+# target -> (weight, middle node)
+_Arcs = Dict[int, Tuple[float, int]]
+
+
+@dataclass
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over the travel times of a `CompactGraph`.
+
+    Both graphs are in CSR layout and only hold edges towards higher ranks.
+    `up_*` are the edges `u -> v` stored at `u`, `down_*` are the edges
+    `u -> v` stored at `v` with `u` as target. `*_middle` is the contracted
+    node a shortcut skips, or `NO_MIDDLE` for original edges.
+    """
+
+    rank: npt.NDArray[np.int32]
+    up_offsets: npt.NDArray[np.int64]
+    up_targets: npt.NDArray[np.int32]
+    up_weights: npt.NDArray[np.float64]
+    up_middle: npt.NDArray[np.int32]
+    down_offsets: npt.NDArray[np.int64]
+    down_targets: npt.NDArray[np.int32]
+    down_weights: npt.NDArray[np.float64]
+    down_middle: npt.NDArray[np.int32]
+
+
+def _witness_search(
+    out_arcs: List[_Arcs],
+    source: int,
+    skip: int,
+    targets: Set[int],
+    max_weight: float,
+    limit: int,
+) -> Dict[int, float]:
+    """
+    Bounded Dijkstra from `source` that never goes through `skip`.
+    """
+    weight_from_source: Dict[int, float] = {source: 0.0}
+    settled: Set[int] = set()
+    frontier: List[Tuple[float, int]] = [(0.0, source)]
+    remaining = set(targets)
+    while frontier and remaining and len(settled) < limit:
+        weight_to_node, node = heapq.heappop(frontier)
+        if node in settled:
+            continue
+        if weight_to_node > max_weight:
+            break
+        settled.add(node)
+        remaining.discard(node)
+        for next_node, (edge_weight, _) in out_arcs[node].items():
+            if next_node == skip:
+                continue
+            new_weight = weight_to_node + edge_weight
+            if new_weight < weight_from_source.get(next_node, np.inf):
+                weight_from_source[next_node] = new_weight
+                heapq.heappush(frontier, (new_weight, next_node))
+    return weight_from_source
+
+
+def _shortcuts(
+    out_arcs: List[_Arcs], in_arcs: List[_Arcs], node: int, limit: int
+) -> List[Tuple[int, int, float]]:
+    """
+    Shortcuts needed to keep every shortest path when `node` is removed.
+    """
+    shortcuts: List[Tuple[int, int, float]] = []
+    if not out_arcs[node]:
+        return shortcuts
+    max_out = max(weight for weight, _ in out_arcs[node].values())
+    for source, (in_weight, _) in in_arcs[node].items():
+        targets = {target for target in out_arcs[node] if target != source}
+        if not targets:
+            continue
+        witness = _witness_search(
+            out_arcs, source, node, targets, in_weight + max_out, limit
+        )
+        for target in targets:
+            weight = in_weight + out_arcs[node][target][0]
+            if witness.get(target, np.inf) > weight:
+                shortcuts.append((source, target, weight))
+    return shortcuts
+
+
+def _priority(
+    out_arcs: List[_Arcs],
+    in_arcs: List[_Arcs],
+    contracted_neighbours: List[int],
+    node: int,
+    limit: int,
+) -> Tuple[int, List[Tuple[int, int, float]]]:
+    """
+    Edge difference plus contracted neighbours, with the shortcuts it needs.
+    """
+    shortcuts = _shortcuts(out_arcs, in_arcs, node, limit)
+    edge_difference = len(shortcuts) - (len(out_arcs[node]) + len(in_arcs[node]))
+    return edge_difference + contracted_neighbours[node], shortcuts
+
+
+def _csr(
+    n_nodes: int, arcs: List[List[Tuple[int, float, int]]]
+) -> Tuple[
+    npt.NDArray[np.int64],
+    npt.NDArray[np.int32],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.int32],
+]:
+    offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum([len(node_arcs) for node_arcs in arcs], out=offsets[1:])
+    flat = [arc for node_arcs in arcs for arc in node_arcs]
+    return (
+        offsets,
+        np.array([target for target, _, _ in flat], dtype=np.int32),
+        np.array([weight for _, weight, _ in flat], dtype=np.float64),
+        np.array([middle for _, _, middle in flat], dtype=np.int32),
+    )
+
+
+def build_hierarchy(
+    graph: CompactGraph,
+    weights: Optional[npt.NDArray[np.float64]] = None,
+    witness_limit: int = DEFAULT_WITNESS_LIMIT,
+) -> ContractionHierarchy:
+    """
+    Contracts every node of `graph`, by default over its travel times.
+
+    Offline only: this is pure Python and takes minutes on a city, run it from
+    `scripts/upload_graph.py` and `scripts/refresh_graph.py`, or in `getGraph`
+    behind `BUILD_CONTRACTION_HIERARCHY`, never while a route is waiting.
+
+    Nodes are ordered by edge difference plus contracted neighbours. Only the
+    neighbours of a contracted node change, they are marked stale and their
+    priority and shortcuts are computed again when they are popped.
+    """
+    if weights is None:
+        weights = travel_times(graph)
+    n_nodes = len(graph.node_ids)
+    out_arcs: List[_Arcs] = [dict() for _ in range(n_nodes)]
+    in_arcs: List[_Arcs] = [dict() for _ in range(n_nodes)]
+    offsets: List[int] = graph.offsets.tolist()
+    targets: List[int] = graph.targets.tolist()
+    edge_weights: List[float] = weights.tolist()
+    for u in range(n_nodes):
+        for edge in range(offsets[u], offsets[u + 1]):
+            v = targets[edge]
+            if u == v or edge_weights[edge] >= out_arcs[u].get(v, (np.inf, 0))[0]:
+                continue
+            out_arcs[u][v] = (edge_weights[edge], NO_MIDDLE)
+            in_arcs[v][u] = (edge_weights[edge], NO_MIDDLE)
+
+    contracted_neighbours = [0] * n_nodes
+    priorities: List[int] = []
+    shortcuts_of: List[List[Tuple[int, int, float]]] = []
+    for node in range(n_nodes):
+        priority, shortcuts = _priority(out_arcs, in_arcs, contracted_neighbours, node, witness_limit)
+        priorities.append(priority)
+        shortcuts_of.append(shortcuts)
+    stale = [False] * n_nodes
+    queue: List[Tuple[int, int]] = [(priority, node) for node, priority in enumerate(priorities)]
+    heapq.heapify(queue)
+
+    rank = np.zeros(n_nodes, dtype=np.int32)
+    up: List[List[Tuple[int, float, int]]] = [[] for _ in range(n_nodes)]
+    down: List[List[Tuple[int, float, int]]] = [[] for _ in range(n_nodes)]
+    contracted = 0
+    while queue:
+        _, node = heapq.heappop(queue)
+        if stale[node]:
+            priorities[node], shortcuts_of[node] = _priority(
+                out_arcs, in_arcs, contracted_neighbours, node, witness_limit
+            )
+            stale[node] = False
+            if queue and priorities[node] > queue[0][0]:
+                heapq.heappush(queue, (priorities[node], node))
+                continue
+        shortcuts, shortcuts_of[node] = shortcuts_of[node], []
+
+        rank[node] = contracted
+        contracted += 1
+        up[node] = [(v, weight, middle) for v, (weight, middle) in out_arcs[node].items()]
+        down[node] = [(u, weight, middle) for u, (weight, middle) in in_arcs[node].items()]
+        for v in out_arcs[node]:
+            del in_arcs[v][node]
+            contracted_neighbours[v] += 1
+            stale[v] = True
+        for u in in_arcs[node]:
+            del out_arcs[u][node]
+            contracted_neighbours[u] += 1
+            stale[u] = True
+        out_arcs[node], in_arcs[node] = dict(), dict()
+        for u, v, weight in shortcuts:
+            if weight < out_arcs[u].get(v, (np.inf, 0))[0]:
+                out_arcs[u][v] = (weight, node)
+                in_arcs[v][u] = (weight, node)
+
+    up_offsets, up_targets, up_weights, up_middle = _csr(n_nodes, up)
+    down_offsets, down_targets, down_weights, down_middle = _csr(n_nodes, down)
+    return ContractionHierarchy(
+        rank=rank,
+        up_offsets=up_offsets,
+        up_targets=up_targets,
+        up_weights=up_weights,
+        up_middle=up_middle,
+        down_offsets=down_offsets,
+        down_targets=down_targets,
+        down_weights=down_weights,
+        down_middle=down_middle,
+    )
+
+
+def dump_hierarchy(hierarchy: ContractionHierarchy) -> bytes:
+    header = HIERARCHY_HEADER.pack(
+        HIERARCHY_FORMAT_MAGIC,
+        HIERARCHY_FORMAT_VERSION,
+        0,
+        len(hierarchy.rank),
+        len(hierarchy.up_targets),
+        len(hierarchy.down_targets),
+    )
+    return dump_columns(
+        header,
+        [
+            hierarchy.rank.astype(np.int32, copy=False),
+            hierarchy.up_offsets.astype(np.int64, copy=False),
+            hierarchy.up_targets.astype(np.int32, copy=False),
+            hierarchy.up_weights.astype(np.float64, copy=False),
+            hierarchy.up_middle.astype(np.int32, copy=False),
+            hierarchy.down_offsets.astype(np.int64, copy=False),
+            hierarchy.down_targets.astype(np.int32, copy=False),
+            hierarchy.down_weights.astype(np.float64, copy=False),
+            hierarchy.down_middle.astype(np.int32, copy=False),
+        ],
+    )
+
+
+def load_hierarchy(buffer: Buffer) -> ContractionHierarchy:
+    """
+    Read a hierarchy written by `dump_hierarchy`.
+    """
+    magic, version, _, n_nodes, n_up, n_down = HIERARCHY_HEADER.unpack_from(buffer, 0)
+    if magic != HIERARCHY_FORMAT_MAGIC:
+        raise ValueError("Not a contraction hierarchy")
+    if version != HIERARCHY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported contraction hierarchy version {version}")
+
+    reader = ColumnReader(buffer, HIERARCHY_HEADER.size)
+    return ContractionHierarchy(
+        rank=reader.read(np.int32, n_nodes).astype(np.int32, copy=False),
+        up_offsets=reader.read(np.int64, n_nodes + 1).astype(np.int64, copy=False),
+        up_targets=reader.read(np.int32, n_up).astype(np.int32, copy=False),
+        up_weights=reader.read(np.float64, n_up).astype(np.float64, copy=False),
+        up_middle=reader.read(np.int32, n_up).astype(np.int32, copy=False),
+        down_offsets=reader.read(np.int64, n_nodes + 1).astype(np.int64, copy=False),
+        down_targets=reader.read(np.int32, n_down).astype(np.int32, copy=False),
+        down_weights=reader.read(np.float64, n_down).astype(np.float64, copy=False),
+        down_middle=reader.read(np.int32, n_down).astype(np.int32, copy=False),
+    )
+
+
+def _middle(
+    offsets: npt.NDArray[np.int64],
+    targets: npt.NDArray[np.int32],
+    middle: npt.NDArray[np.int32],
+    node: int,
+    target: int,
+) -> int:
+    start, end = int(offsets[node]), int(offsets[node + 1])
+    position = np.flatnonzero(targets[start:end] == target)
+    if len(position) == 0:
+        raise KeyError(f"Missing hierarchy edge at {node} to {target}")
+    return int(middle[start + position[0]])
+
+
+def unpack_edges(
+    hierarchy: ContractionHierarchy, edges: List[Tuple[int, int, int]]
+) -> List[Tuple[int, int]]:
+    """
+    Expands `(u, v, middle)` hierarchy edges into the original edges.
+
+    A shortcut `u -> v` over `m` is `u -> m`, stored downward at `m`, plus
+    `m -> v`, stored upward at `m`, since `m` was contracted before both.
+    """
+    original: List[Tuple[int, int]] = []
+    stack = list(reversed(edges))
+    while stack:
+        u, v, middle = stack.pop()
+        if middle == NO_MIDDLE:
+            original.append((u, v))
+            continue
+        first = _middle(
+            hierarchy.down_offsets, hierarchy.down_targets, hierarchy.down_middle, middle, u
+        )
+        second = _middle(
+            hierarchy.up_offsets, hierarchy.up_targets, hierarchy.up_middle, middle, v
+        )
+        stack.append((middle, v, second))
+        stack.append((u, middle, first))
+    return original
+
+
+def query_hierarchy(
+    hierarchy: ContractionHierarchy,
+    graph: CompactGraph,
+    source: NodeId,
+    destination: NodeId,
+) -> Optional[SearchResult]:
+    """
+    Bidirectional upward search, unpacked into the original edges.
+
+    `visited` and `active` are left empty, the searched edges are mostly
+    shortcuts and do not match any street of the graph.
+    """
+    start = node_index(graph, source)
+    target = node_index(graph, destination)
+    if start is None or target is None:
+        return None
+
+    adjacencies = [
+        (hierarchy.up_offsets, hierarchy.up_targets, hierarchy.up_weights, hierarchy.up_middle),
+        (
+            hierarchy.down_offsets,
+            hierarchy.down_targets,
+            hierarchy.down_weights,
+            hierarchy.down_middle,
+        ),
+    ]
+    weight_from: List[Dict[int, float]] = [{start: 0.0}, {target: 0.0}]
+    previous: List[Dict[int, Tuple[int, int]]] = [dict(), dict()]
+    settled: List[Set[int]] = [set(), set()]
+    frontiers: List[List[Tuple[float, int]]] = [[(0.0, start)], [(0.0, target)]]
+    iterations = 0
+    best_weight = 0.0 if start == target else np.inf
+    meeting_node: Optional[int] = start if start == target else None
+
+    while frontiers[0] or frontiers[1]:
+        side = 0 if frontiers[0] and (
+            not frontiers[1] or frontiers[0][0][0] <= frontiers[1][0][0]
+        ) else 1
+        weight_to_node, node = heapq.heappop(frontiers[side])
+        # Every remaining node in this direction is already further than the best path.
+        if weight_to_node >= best_weight:
+            frontiers[side] = []
+            continue
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+        other_weight = weight_from[1 - side].get(node)
+        if other_weight is not None and weight_to_node + other_weight < best_weight:
+            best_weight = weight_to_node + other_weight
+            meeting_node = node
+        offsets, targets, weights, middle = adjacencies[side]
+        start_edge, end_edge = int(offsets[node]), int(offsets[node + 1])
+        for next_node, edge_weight, edge_middle in zip(
+            targets[start_edge:end_edge].tolist(),
+            weights[start_edge:end_edge].tolist(),
+            middle[start_edge:end_edge].tolist(),
+        ):
+            iterations += 1
+            new_weight = weight_to_node + edge_weight
+            if new_weight < weight_from[side].get(next_node, np.inf):
+                weight_from[side][next_node] = new_weight
+                previous[side][next_node] = (node, edge_middle)
+                heapq.heappush(frontiers[side], (new_weight, next_node))
+
+    if meeting_node is None:
+        return None
+
+    edges: List[Tuple[int, int, int]] = []
+    node = meeting_node
+    while node != start:
+        previous_node, edge_middle = previous[0][node]
+        edges.append((previous_node, node, edge_middle))
+        node = previous_node
+    edges.reverse()
+    node = meeting_node
+    while node != target:
+        next_node, edge_middle = previous[1][node]
+        edges.append((node, next_node, edge_middle))
+        node = next_node
+
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    return SearchResult(
+        path={node_ids[v]: node_ids[u] for u, v in unpack_edges(hierarchy, edges)},
+        visited=[],
+        active=[],
+        weight=float(best_weight),
+        iterations=iterations,
+    )
@@ -0,0 +1,304 @@
+import struct
+import numpy as np
+import numpy.typing as npt
+import zstandard
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from modules.graph import (
+    CompactGraph,
+    ColumnReader,
+    build_compact_graph,
+    dump_columns,
+    edge_sources,
+)
+from modules.geometry import EdgeGeometry
+
+DELTA_FORMAT_MAGIC = b"GDLT"
+# Version 2 adds the `highway` column after the geometry.
+DELTA_FORMAT_VERSION = 2
+# magic, version, reserved, graph version, removed nodes, upserted nodes,
+# removed edges, upserted edges, geometry points
+DELTA_HEADER = struct.Struct("<4sHHqqqqqq")
+COMPRESSION_LEVEL = 9
+
+
+@dataclass
+class GraphDelta:
+    """
+    Changes from version `version - 1` of a graph to `version`, by node id.
+
+    Upserted nodes are new or moved, upserted edges are new or have a new
+    `length`, `maxspeed` or `highway`, with their interior points in `geometry`.
+    """
+
+    version: int
+    removed_nodes: npt.NDArray[np.int64]
+    node_ids: npt.NDArray[np.int64]
+    lat: npt.NDArray[np.float64]
+    lon: npt.NDArray[np.float64]
+    removed_edges: npt.NDArray[np.int64]
+    edges: npt.NDArray[np.int64]
+    length: npt.NDArray[np.float32]
+    maxspeed: npt.NDArray[np.float32]
+    highway: npt.NDArray[np.uint8]
+    geometry: EdgeGeometry
+
+    def __len__(self) -> int:
+        return (
+            len(self.removed_nodes) + len(self.node_ids) + len(self.removed_edges) + len(self.edges)
+        )
+
+
+def graph_ref(graph_id: str, version: int) -> str:
+    """
+    Name of a version of a graph, the graph id itself before any delta.
+    """
+    return graph_id if version == 0 else f"{graph_id}@{version}"
+
+
+def parse_graph_ref(ref: str) -> Tuple[str, int]:
+    graph_id, _, version = ref.partition("@")
+    return graph_id, int(version or 0)
+
+
+def delta_key(graph_id: str, version: int) -> str:
+    return f"delta-{graph_id}-{version}.bin"
+
+
+def _edge_ids(graph: CompactGraph) -> npt.NDArray[np.int64]:
+    return np.column_stack(
+        [graph.node_ids[edge_sources(graph)], graph.node_ids[graph.targets]]
+    ).astype(np.int64)
+
+
+def _edge_keys(
+    node_ids: npt.NDArray[np.int64], edges: npt.NDArray[np.int64]
+) -> npt.NDArray[np.int64]:
+    return np.searchsorted(node_ids, edges[:, 0]) * len(node_ids) + np.searchsorted(
+        node_ids, edges[:, 1]
+    )
+
+
+def _select_geometry(
+    geometry: Optional[EdgeGeometry], edges: npt.NDArray[np.int64]
+) -> EdgeGeometry:
+    """
+    Points of some edges of `geometry`, none when there is no geometry.
+    """
+    if geometry is None:
+        return EdgeGeometry(
+            offsets=np.zeros(len(edges) + 1, dtype=np.int64),
+            lat=np.empty(0, dtype=np.float64),
+            lon=np.empty(0, dtype=np.float64),
+        )
+    starts, ends = geometry.offsets[edges], geometry.offsets[edges + 1]
+    return _gather(geometry.lat, geometry.lon, starts, ends - starts)
+
+
+def _gather(
+    lat: npt.NDArray[np.float64],
+    lon: npt.NDArray[np.float64],
+    starts: npt.NDArray[np.int64],
+    counts: npt.NDArray[np.int64],
+) -> EdgeGeometry:
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    points = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+    return EdgeGeometry(offsets=offsets, lat=lat[points], lon=lon[points])
+
+
+def _same_points(
+    old: EdgeGeometry,
+    old_edges: npt.NDArray[np.int64],
+    new: EdgeGeometry,
+    new_edges: npt.NDArray[np.int64],
+) -> npt.NDArray[np.bool_]:
+    old_points, new_points = _select_geometry(old, old_edges), _select_geometry(new, new_edges)
+    counts = np.diff(old_points.offsets)
+    same: npt.NDArray[np.bool_] = counts == np.diff(new_points.offsets)
+    # Edges with the same number of points are compared point by point.
+    old_points = _select_geometry(old, old_edges[same])
+    new_points = _select_geometry(new, new_edges[same])
+    moved = (old_points.lat != new_points.lat) | (old_points.lon != new_points.lon)
+    edge_of_point = np.repeat(np.arange(np.count_nonzero(same)), counts[same])
+    same[same] = np.bincount(edge_of_point, weights=moved, minlength=np.count_nonzero(same)) == 0
+    return same
+
+
+def diff_graphs(
+    old: CompactGraph,
+    new: CompactGraph,
+    version: int,
+    geometry: Optional[EdgeGeometry] = None,
+    old_geometry: Optional[EdgeGeometry] = None,
+) -> GraphDelta:
+    """
+    Delta turning `old` into `new`, `geometry` belongs to `new`.
+
+    Edges with new points are only found when both geometries are given.
+    """
+    _, old_nodes, new_nodes = np.intersect1d(old.node_ids, new.node_ids, return_indices=True)
+    moved = (old.lat[old_nodes] != new.lat[new_nodes]) | (old.lon[old_nodes] != new.lon[new_nodes])
+    upserted_nodes = np.ones(len(new.node_ids), dtype=bool)
+    upserted_nodes[new_nodes[~moved]] = False
+
+    node_ids = np.union1d(old.node_ids, new.node_ids)
+    old_edges, new_edges = _edge_ids(old), _edge_ids(new)
+    old_keys, new_keys = _edge_keys(node_ids, old_edges), _edge_keys(node_ids, new_edges)
+    _, old_common, new_common = np.intersect1d(old_keys, new_keys, return_indices=True)
+    changed = (
+        (old.length[old_common] != new.length[new_common])
+        | (old.maxspeed[old_common] != new.maxspeed[new_common])
+        | (old.highway[old_common] != new.highway[new_common])
+    )
+    if geometry is not None and old_geometry is not None:
+        changed |= ~_same_points(old_geometry, old_common, geometry, new_common)
+    upserted_edges = np.ones(len(new_keys), dtype=bool)
+    upserted_edges[new_common[~changed]] = False
+    removed_edges = np.ones(len(old_keys), dtype=bool)
+    removed_edges[old_common] = False
+    upserted = np.flatnonzero(upserted_edges)
+
+    return GraphDelta(
+        version=version,
+        removed_nodes=np.setdiff1d(old.node_ids, new.node_ids).astype(np.int64),
+        node_ids=new.node_ids[upserted_nodes].astype(np.int64),
+        lat=new.lat[upserted_nodes].astype(np.float64),
+        lon=new.lon[upserted_nodes].astype(np.float64),
+        removed_edges=old_edges[removed_edges],
+        edges=new_edges[upserted],
+        length=new.length[upserted].astype(np.float32),
+        maxspeed=new.maxspeed[upserted].astype(np.float32),
+        highway=new.highway[upserted].astype(np.uint8),
+        geometry=_select_geometry(geometry, upserted),
+    )
+
+
+def apply_delta(
+    graph: CompactGraph, delta: GraphDelta, geometry: Optional[EdgeGeometry] = None
+) -> Tuple[CompactGraph, Optional[EdgeGeometry]]:
+    """
+    Next version of `graph`, and of its `geometry` when given.
+    """
+    keep_nodes = ~np.isin(graph.node_ids, np.concatenate([delta.removed_nodes, delta.node_ids]))
+    node_ids = np.concatenate([graph.node_ids[keep_nodes], delta.node_ids])
+
+    edges = _edge_ids(graph)
+    all_ids = np.union1d(node_ids, graph.node_ids)
+    keys = _edge_keys(all_ids, edges)
+    dropped = np.concatenate(
+        [_edge_keys(all_ids, delta.removed_edges), _edge_keys(all_ids, delta.edges)]
+    )
+    keep_edges = ~np.isin(keys, dropped)
+    # Edges of removed nodes are removed edges too, this only guards bad deltas.
+    keep_edges &= np.isin(edges[:, 0], node_ids) & np.isin(edges[:, 1], node_ids)
+    kept = np.flatnonzero(keep_edges)
+    all_edges = np.concatenate([edges[kept], delta.edges])
+
+    composed = build_compact_graph(
+        node_ids=node_ids,
+        lat=np.concatenate([graph.lat[keep_nodes], delta.lat]),
+        lon=np.concatenate([graph.lon[keep_nodes], delta.lon]),
+        sources=all_edges[:, 0],
+        targets=all_edges[:, 1],
+        length=np.concatenate([graph.length[kept], delta.length]),
+        maxspeed=np.concatenate([graph.maxspeed[kept], delta.maxspeed]),
+        highway=np.concatenate([graph.highway[kept], delta.highway]),
+    )
+    if geometry is None:
+        return composed, None
+
+    # Composed edges are sorted by key, in the order of the kept and upserted ones.
+    order = np.argsort(_edge_keys(composed.node_ids, all_edges), kind="stable")
+    starts = np.concatenate(
+        [geometry.offsets[kept], delta.geometry.offsets[:-1] + len(geometry.lat)]
+    )
+    counts = np.concatenate(
+        [
+            geometry.offsets[kept + 1] - geometry.offsets[kept],
+            np.diff(delta.geometry.offsets),
+        ]
+    )
+    return composed, _gather(
+        np.concatenate([geometry.lat, delta.geometry.lat]),
+        np.concatenate([geometry.lon, delta.geometry.lon]),
+        starts[order],
+        counts[order],
+    )
+
+
+def apply_deltas(
+    graph: CompactGraph, deltas: List[GraphDelta], geometry: Optional[EdgeGeometry] = None
+) -> Tuple[CompactGraph, Optional[EdgeGeometry]]:
+    for delta in sorted(deltas, key=lambda delta: delta.version):
+        graph, geometry = apply_delta(graph, delta, geometry)
+    return graph, geometry
+
+
+def dump_delta(delta: GraphDelta) -> bytes:
+    header = DELTA_HEADER.pack(
+        DELTA_FORMAT_MAGIC,
+        DELTA_FORMAT_VERSION,
+        0,
+        delta.version,
+        len(delta.removed_nodes),
+        len(delta.node_ids),
+        len(delta.removed_edges),
+        len(delta.edges),
+        len(delta.geometry.lat),
+    )
+    columns = dump_columns(
+        header,
+        [
+            delta.removed_nodes.astype(np.int64, copy=False),
+            delta.node_ids.astype(np.int64, copy=False),
+            delta.lat.astype(np.float64, copy=False),
+            delta.lon.astype(np.float64, copy=False),
+            np.ascontiguousarray(delta.removed_edges, dtype=np.int64),
+            np.ascontiguousarray(delta.edges, dtype=np.int64),
+            delta.length.astype(np.float32, copy=False),
+            delta.maxspeed.astype(np.float32, copy=False),
+            delta.geometry.offsets.astype(np.int64, copy=False),
+            delta.geometry.lat.astype(np.float64, copy=False),
+            delta.geometry.lon.astype(np.float64, copy=False),
+            delta.highway.astype(np.uint8, copy=False),
+        ],
+    )
+    return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(columns)
+
+
+def load_delta(buffer: bytes) -> GraphDelta:
+    """
+    Read a delta written by `dump_delta`.
+    """
+    columns = zstandard.ZstdDecompressor().decompress(buffer)
+    magic, version, _, graph_version, *counts = DELTA_HEADER.unpack_from(columns, 0)
+    if magic != DELTA_FORMAT_MAGIC:
+        raise ValueError("Not a graph delta")
+    if version not in [1, DELTA_FORMAT_VERSION]:
+        raise ValueError(f"Unsupported graph delta version {version}")
+    removed_nodes, nodes, removed_edges, edges, points = counts
+
+    reader = ColumnReader(columns, DELTA_HEADER.size)
+    delta = GraphDelta(
+        version=graph_version,
+        removed_nodes=reader.read(np.int64, removed_nodes).astype(np.int64, copy=False),
+        node_ids=reader.read(np.int64, nodes).astype(np.int64, copy=False),
+        lat=reader.read(np.float64, nodes).astype(np.float64, copy=False),
+        lon=reader.read(np.float64, nodes).astype(np.float64, copy=False),
+        removed_edges=reader.read(np.int64, 2 * removed_edges).astype(np.int64).reshape(-1, 2),
+        edges=reader.read(np.int64, 2 * edges).astype(np.int64).reshape(-1, 2),
+        length=reader.read(np.float32, edges).astype(np.float32, copy=False),
+        maxspeed=reader.read(np.float32, edges).astype(np.float32, copy=False),
+        highway=np.zeros(edges, dtype=np.uint8),
+        geometry=EdgeGeometry(
+            offsets=reader.read(np.int64, edges + 1).astype(np.int64, copy=False),
+            lat=reader.read(np.float64, points).astype(np.float64, copy=False),
+            lon=reader.read(np.float64, points).astype(np.float64, copy=False),
+        ),
+    )
+    if version > 1:
+        delta.highway = reader.read(np.uint8, edges).astype(np.uint8, copy=False)
+    return delta
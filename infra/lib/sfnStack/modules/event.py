@@ -1,6 +1,17 @@
 from typing import Union, TypedDict, Optional, Literal
 
-Algorithms = Literal["dijkstra", "a_star", "a_star_enhanced"]
+Algorithms = Literal[
+    "bfs",
+    "dijkstra",
+    "a_star",
+    "a_star_enhanced",
+    "bidirectional_dijkstra",
+    "bidirectional_a_star",
+    "contraction_hierarchies",
+    "isochrone",
+]
+
+RoutingProfiles = Literal["fastest", "shortest", "avoid_highways"]
 
 
 class EventCoords(TypedDict, total=False):
@@ -9,16 +20,32 @@ class EventCoords(TypedDict, total=False):
     source_lon: str
     dest_lat: str
     dest_lon: str
+    # Isochrones only, budgets in minutes as "5,10,15" and "true" to plot them.
+    minutes: Optional[str]
+    plot: Optional[str]
+    # Local time of the city as "2024-05-13T08:30", routes follow the traffic then.
+    departure_time: Optional[str]
+    profile: Optional[RoutingProfiles]
 
 
 class EventAddress(TypedDict, total=False):
     algorithm: Optional[Algorithms]
     source: str
     dest: str
+    minutes: Optional[str]
+    plot: Optional[str]
+    departure_time: Optional[str]
+    profile: Optional[RoutingProfiles]
+
+
+class EventBatch(TypedDict, total=False):
+    # Points as "lat,lon" separated by ";".
+    sources: str
+    destinations: str
 
 
 class EventQueryString(TypedDict, total=False):
-    querystring: EventAddress | EventCoords
+    querystring: EventAddress | EventCoords | EventBatch
 
 
-Event = Union[EventCoords, EventAddress, EventQueryString]
+Event = Union[EventCoords, EventAddress, EventBatch, EventQueryString]
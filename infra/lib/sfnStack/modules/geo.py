@@ -0,0 +1,86 @@
+import numpy as np
+import numpy.typing as npt
+
+from typing import Tuple
+
+# Mean earth radius in km, as the `haversine` package and the ball tree use it.
+EARTH_RADIUS: float = 6371.0088
+KM_PER_DEGREE: float = EARTH_RADIUS * np.pi / 180
+# Longitudes are scaled by at least this, near the poles a degree of longitude is almost nothing.
+MIN_LONGITUDE_SCALE = 0.01
+
+
+def haversine_km(
+    lat1: npt.ArrayLike, lon1: npt.ArrayLike, lat2: npt.ArrayLike, lon2: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Great circle distance in km between points in degrees, broadcast as numpy does.
+    """
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    d = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    # Rounding can push antipodal points slightly above 1.
+    return np.asarray(EARTH_RADIUS * 2 * np.arcsin(np.sqrt(np.minimum(d, 1.0))), dtype=np.float64)
+
+
+def equirectangular_km(
+    lat1: npt.ArrayLike, lon1: npt.ArrayLike, lat2: npt.ArrayLike, lon2: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Distance in km on a plane around the middle latitude of each pair.
+
+    Within a city it is off by well under 0.1%, but it may be shorter than
+    `haversine_km`, so it can not bound A*.
+    """
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return np.asarray(EARTH_RADIUS * np.hypot(x, y), dtype=np.float64)
+
+
+def initial_bearing(
+    lat1: npt.ArrayLike, lon1: npt.ArrayLike, lat2: npt.ArrayLike, lon2: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Compass bearing in degrees from the first point towards the second, in [0, 360).
+    """
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    delta_lon = lon2 - lon1
+    y = np.sin(delta_lon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta_lon)
+    return np.asarray(np.degrees(np.arctan2(y, x)) % 360, dtype=np.float64)
+
+
+def bounding_box(
+    lat: npt.ArrayLike, lon: npt.ArrayLike, margin_km: float = 0.0
+) -> Tuple[float, float, float, float]:
+    """
+    South, west, north and east of every point, `margin_km` further out on each side.
+
+    As in GeoJSON, west is greater than east when the box crosses the
+    antimeridian, and a box reaching a pole spans every longitude. The margin
+    in longitude is taken at the middle latitude of the box.
+    """
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    margin_degrees = margin_km / KM_PER_DEGREE
+    south = max(float(lat.min()) - margin_degrees, -90.0)
+    north = min(float(lat.max()) + margin_degrees, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    # The box leaves out the largest gap between the longitudes, the one across
+    # the antimeridian unless the points are close to it on both sides.
+    lon = np.unique(np.where((lon < -180) | (lon > 180), (lon + 180) % 360 - 180, lon))
+    gaps = np.diff(lon, append=lon[0] + 360)
+    widest = int(np.argmax(gaps))
+    west, east = float(lon[(widest + 1) % len(lon)]), float(lon[widest])
+    scale = float(np.cos(np.radians((south + north) / 2)))
+    margin_lon_degrees = margin_degrees / max(scale, MIN_LONGITUDE_SCALE)
+    if 360 - float(gaps[widest]) + 2 * margin_lon_degrees >= 360:
+        return south, -180.0, north, 180.0
+    west, east = west - margin_lon_degrees, east + margin_lon_degrees
+    return south, west + 360 if west < -180 else west, north, east - 360 if east > 180 else east
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import requests
+
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Protocol, TypedDict, Union, cast
+from urllib.parse import urlencode
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org"
+HEADERS = {"User-Agent": "GraphMapsApplication/1.0"}
+
+# Nominatim usage policy allows one request per second.
+REQUESTS_PER_SECOND: float = 1.0
+# Reverse lookups are cached per cell of 4 decimals, about 11 m.
+REVERSE_PRECISION = 4
+CACHE_TTL = 30 * 24 * 60 * 60
+MEMORY_CACHE_SIZE = 4096
+TIMEOUT = 10
+# Rate limits and server errors are retried after 1, 2 and 4 seconds,
+# or after the `Retry-After` of the answer.
+RETRIES = 3
+RETRY_BACKOFF = 1.0
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+class Address(TypedDict, total=False):
+    """
+    Address details of a Nominatim place, only the fields present are returned.
+    """
+
+    road: str
+    suburb: str
+    city: str
+    town: str
+    village: str
+    state: str
+    postcode: str
+    country: str
+    country_code: str
+
+
+class SearchPlace(TypedDict, total=False):
+    """
+    One place of a Nominatim search, coordinates come as strings.
+    """
+
+    place_id: int
+    osm_type: str
+    osm_id: int
+    lat: str
+    lon: str
+    display_name: str
+    boundingbox: List[str]
+    importance: float
+
+
+class ReversePlace(SearchPlace, total=False):
+    """
+    Nominatim reverse answer, only `error` is set when nothing is there.
+    """
+
+    address: Address
+    error: str
+
+
+GeocodingResult = Union[List[SearchPlace], ReversePlace]
+
+
+class GeocodingStore(Protocol):
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def put(self, key: str, value: str, ttl: int) -> None:
+        ...
+
+
+class DynamoDBStore:
+    """
+    Persistent cache in a DynamoDB table with `Key` as partition key and
+    `ExpiresAt` as TTL attribute.
+    """
+
+    def __init__(self, table_name: str) -> None:
+        import boto3
+
+        self.table = boto3.resource("dynamodb").Table(table_name)
+
+    def get(self, key: str) -> Optional[str]:
+        item = self.table.get_item(Key={"Key": key}).get("Item")
+        # Expired items can still be returned until DynamoDB deletes them.
+        if item is None or int(item["ExpiresAt"]) < time.time():  # type: ignore
+            return None
+        return str(item["Value"])
+
+    def put(self, key: str, value: str, ttl: int) -> None:
+        self.table.put_item(
+            Item={"Key": key, "Value": value, "ExpiresAt": int(time.time()) + ttl}
+        )
+
+
+class SQLiteStore:
+    """
+    Persistent cache in a local SQLite file, for the scripts.
+    """
+
+    def __init__(self, filepath: str) -> None:
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filepath, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocoding "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at INTEGER NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM geocoding WHERE key = ? AND expires_at >= ?",
+                (key, int(time.time())),
+            ).fetchone()
+        return None if row is None else str(row[0])
+
+    def put(self, key: str, value: str, ttl: int) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO geocoding VALUES (?, ?, ?)",
+                (key, value, int(time.time()) + ttl),
+            )
+
+
+class TokenBucket:
+    """
+    Blocks callers so that at most `rate` calls per second go through.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+
+
+class GeocodingClient:
+    """
+    Nominatim client with an in-process LRU and an optional persistent cache.
+
+    Requests share one pooled session and are retried with exponential
+    backoff on rate limits and server errors, every attempt waits on the
+    token bucket.
+    """
+
+    def __init__(
+        self,
+        store: Optional[GeocodingStore] = None,
+        rate: float = REQUESTS_PER_SECOND,
+        ttl: int = CACHE_TTL,
+        cache_size: int = MEMORY_CACHE_SIZE,
+    ) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, GeocodingResult] = OrderedDict()
+        self.lock = threading.Lock()
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+
+    def search(self, params: Dict[str, str | int]) -> Optional[List[SearchPlace]]:
+        """
+        Forward geocoding, None if Nominatim could not answer.
+        """
+        query = dict(params, format="json")
+        key = f"search:{urlencode(sorted(query.items()))}"
+        return cast(Optional[List[SearchPlace]], self._get(key, "search", query))
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[ReversePlace]:
+        """
+        Reverse geocoding of the cell containing the coordinates.
+        """
+        latitude, longitude = (
+            round(latitude, REVERSE_PRECISION),
+            round(longitude, REVERSE_PRECISION),
+        )
+        key = f"reverse:{latitude:.{REVERSE_PRECISION}f},{longitude:.{REVERSE_PRECISION}f}"
+        query: Dict[str, str | float] = {"format": "json", "lat": latitude, "lon": longitude}
+        return cast(Optional[ReversePlace], self._get(key, "reverse", query))
+
+    def _get(self, key: str, endpoint: str, query: Mapping[str, str | float]) -> Optional[GeocodingResult]:
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        raw_result = self.store.get(key) if self.store is not None else None
+        if raw_result is None:
+            raw_result = self._request(endpoint, query)
+            if raw_result is None:
+                return None
+            if self.store is not None:
+                self.store.put(key, raw_result, self.ttl)
+
+        result: GeocodingResult = json.loads(raw_result)
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def _request(self, endpoint: str, query: Mapping[str, str | float]) -> Optional[str]:
+        for attempt in range(RETRIES + 1):
+            delay = RETRY_BACKOFF * 2**attempt
+            self.bucket.acquire()
+            try:
+                response = self.session.get(
+                    f"{NOMINATIM_URL}/{endpoint}", params=query, timeout=TIMEOUT
+                )
+            except requests.RequestException as err:
+                print(f"Geocoding request failed: {err}")
+                if attempt == RETRIES:
+                    return None
+                time.sleep(delay)
+                continue
+            if response.status_code == 200:
+                return response.text
+            print(f"Geocoding request failed with status {response.status_code}")
+            if response.status_code not in RETRY_STATUSES or attempt == RETRIES:
+                return None
+            retry_after = response.headers.get("Retry-After", "")
+            time.sleep(float(retry_after) if retry_after.isdigit() else delay)
+        return None
+
+
+def default_client() -> GeocodingClient:
+    """
+    Client cached in `GEOCODING_TABLE_NAME`, or in `GEOCODING_CACHE_FILE` for local runs.
+    """
+    table_name = os.environ.get("GEOCODING_TABLE_NAME")
+    if table_name:
+        return GeocodingClient(DynamoDBStore(table_name))
+    filepath = os.environ.get("GEOCODING_CACHE_FILE")
+    if filepath:
+        return GeocodingClient(SQLiteStore(filepath))
+    return GeocodingClient()
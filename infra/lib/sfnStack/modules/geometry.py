@@ -0,0 +1,109 @@
+import struct
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass
+from shapely.geometry import LineString
+from typing import List, Optional, cast
+
+from modules.graph import (
+    Buffer,
+    CompactGraph,
+    ColumnReader,
+    OsmGraph,
+    dump_columns,
+    edge_indices,
+)
+
+GEOMETRY_FORMAT_MAGIC = b"GEOM"
+GEOMETRY_FORMAT_VERSION = 1
+# magic, version, reserved, number of edges, number of points
+GEOMETRY_HEADER = struct.Struct("<4sHHqq")
+
+
+@dataclass
+class EdgeGeometry:
+    """
+    Interior points of the edges of a `CompactGraph`, in CSR layout.
+
+    The points of edge `i` are `offsets[i]:offsets[i + 1]`, the end nodes are
+    not repeated and straight edges have no points.
+    """
+
+    offsets: npt.NDArray[np.int64]
+    lat: npt.NDArray[np.float64]
+    lon: npt.NDArray[np.float64]
+
+
+def build_edge_geometry(G: OsmGraph, graph: CompactGraph) -> EdgeGeometry:
+    """
+    Reads the osmnx `geometry` of every edge kept in `graph`.
+
+    Parallel edges keep the last geometry, as `build_compact_graph` does.
+    """
+    n_edges = len(graph.targets)
+    edges = list(G.edges(data=True))
+    indices = edge_indices(graph, [(u, v) for u, v, _ in edges]).tolist()
+    points: List[npt.NDArray[np.float64]] = [np.empty((0, 2))] * n_edges
+    for index, (_, _, data) in zip(indices, edges):
+        if index < 0:
+            continue
+        geometry = cast(Optional[LineString], data.get("geometry"))
+        if geometry is None:
+            points[index] = np.empty((0, 2))
+        else:
+            # Shapely coordinates are (lon, lat) and include both end nodes.
+            points[index] = np.asarray(geometry.coords, dtype=np.float64)[1:-1]
+    offsets = np.zeros(n_edges + 1, dtype=np.int64)
+    np.cumsum([len(edge_points) for edge_points in points], out=offsets[1:])
+    coordinates = np.concatenate(points) if n_edges else np.empty((0, 2))
+    return EdgeGeometry(
+        offsets=offsets,
+        lat=np.ascontiguousarray(coordinates[:, 1], dtype=np.float64),
+        lon=np.ascontiguousarray(coordinates[:, 0], dtype=np.float64),
+    )
+
+
+def dump_edge_geometry(geometry: EdgeGeometry) -> bytes:
+    header = GEOMETRY_HEADER.pack(
+        GEOMETRY_FORMAT_MAGIC,
+        GEOMETRY_FORMAT_VERSION,
+        0,
+        len(geometry.offsets) - 1,
+        len(geometry.lat),
+    )
+    return dump_columns(
+        header,
+        [
+            geometry.offsets.astype(np.int64, copy=False),
+            geometry.lat.astype(np.float64, copy=False),
+            geometry.lon.astype(np.float64, copy=False),
+        ],
+    )
+
+
+def load_edge_geometry(buffer: Buffer) -> EdgeGeometry:
+    """
+    Read the geometry written by `dump_edge_geometry`.
+    """
+    magic, version, _, n_edges, n_points = GEOMETRY_HEADER.unpack_from(buffer, 0)
+    if magic != GEOMETRY_FORMAT_MAGIC:
+        raise ValueError("Not an edge geometry")
+    if version != GEOMETRY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported edge geometry version {version}")
+
+    reader = ColumnReader(buffer, GEOMETRY_HEADER.size)
+    return EdgeGeometry(
+        offsets=reader.read(np.int64, n_edges + 1).astype(np.int64, copy=False),
+        lat=reader.read(np.float64, n_points).astype(np.float64, copy=False),
+        lon=reader.read(np.float64, n_points).astype(np.float64, copy=False),
+    )
+
+
+def open_edge_geometry(filepath: str) -> EdgeGeometry:
+    with open(filepath, "rb") as f:
+        return load_edge_geometry(f.read())
+
+
+def edge_geometry_nbytes(geometry: EdgeGeometry) -> int:
+    return geometry.offsets.nbytes + geometry.lat.nbytes + geometry.lon.nbytes
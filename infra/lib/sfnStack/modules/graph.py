@@ -1,9 +1,51 @@
+import math
+import mmap
+import struct
+import numpy as np
+import numpy.typing as npt
+
 from dataclasses import dataclass
-from typing import Tuple, Dict, List
+from networkx import MultiDiGraph
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Mapping, Tuple, Dict, List, Optional, Union, cast
 
 NodeId = int
 EdgeId = Tuple[NodeId, NodeId]
 
+EdgeData = Dict[str, List[str] | str | int]
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+if TYPE_CHECKING:
+    # osmnx graphs, node and edge attributes are whatever the tags held.
+    OsmGraph = MultiDiGraph[NodeId, Dict[str, object], Dict[str, object]]
+    # Any raw column of `dump_columns`, numpy scalars are not subscriptable at runtime.
+    Column = npt.NDArray[np.generic[object]]
+else:
+    OsmGraph = MultiDiGraph
+    Column = npt.NDArray[np.generic]
+
+GRAPH_FORMAT_MAGIC = b"GRPH"
+# Version 2 adds the `highway` column, graphs of version 1 are read without it.
+GRAPH_FORMAT_VERSION = 2
+
+# magic, version, top speed in km/h, number of nodes, number of edges
+# Graphs written before the top speed have 0 there, it is taken from `maxspeed`.
+GRAPH_HEADER = struct.Struct("<4sHHqq")
+
+# Values of the osmnx `highway` tag stored in `CompactGraph.highway` by index,
+# links are stored as the road they join and any other value as 0.
+HIGHWAY_CLASSES = [
+    "unclassified",
+    "motorway",
+    "trunk",
+    "primary",
+    "secondary",
+    "tertiary",
+    "residential",
+    "living_street",
+    "service",
+]
+
 
 @dataclass
 class Node:
@@ -24,3 +66,386 @@ class Edge:
 class Graph:
     nodes: Dict[NodeId, Node]
     edges: Dict[EdgeId, Edge]
+
+
+@dataclass
+class CompactGraph:
+    """
+    Columnar graph in CSR layout.
+
+    Nodes are sorted by id, the edges leaving the node at index `i` are
+    `targets[offsets[i]:offsets[i + 1]]`, where targets are node indices.
+    `highway` indexes `HIGHWAY_CLASSES`. `max_speed` is the highest speed
+    limit in km/h, 0 without edges.
+    """
+
+    node_ids: npt.NDArray[np.int64]
+    lat: npt.NDArray[np.float64]
+    lon: npt.NDArray[np.float64]
+    offsets: npt.NDArray[np.int64]
+    targets: npt.NDArray[np.int32]
+    length: npt.NDArray[np.float32]
+    maxspeed: npt.NDArray[np.float32]
+    highway: npt.NDArray[np.uint8]
+    max_speed: float
+
+
+def _max_speed(maxspeed: npt.NDArray[np.float32]) -> float:
+    return float(maxspeed.max()) if len(maxspeed) > 0 else 0.0
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def build_compact_graph(
+    node_ids: npt.NDArray[np.int64],
+    lat: npt.NDArray[np.float64],
+    lon: npt.NDArray[np.float64],
+    sources: npt.NDArray[np.int64],
+    targets: npt.NDArray[np.int64],
+    length: npt.NDArray[np.float64],
+    maxspeed: npt.NDArray[np.float64],
+    highway: Optional[npt.NDArray[np.uint8]] = None,
+) -> CompactGraph:
+    """
+    Build the CSR layout from an edge list of node ids.
+
+    Parallel edges are collapsed keeping the last one, as `Graph.edges`
+    does when keyed by `(u, v)`. Edges without `highway` are unclassified.
+    """
+    if highway is None:
+        highway = np.zeros(len(sources), dtype=np.uint8)
+    order = np.argsort(node_ids, kind="stable")
+    sorted_ids = node_ids[order].astype(np.int64)
+    u = np.searchsorted(sorted_ids, sources)
+    v = np.searchsorted(sorted_ids, targets)
+
+    edge_keys = u.astype(np.int64) * len(sorted_ids) + v
+    _, last = np.unique(edge_keys[::-1], return_index=True)
+    keep = len(edge_keys) - 1 - last
+
+    offsets = np.zeros(len(sorted_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u[keep], minlength=len(sorted_ids)), out=offsets[1:])
+
+    kept_maxspeed = maxspeed[keep].astype(np.float32)
+    return CompactGraph(
+        node_ids=sorted_ids,
+        lat=lat[order].astype(np.float64),
+        lon=lon[order].astype(np.float64),
+        offsets=offsets,
+        targets=v[keep].astype(np.int32),
+        length=length[keep].astype(np.float32),
+        maxspeed=kept_maxspeed,
+        highway=highway[keep].astype(np.uint8),
+        max_speed=_max_speed(kept_maxspeed),
+    )
+
+
+def compact_graph(graph: Graph) -> CompactGraph:
+    nodes: List[Node] = list(graph.nodes.values())
+    edges: List[Edge] = list(graph.edges.values())
+    return build_compact_graph(
+        node_ids=np.array([node.id for node in nodes], dtype=np.int64),
+        lat=np.array([node.lat for node in nodes], dtype=np.float64),
+        lon=np.array([node.lon for node in nodes], dtype=np.float64),
+        sources=np.array([edge.id[0] for edge in edges], dtype=np.int64),
+        targets=np.array([edge.id[1] for edge in edges], dtype=np.int64),
+        length=np.array([edge.length for edge in edges], dtype=np.float64),
+        maxspeed=np.array([edge.maxspeed for edge in edges], dtype=np.float64),
+    )
+
+
+def compact_graph_from_multidigraph(
+    graph: OsmGraph, max_speed: Callable[[EdgeData], int]
+) -> CompactGraph:
+    node_ids = np.fromiter(graph.nodes, dtype=np.int64, count=len(graph))
+    lat = np.fromiter(
+        (y for _, y in graph.nodes(data="y")), dtype=np.float64, count=len(graph)
+    )
+    lon = np.fromiter(
+        (x for _, x in graph.nodes(data="x")), dtype=np.float64, count=len(graph)
+    )
+    edges = cast(List[Tuple[NodeId, NodeId, EdgeData]], list(graph.edges(data=True)))
+    return build_compact_graph(
+        node_ids=node_ids,
+        lat=lat,
+        lon=lon,
+        sources=np.fromiter((u for u, _, _ in edges), np.int64, len(edges)),
+        targets=np.fromiter((v for _, v, _ in edges), np.int64, len(edges)),
+        length=np.fromiter((d["length"] for _, _, d in edges), np.float64, len(edges)),
+        maxspeed=np.fromiter((max_speed(d) for _, _, d in edges), np.float64, len(edges)),
+    )
+
+
+def node_index(graph: CompactGraph, node_id: NodeId) -> Optional[int]:
+    index = int(np.searchsorted(graph.node_ids, node_id))
+    if index >= len(graph.node_ids) or graph.node_ids[index] != node_id:
+        return None
+    return index
+
+
+def node_indices(
+    graph: CompactGraph, node_ids: npt.ArrayLike
+) -> npt.NDArray[np.int64]:
+    """
+    Vectorized `node_index`, missing ids are mapped to -1.
+    """
+    ids = np.asarray(node_ids, dtype=np.int64)
+    indices = np.searchsorted(graph.node_ids, ids)
+    found = indices < len(graph.node_ids)
+    found[found] = graph.node_ids[indices[found]] == ids[found]
+    return np.where(found, indices, -1).astype(np.int64)
+
+
+def edge_sources(graph: CompactGraph) -> npt.NDArray[np.int64]:
+    return np.repeat(
+        np.arange(len(graph.node_ids), dtype=np.int64), np.diff(graph.offsets)
+    )
+
+
+def graph_nbytes(graph: CompactGraph) -> int:
+    columns: List[Column] = [
+        graph.node_ids,
+        graph.lat,
+        graph.lon,
+        graph.offsets,
+        graph.targets,
+        graph.length,
+        graph.maxspeed,
+        graph.highway,
+    ]
+    return sum(column.nbytes for column in columns)
+
+
+def dump_columns(header: bytes, columns: List[Column]) -> bytes:
+    """
+    Concatenate a header and raw columns, padding each one to 8 bytes.
+    """
+    chunks: List[bytes] = [header, b"\x00" * _padding(len(header))]
+    for column in columns:
+        data = column.tobytes()
+        chunks.append(data)
+        chunks.append(b"\x00" * _padding(len(data)))
+    return b"".join(chunks)
+
+
+class ColumnReader:
+    """
+    Reads the columns written by `dump_columns` as views over `buffer`.
+    """
+
+    def __init__(self, buffer: Buffer, header_size: int) -> None:
+        self.buffer = buffer
+        self.offset = header_size + _padding(header_size)
+
+    def read(self, dtype: npt.DTypeLike, count: int) -> Column:
+        array: Column = np.frombuffer(
+            self.buffer, dtype=dtype, count=count, offset=self.offset
+        )
+        self.offset += array.nbytes + _padding(array.nbytes)
+        return array
+
+
+def dump_compact_graph(graph: CompactGraph) -> bytes:
+    header = GRAPH_HEADER.pack(
+        GRAPH_FORMAT_MAGIC,
+        GRAPH_FORMAT_VERSION,
+        # Rounded up, the heuristics need an upper bound.
+        min(math.ceil(graph.max_speed), 2**16 - 1),
+        len(graph.node_ids),
+        len(graph.targets),
+    )
+    return dump_columns(
+        header,
+        [
+            graph.node_ids.astype(np.int64, copy=False),
+            graph.lat.astype(np.float64, copy=False),
+            graph.lon.astype(np.float64, copy=False),
+            graph.offsets.astype(np.int64, copy=False),
+            graph.targets.astype(np.int32, copy=False),
+            graph.length.astype(np.float32, copy=False),
+            graph.maxspeed.astype(np.float32, copy=False),
+            graph.highway.astype(np.uint8, copy=False),
+        ],
+    )
+
+
+def load_compact_graph(buffer: Buffer) -> CompactGraph:
+    """
+    Read a graph written by `dump_compact_graph`.
+
+    Columns are views over `buffer`, so passing a memory-mapped file keeps
+    the graph out of the process heap.
+    """
+    magic, version, max_speed, n_nodes, n_edges = GRAPH_HEADER.unpack_from(buffer, 0)
+    if magic != GRAPH_FORMAT_MAGIC:
+        raise ValueError("Not a compact graph")
+    if version not in [1, GRAPH_FORMAT_VERSION]:
+        raise ValueError(f"Unsupported compact graph version {version}")
+
+    reader = ColumnReader(buffer, GRAPH_HEADER.size)
+    graph = CompactGraph(
+        node_ids=reader.read(np.int64, n_nodes).astype(np.int64, copy=False),
+        lat=reader.read(np.float64, n_nodes).astype(np.float64, copy=False),
+        lon=reader.read(np.float64, n_nodes).astype(np.float64, copy=False),
+        offsets=reader.read(np.int64, n_nodes + 1).astype(np.int64, copy=False),
+        targets=reader.read(np.int32, n_edges).astype(np.int32, copy=False),
+        length=reader.read(np.float32, n_edges).astype(np.float32, copy=False),
+        maxspeed=reader.read(np.float32, n_edges).astype(np.float32, copy=False),
+        highway=np.zeros(n_edges, dtype=np.uint8),
+        max_speed=float(max_speed),
+    )
+    if version > 1:
+        graph.highway = reader.read(np.uint8, n_edges).astype(np.uint8, copy=False)
+    if max_speed == 0:
+        graph.max_speed = _max_speed(graph.maxspeed)
+    return graph
+
+
+def open_compact_graph(filepath: str) -> CompactGraph:
+    with open(filepath, "rb") as f:
+        return load_compact_graph(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def dump_graph_json(
+    graph: CompactGraph,
+) -> Tuple[Dict[str, Dict[str, str]], Dict[str, Dict[str, str]]]:
+    lengths = graph.length.tolist()
+    maxspeeds = graph.maxspeed.astype(np.int64).tolist()
+    node_ids = graph.node_ids.tolist()
+    sources = graph.node_ids[edge_sources(graph)].tolist()
+    targets = graph.node_ids[graph.targets].tolist()
+    nodes: Dict[str, Dict[str, str]] = {
+        "Nodes": {
+            str(node): f"{lat},{lon}"
+            for node, lat, lon in zip(node_ids, graph.lat.tolist(), graph.lon.tolist())
+        }
+    }
+    edges: Dict[str, Dict[str, str]] = {
+        "Edges": {
+            f"{u},{v}": f"{length},{maxspeed}"
+            for u, v, length, maxspeed in zip(sources, targets, lengths, maxspeeds)
+        }
+    }
+    return nodes, edges
+
+
+def load_graph_json(
+    nodes: Dict[str, Dict[str, str]], edges: Dict[str, Dict[str, str]]
+) -> CompactGraph:
+    node_data = np.array(
+        [value.split(",") for value in nodes["Nodes"].values()], dtype=np.float64
+    ).reshape(-1, 2)
+    edge_ids = np.array(
+        [key.split(",") for key in edges["Edges"]], dtype=np.int64
+    ).reshape(-1, 2)
+    edge_data = np.array(
+        [value.split(",") for value in edges["Edges"].values()], dtype=np.float64
+    ).reshape(-1, 2)
+    return build_compact_graph(
+        node_ids=np.array(list(nodes["Nodes"]), dtype=np.int64),
+        lat=node_data[:, 0],
+        lon=node_data[:, 1],
+        sources=edge_ids[:, 0],
+        targets=edge_ids[:, 1],
+        length=edge_data[:, 0],
+        maxspeed=edge_data[:, 1],
+    )
+
+
+def edge_index(graph: CompactGraph, edge_id: EdgeId) -> Optional[int]:
+    u, v = node_index(graph, edge_id[0]), node_index(graph, edge_id[1])
+    if u is None or v is None:
+        return None
+    start, end = graph.offsets[u], graph.offsets[u + 1]
+    matches = np.flatnonzero(graph.targets[start:end] == v)
+    if len(matches) == 0:
+        return None
+    return int(start + matches[-1])
+
+
+def edge_indices(
+    graph: CompactGraph, edge_ids: Iterable[EdgeId]
+) -> npt.NDArray[np.int64]:
+    """
+    Vectorized `edge_index`, missing edges are mapped to -1.
+    """
+    pairs = np.array(list(edge_ids), dtype=np.int64).reshape(-1, 2)
+    u, v = node_indices(graph, pairs[:, 0]), node_indices(graph, pairs[:, 1])
+    n_nodes = len(graph.node_ids)
+    # Edges are sorted by (u, v), so their keys are sorted too.
+    edge_keys = edge_sources(graph) * n_nodes + graph.targets
+    keys = u * n_nodes + v
+    indices = np.searchsorted(edge_keys, keys)
+    found = (u >= 0) & (v >= 0) & (indices < len(edge_keys))
+    found[found] = edge_keys[indices[found]] == keys[found]
+    return np.where(found, indices, -1).astype(np.int64)
+
+
+def edge_mask(graph: CompactGraph, edge_ids: Iterable[EdgeId]) -> npt.NDArray[np.bool_]:
+    """
+    Boolean mask over the edges of `graph`, missing edges are ignored.
+    """
+    mask = np.zeros(len(graph.targets), dtype=bool)
+    indices = edge_indices(graph, edge_ids)
+    mask[indices[indices >= 0]] = True
+    return mask
+
+
+class NodesView(Mapping[NodeId, Node]):
+    def __init__(self, graph: CompactGraph) -> None:
+        self.graph = graph
+
+    def __getitem__(self, node_id: NodeId) -> Node:
+        index = node_index(self.graph, node_id)
+        if index is None:
+            raise KeyError(node_id)
+        start, end = self.graph.offsets[index], self.graph.offsets[index + 1]
+        return Node(
+            id=node_id,
+            next_nodes=self.graph.node_ids[self.graph.targets[start:end]].tolist(),
+            lat=float(self.graph.lat[index]),
+            lon=float(self.graph.lon[index]),
+        )
+
+    def __iter__(self) -> Iterator[NodeId]:
+        return iter(self.graph.node_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.graph.node_ids)
+
+
+class EdgesView(Mapping[EdgeId, Edge]):
+    def __init__(self, graph: CompactGraph) -> None:
+        self.graph = graph
+
+    def __getitem__(self, edge_id: EdgeId) -> Edge:
+        index = edge_index(self.graph, edge_id)
+        if index is None:
+            raise KeyError(edge_id)
+        return Edge(
+            id=edge_id,
+            length=float(self.graph.length[index]),
+            maxspeed=int(self.graph.maxspeed[index]),
+        )
+
+    def __iter__(self) -> Iterator[EdgeId]:
+        sources = self.graph.node_ids[edge_sources(self.graph)].tolist()
+        targets = self.graph.node_ids[self.graph.targets].tolist()
+        return zip(sources, targets)
+
+    def __len__(self) -> int:
+        return len(self.graph.targets)
+
+
+class GraphView:
+    """
+    Read-only `Graph` interface over a `CompactGraph`.
+
+    `Node` and `Edge` objects are built on access, nothing is copied upfront.
+    """
+
+    def __init__(self, graph: CompactGraph) -> None:
+        self.nodes = NodesView(graph)
+        self.edges = EdgesView(graph)
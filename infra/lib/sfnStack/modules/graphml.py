@@ -0,0 +1,103 @@
+import ast
+import contextlib
+import gzip
+import networkx as nx
+
+from shapely import wkt
+from typing import BinaryIO, Callable, Dict, cast
+
+from modules.graph import OsmGraph
+
+GRAPHML_COMPRESSION_LEVEL = 6
+
+
+def write_graphml(G: OsmGraph, stream: BinaryIO) -> None:
+    """
+    Writes `G` as gzip compressed GraphML, the same document `ox.save_graphml` saves.
+    """
+    G = G.copy()
+    for attr, value in G.graph.items():
+        G.graph[attr] = str(value)
+    for _, data in G.nodes(data=True):
+        for attr, value in data.items():
+            data[attr] = str(value)
+    for _, _, data in G.edges(keys=False, data=True):
+        for attr, value in data.items():
+            data[attr] = str(value)
+    with gzip.GzipFile(fileobj=stream, mode="wb", compresslevel=GRAPHML_COMPRESSION_LEVEL) as compressed:
+        nx.write_graphml(G, compressed, encoding="utf-8")
+
+
+def parse_bool(value: object) -> bool:
+    """
+    "True" or "False" as osmnx writes booleans, `bool("False")` would be True.
+    """
+    if isinstance(value, bool):
+        return value
+    if value in {"True", "False"}:
+        return value == "True"
+    raise ValueError(f"invalid literal for boolean: {value!r}")
+
+
+# Attribute types `ox.load_graphml` converts, everything else stays a string.
+GRAPH_DTYPES: Dict[str, Callable[[str], object]] = {"simplified": parse_bool}
+NODE_DTYPES: Dict[str, Callable[[str], object]] = {
+    "elevation": float,
+    "elevation_res": float,
+    "lat": float,
+    "lon": float,
+    "osmid": int,
+    "street_count": int,
+    "x": float,
+    "y": float,
+}
+EDGE_DTYPES: Dict[str, Callable[[str], object]] = {
+    "bearing": float,
+    "grade": float,
+    "grade_abs": float,
+    "length": float,
+    "oneway": parse_bool,
+    "osmid": int,
+    "reversed": parse_bool,
+    "speed_kph": float,
+    "travel_time": float,
+}
+
+
+def convert_attrs(data: Dict[str, object], dtypes: Dict[str, Callable[[str], object]]) -> None:
+    """
+    Converts the attributes of a node or edge in place, lists item by item.
+    """
+    for attr, value in data.items():
+        # Simplified graphs keep lists of values, written as their repr.
+        if isinstance(value, str) and (
+            (value.startswith("[") and value.endswith("]")) or (value.startswith("{") and value.endswith("}"))
+        ):
+            with contextlib.suppress(SyntaxError, ValueError):
+                data[attr] = ast.literal_eval(value)
+    for attr in data.keys() & dtypes.keys():
+        value = data[attr]
+        convert = dtypes[attr]
+        data[attr] = [convert(item) for item in value] if isinstance(value, list) else convert(cast(str, value))
+
+
+def read_graphml(stream: BinaryIO, compressed: bool = True) -> OsmGraph:
+    """
+    Parses GraphML while reading `stream`, with the attribute types of `ox.load_graphml`.
+    """
+    source: BinaryIO = cast(BinaryIO, gzip.GzipFile(fileobj=stream, mode="rb")) if compressed else stream
+    G = cast(OsmGraph, nx.read_graphml(source, node_type=int, force_multigraph=True))
+    # The conversions of `ox.load_graphml` 1.9, which only takes paths and strings.
+    G.graph.pop("node_default", None)
+    G.graph.pop("edge_default", None)
+    for attr in G.graph.keys() & GRAPH_DTYPES.keys():
+        G.graph[attr] = GRAPH_DTYPES[attr](G.graph[attr])
+    for _, data in G.nodes(data=True):
+        convert_attrs(data, NODE_DTYPES)
+    for _, _, data in G.edges(keys=False, data=True):
+        # Added by the GraphML writer.
+        data.pop("id", None)
+        convert_attrs(data, EDGE_DTYPES)
+        if "geometry" in data:
+            data["geometry"] = wkt.loads(cast(str, data["geometry"]))
+    return G
@@ -0,0 +1,63 @@
+import numpy as np
+import shapely
+
+from shapely.geometry import MultiPoint, mapping
+from typing import Dict, List, Literal, TypedDict
+
+from modules.graph import CompactGraph, NodeId
+from modules.routing import Reachability
+
+ISOCHRONE_MAX_MINUTES = 60.0
+DEFAULT_ISOCHRONE_MINUTES = "15"
+# Ratio of `shapely.concave_hull`, 0 follows every node and 1 is the convex hull.
+CONCAVE_HULL_RATIO = 0.2
+
+
+class IsochroneProperties(TypedDict):
+    minutes: float
+    nodes: List[NodeId]
+
+
+class IsochroneFeature(TypedDict):
+    type: Literal["Feature"]
+    # GeoJSON geometry as `shapely.geometry.mapping` returns it.
+    geometry: Dict[str, object]
+    properties: IsochroneProperties
+
+
+class IsochroneCollection(TypedDict):
+    type: Literal["FeatureCollection"]
+    features: List[IsochroneFeature]
+
+
+def parse_minutes(raw_minutes: str) -> List[float]:
+    """
+    Time budgets as "5,10,15", sorted and without duplicates.
+    """
+    minutes = sorted({float(value) for value in raw_minutes.split(",")})
+    if not minutes or minutes[0] <= 0 or minutes[-1] > ISOCHRONE_MAX_MINUTES:
+        raise ValueError(f"Budgets must be between 0 and {ISOCHRONE_MAX_MINUTES} minutes")
+    return minutes
+
+
+def isochrone_features(
+    graph: CompactGraph, reachability: Reachability, minutes: List[float]
+) -> IsochroneCollection:
+    """
+    GeoJSON feature collection with the reachable area and nodes of every budget.
+    """
+    features: List[IsochroneFeature] = []
+    for budget in minutes:
+        inside = reachability.nodes[reachability.times <= budget / 60]
+        points = MultiPoint(np.column_stack([graph.lon[inside], graph.lat[inside]]))
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": mapping(shapely.concave_hull(points, ratio=CONCAVE_HULL_RATIO)),
+                "properties": {
+                    "minutes": budget,
+                    "nodes": graph.node_ids[inside].tolist(),
+                },
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
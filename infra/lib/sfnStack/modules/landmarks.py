@@ -0,0 +1,153 @@
+import mmap
+import struct
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from modules.graph import Buffer, CompactGraph, ColumnReader, dump_columns
+
+LANDMARKS_FORMAT_MAGIC = b"LMRK"
+LANDMARKS_FORMAT_VERSION = 1
+# magic, version, reserved, number of landmarks, number of nodes, max speed in km/h
+LANDMARKS_HEADER = struct.Struct("<4sHHqqd")
+
+DEFAULT_LANDMARKS = 16
+# Travel times are stored as float32, bounds give up this share of them to stay below the real times.
+FLOAT32_SLACK = 2.0**-20
+
+
+@dataclass
+class Landmarks:
+    """
+    Travel times in hours between a few landmarks and every node of a `CompactGraph`.
+
+    `from_landmark[i, v]` is the time from landmark `i` to node `v` and
+    `to_landmark[i, v]` the time from `v` to it, `inf` when there is no path.
+    `max_speed` is the highest speed limit of the graph in km/h.
+    """
+
+    nodes: npt.NDArray[np.int32]
+    from_landmark: npt.NDArray[np.float32]
+    to_landmark: npt.NDArray[np.float32]
+    max_speed: float
+
+
+def build_landmarks(
+    graph: CompactGraph, weights: npt.NDArray[np.float64], count: int = DEFAULT_LANDMARKS
+) -> Landmarks:
+    """
+    Farthest point selection, each landmark is the node with the longest
+    round trip to the closest landmark picked so far.
+
+    The search starts from the node farthest from node 0, so landmarks end
+    up on the border of the graph, where their bounds are the tightest.
+    """
+    n_nodes = len(graph.node_ids)
+    count = min(count, n_nodes)
+    forward = csr_matrix((weights, graph.targets, graph.offsets), shape=(n_nodes, n_nodes))
+    backward = forward.transpose().tocsr()
+
+    nodes = np.zeros(count, dtype=np.int32)
+    from_landmark = np.full((count, n_nodes), np.inf, dtype=np.float32)
+    to_landmark = np.full((count, n_nodes), np.inf, dtype=np.float32)
+    if count == 0:
+        return Landmarks(nodes, from_landmark, to_landmark, graph.max_speed)
+
+    closest = dijkstra(forward, directed=True, indices=0)
+    for landmark in range(count):
+        # Unreachable nodes are in other components, their bounds would be useless.
+        reachable = np.where(np.isfinite(closest), closest, -1.0)
+        if landmark > 0:
+            reachable[nodes[:landmark]] = -1.0
+        nodes[landmark] = int(np.argmax(reachable))
+        times_from = dijkstra(forward, directed=True, indices=int(nodes[landmark]))
+        times_to = dijkstra(backward, directed=True, indices=int(nodes[landmark]))
+        from_landmark[landmark] = times_from
+        to_landmark[landmark] = times_to
+        round_trip = times_from + times_to
+        closest = round_trip if landmark == 0 else np.minimum(closest, round_trip)
+
+    return Landmarks(nodes, from_landmark, to_landmark, graph.max_speed)
+
+
+def _difference(minuend: npt.NDArray[np.float32], subtrahend: npt.NDArray[np.float32]) -> npt.NDArray[np.float64]:
+    """
+    `minuend - subtrahend` rounded down, 0 where either time is unknown.
+    """
+    minuend64, subtrahend64 = minuend.astype(np.float64), subtrahend.astype(np.float64)
+    known = np.isfinite(minuend64) & np.isfinite(subtrahend64)
+    difference = np.subtract(minuend64, subtrahend64, out=np.zeros(known.shape), where=known)
+    slack = np.add(minuend64, subtrahend64, out=np.zeros(known.shape), where=known) * FLOAT32_SLACK
+    return np.asarray(difference - slack, dtype=np.float64)
+
+
+def landmark_bounds(landmarks: Landmarks, node: int, reverse: bool = False) -> npt.NDArray[np.float64]:
+    """
+    Lower bound of the travel time in hours from every node to `node`, or
+    from `node` to every node when `reverse`, by the triangle inequality.
+
+    `d(v, t) >= d(L, t) - d(L, v)` and `d(v, t) >= d(v, L) - d(t, L)` for
+    every landmark `L`, the bound is the largest of them. It holds for any
+    weights never below the travel times the landmarks were built on.
+    """
+    from_landmark, to_landmark = landmarks.from_landmark, landmarks.to_landmark
+    if reverse:
+        from_landmark, to_landmark = to_landmark, from_landmark
+    bounds = np.zeros(from_landmark.shape[1], dtype=np.float64)
+    for landmark in range(len(landmarks.nodes)):
+        np.maximum(
+            bounds, _difference(from_landmark[landmark, node], from_landmark[landmark]), out=bounds
+        )
+        np.maximum(bounds, _difference(to_landmark[landmark], to_landmark[landmark, node]), out=bounds)
+    return bounds
+
+
+def dump_landmarks(landmarks: Landmarks) -> bytes:
+    count, n_nodes = landmarks.from_landmark.shape
+    header = LANDMARKS_HEADER.pack(
+        LANDMARKS_FORMAT_MAGIC,
+        LANDMARKS_FORMAT_VERSION,
+        0,
+        count,
+        n_nodes,
+        landmarks.max_speed,
+    )
+    return dump_columns(
+        header,
+        [
+            landmarks.nodes.astype(np.int32, copy=False),
+            landmarks.from_landmark.astype(np.float32, copy=False),
+            landmarks.to_landmark.astype(np.float32, copy=False),
+        ],
+    )
+
+
+def load_landmarks(buffer: Buffer) -> Landmarks:
+    """
+    Read landmarks written by `dump_landmarks`.
+    """
+    magic, version, _, count, n_nodes, max_speed = LANDMARKS_HEADER.unpack_from(buffer, 0)
+    if magic != LANDMARKS_FORMAT_MAGIC:
+        raise ValueError("Not a landmarks file")
+    if version != LANDMARKS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported landmarks version {version}")
+
+    reader = ColumnReader(buffer, LANDMARKS_HEADER.size)
+    return Landmarks(
+        nodes=reader.read(np.int32, count).astype(np.int32, copy=False),
+        from_landmark=reader.read(np.float32, count * n_nodes).reshape(count, n_nodes).astype(np.float32, copy=False),
+        to_landmark=reader.read(np.float32, count * n_nodes).reshape(count, n_nodes).astype(np.float32, copy=False),
+        max_speed=float(max_speed),
+    )
+
+
+def open_landmarks(filepath: str) -> Landmarks:
+    with open(filepath, "rb") as f:
+        return load_landmarks(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def landmarks_nbytes(landmarks: Landmarks) -> int:
+    return landmarks.nodes.nbytes + landmarks.from_landmark.nbytes + landmarks.to_landmark.nbytes
@@ -0,0 +1,132 @@
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from typing import List, Optional, Sequence, TypedDict
+
+from modules.graph import CompactGraph, NodeId, edge_sources, node_indices
+from modules.routing import travel_times
+
+# Shortest path trees kept in memory at once, each holds a few arrays per node.
+SOURCES_PER_CHUNK = 16
+
+
+@dataclass
+class TravelMatrix:
+    """
+    Travel times in hours and distances in km between every source and
+    destination, `inf` when a destination can not be reached.
+
+    Distances are summed along the fastest path, as `reconstruct_path` does.
+    """
+
+    sources: List[Optional[NodeId]]
+    destinations: List[Optional[NodeId]]
+    times: npt.NDArray[np.float64]
+    distances: npt.NDArray[np.float64]
+
+
+def _path_distances(
+    graph: CompactGraph, predecessors: npt.NDArray[np.int32]
+) -> npt.NDArray[np.float64]:
+    """
+    Length in km of the path to every node of each shortest path tree.
+
+    Pointer doubling adds the length of twice as many edges per step, so
+    trees of depth `d` take `log2(d)` vectorized steps.
+    """
+    trees, n_nodes = predecessors.shape
+    nodes = np.arange(n_nodes, dtype=np.int64)
+    reached = predecessors >= 0
+    edge_keys = edge_sources(graph) * n_nodes + graph.targets
+    keys = predecessors.astype(np.int64) * n_nodes + nodes
+    edges = np.searchsorted(edge_keys, keys[reached])
+
+    distances = np.zeros((trees, n_nodes), dtype=np.float64)
+    distances[reached] = graph.length[edges].astype(np.float64) / 1000
+    # Roots and unreached nodes point to themselves with a zero distance.
+    offsets = (np.arange(trees, dtype=np.int64) * n_nodes)[:, None]
+    parents = np.where(reached, predecessors, nodes) + offsets
+    lengths, parents = distances.ravel(), parents.ravel()
+    while True:
+        grandparents = parents[parents]
+        if np.array_equal(grandparents, parents):
+            return lengths.reshape(trees, n_nodes)
+        lengths = lengths + lengths[parents]
+        parents = grandparents
+
+
+def travel_matrix(
+    graph: CompactGraph,
+    sources: Sequence[Optional[NodeId]],
+    destinations: Sequence[Optional[NodeId]],
+) -> TravelMatrix:
+    """
+    One-to-many Dijkstra from every distinct source over the same graph.
+
+    Sources and destinations missing from the graph, or None, get `inf`.
+    """
+    n_nodes = len(graph.node_ids)
+    adjacency = csr_matrix(
+        (travel_times(graph), graph.targets, graph.offsets), shape=(n_nodes, n_nodes)
+    )
+    source_indices = node_indices(graph, [-1 if s is None else s for s in sources])
+    destination_indices = node_indices(graph, [-1 if d is None else d for d in destinations])
+    times = np.full((len(sources), len(destinations)), np.inf)
+    distances = np.full((len(sources), len(destinations)), np.inf)
+
+    found = destination_indices >= 0
+    columns = destination_indices[found]
+    starts, rows = np.unique(source_indices[source_indices >= 0], return_inverse=True)
+    tree_of_source = np.full(len(sources), -1, dtype=np.int64)
+    tree_of_source[source_indices >= 0] = rows
+    for first in range(0, len(starts), SOURCES_PER_CHUNK):
+        chunk = starts[first:first + SOURCES_PER_CHUNK]
+        chunk_times, predecessors = dijkstra(
+            adjacency, directed=True, indices=chunk, return_predecessors=True
+        )
+        chunk_distances = _path_distances(graph, predecessors)
+        for tree in range(len(chunk)):
+            for source in np.flatnonzero(tree_of_source == first + tree):
+                times[source, found] = chunk_times[tree, columns]
+                distances[source, found] = chunk_distances[tree, columns]
+    distances[np.isinf(times)] = np.inf
+
+    return TravelMatrix(
+        sources=list(sources),
+        destinations=list(destinations),
+        times=times,
+        distances=distances,
+    )
+
+
+class MatrixDocument(TypedDict):
+    graph_id: str
+    sources: List[Optional[NodeId]]
+    destinations: List[Optional[NodeId]]
+    times: List[List[Optional[int]]]
+    distances: List[List[Optional[float]]]
+
+
+def dump_matrix(graph_id: str, matrix: TravelMatrix) -> MatrixDocument:
+    """
+    JSON document of the matrix, times in whole seconds as `reconstruct_path`
+    logs them and distances in km, null when unreachable.
+    """
+    reachable = np.isfinite(matrix.times)
+    seconds = np.where(reachable, matrix.times * 60 * 60, 0).astype(np.int64)
+    return {
+        "graph_id": graph_id,
+        "sources": matrix.sources,
+        "destinations": matrix.destinations,
+        "times": [
+            [int(t) if ok else None for t, ok in zip(row, row_ok)]
+            for row, row_ok in zip(seconds.tolist(), reachable.tolist())
+        ],
+        "distances": [
+            [round(d, 3) if ok else None for d, ok in zip(row, row_ok)]
+            for row, row_ok in zip(matrix.distances.tolist(), reachable.tolist())
+        ],
+    }
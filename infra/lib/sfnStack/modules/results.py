@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import boto3
+
+from boto3.dynamodb.conditions import Key
+from mypy_boto3_dynamodb.type_defs import QueryInputTableQueryTypeDef
+from mypy_boto3_s3 import S3Client
+from typing import Dict, Optional
+
+from modules.graph import NodeId
+from modules.weights import DEFAULT_ROUTING_PROFILE
+
+RESULTS_TABLE_NAME = os.environ.get("RESULTS_TABLE_NAME")
+# Plots expire from the paths bucket after 5 days, results must go first.
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", str(4 * 24 * 60 * 60)))
+GRAPH_ID_INDEX = "GraphIdIndex"
+METRICS_NAMESPACE = "GraphsAlgorithms"
+PLOT_URL_EXPIRATION = 300
+
+
+def route_key(
+    graph_id: str,
+    source: NodeId,
+    destination: NodeId,
+    algorithm: str,
+    departure: Optional[float] = None,
+    profile: str = DEFAULT_ROUTING_PROFILE,
+) -> str:
+    key = f"{graph_id}#{source}#{destination}#{algorithm}"
+    if profile != DEFAULT_ROUTING_PROFILE:
+        key = f"{key}#{profile}"
+    # Time-dependent routes are kept by minute of the week they leave at.
+    return key if departure is None else f"{key}#{int(round(departure * 60))}"
+
+
+def log_metric(name: str, value: float, dimensions: Dict[str, str]) -> None:
+    """
+    Prints a metric in the CloudWatch embedded metric format.
+    """
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [list(dimensions)],
+                            "Metrics": [{"Name": name, "Unit": "Count"}],
+                        }
+                    ],
+                },
+                name: value,
+                **dimensions,
+            }
+        )
+    )
+
+
+def plot_url(s3_client: S3Client, bucket: str, solution_key: str) -> str:
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket, "Key": f"{solution_key}.png"},
+        ExpiresIn=PLOT_URL_EXPIRATION,
+    )
+
+
+class ResultCache:
+    """
+    Plots already rendered for a route, by graph, snapped nodes and algorithm.
+
+    Graph ids change when a city is uploaded again, storing a graph under an
+    existing id drops its results with `invalidate`.
+    """
+
+    def __init__(self, table_name: str, ttl: int = RESULT_CACHE_TTL) -> None:
+        self.table = boto3.resource("dynamodb").Table(table_name)
+        self.ttl = ttl
+
+    def get(
+        self,
+        graph_id: str,
+        source: NodeId,
+        destination: NodeId,
+        algorithm: str,
+        departure: Optional[float] = None,
+        profile: str = DEFAULT_ROUTING_PROFILE,
+    ) -> Optional[str]:
+        """
+        Solution key of the plot, None on a miss. Logs the `ResultCacheHit` metric.
+        """
+        item = self.table.get_item(
+            Key={"RouteKey": route_key(graph_id, source, destination, algorithm, departure, profile)}
+        ).get("Item")
+        # Expired items can still be returned until DynamoDB deletes them.
+        hit = item is not None and int(item["ExpiresAt"]) > time.time()  # type: ignore
+        log_metric("ResultCacheHit", int(hit), {"Algorithm": algorithm})
+        return str(item["SolutionKey"]) if hit and item is not None else None
+
+    def put(
+        self,
+        graph_id: str,
+        source: NodeId,
+        destination: NodeId,
+        algorithm: str,
+        solution_key: str,
+        departure: Optional[float] = None,
+        profile: str = DEFAULT_ROUTING_PROFILE,
+    ) -> None:
+        self.table.put_item(
+            Item={
+                "RouteKey": route_key(graph_id, source, destination, algorithm, departure, profile),
+                "GraphId": graph_id,
+                "SolutionKey": solution_key,
+                "ExpiresAt": int(time.time()) + self.ttl,
+            }
+        )
+
+    def invalidate(self, graph_id: str) -> int:
+        deleted = 0
+        query: QueryInputTableQueryTypeDef = {
+            "IndexName": GRAPH_ID_INDEX,
+            "KeyConditionExpression": Key("GraphId").eq(graph_id),
+            "ProjectionExpression": "RouteKey",
+        }
+        with self.table.batch_writer() as batch:
+            while True:
+                response = self.table.query(**query)
+                for item in response["Items"]:
+                    batch.delete_item(Key={"RouteKey": item["RouteKey"]})
+                    deleted += 1
+                if "LastEvaluatedKey" not in response:
+                    break
+                query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        if deleted:
+            print(f"Dropped {deleted} cached results of {graph_id}")
+        return deleted
+
+
+result_cache: Optional[ResultCache] = (
+    ResultCache(RESULTS_TABLE_NAME) if RESULTS_TABLE_NAME else None
+)
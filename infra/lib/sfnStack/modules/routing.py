@@ -0,0 +1,634 @@
+import heapq
+import numpy as np
+import numpy.typing as npt
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from modules.graph import (
+    CompactGraph,
+    EdgeId,
+    NodeId,
+    edge_sources,
+    node_index,
+)
+from modules.geo import haversine_km
+from modules.landmarks import Landmarks, landmark_bounds
+from modules.traffic import BUCKETS_PER_HOUR, GraphProfiles, edge_travel_times, slot_travel_times
+
+# Upper bound of the speed in km/h, for graphs without edges to take it from.
+MAX_SPEED_ALLOWED: float = 150.0
+# A list of ints holds a pointer and an int object per item.
+LIST_ITEM_BYTES = 8 + 28
+
+
+@dataclass
+class SearchResult:
+    """
+    Output of a search, with the same shape the algorithms lambda uploads.
+
+    `path` maps every reached node to its previous node, `visited` are the
+    edges in the order they were processed and `active` the edges left in
+    the frontier. `weight` is the travel time in hours, or the number of
+    iterations for BFS.
+    """
+
+    path: Dict[NodeId, NodeId]
+    visited: List[EdgeId]
+    active: List[EdgeId]
+    weight: float
+    iterations: int
+
+
+@dataclass
+class GraphAdjacency:
+    """
+    Forward and backward adjacency of a graph, the same for every weight.
+
+    `offsets` are the CSR offsets as ints. The backward lists of node `i` are
+    `reverse_edges[reverse_offsets[i]:reverse_offsets[i + 1]]`, the edges
+    entering it, and `reverse_sources`, the nodes they leave.
+    """
+
+    offsets: List[int]
+    reverse_offsets: List[int]
+    reverse_edges: npt.NDArray[np.int64]
+    reverse_sources: npt.NDArray[np.int32]
+
+
+def build_adjacency(graph: CompactGraph) -> GraphAdjacency:
+    order = np.argsort(graph.targets, kind="stable")
+    reverse_offsets = np.zeros(len(graph.node_ids) + 1, dtype=np.int64)
+    np.cumsum(
+        np.bincount(graph.targets, minlength=len(graph.node_ids)), out=reverse_offsets[1:]
+    )
+    return GraphAdjacency(
+        offsets=graph.offsets.tolist(),
+        reverse_offsets=reverse_offsets.tolist(),
+        reverse_edges=order.astype(np.int64),
+        reverse_sources=edge_sources(graph)[order].astype(np.int32),
+    )
+
+
+def adjacency_nbytes(adjacency: GraphAdjacency) -> int:
+    return (
+        (len(adjacency.offsets) + len(adjacency.reverse_offsets)) * LIST_ITEM_BYTES
+        + adjacency.reverse_edges.nbytes
+        + adjacency.reverse_sources.nbytes
+    )
+
+
+@dataclass
+class _Adjacency:
+    """
+    One direction of a `GraphAdjacency` with the weights of a search.
+
+    `edges` are None forward, where the edges of a node are a range.
+    """
+
+    offsets: List[int]
+    targets: npt.NDArray[np.int32]
+    edges: Optional[npt.NDArray[np.int64]]
+    weights: npt.NDArray[np.float64]
+
+    def neighbours(self, node: int) -> List[Tuple[int, int, float]]:
+        start, end = self.offsets[node], self.offsets[node + 1]
+        if self.edges is None:
+            return list(
+                zip(
+                    self.targets[start:end].tolist(),
+                    range(start, end),
+                    self.weights[start:end].tolist(),
+                )
+            )
+        edges = self.edges[start:end]
+        return list(
+            zip(self.targets[start:end].tolist(), edges.tolist(), self.weights[edges].tolist())
+        )
+
+    def out_edges(self, node: int) -> Iterable[int]:
+        start, end = self.offsets[node], self.offsets[node + 1]
+        if self.edges is None:
+            return range(start, end)
+        edges: List[int] = self.edges[start:end].tolist()
+        return edges
+
+
+@dataclass
+class EdgeWeights:
+    """
+    Weight of every edge in the order of the compact graph, and the least
+    weight of a straight km, which keeps the A* heuristics admissible.
+
+    `landmarks` tighten the heuristics of weights never below the travel times.
+    `adjacency` is the cached adjacency of the graph, searches build it without.
+    """
+
+    values: npt.NDArray[np.float64]
+    per_km: float
+    landmarks: Optional[Landmarks] = None
+    adjacency: Optional[GraphAdjacency] = None
+
+
+def travel_times(graph: CompactGraph) -> npt.NDArray[np.float64]:
+    """
+    Travel time in hours of every edge, `length / maxspeed` as in plotPath.
+    """
+    return (graph.length.astype(np.float64) / 1000) / graph.maxspeed
+
+
+def per_km_of_travel_time(graph: CompactGraph) -> float:
+    """
+    Least travel time in hours of a straight km, at the top speed of the graph.
+    """
+    return 1 / (graph.max_speed or MAX_SPEED_ALLOWED)
+
+
+def travel_time_weights(graph: CompactGraph) -> EdgeWeights:
+    return EdgeWeights(values=travel_times(graph), per_km=per_km_of_travel_time(graph))
+
+
+def time_heuristic(
+    graph: CompactGraph, target: int, per_km: Optional[float] = None
+) -> npt.NDArray[np.float64]:
+    """
+    Lower bound of the travel time in hours from every node to `target`, or
+    of any weight given its least weight of a straight km.
+    """
+    distance = haversine_km(graph.lat, graph.lon, graph.lat[target], graph.lon[target])
+    return distance * (per_km_of_travel_time(graph) if per_km is None else per_km)
+
+
+def lower_bounds(
+    graph: CompactGraph,
+    node: int,
+    per_km: float,
+    landmarks: Optional[Landmarks] = None,
+    reverse: bool = False,
+) -> npt.NDArray[np.float64]:
+    """
+    Lower bound of the weight from every node to `node`, or from `node` when
+    `reverse`, the tighter of the straight line and the landmark bounds.
+    """
+    bounds = time_heuristic(graph, node, per_km)
+    if landmarks is not None:
+        np.maximum(bounds, landmark_bounds(landmarks, node, reverse), out=bounds)
+    return bounds
+
+
+def _adjacency(graph: CompactGraph, weights: Optional[EdgeWeights]) -> GraphAdjacency:
+    if weights is not None and weights.adjacency is not None:
+        return weights.adjacency
+    return build_adjacency(graph)
+
+
+def _forward(
+    graph: CompactGraph, adjacency: GraphAdjacency, weights: npt.NDArray[np.float64]
+) -> _Adjacency:
+    return _Adjacency(offsets=adjacency.offsets, targets=graph.targets, edges=None, weights=weights)
+
+
+def _backward(adjacency: GraphAdjacency, weights: npt.NDArray[np.float64]) -> _Adjacency:
+    return _Adjacency(
+        offsets=adjacency.reverse_offsets,
+        targets=adjacency.reverse_sources,
+        edges=adjacency.reverse_edges,
+        weights=weights,
+    )
+
+
+def _result(
+    graph: CompactGraph,
+    previous: Dict[int, int],
+    visited: List[int],
+    active: Set[int],
+    weight: float,
+    iterations: int,
+) -> SearchResult:
+    # Only the reached nodes and edges are translated, not the whole graph.
+    def edge_ids(edges: List[int]) -> List[EdgeId]:
+        indices = np.array(edges, dtype=np.int64)
+        sources = np.searchsorted(graph.offsets, indices, side="right") - 1
+        return list(
+            zip(
+                graph.node_ids[sources].tolist(),
+                graph.node_ids[graph.targets[indices]].tolist(),
+            )
+        )
+
+    nodes = np.fromiter(previous.keys(), dtype=np.int64, count=len(previous))
+    parents = np.fromiter(previous.values(), dtype=np.int64, count=len(previous))
+    return SearchResult(
+        path=dict(zip(graph.node_ids[nodes].tolist(), graph.node_ids[parents].tolist())),
+        visited=edge_ids(visited),
+        active=edge_ids(sorted(active)),
+        weight=weight,
+        iterations=iterations,
+    )
+
+
+def _indices(
+    graph: CompactGraph, source: NodeId, destination: NodeId
+) -> Optional[Tuple[int, int]]:
+    source_index = node_index(graph, source)
+    destination_index = node_index(graph, destination)
+    if source_index is None or destination_index is None:
+        return None
+    return source_index, destination_index
+
+
+def bfs(
+    graph: CompactGraph,
+    source: NodeId,
+    destination: NodeId,
+    weights: Optional[EdgeWeights] = None,
+) -> Optional[SearchResult]:
+    # BFS counts edges, `weights` is only taken to match the other searches.
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    offsets = _adjacency(graph, weights).offsets
+
+    previous: Dict[int, int] = dict()
+    visited_edges: List[int] = []
+    active_edges: Set[int] = set()
+    seen: Set[int] = {start}
+    iterations = 0
+    queue: Deque[int] = deque([start])
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            return _result(
+                graph, previous, visited_edges, active_edges, iterations, iterations
+            )
+        start_edge, end_edge = offsets[node], offsets[node + 1]
+        for next_node, edge in zip(graph.targets[start_edge:end_edge].tolist(), range(start_edge, end_edge)):
+            iterations += 1
+            if next_node in seen:
+                continue
+            seen.add(next_node)
+            visited_edges.append(edge)
+            active_edges.discard(edge)
+            previous[next_node] = node
+            queue.append(next_node)
+            active_edges.update(range(offsets[next_node], offsets[next_node + 1]))
+    return None
+
+
+def _best_first(
+    graph: CompactGraph,
+    start: int,
+    target: int,
+    weights: EdgeWeights,
+    heuristic: Callable[[int], float],
+) -> Optional[SearchResult]:
+    adjacency = _forward(graph, _adjacency(graph, weights), weights.values)
+    weight_from_source: Dict[int, float] = {start: 0.0}
+    previous: Dict[int, int] = dict()
+    settled: Set[int] = set()
+    visited_edges: List[int] = []
+    active_edges: Set[int] = set()
+    iterations = 0
+    frontier: List[Tuple[float, int]] = [(heuristic(start), start)]
+    while frontier:
+        _, node = heapq.heappop(frontier)
+        weight_to_node = weight_from_source[node]
+        if node == target:
+            return _result(
+                graph, previous, visited_edges, active_edges, weight_to_node, iterations
+            )
+        if node in settled:
+            continue
+        settled.add(node)
+        for next_node, edge, edge_weight in adjacency.neighbours(node):
+            iterations += 1
+            visited_edges.append(edge)
+            active_edges.discard(edge)
+            new_weight = weight_to_node + edge_weight
+            if new_weight < weight_from_source.get(next_node, np.inf):
+                weight_from_source[next_node] = new_weight
+                previous[next_node] = node
+                heapq.heappush(frontier, (new_weight + heuristic(next_node), next_node))
+                active_edges.update(adjacency.out_edges(next_node))
+    return None
+
+
+def dijkstra(
+    graph: CompactGraph,
+    source: NodeId,
+    destination: NodeId,
+    weights: Optional[EdgeWeights] = None,
+) -> Optional[SearchResult]:
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    weights = weights or travel_time_weights(graph)
+    return _best_first(graph, start, target, weights, lambda _: 0.0)
+
+
+def a_star(
+    graph: CompactGraph,
+    source: NodeId,
+    destination: NodeId,
+    weights: Optional[EdgeWeights] = None,
+) -> Optional[SearchResult]:
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    weights = weights or travel_time_weights(graph)
+    to_target: List[float] = lower_bounds(graph, target, weights.per_km, weights.landmarks).tolist()
+    return _best_first(graph, start, target, weights, to_target.__getitem__)
+
+
+def _bidirectional(
+    graph: CompactGraph,
+    start: int,
+    target: int,
+    weights: EdgeWeights,
+    potential: List[float],
+) -> Optional[SearchResult]:
+    """
+    Bidirectional search over reduced costs `w(u, v) - p(u) + p(v)`.
+
+    The backward search uses `-p`, so any feasible potential keeps both
+    searches consistent. A zero potential is plain bidirectional Dijkstra.
+    """
+    adjacency = _adjacency(graph, weights)
+    adjacencies = [_forward(graph, adjacency, weights.values), _backward(adjacency, weights.values)]
+    signs = [1.0, -1.0]
+    weight_from: List[Dict[int, float]] = [{start: 0.0}, {target: 0.0}]
+    previous: List[Dict[int, int]] = [dict(), dict()]
+    settled: List[Set[int]] = [set(), set()]
+    frontiers: List[List[Tuple[float, int]]] = [
+        [(potential[start], start)],
+        [(-potential[target], target)],
+    ]
+    visited_edges: List[int] = []
+    active_edges: Set[int] = set()
+    iterations = 0
+    best_weight = np.inf
+    meeting_node: Optional[int] = None
+    if start == target:
+        return _result(graph, {}, visited_edges, active_edges, 0.0, iterations)
+
+    while frontiers[0] and frontiers[1]:
+        if frontiers[0][0][0] + frontiers[1][0][0] >= best_weight:
+            break
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        sign = signs[side]
+        _, node = heapq.heappop(frontiers[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+        weight_to_node = weight_from[side][node]
+        for next_node, edge, edge_weight in adjacencies[side].neighbours(node):
+            iterations += 1
+            visited_edges.append(edge)
+            active_edges.discard(edge)
+            new_weight = weight_to_node + edge_weight
+            if new_weight < weight_from[side].get(next_node, np.inf):
+                weight_from[side][next_node] = new_weight
+                previous[side][next_node] = node
+                heapq.heappush(
+                    frontiers[side],
+                    (new_weight + sign * potential[next_node], next_node),
+                )
+                active_edges.update(adjacencies[side].out_edges(next_node))
+            other_weight = weight_from[1 - side].get(next_node)
+            if other_weight is not None and new_weight + other_weight < best_weight:
+                best_weight = new_weight + other_weight
+                meeting_node = next_node
+
+    if meeting_node is None:
+        return None
+
+    forward_previous, backward_next = previous
+    path: Dict[int, int] = dict(forward_previous)
+    node = meeting_node
+    while node != target:
+        next_node = backward_next[node]
+        path[next_node] = node
+        node = next_node
+    return _result(graph, path, visited_edges, active_edges, float(best_weight), iterations)
+
+
+def bidirectional_dijkstra(
+    graph: CompactGraph,
+    source: NodeId,
+    destination: NodeId,
+    weights: Optional[EdgeWeights] = None,
+) -> Optional[SearchResult]:
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    weights = weights or travel_time_weights(graph)
+    potential: List[float] = [0.0] * len(graph.node_ids)
+    return _bidirectional(graph, start, target, weights, potential)
+
+
+def bidirectional_a_star(
+    graph: CompactGraph,
+    source: NodeId,
+    destination: NodeId,
+    weights: Optional[EdgeWeights] = None,
+) -> Optional[SearchResult]:
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    weights = weights or travel_time_weights(graph)
+    to_target = lower_bounds(graph, target, weights.per_km, weights.landmarks)
+    to_source = lower_bounds(graph, start, weights.per_km, weights.landmarks, reverse=True)
+    # Average of both heuristics, feasible for the forward and backward searches.
+    potential: List[float] = ((to_target - to_source) / 2).tolist()
+    return _bidirectional(graph, start, target, weights, potential)
+
+
+SEARCHES: Dict[
+    str, Callable[[CompactGraph, NodeId, NodeId, Optional[EdgeWeights]], Optional[SearchResult]]
+] = {
+    "bfs": bfs,
+    "dijkstra": dijkstra,
+    "a_star": a_star,
+    "bidirectional_dijkstra": bidirectional_dijkstra,
+    "bidirectional_a_star": bidirectional_a_star,
+}
+
+
+def _time_dependent(
+    graph: CompactGraph,
+    profiles: GraphProfiles,
+    start: int,
+    target: int,
+    departure: float,
+    heuristic: Callable[[int], float],
+) -> Optional[SearchResult]:
+    """
+    Best first search over arrival times, edge times depend on when they are entered.
+
+    Profiles never exceed the speed limit, so the A* heuristics stay lower bounds.
+    """
+    # Edge times by bucket, a route spans a handful of them.
+    times_by_slot: Dict[int, npt.NDArray[np.float64]] = dict()
+    arrival: Dict[int, float] = {start: departure}
+    previous: Dict[int, int] = dict()
+    settled: Set[int] = set()
+    visited_edges: List[int] = []
+    active_edges: Set[int] = set()
+    iterations = 0
+    frontier: List[Tuple[float, int]] = [(departure + heuristic(start), start)]
+    while frontier:
+        _, node = heapq.heappop(frontier)
+        arrival_at_node = arrival[node]
+        if node == target:
+            return _result(
+                graph, previous, visited_edges, active_edges, arrival_at_node - departure, iterations
+            )
+        if node in settled:
+            continue
+        settled.add(node)
+        slot = int(arrival_at_node * BUCKETS_PER_HOUR)
+        if slot not in times_by_slot:
+            times_by_slot[slot] = slot_travel_times(graph, profiles, slot)
+        slot_end = (slot + 1) / BUCKETS_PER_HOUR
+        start_edge, end_edge = int(graph.offsets[node]), int(graph.offsets[node + 1])
+        next_nodes = graph.targets[start_edge:end_edge].tolist()
+        edge_times = times_by_slot[slot][start_edge:end_edge].tolist()
+        for next_node, edge, edge_time in zip(next_nodes, range(start_edge, end_edge), edge_times):
+            if arrival_at_node + edge_time > slot_end:
+                # The speed changes halfway through the edge.
+                edge_time = float(
+                    edge_travel_times(graph, profiles, np.array([edge], dtype=np.int64), arrival_at_node)[0]
+                )
+            iterations += 1
+            visited_edges.append(edge)
+            active_edges.discard(edge)
+            new_arrival = arrival_at_node + edge_time
+            if new_arrival < arrival.get(next_node, np.inf):
+                arrival[next_node] = new_arrival
+                previous[next_node] = node
+                heapq.heappush(frontier, (new_arrival + heuristic(next_node), next_node))
+                active_edges.update(range(int(graph.offsets[next_node]), int(graph.offsets[next_node + 1])))
+    return None
+
+
+def time_dependent_dijkstra(
+    graph: CompactGraph,
+    profiles: GraphProfiles,
+    source: NodeId,
+    destination: NodeId,
+    departure: float,
+    landmarks: Optional[Landmarks] = None,
+) -> Optional[SearchResult]:
+    # Dijkstra has no heuristic, `landmarks` is only taken to match A*.
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    return _time_dependent(graph, profiles, start, target, departure, lambda _: 0.0)
+
+
+def time_dependent_a_star(
+    graph: CompactGraph,
+    profiles: GraphProfiles,
+    source: NodeId,
+    destination: NodeId,
+    departure: float,
+    landmarks: Optional[Landmarks] = None,
+) -> Optional[SearchResult]:
+    indices = _indices(graph, source, destination)
+    if indices is None:
+        return None
+    start, target = indices
+    to_target: List[float] = lower_bounds(graph, target, per_km_of_travel_time(graph), landmarks).tolist()
+    return _time_dependent(graph, profiles, start, target, departure, to_target.__getitem__)
+
+
+TIME_DEPENDENT_SEARCHES: Dict[
+    str,
+    Callable[
+        [CompactGraph, GraphProfiles, NodeId, NodeId, float, Optional[Landmarks]], Optional[SearchResult]
+    ],
+] = {
+    "dijkstra": time_dependent_dijkstra,
+    "a_star": time_dependent_a_star,
+}
+
+
+@dataclass
+class Reachability:
+    """
+    Nodes settled by a search bounded by a travel time budget.
+
+    `nodes` are node indices in the order they were settled and `times`
+    their travel time in hours. `search` holds the shortest path tree with
+    the edges to reached nodes as visited and the frontier as active.
+    """
+
+    nodes: npt.NDArray[np.int64]
+    times: npt.NDArray[np.float64]
+    search: SearchResult
+
+
+def bounded_dijkstra(
+    graph: CompactGraph, source: NodeId, budget: float
+) -> Optional[Reachability]:
+    """
+    Dijkstra from `source` that stops once the nearest node is over `budget` hours.
+
+    Edge weights are computed for the scanned nodes only, so the cost does
+    not grow with the size of the graph.
+    """
+    start = node_index(graph, source)
+    if start is None:
+        return None
+    weight_from_source: Dict[int, float] = {start: 0.0}
+    previous: Dict[int, int] = dict()
+    settled: Dict[int, float] = dict()
+    iterations = 0
+    frontier: List[Tuple[float, int]] = [(0.0, start)]
+    while frontier:
+        weight_to_node, node = heapq.heappop(frontier)
+        if weight_to_node > budget:
+            break
+        if node in settled:
+            continue
+        settled[node] = weight_to_node
+        start_edge, end_edge = int(graph.offsets[node]), int(graph.offsets[node + 1])
+        edge_weights = (
+            graph.length[start_edge:end_edge].astype(np.float64) / 1000
+        ) / graph.maxspeed[start_edge:end_edge]
+        next_nodes = graph.targets[start_edge:end_edge].tolist()
+        for next_node, edge_weight in zip(next_nodes, edge_weights.tolist()):
+            iterations += 1
+            new_weight = weight_to_node + edge_weight
+            if new_weight < weight_from_source.get(next_node, np.inf):
+                weight_from_source[next_node] = new_weight
+                previous[next_node] = node
+                heapq.heappush(frontier, (new_weight, next_node))
+
+    def edge_ids(nodes: List[int]) -> List[EdgeId]:
+        # Edges of the tree, translated without touching the rest of the graph.
+        indices = np.array(nodes, dtype=np.int64)
+        parents = np.array([previous[node] for node in nodes], dtype=np.int64)
+        return list(
+            zip(graph.node_ids[parents].tolist(), graph.node_ids[indices].tolist())
+        )
+
+    tree = edge_ids([node for node in settled if node != start])
+    return Reachability(
+        nodes=np.fromiter(settled.keys(), dtype=np.int64, count=len(settled)),
+        times=np.fromiter(settled.values(), dtype=np.float64, count=len(settled)),
+        search=SearchResult(
+            path={v: u for u, v in tree},
+            visited=tree,
+            active=edge_ids([node for node in previous if node not in settled]),
+            weight=budget,
+            iterations=iterations,
+        ),
+    )
@@ -0,0 +1,102 @@
+import struct
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass
+from sklearn.neighbors import BallTree
+from typing import Tuple
+
+from modules.geo import EARTH_RADIUS
+from modules.graph import Buffer, ColumnReader, CompactGraph, NodeId, dump_columns
+
+EARTH_RADIUS_METERS: float = EARTH_RADIUS * 1000
+
+SPATIAL_INDEX_FORMAT_MAGIC = b"SPIX"
+SPATIAL_INDEX_FORMAT_VERSION = 1
+# magic, version, reserved, number of nodes
+SPATIAL_INDEX_HEADER = struct.Struct("<4sHHq")
+
+
+@dataclass
+class SpatialIndex:
+    """
+    Ball tree over the node coordinates of a graph, in radians.
+
+    Positions in the tree are node indices, `node_ids` translates them and
+    `points` are the coordinates the tree was built from.
+    """
+
+    tree: BallTree
+    node_ids: npt.NDArray[np.int64]
+    points: npt.NDArray[np.float64]
+
+
+def spatial_index_from_points(node_ids: npt.NDArray[np.int64], points: npt.NDArray[np.float64]) -> SpatialIndex:
+    return SpatialIndex(tree=BallTree(points, metric="haversine"), node_ids=node_ids, points=points)
+
+
+def build_spatial_index(graph: CompactGraph) -> SpatialIndex:
+    return spatial_index_from_points(
+        graph.node_ids.astype(np.int64, copy=True),
+        np.radians(np.column_stack([graph.lat, graph.lon])),
+    )
+
+
+def dump_spatial_index(index: SpatialIndex) -> bytes:
+    """
+    Node ids and coordinates in radians, the tree is rebuilt when loading.
+    """
+    header = SPATIAL_INDEX_HEADER.pack(
+        SPATIAL_INDEX_FORMAT_MAGIC, SPATIAL_INDEX_FORMAT_VERSION, 0, len(index.node_ids)
+    )
+    return dump_columns(
+        header,
+        [index.node_ids.astype(np.int64, copy=False), index.points.astype(np.float64, copy=False)],
+    )
+
+
+def load_spatial_index(buffer: Buffer) -> SpatialIndex:
+    """
+    Read an index written by `dump_spatial_index`.
+    """
+    magic, version, _, n_nodes = SPATIAL_INDEX_HEADER.unpack_from(buffer, 0)
+    if magic != SPATIAL_INDEX_FORMAT_MAGIC:
+        raise ValueError("Not a spatial index")
+    if version != SPATIAL_INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported spatial index version {version}")
+
+    reader = ColumnReader(buffer, SPATIAL_INDEX_HEADER.size)
+    node_ids = reader.read(np.int64, n_nodes).astype(np.int64, copy=False)
+    points = reader.read(np.float64, 2 * n_nodes).reshape(n_nodes, 2).astype(np.float64, copy=False)
+    return spatial_index_from_points(node_ids, points)
+
+
+def open_spatial_index(filepath: str) -> SpatialIndex:
+    with open(filepath, "rb") as f:
+        return load_spatial_index(f.read())
+
+
+def spatial_index_nbytes(index: SpatialIndex) -> int:
+    # The tree keeps its own copy of the points and a position per node.
+    return index.node_ids.nbytes + 2 * index.points.nbytes + len(index.node_ids) * 8
+
+
+def snap(
+    index: SpatialIndex, lat: npt.ArrayLike, lon: npt.ArrayLike
+) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Nearest node of every point, with its distance in meters.
+    """
+    points = np.radians(
+        np.column_stack([np.atleast_1d(lat), np.atleast_1d(lon)]).astype(np.float64)
+    )
+    distances, positions = index.tree.query(points, k=1)
+    return (
+        index.node_ids[positions[:, 0]],
+        np.asarray(distances[:, 0] * EARTH_RADIUS_METERS, dtype=np.float64),
+    )
+
+
+def nearest_node(index: SpatialIndex, lat: float, lon: float) -> Tuple[NodeId, float]:
+    node_ids, distances = snap(index, [lat], [lon])
+    return int(node_ids[0]), float(distances[0])
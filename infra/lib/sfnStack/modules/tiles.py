@@ -0,0 +1,138 @@
+import hashlib
+import math
+import networkx as nx
+import numpy as np
+
+from networkx import MultiDiGraph
+from typing import Iterable, List, Sequence, Tuple, cast
+
+from modules.geo import KM_PER_DEGREE, bounding_box, haversine_km
+from modules.graph import OsmGraph
+
+# Tiles are cells of a fixed lat/lon grid, about 22 km high, wrapping at the antimeridian.
+TILE_DEGREES = 0.2
+TILE_ROWS = round(180 / TILE_DEGREES)
+TILE_COLUMNS = round(360 / TILE_DEGREES)
+# Corridors keep every tile closer to the straight line than this share of
+# its length, bounded so short routes get detours and long ones fit in memory.
+CORRIDOR_MARGIN_RATIO = 0.25
+CORRIDOR_MIN_MARGIN_KM = 5.0
+CORRIDOR_MAX_MARGIN_KM = 25.0
+# Tiles are downloaded and stitched within one request, about 400 km of route.
+CORRIDOR_MAX_TILES = 128
+
+# Row and column of a tile in the grid.
+Tile = Tuple[int, int]
+
+
+def tile_of(lat: float, lon: float) -> Tile:
+    """
+    Tile of a point, columns are not wrapped so ranges of them stay contiguous.
+    """
+    return min(math.floor(lat / TILE_DEGREES), TILE_ROWS // 2 - 1), math.floor(lon / TILE_DEGREES)
+
+
+def wrap_tile(tile: Tile) -> Tile:
+    row, col = tile
+    return row, (col + TILE_COLUMNS // 2) % TILE_COLUMNS - TILE_COLUMNS // 2
+
+
+def unwrap_box(west: float, east: float, lon: float) -> Tuple[float, float]:
+    """
+    West and east of a box as increasing longitudes, on the side of the antimeridian of `lon`.
+    """
+    if west > east:
+        east += 360
+    if lon < west:
+        west, east = west - 360, east - 360
+    return west, east
+
+
+def tile_bounds(tile: Tile) -> Tuple[float, float, float, float]:
+    """
+    North, south, east and west of a tile, as `ox.graph_from_bbox` takes them.
+    """
+    row, col = tile
+    return (
+        round((row + 1) * TILE_DEGREES, 6),
+        round(row * TILE_DEGREES, 6),
+        round((col + 1) * TILE_DEGREES, 6),
+        round(col * TILE_DEGREES, 6),
+    )
+
+
+def tile_id(tile: Tile) -> str:
+    row, col = tile
+    return f"tile-{TILE_DEGREES}-{row}_{col}"
+
+
+def corridor_tiles(
+    source_lat: float, source_lon: float, destination_lat: float, destination_lon: float
+) -> List[Tile]:
+    """
+    Tiles around the straight line between both points, sorted.
+
+    Raises a ValueError past `CORRIDOR_MAX_TILES`.
+    """
+    distance = float(haversine_km(source_lat, source_lon, destination_lat, destination_lon))
+    margin = min(
+        CORRIDOR_MAX_MARGIN_KM, max(CORRIDOR_MIN_MARGIN_KM, CORRIDOR_MARGIN_RATIO * distance)
+    )
+    south_lat, west_lon, north_lat, east_lon = bounding_box(
+        [source_lat, destination_lat], [source_lon, destination_lon], margin
+    )
+    # Routes across the antimeridian are projected with continuous longitudes.
+    destination_lon = source_lon + (destination_lon - source_lon + 180) % 360 - 180
+    west_lon, east_lon = unwrap_box(west_lon, east_lon, source_lon)
+    south, west = tile_of(south_lat, west_lon)
+    north, east = tile_of(north_lat, east_lon)
+    east = min(east, west + TILE_COLUMNS - 1)
+    # Equirectangular projection in km around the middle of the route.
+    scale = math.cos(math.radians((source_lat + destination_lat) / 2))
+    grid_rows, grid_cols = np.meshgrid(np.arange(south, north + 1), np.arange(west, east + 1), indexing="ij")
+    rows, cols = grid_rows.ravel(), grid_cols.ravel()
+
+    start = np.array([source_lon * scale, source_lat]) * KM_PER_DEGREE
+    end = np.array([destination_lon * scale, destination_lat]) * KM_PER_DEGREE
+    centers = np.column_stack([(cols + 0.5) * scale, rows + 0.5]) * TILE_DEGREES * KM_PER_DEGREE
+    direction = end - start
+    length = float(np.dot(direction, direction))
+    t = np.zeros(len(centers)) if length == 0 else np.clip((centers - start) @ direction / length, 0, 1)
+    distances = np.linalg.norm(centers - (start + t[:, None] * direction), axis=1)
+    half_diagonal = TILE_DEGREES * KM_PER_DEGREE * math.hypot(scale, 1) / 2
+    keep = distances <= margin + half_diagonal
+    if keep.sum() > CORRIDOR_MAX_TILES:
+        raise ValueError(f"Corridor spans {keep.sum()} tiles, at most {CORRIDOR_MAX_TILES}")
+    return sorted(wrap_tile(tile) for tile in zip(rows[keep].tolist(), cols[keep].tolist()))
+
+
+def area_tiles(lat: Sequence[float], lon: Sequence[float]) -> List[Tile]:
+    """
+    Tiles of the bounding box of every point, with the minimum corridor margin.
+    """
+    south_lat, west_lon, north_lat, east_lon = bounding_box(lat, lon, CORRIDOR_MIN_MARGIN_KM)
+    west_lon, east_lon = unwrap_box(west_lon, east_lon, lon[0])
+    south, west = tile_of(south_lat, west_lon)
+    north, east = tile_of(north_lat, east_lon)
+    # A box around a pole spans every longitude once.
+    east = min(east, west + TILE_COLUMNS - 1)
+    return sorted({wrap_tile((row, col)) for row in range(south, north + 1) for col in range(west, east + 1)})
+
+
+def corridor_id(tiles: Iterable[Tile]) -> str:
+    """
+    Graph id of the stitched tiles, the same tiles always give the same id.
+    """
+    digest = hashlib.sha1(",".join(f"{row}_{col}" for row, col in sorted(tiles)).encode())
+    return f"corridor-{TILE_DEGREES}-{digest.hexdigest()[:20]}"
+
+
+def stitch_tiles(graphs: List[OsmGraph]) -> OsmGraph:
+    """
+    Joins tiles on their shared OSM nodes, edges crossing tile sides are in both tiles.
+    """
+    if not graphs:
+        return MultiDiGraph()
+    G = cast(OsmGraph, nx.compose_all(graphs))
+    G.graph = dict(graphs[0].graph)
+    return G
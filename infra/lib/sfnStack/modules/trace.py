@@ -0,0 +1,107 @@
+import struct
+import numpy as np
+import numpy.typing as npt
+import zstandard
+
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from modules.graph import CompactGraph, EdgeId, NodeId, edge_indices, edge_sources
+from modules.routing import SearchResult
+
+TRACE_FORMAT_MAGIC = b"TRCE"
+TRACE_FORMAT_VERSION = 1
+# magic, version, reserved, number of edges of the graph
+TRACE_HEADER = struct.Struct("<4sHHq")
+# kind, reserved, number of deltas
+CHUNK_HEADER = struct.Struct("<BBxxI")
+
+PATH, VISITED, ACTIVE = 0, 1, 2
+
+# Edges per chunk, the reader yields one batch per chunk.
+CHUNK_SIZE = 1 << 16
+COMPRESSION_LEVEL = 3
+
+
+def _chunks(kind: int, edges: npt.NDArray[np.int64]) -> List[bytes]:
+    """
+    Delta encoded chunks, the first delta of each chunk is the edge itself.
+    """
+    chunks: List[bytes] = []
+    for start in range(0, len(edges), CHUNK_SIZE):
+        batch = edges[start: start + CHUNK_SIZE]
+        deltas = np.diff(batch, prepend=0).astype(np.int32)
+        chunks.append(CHUNK_HEADER.pack(kind, 0, len(deltas)))
+        chunks.append(deltas.tobytes())
+    return chunks
+
+
+def _edges(graph: CompactGraph, edge_ids: List[EdgeId]) -> npt.NDArray[np.int64]:
+    indices = edge_indices(graph, edge_ids)
+    return indices[indices >= 0]
+
+
+def dump_trace(graph: CompactGraph, solution: SearchResult) -> bytes:
+    """
+    Encodes a search as zstd compressed edge indices of `graph`.
+
+    The path tree and active edges are sorted, so their deltas are small,
+    visited edges keep the order they were processed in.
+    """
+    path = _edges(graph, [(u, v) for v, u in solution.path.items()])
+    chunks = [
+        TRACE_HEADER.pack(TRACE_FORMAT_MAGIC, TRACE_FORMAT_VERSION, 0, len(graph.targets)),
+        *_chunks(PATH, np.sort(path)),
+        *_chunks(VISITED, _edges(graph, solution.visited)),
+        *_chunks(ACTIVE, np.sort(_edges(graph, solution.active))),
+    ]
+    return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(b"".join(chunks))
+
+
+def _read(reader: BinaryIO, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = reader.read(size - len(data))
+        if not chunk:
+            break
+        data.extend(chunk)
+    return bytes(data)
+
+
+def iter_trace(
+    stream: BinaryIO, n_edges: int
+) -> Iterator[Tuple[int, npt.NDArray[np.int64]]]:
+    """
+    Decompresses a trace while reading `stream`, yielding (kind, edges) batches.
+    """
+    reader = zstandard.ZstdDecompressor().stream_reader(stream)
+    magic, version, _, trace_edges = TRACE_HEADER.unpack(_read(reader, TRACE_HEADER.size))
+    if magic != TRACE_FORMAT_MAGIC:
+        raise ValueError("Not a search trace")
+    if version != TRACE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported search trace version {version}")
+    if trace_edges != n_edges:
+        raise ValueError("Search trace does not match the graph")
+    while True:
+        header = _read(reader, CHUNK_HEADER.size)
+        if len(header) < CHUNK_HEADER.size:
+            return
+        kind, _, count = CHUNK_HEADER.unpack(header)
+        deltas = np.frombuffer(_read(reader, 4 * count), dtype=np.int32)
+        yield kind, np.cumsum(deltas, dtype=np.int64)
+
+
+def load_trace(
+    graph: CompactGraph, stream: BinaryIO
+) -> Tuple[Dict[NodeId, NodeId], npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+    """
+    Reads a trace into the path tree and visited/active edge masks.
+    """
+    masks = {
+        kind: np.zeros(len(graph.targets), dtype=bool) for kind in [PATH, VISITED, ACTIVE]
+    }
+    for kind, edges in iter_trace(stream, len(graph.targets)):
+        masks[kind][edges] = True
+    path_edges = np.flatnonzero(masks[PATH])
+    sources = graph.node_ids[edge_sources(graph)[path_edges]].tolist()
+    targets = graph.node_ids[graph.targets[path_edges]].tolist()
+    return dict(zip(targets, sources)), masks[VISITED], masks[ACTIVE]
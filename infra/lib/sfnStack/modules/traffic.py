@@ -0,0 +1,277 @@
+import mmap
+import struct
+import threading
+import numpy as np
+import numpy.typing as npt
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Tuple
+
+from modules.graph import (
+    Buffer,
+    CompactGraph,
+    ColumnReader,
+    EdgeId,
+    dump_columns,
+    edge_indices,
+)
+
+PROFILES_FORMAT_MAGIC = b"PRFL"
+PROFILES_FORMAT_VERSION = 1
+# magic, version, reserved, number of classes, buckets per profile, number of overrides
+PROFILES_HEADER = struct.Struct("<4sHHqqq")
+
+BUCKETS_PER_HOUR = 4
+WEEK_BUCKETS = 7 * 24 * BUCKETS_PER_HOUR
+# Factors are stored as the share of the speed limit times 255, never 0.
+FACTOR_SCALE = 255
+# Edges are classed by speed limit, which graphs stored before the `highway`
+# column have too: up to 30, 50 and 80 km/h, and faster roads.
+CLASS_SPEEDS = np.array([30.0, 50.0, 80.0], dtype=np.float32)
+# Share of the speed lost at the worst of rush hour, by class.
+RUSH_HOUR_SLOWDOWN = [0.15, 0.35, 0.45, 0.4]
+# Buckets of edge times kept across searches, a float64 per edge each.
+SLOT_TIMES_CACHE_SIZE = 8
+
+
+@dataclass
+class SpeedProfiles:
+    """
+    Quantized speed factors for every 15 minute bucket of the week, from Monday 00:00.
+
+    `classes` has one row per edge class, `override_factors` one row per
+    edge in `override_edges`, given by node ids so they survive deltas.
+    """
+
+    classes: npt.NDArray[np.uint8]
+    override_edges: npt.NDArray[np.int64]
+    override_factors: npt.NDArray[np.uint8]
+
+
+@dataclass
+class GraphProfiles:
+    """
+    Profiles bound to a graph, `edges` are the sorted indices of the overridden
+    edges and `rows` their rows in `factors`.
+    """
+
+    classes: npt.NDArray[np.uint8]
+    edges: npt.NDArray[np.int64]
+    rows: npt.NDArray[np.int64]
+    factors: npt.NDArray[np.uint8]
+
+
+def quantize(factors: npt.ArrayLike) -> npt.NDArray[np.uint8]:
+    return np.clip(np.rint(np.asarray(factors, dtype=np.float64) * FACTOR_SCALE), 1, FACTOR_SCALE).astype(np.uint8)
+
+
+def typical_profiles() -> SpeedProfiles:
+    """
+    Weekday peaks around 08:00 and 17:30 and a milder weekend midday, without overrides.
+    """
+    hours = np.arange(WEEK_BUCKETS) / BUCKETS_PER_HOUR
+    day, hour = hours // 24, hours % 24
+    weekday = np.exp(-(((hour - 8) / 1) ** 2)) + np.exp(-(((hour - 17.5) / 1.5) ** 2))
+    weekend = 0.3 * np.exp(-(((hour - 13) / 3) ** 2))
+    congestion = np.minimum(np.where(day < 5, weekday, weekend), 1)
+    return SpeedProfiles(
+        classes=quantize(1 - np.outer(RUSH_HOUR_SLOWDOWN, congestion)),
+        override_edges=np.empty((0, 2), dtype=np.int64),
+        override_factors=np.empty((0, WEEK_BUCKETS), dtype=np.uint8),
+    )
+
+
+def with_overrides(
+    profiles: SpeedProfiles, overrides: Dict[EdgeId, npt.NDArray[np.float64]]
+) -> SpeedProfiles:
+    """
+    Copy of `profiles` where the given edges follow their own factors, as shares of the limit.
+    """
+    return SpeedProfiles(
+        classes=profiles.classes,
+        override_edges=np.array(list(overrides), dtype=np.int64).reshape(-1, 2),
+        override_factors=quantize(np.array(list(overrides.values())).reshape(-1, WEEK_BUCKETS)),
+    )
+
+
+def dump_speed_profiles(profiles: SpeedProfiles) -> bytes:
+    header = PROFILES_HEADER.pack(
+        PROFILES_FORMAT_MAGIC,
+        PROFILES_FORMAT_VERSION,
+        0,
+        len(profiles.classes),
+        WEEK_BUCKETS,
+        len(profiles.override_edges),
+    )
+    return dump_columns(
+        header,
+        [
+            np.ascontiguousarray(profiles.classes, dtype=np.uint8),
+            np.ascontiguousarray(profiles.override_edges, dtype=np.int64),
+            np.ascontiguousarray(profiles.override_factors, dtype=np.uint8),
+        ],
+    )
+
+
+def load_speed_profiles(buffer: Buffer) -> SpeedProfiles:
+    """
+    Read the profiles written by `dump_speed_profiles`, as views over `buffer`.
+    """
+    magic, version, _, n_classes, buckets, n_overrides = PROFILES_HEADER.unpack_from(buffer, 0)
+    if magic != PROFILES_FORMAT_MAGIC:
+        raise ValueError("Not speed profiles")
+    if version != PROFILES_FORMAT_VERSION:
+        raise ValueError(f"Unsupported speed profiles version {version}")
+    if buckets != WEEK_BUCKETS:
+        raise ValueError(f"Speed profiles have {buckets} buckets instead of {WEEK_BUCKETS}")
+
+    reader = ColumnReader(buffer, PROFILES_HEADER.size)
+    return SpeedProfiles(
+        classes=reader.read(np.uint8, n_classes * buckets)
+        .astype(np.uint8, copy=False)
+        .reshape(n_classes, buckets),
+        override_edges=reader.read(np.int64, 2 * n_overrides)
+        .astype(np.int64, copy=False)
+        .reshape(-1, 2),
+        override_factors=reader.read(np.uint8, n_overrides * buckets)
+        .astype(np.uint8, copy=False)
+        .reshape(n_overrides, buckets),
+    )
+
+
+def open_speed_profiles(filepath: str) -> SpeedProfiles:
+    with open(filepath, "rb") as f:
+        return load_speed_profiles(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def speed_profiles_nbytes(profiles: SpeedProfiles) -> int:
+    return (
+        profiles.classes.nbytes + profiles.override_edges.nbytes + profiles.override_factors.nbytes
+    )
+
+
+def bind_profiles(graph: CompactGraph, profiles: SpeedProfiles) -> GraphProfiles:
+    """
+    Resolves the overridden edges of `profiles` in `graph`, edges it lacks are dropped.
+    """
+    indices = edge_indices(graph, profiles.override_edges.tolist())
+    rows = np.flatnonzero(indices >= 0)
+    order = np.argsort(indices[rows], kind="stable")
+    return GraphProfiles(
+        classes=profiles.classes,
+        edges=indices[rows][order],
+        rows=rows[order],
+        factors=profiles.override_factors,
+    )
+
+
+def parse_departure(raw_departure: str) -> float:
+    """
+    Hours since Monday 00:00 of a local time as "2024-05-13T08:30", to the minute.
+    """
+    departure = datetime.fromisoformat(raw_departure)
+    return departure.weekday() * 24 + departure.hour + departure.minute / 60
+
+
+def format_departure(departure: float) -> str:
+    minutes = int(round(departure * 60))
+    day = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"][minutes // (24 * 60) % 7]
+    return f"{day} {minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def speed_factors(
+    graph: CompactGraph,
+    profiles: GraphProfiles,
+    edges: npt.NDArray[np.int64],
+    buckets: npt.NDArray[np.int64],
+) -> npt.NDArray[np.float64]:
+    """
+    Share of the speed limit driven on `edges` during `buckets`.
+    """
+    classes = np.searchsorted(CLASS_SPEEDS, graph.maxspeed[edges])
+    factors = profiles.classes[classes, buckets]
+    if len(profiles.edges):
+        positions = np.minimum(np.searchsorted(profiles.edges, edges), len(profiles.edges) - 1)
+        overridden = profiles.edges[positions] == edges
+        factors[overridden] = profiles.factors[
+            profiles.rows[positions[overridden]], buckets[overridden]
+        ]
+    return factors / FACTOR_SCALE
+
+
+def bucket_travel_times(
+    graph: CompactGraph, profiles: GraphProfiles, slot: int
+) -> npt.NDArray[np.float64]:
+    """
+    Hours to drive every edge at the speeds of bucket `slot`, exact for the
+    edges entered and left within it.
+    """
+    edges = np.arange(len(graph.targets), dtype=np.int64)
+    factors = speed_factors(
+        graph, profiles, edges, np.full(len(edges), slot % WEEK_BUCKETS, dtype=np.int64)
+    )
+    return (graph.length.astype(np.float64) / 1000) / (graph.maxspeed * factors)
+
+
+SlotTimes = Tuple[CompactGraph, GraphProfiles, npt.NDArray[np.float64]]
+_slot_times: OrderedDict[Tuple[int, int, int], SlotTimes] = OrderedDict()
+_slot_times_lock = threading.Lock()
+
+
+def slot_travel_times(
+    graph: CompactGraph, profiles: GraphProfiles, slot: int
+) -> npt.NDArray[np.float64]:
+    """
+    `bucket_travel_times`, computed once per graph, profiles and bucket of the week.
+
+    Graphs and profiles come from the graph cache, so warm lambdas search
+    the same objects again. Entries hold them, so their ids are not reused.
+    """
+    key = (id(graph), id(profiles), slot % WEEK_BUCKETS)
+    with _slot_times_lock:
+        if key in _slot_times:
+            _slot_times.move_to_end(key)
+            return _slot_times[key][2]
+    times = bucket_travel_times(graph, profiles, slot)
+    with _slot_times_lock:
+        _slot_times[key] = (graph, profiles, times)
+        if len(_slot_times) > SLOT_TIMES_CACHE_SIZE:
+            _slot_times.popitem(last=False)
+    return times
+
+
+def edge_travel_times(
+    graph: CompactGraph,
+    profiles: GraphProfiles,
+    edges: npt.NDArray[np.int64],
+    departure: float,
+) -> npt.NDArray[np.float64]:
+    """
+    Hours to drive `edges` leaving at `departure`, hours since Monday 00:00.
+
+    The speed changes when a bucket ends halfway through an edge, so leaving
+    later never means arriving earlier and time-dependent Dijkstra stays exact.
+    """
+    remaining = graph.length[edges].astype(np.float64) / 1000
+    times = np.zeros(len(edges), dtype=np.float64)
+    slot = int(departure * BUCKETS_PER_HOUR)
+    # Hours left in the first bucket, every later bucket is whole.
+    left = max((slot + 1) / BUCKETS_PER_HOUR - departure, 0.0)
+    pending = np.arange(len(edges))
+    while len(pending):
+        speeds = graph.maxspeed[edges[pending]] * speed_factors(
+            graph,
+            profiles,
+            edges[pending],
+            np.full(len(pending), slot % WEEK_BUCKETS, dtype=np.int64),
+        )
+        reach = speeds * left
+        done = remaining[pending] <= reach
+        times[pending[done]] += remaining[pending[done]] / speeds[done]
+        pending, reach = pending[~done], reach[~done]
+        times[pending] += left
+        remaining[pending] -= reach
+        slot, left = slot + 1, 1 / BUCKETS_PER_HOUR
+    return times
@@ -0,0 +1,86 @@
+import numpy as np
+import numpy.typing as npt
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from modules.event import RoutingProfiles
+from modules.graph import HIGHWAY_CLASSES, CompactGraph
+from modules.landmarks import Landmarks
+from modules.routing import (
+    MAX_SPEED_ALLOWED,
+    EdgeWeights,
+    GraphAdjacency,
+    per_km_of_travel_time,
+    travel_times,
+)
+
+DEFAULT_ROUTING_PROFILE: RoutingProfiles = "fastest"
+# Motorways and trunks count as this many times their travel time when avoiding highways.
+HIGHWAY_PENALTY = 5.0
+HIGHWAYS = [HIGHWAY_CLASSES.index("motorway"), HIGHWAY_CLASSES.index("trunk")]
+
+
+@dataclass
+class RoutingProfile:
+    """
+    Weight column of a routing profile, computed over the compact graph.
+
+    Every profile shares the graph's CSR arrays, a profile only adds its
+    column. `per_km` is the least weight of a straight km in the graph, and
+    `landmarks` whether weights never go below the travel times, for A*.
+    """
+
+    weights: Callable[[CompactGraph], npt.NDArray[np.float64]]
+    per_km: Callable[[CompactGraph], float]
+    landmarks: bool
+
+
+def distances(graph: CompactGraph) -> npt.NDArray[np.float64]:
+    """
+    Length in km of every edge, roads are never shorter than the straight line.
+    """
+    return graph.length.astype(np.float64) / 1000
+
+
+def highway_penalized_times(graph: CompactGraph) -> npt.NDArray[np.float64]:
+    penalty = np.where(np.isin(graph.highway, HIGHWAYS), HIGHWAY_PENALTY, 1.0)
+    return travel_times(graph) * penalty
+
+
+ROUTING_PROFILES: Dict[str, RoutingProfile] = {
+    "fastest": RoutingProfile(weights=travel_times, per_km=per_km_of_travel_time, landmarks=True),
+    "shortest": RoutingProfile(weights=distances, per_km=lambda _: 1.0, landmarks=False),
+    # Penalties only grow weights, the travel time heuristics stay lower bounds.
+    "avoid_highways": RoutingProfile(
+        weights=highway_penalized_times, per_km=per_km_of_travel_time, landmarks=True
+    ),
+}
+
+
+def write_weight_column(graph: CompactGraph, profile: str, filename: str) -> None:
+    with open(filename, "wb") as f:
+        np.save(f, ROUTING_PROFILES[profile].weights(graph))
+
+
+def open_weight_column(filename: str) -> npt.NDArray[np.float64]:
+    column: npt.NDArray[np.float64] = np.load(filename, mmap_mode="r")
+    return column
+
+
+def profile_weights(
+    graph: CompactGraph,
+    profile: str,
+    column: npt.NDArray[np.float64],
+    landmarks: Optional[Landmarks] = None,
+    adjacency: Optional[GraphAdjacency] = None,
+) -> EdgeWeights:
+    """
+    Landmarks are dropped for profiles whose weights are not travel times.
+    """
+    routing_profile = ROUTING_PROFILES[profile]
+    if landmarks is None or not routing_profile.landmarks:
+        return EdgeWeights(values=column, per_km=routing_profile.per_km(graph), adjacency=adjacency)
+    # Graphs without a speed limit keep the straight-line bound at the highest allowed speed.
+    per_km = 1 / (landmarks.max_speed or MAX_SPEED_ALLOWED)
+    return EdgeWeights(values=column, per_km=per_km, landmarks=landmarks, adjacency=adjacency)
@@ -14,6 +14,8 @@ interface LambdaStackProps extends cdk.StackProps {
   graphsPlotsBucket: s3.Bucket;
   graphsBucket: s3.Bucket;
   graphsDatabase: dynamo.Table;
+  geocodingDatabase: dynamo.Table;
+  resultsDatabase: dynamo.Table;
 }
 
 export class SfnStack extends cdk.Stack {
@@ -24,6 +26,8 @@ export class SfnStack extends cdk.Stack {
     const graphsPlotsBucket = props.graphsPlotsBucket;
     const graphsBucket = props.graphsBucket;
     const graphsDatabase = props.graphsDatabase;
+    const geocodingDatabase = props.geocodingDatabase;
+    const resultsDatabase = props.resultsDatabase;
 
     const getGraphsImage = lambda.DockerImageCode.fromImageAsset(__dirname, {
       buildArgs: {FUNCTION_NAME: "getGraph"},
@@ -40,7 +44,11 @@ export class SfnStack extends cdk.Stack {
       environment: {
         GRAPHS_BUCKET: graphsBucket.bucketName,
         PATHS_BUCKET: graphsPlotsBucket.bucketName,
-        GRAPHS_TABLE_NAME: graphsDatabase.tableName
+        GRAPHS_TABLE_NAME: graphsDatabase.tableName,
+        GEOCODING_TABLE_NAME: geocodingDatabase.tableName,
+        RESULTS_TABLE_NAME: resultsDatabase.tableName,
+        GRAPH_CACHE_MEMORY_MB: "768",
+        GRAPH_CACHE_DISK_MB: "512"
       },
       timeout: cdk.Duration.minutes(7),
       memorySize: 2048,
@@ -48,6 +56,8 @@ export class SfnStack extends cdk.Stack {
     });
 
     graphsDatabase.grantReadWriteData(getGraphLambda);
+    geocodingDatabase.grantReadWriteData(getGraphLambda);
+    resultsDatabase.grantReadWriteData(getGraphLambda);
 
     const plotPathLambda = new lambda.DockerImageFunction(this, "plotPathLambda", {
       functionName: "plotPath",
@@ -55,7 +65,10 @@ export class SfnStack extends cdk.Stack {
       environment: {
         GRAPHS_BUCKET: graphsBucket.bucketName,
         PATHS_BUCKET: graphsPlotsBucket.bucketName,
-        GRAPHS_TABLE_NAME: graphsDatabase.tableName
+        GRAPHS_TABLE_NAME: graphsDatabase.tableName,
+        RESULTS_TABLE_NAME: resultsDatabase.tableName,
+        GRAPH_CACHE_MEMORY_MB: "768",
+        GRAPH_CACHE_DISK_MB: "512"
       },
       timeout: cdk.Duration.minutes(7),
       memorySize: 2048,
@@ -63,6 +76,7 @@ export class SfnStack extends cdk.Stack {
     });
 
     graphsDatabase.grantReadData(plotPathLambda);
+    resultsDatabase.grantReadWriteData(plotPathLambda);
 
     const algorithmsLambda = new RustFunction(this, "algorithmsLambda", {
       manifestPath: path.join(__dirname, "../../algorithms/Cargo.toml"),
@@ -100,7 +114,17 @@ export class SfnStack extends cdk.Stack {
 
     const logGroup = new logs.LogGroup(this, "stateMachineLogGroup");
 
-    const stateMachineDefinition = getGraphTask.next(algorithmsTask).next(plotPathTask);
+    // getGraph solves short routes itself and already returns a solution key.
+    const solvedChoice = new sfn.Choice(this, "solvedChoice")
+      .when(sfn.Condition.isPresent("$.solution_key"), plotPathTask)
+      .otherwise(algorithmsTask.next(plotPathTask));
+
+    // Routes plotted before and batch matrices come back from getGraph with their url.
+    const cachedChoice = new sfn.Choice(this, "cachedChoice")
+      .when(sfn.Condition.isPresent("$.body"), new sfn.Succeed(this, "cachedResult"))
+      .otherwise(solvedChoice);
+
+    const stateMachineDefinition = getGraphTask.next(cachedChoice);
     this.graphsStateMachine = new sfn.StateMachine(this, "graphsStateMachine", {
       definitionBody: sfn.DefinitionBody.fromChainable(stateMachineDefinition),
       timeout: cdk.Duration.minutes(15),
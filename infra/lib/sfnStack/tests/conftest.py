@@ -0,0 +1,85 @@
+import math
+import random
+
+import numpy as np
+import pytest
+from networkx import MultiDiGraph
+from typing import Callable
+
+from modules.geo import haversine_km
+from modules.graph import CompactGraph, EdgeData, build_compact_graph, compact_graph_from_multidigraph
+
+BASE_ID = 25_000_000
+
+
+def max_speed(edge: EdgeData) -> int:
+    max_speeds = edge["maxspeed"]
+    if isinstance(max_speeds, list):
+        return min(int(speed) for speed in max_speeds)
+    return int(max_speeds)
+
+
+def grid_multidigraph(side: int, seed: int = 0) -> MultiDiGraph:
+    """
+    Bidirectional grid as osmnx would return it, node ids start at `BASE_ID` row by row.
+    """
+    rng = random.Random(seed)
+    G = MultiDiGraph()
+    for row in range(side):
+        for col in range(side):
+            G.add_node(BASE_ID + row * side + col, y=52.5 + row * 1e-3, x=13.4 + col * 1e-3)
+    for row in range(side):
+        for col in range(side):
+            u = BASE_ID + row * side + col
+            for v in [u + side if row + 1 < side else None, u + 1 if col + 1 < side else None]:
+                if v is None:
+                    continue
+                # Roads are never shorter than the straight line between nodes.
+                straight = 111_195 * (1e-3 if v == u + side else 1e-3 * math.cos(math.radians(52.5)))
+                length = straight * rng.uniform(1.01, 1.6)
+                maxspeed = rng.choice(["30", "50", ["50", "70"]])
+                G.add_edge(u, v, length=length, maxspeed=maxspeed, highway="residential")
+                G.add_edge(v, u, length=length, maxspeed=maxspeed, highway="residential")
+    return G
+
+
+def random_compact_graph(seed: int, n_nodes: int = 40, n_edges: int = 90) -> CompactGraph:
+    """
+    Sparse directed graph over random points, some nodes can not reach others.
+
+    Edges are never shorter than the straight line, as roads, so the A*
+    heuristics stay admissible. Node ids are not in the order of the points.
+    """
+    rng = np.random.default_rng(seed)
+    node_ids = rng.choice(np.arange(1, 10 * n_nodes), n_nodes, replace=False).astype(np.int64)
+    lat = 52.5 + rng.uniform(0, 0.05, n_nodes)
+    lon = 13.4 + rng.uniform(0, 0.05, n_nodes)
+    u = rng.integers(0, n_nodes, n_edges)
+    v = rng.integers(0, n_nodes, n_edges)
+    keep = u != v
+    u, v = u[keep], v[keep]
+    straight = haversine_km(lat[u], lon[u], lat[v], lon[v]) * 1000
+    return build_compact_graph(
+        node_ids=node_ids,
+        lat=lat,
+        lon=lon,
+        sources=node_ids[u],
+        targets=node_ids[v],
+        length=straight * rng.uniform(1.0, 2.0, len(u)) + 1.0,
+        maxspeed=rng.choice([30.0, 50.0, 80.0], len(u)),
+    )
+
+
+@pytest.fixture
+def grid() -> Callable[[int], MultiDiGraph]:
+    return grid_multidigraph
+
+
+@pytest.fixture
+def compact_grid() -> Callable[[int], CompactGraph]:
+    return lambda side: compact_graph_from_multidigraph(grid_multidigraph(side), max_speed)
+
+
+@pytest.fixture
+def random_graph() -> Callable[..., CompactGraph]:
+    return random_compact_graph
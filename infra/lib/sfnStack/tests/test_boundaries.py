@@ -0,0 +1,99 @@
+import random
+
+import numpy as np
+import pytest
+from typing import Callable, Dict
+
+from modules.boundaries import (
+    CityBoundary,
+    add_boundary,
+    build_boundary,
+    dump_boundaries,
+    find_boundary,
+    load_boundaries,
+)
+from modules.graph import CompactGraph, build_compact_graph
+
+
+def shifted(boundary: CityBoundary, graph_id: str, lon: float, scale: float = 1.0) -> CityBoundary:
+    hull = boundary.hull.copy()
+    center = hull.mean(axis=0)
+    hull = center + (hull - center) * scale
+    hull[:, 1] += lon
+    return CityBoundary("Germany", f"City {graph_id}", graph_id, hull)
+
+
+def test_hull_of_a_grid(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(10)
+    boundary = build_boundary("Germany", "Berlin", "0", graph)
+    assert boundary is not None
+    # The corners of the grid, nodes on the sides are not vertices.
+    assert len(boundary.hull) == 4
+    assert boundary.bbox == (52.5, 52.509, 13.4, 13.409)
+    assert boundary.area == pytest.approx(0.009**2)
+    assert all(boundary.contains(lat, lon) for lat, lon in zip(graph.lat, graph.lon))
+    assert not boundary.contains(52.5 - 1e-5, 13.405)
+    assert not boundary.contains(52.505, 13.41)
+
+
+def test_graphs_without_an_area() -> None:
+    node_ids = np.arange(1, 4, dtype=np.int64)
+    line = build_compact_graph(
+        node_ids=node_ids,
+        lat=np.array([52.5, 52.6, 52.7]),
+        lon=np.array([13.4, 13.5, 13.6]),
+        sources=node_ids[:2],
+        targets=node_ids[1:],
+        length=np.array([100.0, 100.0]),
+        maxspeed=np.array([50.0, 50.0]),
+    )
+    assert build_boundary("Germany", "Line", "0", line) is None
+
+
+def test_lookup_in_a_row_of_cities(compact_grid: Callable[[int], CompactGraph]) -> None:
+    boundary = build_boundary("Germany", "Berlin", "0", compact_grid(10))
+    assert boundary is not None
+    width = 0.009
+    boundaries: Dict[str, CityBoundary] = {
+        str(city): shifted(boundary, str(city), city * 2 * width) for city in range(20)
+    }
+    rng = random.Random(3)
+    for _ in range(1000):
+        lat, lon = rng.uniform(52.5, 52.5 + width), rng.uniform(13.4, 13.4 + 40 * width)
+        square, offset = divmod(lon - 13.4, 2 * width)
+        # Points too close to a side may fall on either side after rounding.
+        if min(abs(offset), abs(offset - width)) < 1e-6:
+            continue
+        found = find_boundary(boundaries, lat, lon)
+        assert (found.graph_id if found else None) == (str(int(square)) if offset <= width else None)
+
+
+def test_smallest_overlapping_city_wins(compact_grid: Callable[[int], CompactGraph]) -> None:
+    boundary = build_boundary("Germany", "Berlin", "0", compact_grid(10))
+    assert boundary is not None
+    boundaries = {"large": shifted(boundary, "large", 0.0, 2.0), "small": shifted(boundary, "small", 0.0, 0.5)}
+    found = find_boundary(boundaries, 52.5045, 13.4045)
+    assert found is not None and found.graph_id == "small"
+    found = find_boundary(boundaries, 52.4990, 13.4045)
+    assert found is not None and found.graph_id == "large"
+
+
+def test_refreshed_city_replaces_the_old_graph(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(4)
+    boundaries: Dict[str, CityBoundary] = {}
+    for graph_id in ["0", "1"]:
+        boundary = build_boundary("Germany", "Berlin", graph_id, graph)
+        assert boundary is not None
+        add_boundary(boundaries, boundary)
+    assert list(boundaries) == ["1"]
+
+
+def test_dump_round_trip(compact_grid: Callable[[int], CompactGraph]) -> None:
+    boundary = build_boundary("Germany", "Berlin", "0", compact_grid(4))
+    assert boundary is not None
+    loaded = load_boundaries(dump_boundaries({"0": boundary}))
+    assert list(loaded) == ["0"]
+    assert np.array_equal(loaded["0"].hull, boundary.hull)
+    assert loaded["0"].bbox == boundary.bbox
+    with pytest.raises(ValueError):
+        load_boundaries(b'{"version": 0, "cities": []}')
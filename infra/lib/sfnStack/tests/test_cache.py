@@ -0,0 +1,143 @@
+import io
+import threading
+
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, List, Tuple
+
+from modules.cache import GraphCache
+
+MB = 2**20
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class Writer:
+    """
+    Download that writes `data` and records the paths it wrote.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.paths: List[str] = []
+
+    def __call__(self, path: str) -> None:
+        self.paths.append(path)
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+
+def test_downloads_go_through_a_partial_file(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, MB)
+    download = Writer(b"graph")
+    assert cache.get("a.bin", download, read, len) == b"graph"
+    assert download.paths == [(tmp_path / "a.bin.part").as_posix()]
+    assert [path.name for path in tmp_path.iterdir()] == ["a.bin"]
+    assert cache.get("a.bin", download, read, len) == b"graph"
+    assert len(download.paths) == 1
+    assert cache.stats.misses == 1 and cache.stats.memory_hits == 1
+
+
+def test_failed_downloads_leave_nothing(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, MB)
+
+    def fail(path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(b"trunc")
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        cache.get("a.bin", fail, read, len)
+    assert list(tmp_path.iterdir()) == []
+    assert "a.bin" not in cache.disk
+    assert cache.get("a.bin", Writer(b"graph"), read, len) == b"graph"
+
+
+def test_restarted_cache_drops_partial_files(tmp_path: Path) -> None:
+    (tmp_path / "a.bin").write_bytes(b"graph")
+    (tmp_path / "b.bin.part").write_bytes(b"trunc")
+    cache = GraphCache(tmp_path.as_posix(), MB, MB)
+    assert list(cache.disk) == ["a.bin"]
+    assert not (tmp_path / "b.bin.part").exists()
+    assert cache.get("a.bin", Writer(b"other"), read, len) == b"graph"
+    assert cache.stats.disk_hits == 1
+
+
+def test_different_files_download_concurrently(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, MB)
+    # Both downloads must be running at once to pass the barrier.
+    barrier = threading.Barrier(2, timeout=5)
+
+    def download(path: str) -> None:
+        barrier.wait()
+        Writer(b"graph")(path)
+
+    with ThreadPoolExecutor(2) as executor:
+        results = list(executor.map(lambda name: cache.get(name, download, read, len), ["a.bin", "b.bin"]))
+    assert results == [b"graph", b"graph"]
+
+
+def test_same_file_downloads_once(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, MB)
+    download = Writer(b"graph")
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: cache.get("a.bin", download, read, len), range(32)))
+    assert results == [b"graph"] * 32
+    assert len(download.paths) == 1
+    assert cache.stats.misses == 1 and cache.stats.memory_hits == 31
+
+
+def test_streamed_files_are_kept_when_they_fit(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, 8)
+
+    def open_stream(data: bytes) -> Tuple[BinaryIO, int]:
+        return io.BytesIO(data), len(data)
+
+    def load(stream: BinaryIO) -> bytes:
+        return stream.read(2)
+
+    assert cache.get_streamed("a.bin", lambda: open_stream(b"graph"), load, len) == b"gr"
+    assert (tmp_path / "a.bin").read_bytes() == b"graph"
+    assert cache.get_streamed("b.bin", lambda: open_stream(b"large graph"), load, len) == b"la"
+    assert not (tmp_path / "b.bin").exists()
+
+
+def test_disk_eviction_keeps_the_budget(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), 0, 10)
+    for name in ["a.bin", "b.bin", "c.bin"]:
+        cache.get(name, Writer(b"graph"), read, len)
+    assert list(cache.disk) == ["b.bin", "c.bin"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b.bin", "c.bin"]
+    assert cache.stats.disk_bytes == 10 and cache.stats.disk_evictions == 1
+
+
+def test_files_leave_memory_before_the_disk(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, 10)
+    for name in ["a.bin", "b.bin"]:
+        cache.get(name, Writer(b"graph"), read, len)
+    cache.get("a.bin", Writer(b"graph"), read, len)
+    # Lookups alone log nothing.
+    assert capsys.readouterr().out == ""
+    cache.get("c.bin", Writer(b"graph"), read, len)
+    assert list(cache.disk) == ["a.bin", "c.bin"]
+    assert list(cache.memory) == ["a.bin", "c.bin"]
+    assert cache.stats.memory_bytes == 10 and cache.stats.memory_evictions == 1
+    assert "disk_evictions': 1" in capsys.readouterr().out
+
+
+def test_derived_values_are_built_once(tmp_path: Path) -> None:
+    cache = GraphCache(tmp_path.as_posix(), MB, MB)
+    built: List[str] = []
+
+    def build() -> bytes:
+        built.append("a")
+        return b"adjacency"
+
+    assert cache.get_derived("adjacency-a", build, len) == b"adjacency"
+    assert cache.get_derived("adjacency-a", build, len) == b"adjacency"
+    assert built == ["a"] and list(tmp_path.iterdir()) == []
+    assert cache.stats.misses == 1 and cache.stats.memory_hits == 1
@@ -0,0 +1,67 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+from typing import Callable
+
+from modules.contraction import build_hierarchy, dump_hierarchy, load_hierarchy, query_hierarchy
+from modules.graph import CompactGraph, edge_index, edge_sources
+from modules.routing import travel_times
+
+
+def check_queries(graph: CompactGraph, pairs: int, seed: int) -> None:
+    weights = travel_times(graph)
+    hierarchy = load_hierarchy(dump_hierarchy(build_hierarchy(graph)))
+    reference = nx.MultiDiGraph()
+    reference.add_nodes_from(graph.node_ids.tolist())
+    for u, v, weight in zip(
+        graph.node_ids[edge_sources(graph)].tolist(), graph.node_ids[graph.targets].tolist(), weights.tolist()
+    ):
+        reference.add_edge(u, v, weight=weight)
+
+    rng = random.Random(seed)
+    node_ids = graph.node_ids.tolist()
+    for _ in range(pairs):
+        source, destination = rng.choice(node_ids), rng.choice(node_ids)
+        result = query_hierarchy(hierarchy, graph, source, destination)
+        if not nx.has_path(reference, source, destination):
+            assert result is None
+            continue
+        assert result is not None
+        expected = nx.shortest_path_length(reference, source, destination, weight="weight")
+        assert result.weight == pytest.approx(expected)
+        # The unpacked path is made of original edges and adds up to the weight.
+        node, weight = destination, 0.0
+        while node != source:
+            edge = edge_index(graph, (result.path[node], node))
+            assert edge is not None
+            weight += float(weights[edge])
+            node = result.path[node]
+        assert weight == pytest.approx(result.weight)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_match_networkx(random_graph: Callable[..., CompactGraph], seed: int) -> None:
+    check_queries(random_graph(seed, 60, 150), 100, seed)
+
+
+def test_queries_on_a_grid(compact_grid: Callable[[int], CompactGraph]) -> None:
+    check_queries(compact_grid(12), 100, 0)
+
+
+def test_missing_nodes(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(3)
+    hierarchy = build_hierarchy(graph)
+    assert query_hierarchy(hierarchy, graph, int(graph.node_ids[0]), -1) is None
+    same = query_hierarchy(hierarchy, graph, int(graph.node_ids[0]), int(graph.node_ids[0]))
+    assert same is not None and same.weight == 0.0
+
+
+def test_dump_round_trip(compact_grid: Callable[[int], CompactGraph]) -> None:
+    hierarchy = build_hierarchy(compact_grid(4))
+    loaded = load_hierarchy(dump_hierarchy(hierarchy))
+    for name, column in vars(hierarchy).items():
+        assert np.array_equal(getattr(loaded, name), column)
+    with pytest.raises(ValueError):
+        load_hierarchy(b"XXXX" + dump_hierarchy(hierarchy)[4:])
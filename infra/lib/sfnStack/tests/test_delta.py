@@ -0,0 +1,111 @@
+import random
+
+import numpy as np
+import pytest
+from networkx import MultiDiGraph
+from shapely.geometry import LineString
+from typing import Callable, Optional
+
+from modules.delta import apply_deltas, diff_graphs, dump_delta, graph_ref, load_delta, parse_graph_ref
+from modules.geometry import EdgeGeometry, build_edge_geometry
+from modules.graph import CompactGraph
+from lambdas.getGraph.modules.ingestion import ingest_graph
+
+GRAPH_COLUMNS = ["node_ids", "lat", "lon", "offsets", "targets", "length", "maxspeed", "highway"]
+
+
+def bend(G: MultiDiGraph, u: int, v: int, key: int = 0) -> None:
+    x0, y0, x1, y1 = G.nodes[u]["x"], G.nodes[u]["y"], G.nodes[v]["x"], G.nodes[v]["y"]
+    G.edges[u, v, key]["geometry"] = LineString([(x0, y0), ((x0 + x1) / 2 + 1e-5, (y0 + y1) / 2), (x1, y1)])
+
+
+def edit(G: MultiDiGraph, rng: random.Random) -> MultiDiGraph:
+    """
+    Roads closed, opened, retagged and bent, nodes moved, added and removed.
+    """
+    G = G.copy()
+    edges = list(G.edges(keys=True, data=True))
+    for u, v, key, _ in rng.sample(edges, 5):
+        if G.has_edge(u, v, key):
+            G.remove_edge(u, v, key)
+    for u, v, key, data in rng.sample(edges, 5):
+        if G.has_edge(u, v, key):
+            G.edges[u, v, key]["maxspeed"] = "30" if data["maxspeed"] != "30" else "50"
+    for u, v, key, _ in rng.sample(edges, 5):
+        if G.has_edge(u, v, key):
+            bend(G, u, v, key)
+    nodes = list(G.nodes)
+    for node in rng.sample(nodes, 2):
+        G.nodes[node]["y"] += 1e-5
+    new_node = max(nodes) + 1
+    u, v = rng.sample(nodes, 2)
+    G.add_node(new_node, x=(G.nodes[u]["x"] + G.nodes[v]["x"]) / 2, y=(G.nodes[u]["y"] + G.nodes[v]["y"]) / 2)
+    for a, b in [(u, new_node), (new_node, u), (new_node, v), (v, new_node)]:
+        G.add_edge(a, b, length=80.0, maxspeed="50", highway="residential")
+    for node in rng.sample(nodes, 2):
+        G.remove_node(node)
+    return G
+
+
+def assert_same(graph: CompactGraph, expected: CompactGraph) -> None:
+    for column in GRAPH_COLUMNS:
+        assert np.array_equal(getattr(graph, column), getattr(expected, column)), column
+
+
+def assert_same_geometry(geometry: Optional[EdgeGeometry], expected: EdgeGeometry) -> None:
+    assert geometry is not None
+    for column in ["offsets", "lat", "lon"]:
+        assert np.array_equal(getattr(geometry, column), getattr(expected, column)), column
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_composed_versions_match_the_refreshed_graph(grid: Callable[[int], MultiDiGraph], seed: int) -> None:
+    rng = random.Random(seed)
+    G = grid(8)
+    for u, v, _ in rng.sample(list(G.edges(keys=True)), 20):
+        bend(G, u, v)
+    base = ingest_graph(G)
+    base_geometry = build_edge_geometry(G, base)
+
+    deltas = []
+    current, current_graph, current_geometry = G, base, base_geometry
+    for version in range(1, 4):
+        current = edit(current, rng)
+        new = ingest_graph(current)
+        new_geometry = build_edge_geometry(current, new)
+        delta = diff_graphs(current_graph, new, version, new_geometry, current_geometry)
+        deltas.append(load_delta(dump_delta(delta)))
+        # Deltas are applied in version order whatever order they were read in.
+        composed, composed_geometry = apply_deltas(base, deltas[::-1], base_geometry)
+        assert_same(composed, new)
+        assert_same_geometry(composed_geometry, new_geometry)
+        without_geometry, none = apply_deltas(base, deltas)
+        assert_same(without_geometry, new)
+        assert none is None
+        current_graph, current_geometry = new, new_geometry
+
+
+def test_unchanged_graph_has_an_empty_delta(grid: Callable[[int], MultiDiGraph]) -> None:
+    G = grid(5)
+    graph = ingest_graph(G)
+    geometry = build_edge_geometry(G, graph)
+    assert len(diff_graphs(graph, graph, 1, geometry, geometry)) == 0
+
+
+def test_new_points_are_found_with_both_geometries(grid: Callable[[int], MultiDiGraph]) -> None:
+    G = grid(5)
+    graph = ingest_graph(G)
+    old_geometry = build_edge_geometry(G, graph)
+    u, v, _ = next(iter(G.edges(keys=True)))
+    bend(G, u, v)
+    geometry = build_edge_geometry(G, graph)
+    delta = diff_graphs(graph, graph, 1, geometry, old_geometry)
+    assert delta.edges.tolist() == [[u, v]]
+    assert len(diff_graphs(graph, graph, 1, geometry)) == 0
+
+
+def test_graph_refs() -> None:
+    assert graph_ref("1234", 0) == "1234"
+    assert graph_ref("1234", 3) == "1234@3"
+    assert parse_graph_ref("1234@3") == ("1234", 3)
+    assert parse_graph_ref("1234") == ("1234", 0)
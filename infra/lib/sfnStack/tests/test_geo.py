@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pytest
+from haversine import Unit, haversine, haversine_vector, inverse_haversine
+
+from modules.geo import EARTH_RADIUS, bounding_box, equirectangular_km, haversine_km, initial_bearing
+from modules.tiles import area_tiles, corridor_tiles
+
+BERLIN = (52.52, 13.405)
+PARIS = (48.8566, 2.3522)
+
+
+def test_known_distances() -> None:
+    assert float(haversine_km(*BERLIN, *PARIS)) == pytest.approx(877.5, abs=0.1)
+    assert float(haversine_km(0, 0, 1, 0)) == pytest.approx(EARTH_RADIUS * math.pi / 180)
+    assert float(haversine_km(0, 0, 0, 180)) == pytest.approx(EARTH_RADIUS * math.pi)
+    assert float(haversine_km(90, 0, -90, 0)) == pytest.approx(EARTH_RADIUS * math.pi)
+    assert float(haversine_km(*BERLIN, *BERLIN)) == 0.0
+
+
+def test_haversine_matches_the_package() -> None:
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-90, 90, 1000), rng.uniform(-90, 90, 1000)
+    lon1, lon2 = rng.uniform(-180, 180, 1000), rng.uniform(-180, 180, 1000)
+    expected = haversine_vector(np.column_stack([lat1, lon1]), np.column_stack([lat2, lon2]), Unit.KILOMETERS)
+    assert np.allclose(haversine_km(lat1, lon1, lat2, lon2), expected, rtol=1e-9, atol=1e-6)
+    assert float(haversine_km(*BERLIN, *PARIS)) == pytest.approx(haversine(BERLIN, PARIS), rel=1e-12)
+    # Both sides of the antimeridian are close.
+    assert float(haversine_km(0, 179.95, 0, -179.95)) == pytest.approx(
+        haversine((0, 179.95), (0, -179.95)), rel=1e-9
+    )
+
+
+def test_equirectangular_within_a_city() -> None:
+    rng = np.random.default_rng(1)
+    lat, lon = rng.uniform(-70, 70, 1000), rng.uniform(-180, 180, 1000)
+    near_lat, near_lon = lat + rng.uniform(-0.05, 0.05, 1000), lon + rng.uniform(-0.05, 0.05, 1000)
+    exact = haversine_km(lat, lon, near_lat, near_lon)
+    assert np.allclose(equirectangular_km(lat, lon, near_lat, near_lon), exact, rtol=1e-3)
+
+
+def test_initial_bearing() -> None:
+    assert float(initial_bearing(0, 0, 1, 0)) == pytest.approx(0)
+    assert float(initial_bearing(0, 0, 0, 1)) == pytest.approx(90)
+    assert float(initial_bearing(1, 0, 0, 0)) == pytest.approx(180)
+    assert float(initial_bearing(0, 0, 0, -1)) == pytest.approx(270)
+    rng = np.random.default_rng(2)
+    lat, lon, bearings = rng.uniform(-80, 80, 200), rng.uniform(-180, 180, 200), rng.uniform(0, 360, 200)
+    walked = [
+        inverse_haversine((lat[i], lon[i]), 10, math.radians(bearings[i]), Unit.KILOMETERS) for i in range(200)
+    ]
+    computed = initial_bearing(lat, lon, [p[0] for p in walked], [p[1] for p in walked])
+    assert np.abs((computed - bearings + 180) % 360 - 180).max() < 1e-6
+
+
+def test_bounding_box_margin() -> None:
+    rng = np.random.default_rng(3)
+    lat, lon = 52.5 + rng.uniform(0, 0.1, 100), 13.4 + rng.uniform(0, 0.1, 100)
+    south, west, north, east = bounding_box(lat, lon, 5.0)
+    assert np.all((lat > south) & (lat < north) & (lon > west) & (lon < east))
+    assert float(haversine_km(lat.min(), 0, south, 0)) == pytest.approx(5.0)
+    assert float(haversine_km(north, 0, lat.max(), 0)) == pytest.approx(5.0)
+    middle = (south + north) / 2
+    assert float(haversine_km(middle, lon.max(), middle, east)) == pytest.approx(5.0, rel=1e-3)
+    assert bounding_box(lat, lon) == (lat.min(), lon.min(), lat.max(), lon.max())
+
+
+def test_bounding_box_across_the_antimeridian() -> None:
+    south, west, north, east = bounding_box([10, 11], [179.9, -179.9], 5.0)
+    assert west > east
+    assert 179.8 < west < 179.9 and -179.9 < east < -179.8
+    assert float(haversine_km(10.5, west, 10.5, 179.9)) == pytest.approx(5.0, rel=1e-3)
+    assert bounding_box([10, 11], [-179.9, 179.9]) == (10, 179.9, 11, -179.9)
+    # The margin alone can cross it.
+    assert bounding_box([0], [179.99], 5.0)[3] < -179.9
+    # Points all around the world leave out the largest gap.
+    assert bounding_box([0, 0, 0], [-170, 0, 170]) == (0, 0, 0, -170)
+    assert bounding_box([0, 0, 0], [-120, 0, 120], 8000)[1::2] == (-180, 180)
+
+
+@pytest.mark.parametrize("lat", [89.99, -89.99])
+def test_bounding_box_around_the_poles(lat: float) -> None:
+    south, west, north, east = bounding_box([lat], [13.4], 5.0)
+    assert -90 <= south < north <= 90
+    assert (west, east) == (-180, 180)
+    # Short of the pole the box still has sides, far apart in longitude.
+    _, west, _, east = bounding_box([lat], [13.4], 0.1)
+    assert 0 < west < 13.4 < east < 30
+
+
+def test_tiles_across_the_antimeridian() -> None:
+    tiles = corridor_tiles(-17.0, 179.95, -17.1, -179.9)
+    assert {col for _, col in tiles} == {-900, 899}
+    assert corridor_tiles(-17.1, -179.9, -17.0, 179.95) == tiles
+    assert {col for _, col in area_tiles([10], [179.99])} == {-900, 899}
+    assert len(area_tiles([89.99], [0])) == 360 / 0.2
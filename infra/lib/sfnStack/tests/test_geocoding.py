@@ -0,0 +1,212 @@
+import json
+
+import pytest
+import requests
+from botocore.stub import Stubber
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, cast
+
+from modules import geocoding
+from modules.geocoding import (
+    MEMORY_CACHE_SIZE,
+    REQUESTS_PER_SECOND,
+    RETRIES,
+    DynamoDBStore,
+    GeocodingClient,
+    GeocodingStore,
+    SQLiteStore,
+    TokenBucket,
+)
+
+NOW = 1_700_000_000
+PLACES = [{"place_id": 1, "lat": "52.5", "lon": "13.4"}]
+
+
+class FakeClock:
+    """
+    Stands for the `time` module, sleeping moves the clock forward.
+    """
+
+    def __init__(self) -> None:
+        self.now = float(NOW)
+        self.sleeps: List[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str = "", headers: Mapping[str, str] = {}) -> None:
+        self.status_code = status_code
+        self.text = text
+        self.headers = dict(headers)
+
+
+class FakeSession:
+    """
+    Answers requests in order and records the time and query of each.
+    """
+
+    def __init__(self, clock: FakeClock, responses: List[FakeResponse]) -> None:
+        self.clock = clock
+        self.responses = responses
+        self.requests: List[Tuple[float, Mapping[str, str | float]]] = []
+
+    def get(self, url: str, params: Mapping[str, str | float], timeout: float) -> FakeResponse:
+        self.requests.append((self.clock.now, params))
+        if not self.responses:
+            raise requests.ConnectionError("No more responses")
+        return self.responses.pop(0)
+
+
+class MemoryStore:
+    def __init__(self) -> None:
+        self.values: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+    def put(self, key: str, value: str, ttl: int) -> None:
+        self.values[key] = value
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr(geocoding, "time", fake_clock)
+    return fake_clock
+
+
+def client_with(
+    clock: FakeClock,
+    responses: List[FakeResponse],
+    store: Optional[GeocodingStore] = None,
+    rate: float = REQUESTS_PER_SECOND,
+    cache_size: int = MEMORY_CACHE_SIZE,
+) -> Tuple[GeocodingClient, FakeSession]:
+    """
+    Client whose requests are answered by a `FakeSession` of `responses`.
+    """
+    client = GeocodingClient(store, rate, cache_size=cache_size)
+    session = FakeSession(clock, responses)
+    client.session = cast(requests.Session, session)
+    return client, session
+
+
+def test_token_bucket_spaces_calls(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=2.0)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == [0.5, 0.5, 0.5]
+    clock.now += 10
+    bucket.acquire()
+    # Idle time fills the bucket up to its capacity only.
+    assert clock.sleeps == [0.5, 0.5, 0.5]
+    bucket.acquire()
+    assert clock.sleeps[-1] == 0.5
+
+
+def test_answers_are_cached(clock: FakeClock) -> None:
+    store = MemoryStore()
+    client, session = client_with(clock, [FakeResponse(200, json.dumps(PLACES))], store=store)
+    assert client.search({"city": "Berlin"}) == PLACES
+    assert client.search({"city": "Berlin"}) == PLACES
+    assert len(session.requests) == 1
+    # A new container reads the persistent store.
+    other, other_session = client_with(clock, [], store=store)
+    assert other.search({"city": "Berlin"}) == PLACES
+    assert other_session.requests == []
+
+
+def test_memory_cache_drops_the_least_recent(clock: FakeClock) -> None:
+    responses = [FakeResponse(200, json.dumps([{"place_id": place}])) for place in range(4)]
+    client, session = client_with(clock, responses, cache_size=2)
+    for city in ["a", "b", "a", "c"]:
+        client.search({"city": city})
+    assert len(session.requests) == 3
+    assert [key.split("=")[1].split("&")[0] for key in client.cache] == ["a", "c"]
+    client.search({"city": "b"})
+    assert len(session.requests) == 4
+
+
+def test_reverse_lookups_share_a_cell(clock: FakeClock) -> None:
+    client, session = client_with(clock, [FakeResponse(200, json.dumps({"place_id": 1}))])
+    assert client.reverse(52.500001, 13.400001) == client.reverse(52.499999, 13.399999)
+    assert len(session.requests) == 1
+    assert session.requests[0][1]["lat"] == 52.5
+
+
+def test_rate_limits_are_retried_at_the_rate(clock: FakeClock) -> None:
+    responses = [
+        FakeResponse(429, headers={"Retry-After": "5"}),
+        FakeResponse(503),
+        FakeResponse(200, json.dumps(PLACES)),
+    ]
+    client, session = client_with(clock, responses)
+    assert client.search({"city": "Berlin"}) == PLACES
+    times = [at for at, _ in session.requests]
+    assert times == [NOW, NOW + 5, NOW + 7]
+    client, session = client_with(clock, [FakeResponse(429, headers={"Retry-After": "0"})] * (RETRIES + 1), rate=0.5)
+    assert client.search({"city": "Hamburg"}) is None
+    times = [at for at, _ in session.requests]
+    # Every attempt takes a token, even when the server asks for less.
+    assert all(later - earlier >= 2 for earlier, later in zip(times, times[1:]))
+    assert len(times) == RETRIES + 1
+
+
+def test_errors_are_not_cached(clock: FakeClock) -> None:
+    client, session = client_with(clock, [FakeResponse(404), FakeResponse(200, json.dumps(PLACES))])
+    assert client.search({"city": "Berlin"}) is None
+    assert client.search({"city": "Berlin"}) == PLACES
+    assert len(session.requests) == 2
+
+
+def test_sqlite_entries_expire(clock: FakeClock, tmp_path: Path) -> None:
+    store = SQLiteStore((tmp_path / "geocoding.sqlite").as_posix())
+    store.put("key", "value", ttl=60)
+    assert store.get("key") == "value"
+    store.put("key", "new value", ttl=60)
+    clock.now += 60
+    assert store.get("key") == "new value"
+    clock.now += 1
+    assert store.get("key") is None
+    assert store.get("missing") is None
+
+
+@pytest.fixture
+def dynamodb_store(monkeypatch: pytest.MonkeyPatch, clock: FakeClock) -> Iterator[Tuple[DynamoDBStore, Stubber]]:
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    store = DynamoDBStore("geocoding")
+    with Stubber(store.table.meta.client) as stubber:
+        yield store, stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_dynamodb_put_sets_the_expiry(dynamodb_store: Tuple[DynamoDBStore, Stubber]) -> None:
+    store, stubber = dynamodb_store
+    stubber.add_response(
+        "put_item",
+        {},
+        {"TableName": "geocoding", "Item": {"Key": "key", "Value": "value", "ExpiresAt": NOW + 60}},
+    )
+    store.put("key", "value", ttl=60)
+
+
+@pytest.mark.parametrize("expires_at, expected", [(NOW, "value"), (NOW - 1, None)])
+def test_dynamodb_skips_expired_items(
+    dynamodb_store: Tuple[DynamoDBStore, Stubber], expires_at: int, expected: str
+) -> None:
+    store, stubber = dynamodb_store
+    stubber.add_response(
+        "get_item",
+        {"Item": {"Key": {"S": "key"}, "Value": {"S": "value"}, "ExpiresAt": {"N": str(expires_at)}}},
+        {"TableName": "geocoding", "Key": {"Key": "key"}},
+    )
+    assert store.get("key") == expected
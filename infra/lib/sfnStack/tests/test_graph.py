@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+from pathlib import Path
+from networkx import MultiDiGraph
+from typing import Callable
+
+from modules.graph import (
+    GRAPH_FORMAT_MAGIC,
+    GRAPH_HEADER,
+    CompactGraph,
+    GraphView,
+    build_compact_graph,
+    dump_columns,
+    dump_compact_graph,
+    dump_graph_json,
+    edge_index,
+    edge_indices,
+    graph_nbytes,
+    load_compact_graph,
+    load_graph_json,
+    node_indices,
+    open_compact_graph,
+)
+
+COLUMNS = ["node_ids", "lat", "lon", "offsets", "targets", "length", "maxspeed", "highway"]
+
+
+def assert_same_graph(graph: CompactGraph, other: CompactGraph) -> None:
+    for column in COLUMNS:
+        assert np.array_equal(getattr(graph, column), getattr(other, column)), column
+
+
+def test_binary_round_trip(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(6)
+    loaded = load_compact_graph(dump_compact_graph(graph))
+    assert_same_graph(loaded, graph)
+    assert loaded.max_speed == graph.max_speed == graph.maxspeed.max()
+
+
+def test_memory_mapped_graph(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(6)
+    filename = f"{tmp_path}/graph.bin"
+    with open(filename, "wb") as f:
+        f.write(dump_compact_graph(graph))
+    assert_same_graph(open_compact_graph(filename), graph)
+
+
+def test_json_and_binary_formats_agree(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(6)
+    nodes, edges = dump_graph_json(graph)
+    json_graph = load_graph_json(json.loads(json.dumps(nodes)), json.loads(json.dumps(edges)))
+    binary_graph = load_compact_graph(dump_compact_graph(graph))
+    assert np.array_equal(json_graph.node_ids, binary_graph.node_ids)
+    assert np.array_equal(json_graph.targets, binary_graph.targets)
+    assert np.array_equal(json_graph.length, binary_graph.length)
+
+
+def test_version_1_graphs_load_without_highway(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(4)
+    header = GRAPH_HEADER.pack(GRAPH_FORMAT_MAGIC, 1, 0, len(graph.node_ids), len(graph.targets))
+    columns = [getattr(graph, column) for column in COLUMNS[:-1]]
+    loaded = load_compact_graph(dump_columns(header, columns))
+    assert np.array_equal(loaded.targets, graph.targets)
+    assert not loaded.highway.any()
+    # Graphs written without the top speed take it from the edges.
+    assert loaded.max_speed == graph.max_speed
+
+
+def test_parallel_edges_keep_the_last_one() -> None:
+    graph = build_compact_graph(
+        node_ids=np.array([3, 1, 2], dtype=np.int64),
+        lat=np.zeros(3),
+        lon=np.zeros(3),
+        sources=np.array([1, 1, 2], dtype=np.int64),
+        targets=np.array([2, 2, 3], dtype=np.int64),
+        length=np.array([10.0, 20.0, 30.0]),
+        maxspeed=np.array([50.0, 30.0, 50.0]),
+    )
+    assert graph.node_ids.tolist() == [1, 2, 3]
+    assert len(graph.targets) == 2
+    edge = edge_index(graph, (1, 2))
+    assert edge is not None and graph.length[edge] == 20.0 and graph.maxspeed[edge] == 30.0
+
+
+def test_missing_nodes_and_edges(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(3)
+    first, last = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    assert node_indices(graph, [first, 1, last]).tolist() == [0, -1, len(graph.node_ids) - 1]
+    assert edge_index(graph, (first, last)) is None
+    assert edge_indices(graph, [(first, first + 1), (first, last), (1, first)]).tolist()[1:] == [-1, -1]
+
+
+def test_graph_view_matches_the_multidigraph(
+    grid: Callable[[int], MultiDiGraph], compact_grid: Callable[[int], CompactGraph]
+) -> None:
+    G = grid(5)
+    graph = compact_grid(5)
+    view = GraphView(graph)
+    assert len(view.nodes) == len(G.nodes) and len(view.edges) == len(G.edges)
+    for node_id in G.nodes:
+        assert view.nodes[node_id].next_nodes == sorted(set(G.successors(node_id)))
+    for u, v, data in G.edges(data=True):
+        assert np.isclose(view.edges[(u, v)].length, data["length"], rtol=1e-6)
+    assert graph_nbytes(graph) > 0
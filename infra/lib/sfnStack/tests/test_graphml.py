@@ -0,0 +1,58 @@
+import gzip
+import io
+
+import osmnx as ox
+import pytest
+from networkx import MultiDiGraph
+from pathlib import Path
+from shapely.geometry import LineString
+from typing import Callable
+
+from modules.graphml import parse_bool, read_graphml, write_graphml
+
+
+def osmnx_graph(G: MultiDiGraph) -> MultiDiGraph:
+    """
+    The grid with the attributes of a simplified osmnx graph.
+    """
+    G = G.copy()
+    G.graph.update(crs="epsg:4326", simplified=True)
+    for node, data in G.nodes(data=True):
+        data.update(osmid=node, street_count=4, lat=data["y"], lon=data["x"])
+    for index, (u, v, data) in enumerate(G.edges(data=True)):
+        data.update(osmid=[index, index + 1] if index % 3 == 0 else index, oneway=index % 2 == 0, reversed=False)
+        if index % 5 == 0:
+            data["geometry"] = LineString([(G.nodes[u]["x"], G.nodes[u]["y"]), (G.nodes[v]["x"], G.nodes[v]["y"])])
+    return G
+
+
+def test_read_graphml_matches_osmnx(grid: Callable[[int], MultiDiGraph], tmp_path: Path) -> None:
+    G = osmnx_graph(grid(4))
+    stream = io.BytesIO()
+    write_graphml(G, stream)
+    filepath = tmp_path / "graph.graphml"
+    filepath.write_bytes(gzip.decompress(stream.getvalue()))
+
+    streamed = read_graphml(io.BytesIO(stream.getvalue()))
+    loaded = ox.load_graphml(filepath)
+    assert streamed.graph == loaded.graph
+    assert dict(streamed.nodes(data=True)) == dict(loaded.nodes(data=True))
+    assert list(streamed.edges(keys=True, data=True)) == list(loaded.edges(keys=True, data=True))
+    # And the values come back as they were written.
+    assert streamed.graph["simplified"] is True
+    assert dict(streamed.nodes(data=True)) == dict(G.nodes(data=True))
+    for (_, _, data), (_, _, expected) in zip(streamed.edges(data=True), G.edges(data=True)):
+        assert data == expected
+
+
+def test_uncompressed_documents(grid: Callable[[int], MultiDiGraph]) -> None:
+    stream = io.BytesIO()
+    write_graphml(grid(3), stream)
+    G = read_graphml(io.BytesIO(gzip.decompress(stream.getvalue())), compressed=False)
+    assert G.number_of_edges() == grid(3).number_of_edges()
+
+
+def test_parse_bool() -> None:
+    assert parse_bool("True") is True and parse_bool("False") is False and parse_bool(False) is False
+    with pytest.raises(ValueError):
+        parse_bool("yes")
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from networkx import MultiDiGraph
+from typing import Callable, List, Optional
+
+from modules.graph import HIGHWAY_CLASSES, EdgeData, compact_graph_from_multidigraph
+from lambdas.getGraph.modules.ingestion import (
+    DEFAULT_MAX_SPEED,
+    highway_class,
+    ingest_graph,
+    normalize_max_speeds,
+    parse_max_speed,
+)
+
+
+def legacy_max_speed(edge: EdgeData) -> int:
+    """
+    Per-edge parsing of numeric tags, as `get_max_speed` did.
+    """
+    max_speeds = edge.get("maxspeed")
+    if isinstance(max_speeds, list):
+        speeds: List[int] = [int(speed) for speed in max_speeds if speed.isnumeric()]
+        return min(speeds) if speeds else DEFAULT_MAX_SPEED
+    if isinstance(max_speeds, str) and max_speeds.isnumeric():
+        return int(max_speeds)
+    return DEFAULT_MAX_SPEED
+
+
+@pytest.mark.parametrize(
+    "tag, speed",
+    [
+        ("50", 50),
+        (("50", "70"), 50),
+        ("50;70", 50),
+        ("30 mph", 48),
+        ("DE:zone30", 30),
+        ("DE:urban", 50),
+        ("signals", None),
+        ("50 furlongs", None),
+    ],
+)
+def test_parse_max_speed(tag: str, speed: Optional[int]) -> None:
+    assert parse_max_speed(tag) == speed
+
+
+def test_missing_and_unknown_tags_get_the_default() -> None:
+    speeds = normalize_max_speeds(["50", None, "signals", ["30", "70"]])
+    assert speeds.tolist() == [50, DEFAULT_MAX_SPEED, DEFAULT_MAX_SPEED, 30]
+
+
+def test_highway_class() -> None:
+    assert HIGHWAY_CLASSES[highway_class("motorway_link")] == "motorway"
+    assert HIGHWAY_CLASSES[highway_class(["secondary", "residential"])] == "secondary"
+    assert highway_class("bus_guideway") == highway_class(None) == 0
+
+
+def test_ingest_matches_the_per_edge_loop(grid: Callable[[int], MultiDiGraph]) -> None:
+    G = grid(6)
+    graph = ingest_graph(G)
+    legacy = compact_graph_from_multidigraph(G, legacy_max_speed)
+    assert np.array_equal(graph.node_ids, legacy.node_ids)
+    assert np.array_equal(graph.offsets, legacy.offsets)
+    assert np.array_equal(graph.targets, legacy.targets)
+    assert np.array_equal(graph.length, legacy.length)
+    assert np.array_equal(graph.maxspeed, legacy.maxspeed)
+    assert set(graph.highway.tolist()) == {HIGHWAY_CLASSES.index("residential")}
@@ -0,0 +1,46 @@
+import networkx as nx
+import numpy as np
+import pytest
+from networkx import MultiDiGraph
+from shapely.geometry import Point, shape
+from typing import Callable
+
+from modules.graph import CompactGraph, edge_sources
+from modules.isochrone import ISOCHRONE_MAX_MINUTES, isochrone_features, parse_minutes
+from modules.routing import bounded_dijkstra, travel_times
+
+
+def test_parse_minutes() -> None:
+    assert parse_minutes("15,5,10,5") == [5.0, 10.0, 15.0]
+    for raw_minutes in ["0", "-5", f"{ISOCHRONE_MAX_MINUTES + 1}", "5,x"]:
+        with pytest.raises(ValueError):
+            parse_minutes(raw_minutes)
+
+
+def test_isochrones_match_networkx(
+    grid: Callable[[int], MultiDiGraph], compact_grid: Callable[[int], CompactGraph]
+) -> None:
+    G = grid(15)
+    graph = compact_grid(15)
+    reference = nx.DiGraph()
+    sources = graph.node_ids[edge_sources(graph)].tolist()
+    targets = graph.node_ids[graph.targets].tolist()
+    for u, v, weight in zip(sources, targets, travel_times(graph).tolist()):
+        reference.add_edge(u, v, weight=weight)
+
+    source = int(graph.node_ids[len(graph.node_ids) // 2])
+    minutes = parse_minutes("1,2,3")
+    reachability = bounded_dijkstra(graph, source, minutes[-1] / 60)
+    assert reachability is not None
+    assert np.all(np.diff(reachability.times) >= 0)
+    expected = nx.single_source_dijkstra_path_length(reference, source, cutoff=minutes[-1] / 60, weight="weight")
+    assert set(graph.node_ids[reachability.nodes].tolist()) == set(expected)
+
+    collection = isochrone_features(graph, reachability, minutes)
+    assert collection["type"] == "FeatureCollection"
+    assert [feature["properties"]["minutes"] for feature in collection["features"]] == minutes
+    for feature in collection["features"]:
+        inside = [node for node, hours in expected.items() if hours <= feature["properties"]["minutes"] / 60]
+        assert sorted(feature["properties"]["nodes"]) == sorted(inside)
+        polygon = shape(feature["geometry"]).buffer(1e-9)
+        assert all(polygon.contains(Point(G.nodes[node]["x"], G.nodes[node]["y"])) for node in inside)
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+from pathlib import Path
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra as all_pairs
+from typing import Callable
+
+from modules.graph import CompactGraph
+from modules.landmarks import build_landmarks, dump_landmarks, landmark_bounds, open_landmarks
+from modules.routing import (
+    EdgeWeights,
+    a_star,
+    bidirectional_a_star,
+    dijkstra,
+    time_dependent_a_star,
+    time_dependent_dijkstra,
+    travel_times,
+)
+from modules.traffic import bind_profiles, parse_departure, typical_profiles
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bounds_never_overestimate(random_graph: Callable[..., CompactGraph], seed: int) -> None:
+    graph = random_graph(seed, 50, 120)
+    times = travel_times(graph)
+    landmarks = build_landmarks(graph, times, 4)
+    n_nodes = len(graph.node_ids)
+    exact = all_pairs(csr_matrix((times, graph.targets, graph.offsets), shape=(n_nodes, n_nodes)), directed=True)
+    for node in range(n_nodes):
+        assert (landmark_bounds(landmarks, node) <= exact[:, node] + 1e-12).all()
+        assert (landmark_bounds(landmarks, node, reverse=True) <= exact[node] + 1e-12).all()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_searches_with_landmarks_match_dijkstra(random_graph: Callable[..., CompactGraph], seed: int) -> None:
+    graph = random_graph(seed, 50, 120)
+    times = travel_times(graph)
+    landmarks = build_landmarks(graph, times, 4)
+    weights = EdgeWeights(values=times, per_km=1 / landmarks.max_speed, landmarks=landmarks)
+    rng = random.Random(seed)
+    node_ids = graph.node_ids.tolist()
+    for _ in range(50):
+        source, destination = rng.choice(node_ids), rng.choice(node_ids)
+        reference = dijkstra(graph, source, destination)
+        for search in [a_star, bidirectional_a_star]:
+            result = search(graph, source, destination, weights)
+            if reference is None:
+                assert result is None
+                continue
+            assert result is not None and result.weight == pytest.approx(reference.weight, abs=1e-9)
+
+
+def test_landmarks_on_the_border(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(12)
+    landmarks = build_landmarks(graph, travel_times(graph), 4)
+    assert len(set(landmarks.nodes.tolist())) == 4
+    rows, cols = np.divmod(landmarks.nodes, 12)
+    assert np.all((rows == 0) | (rows == 11) | (cols == 0) | (cols == 11))
+
+
+def test_landmarks_bound_the_rush_hour(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(12)
+    landmarks = build_landmarks(graph, travel_times(graph), 4)
+    profiles = bind_profiles(graph, typical_profiles())
+    departure = parse_departure("2024-05-13T08:00")
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    result = time_dependent_a_star(graph, profiles, source, destination, departure, landmarks)
+    reference = time_dependent_dijkstra(graph, profiles, source, destination, departure)
+    assert result is not None and reference is not None
+    assert result.weight == pytest.approx(reference.weight)
+    assert result.iterations < reference.iterations
+
+
+def test_file_round_trip(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(5)
+    landmarks = build_landmarks(graph, travel_times(graph), 3)
+    filename = tmp_path / "landmarks.bin"
+    filename.write_bytes(dump_landmarks(landmarks))
+    stored = open_landmarks(filename.as_posix())
+    assert np.array_equal(stored.nodes, landmarks.nodes)
+    assert np.array_equal(stored.from_landmark, landmarks.from_landmark)
+    assert np.array_equal(stored.to_landmark, landmarks.to_landmark)
+    assert stored.max_speed == landmarks.max_speed == graph.maxspeed.max()
@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+from typing import Callable, List, Optional
+
+from modules.graph import CompactGraph, NodeId, edge_index
+from modules.matrix import dump_matrix, travel_matrix
+from modules.routing import dijkstra
+
+
+def test_matrix_matches_single_searches(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(12)
+    rng = random.Random(2)
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    sources: List[Optional[NodeId]] = [rng.choice(node_ids) for _ in range(6)]
+    destinations: List[Optional[NodeId]] = [rng.choice(node_ids) for _ in range(7)]
+    matrix = travel_matrix(graph, sources, destinations)
+    document = dump_matrix("grid", matrix)
+    for row, source in enumerate(sources):
+        for column, destination in enumerate(destinations):
+            assert source is not None and destination is not None
+            result = dijkstra(graph, source, destination)
+            assert result is not None
+            # Distances are summed along the fastest path, as `reconstruct_path` does.
+            hours, km, node = 0.0, 0.0, destination
+            while node != source:
+                edge = edge_index(graph, (result.path[node], node))
+                assert edge is not None
+                hours += float(graph.length[edge]) / 1000 / float(graph.maxspeed[edge])
+                km += float(graph.length[edge]) / 1000
+                node = result.path[node]
+            assert abs(matrix.times[row, column] - hours) < 1e-9
+            assert abs(matrix.distances[row, column] - km) < 1e-6
+            assert document["times"][row][column] == int(hours * 60 * 60)
+
+
+def test_unsnapped_points_give_empty_rows_and_columns(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(4)
+    first, last = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    missing = travel_matrix(graph, [None, first], [last, -1])
+    assert np.isinf(missing.times[0]).all() and np.isinf(missing.times[:, 1]).all()
+    assert np.isfinite(missing.times[1, 0])
+    document = dump_matrix("grid", missing)
+    assert document["times"][0] == [None, None]
+    assert document["distances"][1][1] is None
+    assert document["sources"] == [None, first]
@@ -0,0 +1,109 @@
+import io
+
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection
+from networkx import MultiDiGraph
+from shapely.geometry import LineString
+from typing import Callable, Set
+
+from modules.graph import CompactGraph, EdgeId, edge_mask, edge_sources
+from modules.geometry import build_edge_geometry
+from lambdas.getGraph.modules.ingestion import ingest_graph
+from lambdas.plotPath.render import (
+    ACTIVE,
+    EDGE_STYLES,
+    FULL_DPI,
+    MIN_DPI,
+    PATH,
+    UNVISITED,
+    VISITED,
+    Basemap,
+    edge_classes,
+    edge_segments,
+    render_graph,
+    search_viewport,
+    segment_bounds,
+    viewport_dpi,
+)
+
+TITLE = "Distance: 1.0 km\nTime: 1 min 0 sec"
+
+
+def edge_ids(graph: CompactGraph, edges: np.ndarray) -> Set[EdgeId]:
+    sources = graph.node_ids[edge_sources(graph)]
+    return set(zip(sources[edges].tolist(), graph.node_ids[graph.targets[edges]].tolist()))
+
+
+def test_path_edges_are_never_visited_or_active(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(4)
+    edges = np.arange(len(graph.targets))
+    visited, active = edge_mask(graph, edge_ids(graph, edges[:10])), edge_mask(graph, edge_ids(graph, edges[5:20]))
+    classes = edge_classes(graph, edge_ids(graph, edges[:3]), visited, active)
+    assert classes[:3].tolist() == [PATH] * 3
+    assert classes[3:10].tolist() == [VISITED] * 7
+    assert classes[10:20].tolist() == [ACTIVE] * 10
+    assert (classes[20:] == UNVISITED).all()
+
+
+def test_segments_follow_the_geometry(grid: Callable[[int], MultiDiGraph]) -> None:
+    G = grid(3)
+    u, v, data = next(iter(G.edges(data=True)))
+    start, end = (G.nodes[u]["x"], G.nodes[u]["y"]), (G.nodes[v]["x"], G.nodes[v]["y"])
+    data["geometry"] = LineString([start, (start[0] + 1e-4, start[1] + 1e-4), end])
+    graph = ingest_graph(G)
+    straight = edge_segments(graph, None)
+    assert isinstance(straight, np.ndarray) and straight.shape == (len(graph.targets), 2, 2)
+    bent = edge_segments(graph, build_edge_geometry(G, graph))
+    lengths = [len(segment) for segment in bent]
+    assert sorted(lengths) == [2] * (len(graph.targets) - 1) + [3]
+    edge = lengths.index(3)
+    assert np.allclose(bent[edge][[0, 2]], straight[edge])
+
+
+def test_one_collection_per_drawn_class(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(5)
+    edges = np.arange(len(graph.targets))
+    visited = edge_mask(graph, edge_ids(graph, edges[4:8]))
+    classes = edge_classes(graph, edge_ids(graph, edges[:4]), visited, edge_mask(graph, set()))
+    fig, dpi = render_graph(graph, classes, 0, len(graph.node_ids) - 1, TITLE)
+    collections = [child for child in fig.axes[0].get_children() if isinstance(child, LineCollection)]
+    assert [len(collection.get_segments()) for collection in collections] == [len(edges) - 8, 4, 4]
+    assert [collection.get_linewidth()[0] for collection in collections] == [
+        EDGE_STYLES[edge_class].linewidth for edge_class in [UNVISITED, VISITED, PATH]
+    ]
+    assert dpi == FULL_DPI
+    buffer = io.BytesIO()
+    fig.savefig(buffer, dpi=50, format="png")
+    plt.close(fig)
+    assert mpimg.imread(io.BytesIO(buffer.getvalue())).shape == (400, 400, 4)
+
+
+def test_crop_keeps_the_search(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(30)
+    edges = np.arange(len(graph.targets))
+    source = 15 * 30 + 15
+    visited = edge_mask(graph, edge_ids(graph, edges[graph.offsets[source]: graph.offsets[source + 1]]))
+    classes = edge_classes(graph, set(), visited, edge_mask(graph, set()))
+    bounds = segment_bounds(edge_segments(graph, None))
+    west, south, east, north = search_viewport(graph, classes, bounds, source, source + 1)
+    assert (bounds[classes == VISITED] >= [west, south, west, south]).all()
+    assert (bounds[classes == VISITED] <= [east, north, east, north]).all()
+    full = (graph.lon.min(), graph.lat.min(), graph.lon.max(), graph.lat.max())
+    assert MIN_DPI <= viewport_dpi((west, south, east, north), full) < FULL_DPI
+    assert viewport_dpi(full, full) == FULL_DPI
+
+    fig, dpi = render_graph(graph, classes, source, source + 1, TITLE, crop=True)
+    drawn = sum(
+        len(child.get_segments()) for child in fig.axes[0].get_children() if isinstance(child, LineCollection)
+    )
+    plt.close(fig)
+    assert dpi < FULL_DPI and len(visited.nonzero()[0]) <= drawn < len(edges)
+
+
+def test_basemap_tiles_in_a_viewport() -> None:
+    basemap = Basemap(bounds=(0.0, 0.0, 8.0, 8.0), rows=8, cols=8, load_tile=lambda row, col: np.zeros((1, 1)))
+    assert basemap.tile_bounds(0, 0) == (0.0, 7.0, 1.0, 8.0)
+    assert basemap.tiles_in((1.5, 6.5, 2.5, 7.5)) == [(0, 1), (0, 2), (1, 1), (1, 2)]
+    assert len(basemap.tiles_in((-10.0, -10.0, 20.0, 20.0))) == 64
@@ -0,0 +1,103 @@
+import pytest
+from botocore.stub import ANY, Stubber
+from typing import Iterator, Tuple
+
+from modules import results
+from modules.results import GRAPH_ID_INDEX, ResultCache, route_key
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> Iterator[Tuple[ResultCache, Stubber]]:
+    """
+    Result cache over a stubbed table, every expected call must be made.
+    """
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setattr(results.time, "time", lambda: NOW)
+    result_cache = ResultCache("results", ttl=60)
+    with Stubber(result_cache.table.meta.client) as stubber:
+        yield result_cache, stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_route_keys() -> None:
+    assert route_key("g", 1, 2, "dijkstra") == "g#1#2#dijkstra"
+    assert route_key("g", 1, 2, "dijkstra", profile="fastest") == "g#1#2#dijkstra"
+    assert route_key("g", 1, 2, "a_star", profile="shortest") == "g#1#2#a_star#shortest"
+    # Departures are hours of the week, kept by minute.
+    assert route_key("g", 1, 2, "a_star", 8.5 + 1 / 180) == "g#1#2#a_star#510"
+    assert route_key("g", 1, 2, "a_star", 8.5, "avoid_highways") == "g#1#2#a_star#avoid_highways#510"
+
+
+def test_put_sets_the_expiry(cache: Tuple[ResultCache, Stubber]) -> None:
+    result_cache, stubber = cache
+    stubber.add_response(
+        "put_item",
+        {},
+        {
+            "TableName": "results",
+            "Item": {
+                "RouteKey": "g#1#2#dijkstra#shortest#510",
+                "GraphId": "g",
+                "SolutionKey": "solution",
+                "ExpiresAt": NOW + 60,
+            },
+        },
+    )
+    result_cache.put("g", 1, 2, "dijkstra", "solution", 8.5, "shortest")
+
+
+@pytest.mark.parametrize("expires_at, expected", [(NOW + 1, "solution"), (NOW, None)])
+def test_expired_results_are_misses(
+    cache: Tuple[ResultCache, Stubber], expires_at: int, expected: str
+) -> None:
+    result_cache, stubber = cache
+    stubber.add_response(
+        "get_item",
+        {
+            "Item": {
+                "RouteKey": {"S": "g#1#2#dijkstra"},
+                "SolutionKey": {"S": "solution"},
+                "ExpiresAt": {"N": str(expires_at)},
+            }
+        },
+        {"TableName": "results", "Key": {"RouteKey": "g#1#2#dijkstra"}},
+    )
+    assert result_cache.get("g", 1, 2, "dijkstra") == expected
+
+
+def test_missing_results(cache: Tuple[ResultCache, Stubber]) -> None:
+    result_cache, stubber = cache
+    stubber.add_response("get_item", {}, {"TableName": "results", "Key": {"RouteKey": "g#1#2#bfs"}})
+    assert result_cache.get("g", 1, 2, "bfs") is None
+
+
+def test_invalidate_reads_every_page_of_the_index(cache: Tuple[ResultCache, Stubber]) -> None:
+    result_cache, stubber = cache
+    query = {
+        "TableName": "results",
+        "IndexName": GRAPH_ID_INDEX,
+        "KeyConditionExpression": ANY,
+        "ProjectionExpression": "RouteKey",
+    }
+    stubber.add_response(
+        "query",
+        {"Items": [{"RouteKey": {"S": "a"}}, {"RouteKey": {"S": "b"}}], "LastEvaluatedKey": {"RouteKey": {"S": "b"}}},
+        query,
+    )
+    stubber.add_response(
+        "query",
+        {"Items": [{"RouteKey": {"S": "c"}}]},
+        {**query, "ExclusiveStartKey": {"RouteKey": "b"}},
+    )
+    stubber.add_response(
+        "batch_write_item",
+        {"UnprocessedItems": {}},
+        {
+            "RequestItems": {
+                "results": [{"DeleteRequest": {"Key": {"RouteKey": key}}} for key in ["a", "b", "c"]]
+            }
+        },
+    )
+    assert result_cache.invalidate("g") == 3
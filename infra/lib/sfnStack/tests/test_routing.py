@@ -0,0 +1,150 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+from typing import Callable, List, Optional, Tuple
+
+from modules.graph import CompactGraph, NodeId, build_compact_graph, edge_index, edge_sources
+from modules.routing import (
+    EdgeWeights,
+    SearchResult,
+    a_star,
+    bfs,
+    bidirectional_a_star,
+    bidirectional_dijkstra,
+    build_adjacency,
+    dijkstra,
+    travel_times,
+)
+
+Search = Callable[[CompactGraph, NodeId, NodeId, Optional[EdgeWeights]], Optional[SearchResult]]
+WEIGHTED_SEARCHES: List[Search] = [dijkstra, a_star, bidirectional_dijkstra, bidirectional_a_star]
+
+
+def reference_graph(graph: CompactGraph, weights: np.ndarray) -> nx.DiGraph:
+    reference = nx.DiGraph()
+    reference.add_nodes_from(graph.node_ids.tolist())
+    sources = graph.node_ids[edge_sources(graph)].tolist()
+    targets = graph.node_ids[graph.targets].tolist()
+    for u, v, weight in zip(sources, targets, weights.tolist()):
+        reference.add_edge(u, v, weight=weight)
+    return reference
+
+
+def path_weight(
+    graph: CompactGraph, weights: np.ndarray, result: SearchResult, source: NodeId, target: NodeId
+) -> float:
+    """
+    Sum of the weights along the path of a result, which must only use edges of the graph.
+    """
+    node, weight = target, 0.0
+    while node != source:
+        edge = edge_index(graph, (result.path[node], node))
+        assert edge is not None
+        weight += float(weights[edge])
+        node = result.path[node]
+    return weight
+
+
+def all_pairs(graph: CompactGraph, seed: int, count: int) -> List[Tuple[NodeId, NodeId]]:
+    rng = random.Random(seed)
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    return [(rng.choice(node_ids), rng.choice(node_ids)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("search", WEIGHTED_SEARCHES, ids=lambda search: search.__name__)
+@pytest.mark.parametrize("seed", range(8))
+def test_weighted_searches_match_networkx(random_graph: Callable[..., CompactGraph], search: Search, seed: int) -> None:
+    graph = random_graph(seed)
+    weights = travel_times(graph)
+    reference = reference_graph(graph, weights)
+    unreachable = 0
+    for source, target in all_pairs(graph, seed, 30):
+        result = search(graph, source, target, None)
+        try:
+            expected = nx.shortest_path_length(reference, source, target, weight="weight")
+        except nx.NetworkXNoPath:
+            assert result is None
+            unreachable += 1
+            continue
+        assert result is not None
+        assert result.weight == pytest.approx(expected, abs=1e-9)
+        assert path_weight(graph, weights, result, source, target) == pytest.approx(expected, abs=1e-9)
+    # The random graphs are sparse enough to have pairs without a path.
+    if seed == 0:
+        assert unreachable > 0
+
+
+@pytest.mark.parametrize("search", WEIGHTED_SEARCHES, ids=lambda search: search.__name__)
+def test_searches_with_other_weights(random_graph: Callable[..., CompactGraph], search: Search) -> None:
+    graph = random_graph(3)
+    distances = graph.length.astype(np.float64) / 1000
+    weights = EdgeWeights(values=distances, per_km=1.0)
+    reference = reference_graph(graph, distances)
+    for source, target in all_pairs(graph, 3, 30):
+        result = search(graph, source, target, weights)
+        if not nx.has_path(reference, source, target):
+            assert result is None
+            continue
+        assert result is not None
+        assert result.weight == pytest.approx(
+            nx.shortest_path_length(reference, source, target, weight="weight"), abs=1e-9
+        )
+
+
+@pytest.mark.parametrize("search", WEIGHTED_SEARCHES + [bfs], ids=lambda search: search.__name__)
+def test_searches_with_a_cached_adjacency(random_graph: Callable[..., CompactGraph], search: Search) -> None:
+    graph = random_graph(5)
+    times = travel_times(graph)
+    cached = EdgeWeights(values=times, per_km=1 / 80, adjacency=build_adjacency(graph))
+    for source, target in all_pairs(graph, 5, 30):
+        result = search(graph, source, target, cached)
+        expected = search(graph, source, target, EdgeWeights(values=times, per_km=1 / 80))
+        if expected is None:
+            assert result is None
+            continue
+        assert result is not None
+        assert result.path == expected.path and result.weight == expected.weight
+        assert result.visited == expected.visited and result.active == expected.active
+
+
+@pytest.mark.parametrize("search", WEIGHTED_SEARCHES + [bfs], ids=lambda search: search.__name__)
+def test_source_is_the_destination(random_graph: Callable[..., CompactGraph], search: Search) -> None:
+    graph = random_graph(1)
+    node = int(graph.node_ids[0])
+    result = search(graph, node, node, None)
+    assert result is not None
+    assert result.weight == 0.0
+    assert node not in result.path
+
+
+@pytest.mark.parametrize("search", WEIGHTED_SEARCHES + [bfs], ids=lambda search: search.__name__)
+def test_isolated_and_missing_nodes(random_graph: Callable[..., CompactGraph], search: Search) -> None:
+    graph = random_graph(2)
+    with_isolated = build_compact_graph(
+        node_ids=np.append(graph.node_ids, 10**9),
+        lat=np.append(graph.lat, 52.5),
+        lon=np.append(graph.lon, 13.4),
+        sources=graph.node_ids[edge_sources(graph)],
+        targets=graph.node_ids[graph.targets],
+        length=graph.length,
+        maxspeed=graph.maxspeed,
+    )
+    source = int(graph.node_ids[0])
+    assert search(with_isolated, source, 10**9, None) is None
+    assert search(with_isolated, 10**9, source, None) is None
+    assert search(with_isolated, source, -1, None) is None
+
+
+def test_bfs_finds_the_fewest_edges(random_graph: Callable[..., CompactGraph]) -> None:
+    graph = random_graph(4)
+    reference = reference_graph(graph, np.ones(len(graph.targets)))
+    for source, target in all_pairs(graph, 4, 30):
+        result = bfs(graph, source, target, None)
+        if not nx.has_path(reference, source, target):
+            assert result is None
+            continue
+        assert result is not None
+        hops = path_weight(graph, np.ones(len(graph.targets)), result, source, target)
+        assert hops == nx.shortest_path_length(reference, source, target)
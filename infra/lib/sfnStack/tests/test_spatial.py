@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from typing import Callable
+
+from modules.geo import haversine_km
+from modules.graph import CompactGraph
+from modules.spatial import (
+    SPATIAL_INDEX_HEADER,
+    build_spatial_index,
+    dump_spatial_index,
+    load_spatial_index,
+    nearest_node,
+    snap,
+)
+
+
+def test_snap_finds_the_nearest_node(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(10)
+    index = build_spatial_index(graph)
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(graph.lat.min(), graph.lat.max(), 200)
+    lon = rng.uniform(graph.lon.min(), graph.lon.max(), 200)
+    node_ids, distances = snap(index, lat, lon)
+    all_distances = haversine_km(lat[:, None], lon[:, None], graph.lat[None, :], graph.lon[None, :]) * 1000
+    assert node_ids.tolist() == graph.node_ids[all_distances.argmin(axis=1)].tolist()
+    assert np.allclose(distances, all_distances.min(axis=1))
+    node, distance = nearest_node(index, float(graph.lat[3]), float(graph.lon[3]))
+    assert node == int(graph.node_ids[3]) and distance == pytest.approx(0, abs=1e-6)
+
+
+def test_round_trip_rebuilds_the_tree(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(8)
+    index = build_spatial_index(graph)
+    raw_index = dump_spatial_index(index)
+    loaded = load_spatial_index(raw_index)
+    assert np.array_equal(loaded.node_ids, index.node_ids)
+    assert np.array_equal(loaded.points, index.points)
+    lat, lon = graph.lat + 1e-4, graph.lon - 1e-4
+    assert np.array_equal(snap(loaded, lat, lon)[0], snap(index, lat, lon)[0])
+
+
+def test_only_spatial_indexes_load() -> None:
+    with pytest.raises(ValueError, match="Not a spatial index"):
+        load_spatial_index(b"\x80\x05" + bytes(SPATIAL_INDEX_HEADER.size))
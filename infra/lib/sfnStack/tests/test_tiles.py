@@ -0,0 +1,20 @@
+import pytest
+
+from modules.tiles import CORRIDOR_MAX_TILES, corridor_tiles, tile_bounds, tile_of
+
+
+def test_corridors_cover_both_points() -> None:
+    tiles = corridor_tiles(52.52, 13.405, 52.39, 13.06)
+    assert tile_of(52.52, 13.405) in tiles and tile_of(52.39, 13.06) in tiles
+    assert tiles == sorted(set(tiles))
+    north, south, east, west = tile_bounds(tiles[0])
+    assert north > south and east > west
+
+
+def test_long_corridors_are_refused() -> None:
+    assert len(corridor_tiles(48.0, 2.0, 48.0, 6.0)) <= CORRIDOR_MAX_TILES
+    with pytest.raises(ValueError, match="at most"):
+        corridor_tiles(48.0, 2.0, 48.0, 10.0)
+    # Halfway around the world.
+    with pytest.raises(ValueError):
+        corridor_tiles(0.0, 0.0, 0.0, 179.0)
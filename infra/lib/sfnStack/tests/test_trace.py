@@ -0,0 +1,49 @@
+import io
+
+import numpy as np
+import pytest
+import zstandard
+from typing import Callable
+
+from modules import trace
+from modules.graph import CompactGraph, edge_mask
+from modules.routing import dijkstra
+from modules.trace import ACTIVE, PATH, VISITED, dump_trace, iter_trace, load_trace
+
+
+def test_round_trip(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(12)
+    solution = dijkstra(graph, int(graph.node_ids[0]), int(graph.node_ids[-1]))
+    assert solution is not None
+    path, visited, active = load_trace(graph, io.BytesIO(dump_trace(graph, solution)))
+    assert path == solution.path
+    assert np.array_equal(visited, edge_mask(graph, solution.visited))
+    assert np.array_equal(active, edge_mask(graph, solution.active))
+
+
+def test_edges_are_split_in_chunks(
+    compact_grid: Callable[[int], CompactGraph], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(trace, "CHUNK_SIZE", 7)
+    graph = compact_grid(6)
+    solution = dijkstra(graph, int(graph.node_ids[0]), int(graph.node_ids[-1]))
+    assert solution is not None
+    batches = list(iter_trace(io.BytesIO(dump_trace(graph, solution)), len(graph.targets)))
+    assert max(len(edges) for _, edges in batches) == 7
+    kinds = [kind for kind, _ in batches]
+    assert kinds == sorted(kinds) and set(kinds) == {PATH, VISITED, ACTIVE}
+    visited = np.concatenate([edges for kind, edges in batches if kind == VISITED])
+    assert np.array_equal(np.flatnonzero(edge_mask(graph, solution.visited)), np.sort(visited))
+    path, _, _ = load_trace(graph, io.BytesIO(dump_trace(graph, solution)))
+    assert path == solution.path
+
+
+def test_rejects_other_files(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(3)
+    solution = dijkstra(graph, int(graph.node_ids[0]), int(graph.node_ids[-1]))
+    assert solution is not None
+    with pytest.raises(ValueError, match="does not match"):
+        load_trace(compact_grid(4), io.BytesIO(dump_trace(graph, solution)))
+    other = zstandard.ZstdCompressor().compress(b"XXXX" + bytes(12))
+    with pytest.raises(ValueError, match="Not a search trace"):
+        load_trace(graph, io.BytesIO(other))
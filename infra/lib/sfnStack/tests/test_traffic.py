@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from pathlib import Path
+from typing import Callable, Dict
+
+from modules.graph import CompactGraph, NodeId, edge_index
+from modules.routing import dijkstra, time_dependent_a_star, time_dependent_dijkstra
+from modules.traffic import (
+    WEEK_BUCKETS,
+    GraphProfiles,
+    SpeedProfiles,
+    bind_profiles,
+    bucket_travel_times,
+    dump_speed_profiles,
+    edge_travel_times,
+    open_speed_profiles,
+    parse_departure,
+    slot_travel_times,
+    typical_profiles,
+    with_overrides,
+)
+
+DEPARTURES = ["2024-05-13T03:00", "2024-05-13T08:00", "2024-05-13T17:30", "2024-05-18T13:00"]
+
+
+def bound(graph: CompactGraph, profiles: SpeedProfiles, tmp_path: Path) -> GraphProfiles:
+    filename = (tmp_path / "profiles.bin").as_posix()
+    with open(filename, "wb") as f:
+        f.write(dump_speed_profiles(profiles))
+    return bind_profiles(graph, open_speed_profiles(filename))
+
+
+def path_time(
+    graph: CompactGraph,
+    profiles: GraphProfiles,
+    path: Dict[NodeId, NodeId],
+    source: NodeId,
+    destination: NodeId,
+    departure: float,
+) -> float:
+    """
+    Travel time of a path driven from `source`, as plotPath sums it.
+    """
+    edges = []
+    node = destination
+    while node != source:
+        edges.append(edge_index(graph, (path[node], node)))
+        node = path[node]
+    hours = 0.0
+    for edge in reversed(edges):
+        hours += float(edge_travel_times(graph, profiles, np.array([edge], dtype=np.int64), departure + hours)[0])
+    return hours
+
+
+def test_free_flow_is_static(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(20)
+    free_flow = SpeedProfiles(
+        classes=np.full((4, WEEK_BUCKETS), 255, dtype=np.uint8),
+        override_edges=np.empty((0, 2), dtype=np.int64),
+        override_factors=np.empty((0, WEEK_BUCKETS), dtype=np.uint8),
+    )
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    static = dijkstra(graph, source, destination)
+    flat = time_dependent_dijkstra(graph, bound(graph, free_flow, tmp_path), source, destination, 8.0)
+    assert static is not None and flat is not None
+    assert flat.weight == pytest.approx(static.weight)
+
+
+@pytest.mark.parametrize("raw_departure", DEPARTURES)
+def test_a_star_matches_dijkstra(
+    compact_grid: Callable[[int], CompactGraph], tmp_path: Path, raw_departure: str
+) -> None:
+    graph = compact_grid(20)
+    profiles = bound(graph, typical_profiles(), tmp_path)
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    departure = parse_departure(raw_departure)
+    fastest = time_dependent_a_star(graph, profiles, source, destination, departure)
+    reference = time_dependent_dijkstra(graph, profiles, source, destination, departure)
+    assert fastest is not None and reference is not None
+    assert fastest.weight == pytest.approx(reference.weight)
+    assert path_time(graph, profiles, fastest.path, source, destination, departure) == pytest.approx(fastest.weight)
+
+
+def test_overrides_push_the_route_elsewhere(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(20)
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    departure = parse_departure("2024-05-13T08:00")
+    route = time_dependent_a_star(graph, bound(graph, typical_profiles(), tmp_path), source, destination, departure)
+    assert route is not None
+    blocked = (route.path[destination], destination)
+    jammed = with_overrides(typical_profiles(), {blocked: np.full(WEEK_BUCKETS, 0.01)})
+    detour = time_dependent_a_star(graph, bound(graph, jammed, tmp_path), source, destination, departure)
+    assert detour is not None and detour.path[destination] != blocked[0]
+
+
+def test_edge_times_keep_fifo(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(20)
+    profiles = bound(graph, typical_profiles(), tmp_path)
+    edges = np.arange(len(graph.targets), dtype=np.int64)
+    departures = np.arange(0, 168, 0.05)
+    arrivals = np.array([departure + edge_travel_times(graph, profiles, edges, departure) for departure in departures])
+    assert np.all(np.diff(arrivals, axis=0) >= -1e-12)
+
+
+def test_slot_times_are_computed_once(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(5)
+    profiles = bound(graph, typical_profiles(), tmp_path)
+    times = slot_travel_times(graph, profiles, 32)
+    assert np.array_equal(times, bucket_travel_times(graph, profiles, 32))
+    # The same bucket of another week is the same array.
+    assert slot_travel_times(graph, profiles, 32 + WEEK_BUCKETS) is times
+    assert slot_travel_times(graph, profiles, 33) is not times
+    other = bound(graph, typical_profiles(), tmp_path)
+    assert slot_travel_times(graph, other, 32) is not times
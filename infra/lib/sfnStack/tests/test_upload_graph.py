@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import upload_graph
+from upload_graph import CITIES_FILE, DRY_RUN_ENVIRONMENT, LocalStorage, PreparedCity, open_storage, upload_cities
+
+CITIES = [
+    {"lat": "52.5", "lon": "13.4"},
+    {"lat": "48.1", "lon": "11.6"},
+    {"lat": "53.6", "lon": "10.0"},
+    {"lat": "50.9", "lon": "6.9", "uploaded": True, "graph_id": "cologne"},
+]
+PLACES = {"52.5": "Berlin", "48.1": "Broken", "53.6": "Hamburg", "50.9": "Cologne"}
+
+
+def fake_prepare(index: int, country: str, city: str) -> PreparedCity:
+    """
+    Runs in the worker processes instead of downloading the city.
+    """
+    if city == "Broken":
+        raise ValueError("Overpass is down")
+    return PreparedCity(
+        index=index,
+        country=country,
+        city=city,
+        graph_id=city.lower(),
+        files={f"graph-{city.lower()}.bin": city.encode()},
+        boundary=None,
+        download_time=0.0,
+        convert_time=0.0,
+    )
+
+
+@pytest.fixture
+def dry_run(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Tuple[LocalStorage, Path, List[str]]:
+    """
+    Dry run storage over a copy of `CITIES`, with the places that were geocoded.
+    """
+    for name in DRY_RUN_ENVIRONMENT:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / CITIES_FILE).write_text(json.dumps(CITIES))
+    geocoded: List[str] = []
+
+    def get_place(lat: str, lon: str) -> Tuple[Optional[str], Optional[str]]:
+        geocoded.append(PLACES[lat])
+        return PLACES[lat], "Germany"
+
+    monkeypatch.setattr(upload_graph, "get_place", get_place)
+    storage, state_file = open_storage(tmp_path / "dry-run")
+    assert isinstance(storage, LocalStorage)
+    return storage, state_file, geocoded
+
+
+def test_dry_runs_stay_local(dry_run: Tuple[LocalStorage, Path, List[str]], tmp_path: Path) -> None:
+    storage, state_file, _ = dry_run
+    assert state_file == tmp_path / "dry-run" / CITIES_FILE
+    assert json.loads(state_file.read_text()) == CITIES
+    assert all(os.environ[name] == value for name, value in DRY_RUN_ENVIRONMENT.items())
+    storage.put_object("a.bin", b"a")
+    assert storage.read_object("a.bin") == b"a" and storage.read_object("b.bin") is None
+    storage.put_item({"Country": "Germany", "City": "Berlin", "GraphId": "berlin"})
+    storage.put_item({"Country": "Germany", "City": "Berlin", "GraphId": "new"})
+    assert json.loads(storage.table.read_text()) == {
+        "Germany/Berlin": {"Country": "Germany", "City": "Berlin", "GraphId": "new"}
+    }
+
+
+def test_uploads_resume_from_the_checkpoint(dry_run: Tuple[LocalStorage, Path, List[str]]) -> None:
+    storage, state_file, geocoded = dry_run
+    upload_cities(storage, state_file, workers=2, uploads=2, downloads=1, prepare=fake_prepare)
+    cities: List[Dict[str, Any]] = json.loads(state_file.read_text())
+    assert [city.get("graph_id") for city in cities] == ["berlin", None, "hamburg", "cologne"]
+    assert not cities[1].get("uploaded", False)
+    assert sorted(geocoded) == ["Berlin", "Broken", "Hamburg"]
+    assert storage.read_object("graph-berlin.bin") == b"Berlin"
+    assert storage.read_object("graph-hamburg.bin") == b"Hamburg"
+    assert sorted(json.loads(storage.table.read_text())) == ["Germany/Berlin", "Germany/Hamburg"]
+    # A second run only tries the city that failed.
+    geocoded.clear()
+    upload_cities(storage, state_file, workers=1, uploads=1, downloads=1, prepare=fake_prepare)
+    assert geocoded == ["Broken"]
+    assert json.loads(state_file.read_text()) == cities
@@ -0,0 +1,107 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+from dataclasses import replace
+from networkx import MultiDiGraph
+from pathlib import Path
+from typing import Callable
+
+from modules.graph import HIGHWAY_CLASSES, CompactGraph, NodeId, edge_index, edge_sources
+from modules.landmarks import build_landmarks
+from modules.routing import MAX_SPEED_ALLOWED, SEARCHES, SearchResult, travel_times
+from modules.weights import (
+    HIGHWAY_PENALTY,
+    HIGHWAYS,
+    ROUTING_PROFILES,
+    open_weight_column,
+    profile_weights,
+    write_weight_column,
+)
+from lambdas.getGraph.modules.ingestion import ingest_graph
+
+
+def with_highways(G: MultiDiGraph, side: int, every: int) -> CompactGraph:
+    """
+    Every `every`-th row and column of the grid is a fast motorway.
+    """
+    first = min(G.nodes)
+    for u, v, data in G.edges(data=True):
+        row_u, col_u = divmod(u - first, side)
+        row_v, col_v = divmod(v - first, side)
+        if (row_u == row_v and row_u % every == 0) or (col_u == col_v and col_u % every == 0):
+            data["highway"], data["maxspeed"] = "motorway", "120"
+    return ingest_graph(G)
+
+
+def highway_share(graph: CompactGraph, result: SearchResult, source: NodeId, destination: NodeId) -> float:
+    node, highway, length = destination, 0.0, 0.0
+    while node != source:
+        edge = edge_index(graph, (result.path[node], node))
+        assert edge is not None
+        length += float(graph.length[edge])
+        highway += float(graph.length[edge]) * (int(graph.highway[edge]) in HIGHWAYS)
+        node = result.path[node]
+    return highway / length
+
+
+def test_avoid_highways_penalizes_motorways(grid: Callable[[int], MultiDiGraph]) -> None:
+    graph = with_highways(grid(10), 10, 5)
+    assert set(graph.highway.tolist()) == {HIGHWAY_CLASSES.index(road) for road in ["motorway", "residential"]}
+    penalized = ROUTING_PROFILES["avoid_highways"].weights(graph)
+    times = travel_times(graph)
+    on_highway = np.isin(graph.highway, HIGHWAYS)
+    assert np.allclose(penalized[on_highway], times[on_highway] * HIGHWAY_PENALTY)
+    assert np.array_equal(penalized[~on_highway], times[~on_highway])
+    assert np.array_equal(ROUTING_PROFILES["shortest"].weights(graph), graph.length.astype(np.float64) / 1000)
+
+
+@pytest.mark.parametrize("profile", list(ROUTING_PROFILES))
+@pytest.mark.parametrize("with_landmarks", [False, True])
+def test_searches_match_networkx(grid: Callable[[int], MultiDiGraph], profile: str, with_landmarks: bool) -> None:
+    graph = with_highways(grid(12), 12, 4)
+    column = ROUTING_PROFILES[profile].weights(graph)
+    landmarks = build_landmarks(graph, travel_times(graph), 4) if with_landmarks else None
+    weights = profile_weights(graph, profile, column, landmarks)
+    # Landmarks bound travel times, not distances.
+    assert (weights.landmarks is not None) == (with_landmarks and ROUTING_PROFILES[profile].landmarks)
+    reference = nx.DiGraph()
+    for u, v, weight in zip(
+        graph.node_ids[edge_sources(graph)].tolist(), graph.node_ids[graph.targets].tolist(), column.tolist()
+    ):
+        reference.add_edge(u, v, weight=weight)
+    rng = random.Random(2)
+    node_ids = graph.node_ids.tolist()
+    for _ in range(20):
+        source, destination = rng.choice(node_ids), rng.choice(node_ids)
+        expected = nx.shortest_path_length(reference, source, destination, weight="weight")
+        for name in ["dijkstra", "a_star", "bidirectional_a_star"]:
+            result = SEARCHES[name](graph, source, destination, weights)
+            assert result is not None and result.weight == pytest.approx(expected, abs=1e-9), name
+
+
+def test_avoided_routes_use_fewer_highways(grid: Callable[[int], MultiDiGraph]) -> None:
+    graph = with_highways(grid(12), 12, 4)
+    source, destination = int(graph.node_ids[1]), int(graph.node_ids[12 * 12 - 2])
+    shares = {}
+    for profile in ["fastest", "avoid_highways"]:
+        weights = profile_weights(graph, profile, ROUTING_PROFILES[profile].weights(graph))
+        result = SEARCHES["dijkstra"](graph, source, destination, weights)
+        assert result is not None
+        shares[profile] = highway_share(graph, result, source, destination)
+    assert shares["avoid_highways"] < shares["fastest"]
+
+
+def test_weight_column_round_trip(compact_grid: Callable[[int], CompactGraph], tmp_path: Path) -> None:
+    graph = compact_grid(4)
+    filename = (tmp_path / "weights.npy").as_posix()
+    write_weight_column(graph, "shortest", filename)
+    assert np.array_equal(open_weight_column(filename), ROUTING_PROFILES["shortest"].weights(graph))
+
+
+def test_landmarks_without_a_speed_limit(compact_grid: Callable[[int], CompactGraph]) -> None:
+    graph = compact_grid(4)
+    landmarks = replace(build_landmarks(graph, travel_times(graph), 2), max_speed=0.0)
+    weights = profile_weights(graph, "fastest", travel_times(graph), landmarks)
+    assert weights.per_km == 1 / MAX_SPEED_ALLOWED
@@ -1,8 +1,20 @@
-from typing import Optional, Tuple, List, Dict, Union
+from typing import Optional, Tuple, List, Dict, Union, overload
+import numpy as np
+import numpy.typing as npt
 from matplotlib.axes import Axes
 from matplotlib.figure import Figure
 from networkx import MultiDiGraph
 
+# As `modules.graph.OsmGraph`, attributes are whatever the OSM tags held.
+_Graph = MultiDiGraph[int, Dict[str, object], Dict[str, object]]
+
+
+class _Settings:
+    default_crs: str
+
+
+settings: _Settings
+
 
 def graph_from_place(
     query: str | List[str] | Dict[str, str],
@@ -14,38 +26,58 @@ def graph_from_place(
     buffer_dist: Optional[float] = None,
     clean_periphery: Optional[bool] = None,
     custom_filter: Optional[str] = None,
-) -> Optional[MultiDiGraph]: ...
+) -> Optional[_Graph]: ...
 
 
 def save_graphml(
-    G: MultiDiGraph,
+    G: _Graph,
     filepath: Optional[str] = None,
     gephi: bool = False,
     encoding: str = "utf-8",
 ) -> None: ...
 
 
-def graph_from_point(center: Tuple[float, float], dist: int, network_type: str = "all_private") -> MultiDiGraph: ...
+def graph_from_bbox(
+    bbox: Tuple[float, float, float, float],
+    network_type: str = "all_private",
+    simplify: bool = True,
+    retain_all: bool = False,
+    truncate_by_edge: bool = False,
+    custom_filter: Optional[str] = None,
+) -> _Graph: ...
+
+
+def graph_from_point(center: Tuple[float, float], dist: int, network_type: str = "all_private") -> _Graph: ...
 
 
 def load_graphml(
     filepath: Optional[str] = None, graphml_str: Optional[str] = None
-) -> MultiDiGraph: ...
+) -> _Graph: ...
 
 
+@overload
 def nearest_nodes(
-    G: MultiDiGraph,
-    X: Union[List[float], float],
-    Y: Union[List[float], float],
+    G: _Graph,
+    X: float,
+    Y: float,
     return_dist: bool = False,
 ) -> int: ...
 
 
+@overload
+def nearest_nodes(
+    G: _Graph,
+    X: List[float],
+    Y: List[float],
+    return_dist: bool = False,
+) -> npt.NDArray[np.int64]: ...
+
+
 def config(use_cache: bool = True, cache_folder: str = "./cache") -> None: ...
 
 
 def plot_graph(
-    G: MultiDiGraph,
+    G: _Graph,
     node_size: Union[List[float], float] = 15.0,
     node_alpha: Optional[Union[List[float], float]] = None,
     edge_color: Union[List[str], str] = "#999999",
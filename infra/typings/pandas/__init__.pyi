@@ -0,0 +1,17 @@
+from typing import Iterator, Sequence, Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+class Series:
+    def __init__(self, data: Sequence[object], dtype: object = None) -> None: ...
+
+
+class Index:
+    def __iter__(self) -> Iterator[object]: ...
+    def __len__(self) -> int: ...
+
+
+def factorize(
+    values: Series, sort: bool = False, use_na_sentinel: bool = True
+) -> Tuple[npt.NDArray[np.intp], Index]: ...
@@ -0,0 +1,15 @@
+from typing import Tuple
+import numpy.typing as npt
+
+
+class csr_matrix:
+    def __init__(
+        self,
+        arg1: Tuple[npt.ArrayLike, npt.ArrayLike, npt.ArrayLike],
+        shape: Tuple[int, int],
+    ) -> None: ...
+    def transpose(self) -> "csc_matrix": ...
+
+
+class csc_matrix:
+    def tocsr(self) -> csr_matrix: ...
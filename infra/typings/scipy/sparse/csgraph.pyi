@@ -0,0 +1,29 @@
+from typing import Literal, Optional, Tuple, overload
+import numpy as np
+import numpy.typing as npt
+from scipy.sparse import csr_matrix
+
+
+@overload
+def dijkstra(
+    csgraph: csr_matrix,
+    directed: bool = True,
+    indices: Optional[npt.ArrayLike] = None,
+    return_predecessors: Literal[False] = False,
+    unweighted: bool = False,
+    limit: float = ...,
+    min_only: bool = False,
+) -> npt.NDArray[np.float64]: ...
+
+
+@overload
+def dijkstra(
+    csgraph: csr_matrix,
+    directed: bool = True,
+    indices: Optional[npt.ArrayLike] = None,
+    *,
+    return_predecessors: Literal[True],
+    unweighted: bool = False,
+    limit: float = ...,
+    min_only: bool = False,
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.int32]]: ...
@@ -0,0 +1,11 @@
+import numpy as np
+import numpy.typing as npt
+
+
+class QhullError(RuntimeError): ...
+
+
+class ConvexHull:
+    vertices: npt.NDArray[np.int32]
+
+    def __init__(self, points: npt.ArrayLike) -> None: ...
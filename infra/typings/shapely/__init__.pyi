@@ -0,0 +1,5 @@
+from shapely import wkt as wkt
+from shapely.geometry import BaseGeometry
+
+
+def concave_hull(geometry: BaseGeometry, ratio: float = 0.0, allow_holes: bool = False) -> BaseGeometry: ...
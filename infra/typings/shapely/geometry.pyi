@@ -0,0 +1,18 @@
+from typing import Dict, Sequence, Tuple
+import numpy.typing as npt
+
+
+class BaseGeometry:
+    @property
+    def coords(self) -> Sequence[Tuple[float, float]]: ...
+
+
+class LineString(BaseGeometry):
+    def __init__(self, coordinates: npt.ArrayLike) -> None: ...
+
+
+class MultiPoint(BaseGeometry):
+    def __init__(self, points: npt.ArrayLike) -> None: ...
+
+
+def mapping(ob: BaseGeometry) -> Dict[str, object]: ...
@@ -0,0 +1,7 @@
+from shapely.geometry import BaseGeometry
+
+
+def loads(data: str) -> BaseGeometry: ...
+
+
+def dumps(ob: BaseGeometry) -> str: ...
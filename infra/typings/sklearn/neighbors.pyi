@@ -0,0 +1,10 @@
+from typing import Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+class BallTree:
+    def __init__(self, X: npt.ArrayLike, leaf_size: int = 40, metric: str = "minkowski") -> None: ...
+    def query(
+        self, X: npt.ArrayLike, k: int = 1
+    ) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.intp]]: ...
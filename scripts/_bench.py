@@ -0,0 +1,28 @@
+"""
+Shared setup of the benchmarks, importing it puts the lambdas' modules on the path.
+
+Benchmarks only time and size things, correctness is checked by the tests
+under `infra/lib/*/tests`.
+"""
+import os
+import sys
+
+from pathlib import Path
+
+# Plots are rendered without a display, scripts import this before matplotlib.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+SFN_STACK = REPOSITORY / "infra/lib/sfnStack"
+API_LAMBDAS = REPOSITORY / "infra/lib/apiStack/lambdas"
+
+for path in [SFN_STACK, API_LAMBDAS]:
+    if path.as_posix() not in sys.path:
+        sys.path.append(path.as_posix())
+
+
+def arg(position: int, default: int) -> int:
+    """
+    Integer command line argument, the size of the benchmark.
+    """
+    return int(sys.argv[position]) if len(sys.argv) > position else default
@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+from datetime import datetime, timezone
+
+from typing import Any, Callable, Dict, List
+
+import _bench  # noqa: F401
+
+PLOT_URL = "https://example.com/plot.png"
+STAGES = ["getGraphTask", "algorithmTask", "plotPathTask"]
+
+
+class ExecutionDoesNotExist(Exception):
+    pass
+
+
+class LocalExceptions:
+    ExecutionDoesNotExist = ExecutionDoesNotExist
+
+
+class LocalStepFunctions:
+    """
+    Stand-in for the Step Functions client, every execution runs for `duration` seconds.
+    """
+
+    exceptions = LocalExceptions
+
+    def __init__(self, duration: float, execution_arn: Callable[[str], str]) -> None:
+        self.duration = duration
+        self.execution_arn = execution_arn
+        self.started: Dict[str, float] = {}
+        self.describe_calls = 0
+
+    def start_execution(self, stateMachineArn: str, input: str, name: str) -> Dict[str, str]:
+        execution_arn = self.execution_arn(name)
+        self.started[execution_arn] = time.monotonic()
+        return {"executionArn": execution_arn}
+
+    def describe_execution(self, executionArn: str) -> Dict[str, Any]:
+        if executionArn not in self.started:
+            raise ExecutionDoesNotExist(executionArn)
+        self.describe_calls += 1
+        elapsed = time.monotonic() - self.started[executionArn]
+        description: Dict[str, Any] = {"status": "RUNNING", "startDate": datetime.now(timezone.utc)}
+        if elapsed >= self.duration:
+            description.update(
+                status="SUCCEEDED",
+                stopDate=datetime.now(timezone.utc),
+                output=json.dumps({"body": json.dumps({"url": PLOT_URL})}),
+            )
+        return description
+
+    def get_execution_history(self, executionArn: str, reverseOrder: bool, maxResults: int) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started[executionArn]
+        entered = STAGES[: min(len(STAGES), int(elapsed / self.duration * len(STAGES)) + 1)]
+        events: List[Dict[str, Any]] = [{"stateEnteredEventDetails": {"name": name}} for name in entered]
+        return {"events": events[::-1] if reverseOrder else events}
+
+
+def legacy_wait(client: LocalStepFunctions, execution_arn: str) -> None:
+    """
+    What the API did before, one poll every 3 seconds.
+    """
+    while client.describe_execution(executionArn=execution_arn)["status"] not in ["SUCCEEDED", "FAILED", "TIMED_OUT"]:
+        time.sleep(3)
+
+
+def main() -> None:
+    # The API lambda reads its state machine on import, executions stay local here.
+    os.environ.setdefault("GRAPHS_STATE_MACHINE_ARN", "arn:aws:states:us-east-1:000000000000:stateMachine:graphs")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    import lambda_function as api
+
+    query = {"source": "a", "dest": "b"}
+    for duration in [0.3, 1.0, 2.5, 4.0]:
+        client = LocalStepFunctions(duration, api.execution_arn)
+        api.sfn_client = client
+
+        start = time.monotonic()
+        legacy_wait(client, client.start_execution("", "", "0" * 32)["executionArn"])
+        legacy_time = time.monotonic() - start
+
+        client.describe_calls = 0
+        start = time.monotonic()
+        result = api.lambda_handler({"rawPath": "/", "queryStringParameters": query}, {})
+        adaptive_time = time.monotonic() - start
+        print(
+            f"Job of {duration:.1f} s: legacy {legacy_time:5.2f} s, "
+            f"adaptive {adaptive_time:5.2f} s with {client.describe_calls} polls, answered {result['statusCode']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
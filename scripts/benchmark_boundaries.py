@@ -0,0 +1,58 @@
+import random
+import time
+
+from typing import Dict
+
+from _bench import arg
+
+from modules.boundaries import (
+    CityBoundary,
+    build_boundary,
+    dump_boundaries,
+    find_boundary,
+    load_boundaries,
+)
+from modules.graph import compact_graph_from_multidigraph
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 300)
+    cities = arg(2, 500)
+    points = 10_000
+    graph = compact_graph_from_multidigraph(synthetic_multidigraph(side), max_speed)
+
+    start = time.perf_counter()
+    boundary = build_boundary("Germany", "Berlin", "0", graph)
+    assert boundary is not None
+    print(f"Hull of {len(graph.node_ids)} nodes: {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    # Same city shifted along a row of disjoint squares.
+    width = (side - 1) * 1e-3
+    boundaries: Dict[str, CityBoundary] = {}
+    for city in range(cities):
+        hull = boundary.hull.copy()
+        hull[:, 1] += city * 2 * width
+        boundaries[str(city)] = CityBoundary("Germany", f"City {city}", str(city), hull)
+
+    raw_boundaries = dump_boundaries(boundaries)
+    start = time.perf_counter()
+    boundaries = load_boundaries(raw_boundaries)
+    load_time = time.perf_counter() - start
+    print(f"{cities} cities: {len(raw_boundaries) / 2**10:.1f} KiB, load {load_time * 1000:.2f} ms")
+
+    random.seed(3)
+    queries = [
+        (random.uniform(52.5, 52.5 + width), random.uniform(13.4, 13.4 + 2 * cities * width))
+        for _ in range(points)
+    ]
+    start = time.perf_counter()
+    found = [find_boundary(boundaries, lat, lon) for lat, lon in queries]
+    lookup_time = time.perf_counter() - start
+    inside = sum(city is not None for city in found)
+    print(f"Lookup: {lookup_time / points * 1e6:8.2f} us per point, {inside} of {points} inside a city")
+
+
+if __name__ == "__main__":
+    main()
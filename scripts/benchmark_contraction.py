@@ -0,0 +1,53 @@
+import random
+import time
+
+from typing import List, Tuple
+
+from _bench import arg
+
+from modules.graph import NodeId, compact_graph_from_multidigraph
+from modules.routing import bidirectional_dijkstra
+from modules.contraction import (
+    build_hierarchy,
+    dump_hierarchy,
+    load_hierarchy,
+    query_hierarchy,
+)
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 100)
+    queries = arg(2, 50)
+    graph = compact_graph_from_multidigraph(synthetic_multidigraph(side), max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    start = time.perf_counter()
+    hierarchy = load_hierarchy(dump_hierarchy(build_hierarchy(graph)))
+    print(f"Preprocessing: {time.perf_counter() - start:8.2f} s")
+    shortcuts = len(hierarchy.up_targets) + len(hierarchy.down_targets) - len(graph.targets)
+    print(f"Shortcuts:     {shortcuts:8d}")
+
+    random.seed(1)
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    pairs: List[Tuple[NodeId, NodeId]] = [
+        (random.choice(node_ids), random.choice(node_ids)) for _ in range(queries)
+    ]
+
+    dijkstra_time, hierarchy_time = 0.0, 0.0
+    for source, destination in pairs:
+        start = time.perf_counter()
+        bidirectional_dijkstra(graph, source, destination)
+        dijkstra_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        query_hierarchy(hierarchy, graph, source, destination)
+        hierarchy_time += time.perf_counter() - start
+
+    print(f"Bidirectional Dijkstra: {dijkstra_time / len(pairs) * 1000:8.2f} ms/query")
+    print(f"Contraction hierarchy:  {hierarchy_time / len(pairs) * 1000:8.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import json
+import random
+import time
+
+from networkx import MultiDiGraph
+from shapely.geometry import LineString
+
+from _bench import arg
+
+from modules.delta import apply_deltas, diff_graphs, dump_delta, load_delta
+from modules.geometry import build_edge_geometry, dump_edge_geometry
+from modules.graph import compact_graph_from_multidigraph, dump_compact_graph, dump_graph_json
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def add_geometry(G: MultiDiGraph, share: float) -> None:
+    """
+    Gives a bent geometry to a share of the edges, as osmnx does for curved roads.
+    """
+    for u, v, data in G.edges(data=True):
+        if random.random() < share:
+            x0, y0, x1, y1 = G.nodes[u]["x"], G.nodes[u]["y"], G.nodes[v]["x"], G.nodes[v]["y"]
+            data["geometry"] = LineString([(x0, y0), ((x0 + x1) / 2 + 1e-5, (y0 + y1) / 2), (x1, y1)])
+
+
+def edit(G: MultiDiGraph, changes: int) -> MultiDiGraph:
+    """
+    What a week of OpenStreetMap edits looks like, a few roads closed, opened or retagged.
+    """
+    G = G.copy()
+    edges = list(G.edges(keys=True, data=True))
+    for u, v, key, _ in random.sample(edges, changes):
+        if G.has_edge(u, v, key):
+            G.remove_edge(u, v, key)
+    for u, v, key, data in random.sample(edges, changes):
+        if G.has_edge(u, v, key):
+            G.edges[u, v, key]["maxspeed"] = "30" if data["maxspeed"] != "30" else "50"
+    nodes = list(G.nodes)
+    for node in random.sample(nodes, changes // 10):
+        G.nodes[node]["y"] += 1e-5
+    for index in range(changes // 10):
+        new_node = 10**9 + index
+        u, v = random.sample(nodes, 2)
+        G.add_node(new_node, x=(G.nodes[u]["x"] + G.nodes[v]["x"]) / 2, y=(G.nodes[u]["y"] + G.nodes[v]["y"]) / 2)
+        for a, b in [(u, new_node), (new_node, u), (new_node, v), (v, new_node)]:
+            G.add_edge(a, b, length=80.0, maxspeed="50")
+    for node in random.sample(nodes, changes // 10):
+        G.remove_node(node)
+    return G
+
+
+def main() -> None:
+    side = arg(1, 200)
+    changes = arg(2, 200)
+    versions = arg(3, 3)
+    random.seed(3)
+    G = synthetic_multidigraph(side)
+    add_geometry(G, 0.2)
+    base = compact_graph_from_multidigraph(G, max_speed)
+    base_geometry = build_edge_geometry(G, base)
+    nodes, edges = dump_graph_json(base)
+    full_bytes = (
+        len(dump_compact_graph(base))
+        + len(json.dumps(nodes))
+        + len(json.dumps(edges))
+        + len(dump_edge_geometry(base_geometry))
+    )
+    print(f"Graph with {len(base.node_ids)} nodes and {len(base.targets)} edges, {full_bytes / 2**20:.1f} MiB stored")
+
+    deltas = []
+    current, current_graph, current_geometry = G, base, base_geometry
+    for version in range(1, versions + 1):
+        current = edit(current, changes)
+        add_geometry(current, 0.01)
+        new = compact_graph_from_multidigraph(current, max_speed)
+        new_geometry = build_edge_geometry(current, new)
+
+        start = time.perf_counter()
+        delta = diff_graphs(current_graph, new, version, new_geometry, current_geometry)
+        raw_delta = dump_delta(delta)
+        diff_time = time.perf_counter() - start
+        deltas.append(load_delta(raw_delta))
+
+        start = time.perf_counter()
+        apply_deltas(base, deltas, base_geometry)
+        compose_time = time.perf_counter() - start
+        print(
+            f"Version {version}: {len(delta)} changes in {len(raw_delta) / 2**10:.1f} KiB "
+            f"({len(raw_delta) / full_bytes:.2%} of a full upload), diff {diff_time * 1000:.0f} ms, "
+            f"compose {len(deltas)} deltas {compose_time * 1000:.0f} ms"
+        )
+        current_graph, current_geometry = new, new_geometry
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import math
+import time
+
+import numpy as np
+from haversine import Unit, haversine, haversine_vector
+
+from _bench import arg
+
+from modules.geo import bounding_box, equirectangular_km, haversine_km, initial_bearing
+
+
+def degrees_haversine(source_lat: float, source_lon: float, destination_lat: float, destination_lon: float) -> float:
+    """
+    The scalar haversine getGraph used before, it took degrees as radians.
+    """
+    delta_lat = destination_lat - source_lat
+    delta_lon = destination_lon - source_lon
+    dist = (
+        math.sin(delta_lat / 2) ** 2
+        + math.cos(source_lat) * math.cos(destination_lat) * math.sin(delta_lon / 2) ** 2
+    )
+    return 6371.0088 * 2 * math.asin(math.sqrt(dist))
+
+
+def main() -> None:
+    pairs = arg(1, 1_000_000)
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-89, 89, pairs), rng.uniform(-89, 89, pairs)
+    lon1, lon2 = rng.uniform(-180, 180, pairs), rng.uniform(-180, 180, pairs)
+
+    start = time.perf_counter()
+    distances = haversine_km(lat1, lon1, lat2, lon2)
+    vectorized_time = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = haversine_vector(np.column_stack([lat1, lon1]), np.column_stack([lat2, lon2]), Unit.KILOMETERS)
+    package_time = time.perf_counter() - start
+    sample = 10_000
+    start = time.perf_counter()
+    for i in range(sample):
+        haversine((lat1[i], lon1[i]), (lat2[i], lon2[i]), Unit.KILOMETERS)
+    scalar_time = (time.perf_counter() - start) * pairs / sample
+    print(
+        f"haversine_km of {pairs} pairs: {vectorized_time * 1000:.0f} ms, haversine_vector "
+        f"{package_time * 1000:.0f} ms, scalar haversine {scalar_time * 1000:.0f} ms, "
+        f"largest difference {np.abs(distances - expected).max():.1e} km"
+    )
+
+    # Berlin to Paris, the degrees were taken as radians before.
+    berlin, paris = (52.52, 13.405), (48.8566, 2.3522)
+    print(
+        f"Berlin to Paris: {float(haversine_km(*berlin, *paris)):.1f} km, haversine "
+        f"{haversine(berlin, paris):.1f} km, before {degrees_haversine(*berlin, *paris):.1f} km"
+    )
+
+    # Points a few km apart, as in a city.
+    near_lat = lat1 + rng.uniform(-0.05, 0.05, pairs)
+    near_lon = lon1 + rng.uniform(-0.05, 0.05, pairs)
+    start = time.perf_counter()
+    approximations = equirectangular_km(lat1, lon1, near_lat, near_lon)
+    approximation_time = time.perf_counter() - start
+    exact = haversine_km(lat1, lon1, near_lat, near_lon)
+    error = np.abs(approximations - exact) / np.maximum(exact, 1e-9)
+    print(
+        f"equirectangular_km of {pairs} city pairs: {approximation_time * 1000:.0f} ms, "
+        f"relative error {np.median(error):.1e} median, {error.max():.1e} max"
+    )
+
+    start = time.perf_counter()
+    initial_bearing(lat1, lon1, lat2, lon2)
+    bearing_time = time.perf_counter() - start
+    print(f"initial_bearing of {pairs} pairs: {bearing_time * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    for i in range(0, pairs, 1000):
+        bounding_box(near_lat[i:i + 1000], near_lon[i:i + 1000], 5.0)
+    box_time = time.perf_counter() - start
+    print(f"bounding_box of {pairs // 1000} groups of 1000 points: {box_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
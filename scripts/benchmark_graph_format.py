@@ -0,0 +1,90 @@
+import json
+import random
+import time
+
+
+from typing import Dict, List
+
+from _bench import arg
+
+from modules.graph import (
+    Graph,
+    Node,
+    Edge,
+    NodeId,
+    EdgeId,
+    compact_graph,
+    dump_compact_graph,
+    load_compact_graph,
+    dump_graph_json,
+    load_graph_json,
+)
+
+
+def grid_graph(side: int) -> Graph:
+    """
+    Builds a bidirectional grid road network with `side * side` nodes.
+
+    Args:
+        side: Number of nodes in each row and column.
+
+    Returns:
+        A graph with random lengths and speeds, ids similar to OSM ones.
+    """
+    random.seed(0)
+    nodes: Dict[NodeId, Node] = dict()
+    edges: Dict[EdgeId, Edge] = dict()
+    base_id = 25_000_000
+    for row in range(side):
+        for col in range(side):
+            node_id = base_id + row * side + col
+            nodes[node_id] = Node(
+                id=node_id,
+                next_nodes=[],
+                lat=52.5 + row * 1e-3,
+                lon=13.4 + col * 1e-3,
+            )
+    for row in range(side):
+        for col in range(side):
+            u = base_id + row * side + col
+            neighbours: List[NodeId] = []
+            if row + 1 < side:
+                neighbours.append(u + side)
+            if col + 1 < side:
+                neighbours.append(u + 1)
+            for v in neighbours:
+                length = round(random.uniform(20, 200), 3)
+                maxspeed = random.choice([30, 50, 70])
+                for edge_id in [(u, v), (v, u)]:
+                    edges[edge_id] = Edge(id=edge_id, length=length, maxspeed=maxspeed)
+                    nodes[edge_id[0]].next_nodes.append(edge_id[1])
+    return Graph(nodes=nodes, edges=edges)
+
+
+def main() -> None:
+    side = arg(1, 300)
+    graph = grid_graph(side)
+    print(f"Graph with {len(graph.nodes)} nodes and {len(graph.edges)} edges")
+
+    nodes, edges = dump_graph_json(compact_graph(graph))
+    raw_nodes, raw_edges = json.dumps(nodes), json.dumps(edges)
+    raw_graph = dump_compact_graph(compact_graph(graph))
+
+    json_size = len(raw_nodes) + len(raw_edges)
+    print(f"JSON size:   {json_size / 2**20:8.2f} MiB")
+    print(f"Binary size: {len(raw_graph) / 2**20:8.2f} MiB")
+
+    start = time.perf_counter()
+    load_graph_json(json.loads(raw_nodes), json.loads(raw_edges))
+    json_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_compact_graph(raw_graph)
+    binary_time = time.perf_counter() - start
+
+    print(f"JSON load:   {json_time * 1000:8.2f} ms")
+    print(f"Binary load: {binary_time * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import math
+import random
+import time
+import tracemalloc
+
+from networkx import MultiDiGraph
+
+from typing import Callable, Dict, List, Tuple, TypeVar, cast
+
+from _bench import arg
+
+from modules.graph import (
+    Graph,
+    Node,
+    Edge,
+    NodeId,
+    EdgeId,
+    EdgeData,
+    compact_graph_from_multidigraph,
+    graph_nbytes,
+)
+
+T = TypeVar("T")
+
+
+def synthetic_multidigraph(side: int) -> MultiDiGraph:
+    """
+    Builds a bidirectional grid as osmnx would return it.
+
+    Args:
+        side: Number of nodes in each row and column, 500 gives ~1M edges.
+
+    Returns:
+        A MultiDiGraph with `x`, `y`, `length` and `maxspeed` attributes.
+    """
+    random.seed(0)
+    G = MultiDiGraph()
+    base_id = 25_000_000
+    for row in range(side):
+        for col in range(side):
+            G.add_node(base_id + row * side + col, y=52.5 + row * 1e-3, x=13.4 + col * 1e-3)
+    for row in range(side):
+        for col in range(side):
+            u = base_id + row * side + col
+            for v in [u + side if row + 1 < side else None, u + 1 if col + 1 < side else None]:
+                if v is None:
+                    continue
+                # Roads are never shorter than the straight line between nodes.
+                straight = 111_195 * (1e-3 if v == u + side else 1e-3 * math.cos(math.radians(52.5)))
+                length = straight * random.uniform(1.01, 1.6)
+                maxspeed = random.choice(["30", "50", ["50", "70"]])
+                G.add_edge(u, v, length=length, maxspeed=maxspeed)
+                G.add_edge(v, u, length=length, maxspeed=maxspeed)
+    return G
+
+
+def max_speed(edge: EdgeData) -> int:
+    max_speeds = edge["maxspeed"]
+    if isinstance(max_speeds, list):
+        return min(int(speed) for speed in max_speeds)
+    return int(max_speeds)
+
+
+def legacy_graph(
+    graph: MultiDiGraph, edge_max_speed: Callable[[EdgeData], int] = max_speed
+) -> Graph:
+    all_edges: Dict[EdgeId, Edge] = dict()
+    to_node_by_node: Dict[NodeId, List[NodeId]] = dict()
+    for edge in cast(List[Tuple[NodeId, NodeId, float]], graph.edges):
+        u, v, _ = edge
+        current_edge: EdgeData = graph.edges[edge]
+        all_edges[(u, v)] = Edge(
+            id=(u, v),
+            length=cast(float, current_edge["length"]),
+            maxspeed=edge_max_speed(current_edge),
+        )
+        to_node_by_node.setdefault(u, []).append(v)
+    all_nodes: Dict[NodeId, Node] = {
+        node: Node(
+            id=node,
+            next_nodes=to_node_by_node.get(node, []),
+            lat=graph.nodes[node]["y"],
+            lon=graph.nodes[node]["x"],
+        )
+        for node in cast(List[NodeId], graph.nodes)
+    }
+    return Graph(nodes=all_nodes, edges=all_edges)
+
+
+def measure(build: Callable[[], T]) -> Tuple[T, float, int]:
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+
+def main() -> None:
+    side = arg(1, 500)
+    G = synthetic_multidigraph(side)
+    print(f"Graph with {len(G.nodes)} nodes and {len(G.edges)} edges")
+
+    _, legacy_time, legacy_size = measure(lambda: legacy_graph(G))
+    graph, compact_time, compact_size = measure(
+        lambda: compact_graph_from_multidigraph(G, max_speed)
+    )
+
+    print(f"Graph:        build {legacy_time:6.2f} s, retained {legacy_size / 2**20:8.1f} MiB")
+    print(f"CompactGraph: build {compact_time:6.2f} s, retained {compact_size / 2**20:8.1f} MiB")
+    print(f"CompactGraph columns: {graph_nbytes(graph) / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
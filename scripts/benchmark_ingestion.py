@@ -0,0 +1,79 @@
+import random
+import time
+
+from networkx import MultiDiGraph
+
+from typing import List
+
+from _bench import arg
+
+from modules.graph import EdgeData, compact_graph_from_multidigraph
+from lambdas.getGraph.modules.ingestion import ingest_graph
+
+from benchmark_graph_model import synthetic_multidigraph, legacy_graph
+
+MAX_SPEED_TAGS: List[List[str] | str] = [
+    "30",
+    "50",
+    "70",
+    ["50", "70"],
+    "30 mph",
+    "RU:urban",
+    "DE:zone30",
+    "signals",
+]
+
+
+def legacy_max_speed(edge: EdgeData, min_max_speed_allowed: int = 30) -> int:
+    max_speed = min_max_speed_allowed
+    if "maxspeed" in edge:
+        max_speeds = edge["maxspeed"]
+        if isinstance(max_speeds, list):
+            speeds: List[int] = [
+                int(speed) for speed in max_speeds if speed and speed.isnumeric()
+            ]
+            if len(speeds) > 0:
+                max_speed = min(speeds)
+        elif isinstance(max_speeds, str) and max_speeds.isnumeric():
+            max_speed = int(max_speeds)
+        elif isinstance(max_speeds, int):
+            max_speed = max_speeds
+    return max_speed
+
+
+def osm_like_multidigraph(side: int) -> MultiDiGraph:
+    random.seed(0)
+    G = synthetic_multidigraph(side)
+    G.graph["crs"] = "epsg:4326"
+    for _, _, data in G.edges(data=True):
+        if random.random() < 0.4:
+            del data["maxspeed"]
+        else:
+            data["maxspeed"] = random.choice(MAX_SPEED_TAGS)
+    return G
+
+
+def main() -> None:
+    side = arg(1, 500)
+    G = osm_like_multidigraph(side)
+    print(f"Graph with {len(G.nodes)} nodes and {len(G.edges)} edges")
+
+    start = time.perf_counter()
+    legacy_graph(G, legacy_max_speed)
+    graph_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compact_graph_from_multidigraph(G, legacy_max_speed)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ingest_graph(G)
+    ingest_time = time.perf_counter() - start
+
+    print(f"Graph loop:    {graph_time:6.2f} s")
+    print(f"Per-edge loop: {legacy_time:6.2f} s")
+    print(f"Batched:       {ingest_time:6.2f} s ({graph_time / ingest_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import time
+
+from _bench import arg
+
+from modules.graph import compact_graph_from_multidigraph
+from modules.isochrone import isochrone_features, parse_minutes
+from modules.routing import bounded_dijkstra, dijkstra
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 400)
+    G = synthetic_multidigraph(side)
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    source = int(graph.node_ids[len(graph.node_ids) // 2 + side // 2])
+    for raw_minutes in ["5", "5,10,15", "30"]:
+        minutes = parse_minutes(raw_minutes)
+        start = time.perf_counter()
+        reachability = bounded_dijkstra(graph, source, minutes[-1] / 60)
+        assert reachability is not None
+        search_time = time.perf_counter() - start
+        features = isochrone_features(graph, reachability, minutes)
+        total_time = time.perf_counter() - start
+        areas = ", ".join(
+            f"{feature['properties']['minutes']:g} min {len(feature['properties']['nodes'])} nodes"
+            for feature in features["features"]
+        )
+        print(
+            f"Budgets {raw_minutes:8}: search {search_time * 1000:7.1f} ms, "
+            f"with polygons {total_time * 1000:7.1f} ms ({areas})"
+        )
+
+    # An unbounded search settles the whole graph before reaching a far corner.
+    start = time.perf_counter()
+    dijkstra(graph, source, int(graph.node_ids[-1]))
+    print(f"Unbounded Dijkstra to the corner: {(time.perf_counter() - start) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import random
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from _bench import arg
+
+from modules.graph import NodeId, compact_graph_from_multidigraph
+from modules.landmarks import build_landmarks, dump_landmarks, open_landmarks
+from modules.routing import (
+    MAX_SPEED_ALLOWED,
+    EdgeWeights,
+    a_star,
+    bidirectional_a_star,
+    dijkstra,
+    time_dependent_a_star,
+    travel_times,
+)
+from modules.traffic import bind_profiles, parse_departure, typical_profiles
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 200)
+    queries = arg(2, 20)
+    G = synthetic_multidigraph(side)
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    times = travel_times(graph)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    start = time.perf_counter()
+    landmarks = build_landmarks(graph, times)
+    build_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        filename = f"{directory}/landmarks.bin"
+        with open(filename, "wb") as f:
+            f.write(dump_landmarks(landmarks))
+        start = time.perf_counter()
+        stored = open_landmarks(filename)
+        open_time = time.perf_counter() - start
+        print(
+            f"{len(landmarks.nodes)} landmarks in {build_time:.2f} s, "
+            f"{Path(filename).stat().st_size / 2**20:.1f} MiB, "
+            f"opened in {open_time * 1000:.2f} ms, max speed {stored.max_speed:.0f} km/h"
+        )
+
+    heuristics: Dict[str, EdgeWeights] = {
+        f"{MAX_SPEED_ALLOWED:.0f} km/h": EdgeWeights(values=times, per_km=1 / MAX_SPEED_ALLOWED),
+        f"{landmarks.max_speed:.0f} km/h": EdgeWeights(values=times, per_km=1 / landmarks.max_speed),
+        "landmarks": EdgeWeights(values=times, per_km=1 / landmarks.max_speed, landmarks=landmarks),
+    }
+    random.seed(3)
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    pairs: List[Tuple[NodeId, NodeId]] = [
+        (random.choice(node_ids), random.choice(node_ids)) for _ in range(queries)
+    ]
+    references = [dijkstra(graph, source, destination) for source, destination in pairs]
+    dijkstra_edges = sum(reference.iterations for reference in references if reference is not None)
+    print(f"{'dijkstra':30} {dijkstra_edges / len(pairs):9.0f} visited edges")
+    for search in [a_star, bidirectional_a_star]:
+        for name, weights in heuristics.items():
+            visited, elapsed = 0, 0.0
+            for source, destination in pairs:
+                start = time.perf_counter()
+                result = search(graph, source, destination, weights)
+                elapsed += time.perf_counter() - start
+                visited += result.iterations if result is not None else 0
+            print(
+                f"{search.__name__ + ' ' + name:30} {visited / len(pairs):9.0f} visited edges "
+                f"({visited / dijkstra_edges:5.1%} of Dijkstra), {elapsed / len(pairs) * 1000:6.1f} ms"
+            )
+
+    # Traffic only slows edges down, the free flow landmarks still bound the rush hour.
+    profiles = bind_profiles(graph, typical_profiles())
+    departure = parse_departure("2024-05-13T08:00")
+    for name, search_landmarks in [("max speed", None), ("landmarks", landmarks)]:
+        visited, elapsed = 0, 0.0
+        for source, destination in pairs[:5]:
+            start = time.perf_counter()
+            result = time_dependent_a_star(graph, profiles, source, destination, departure, search_landmarks)
+            elapsed += time.perf_counter() - start
+            visited += result.iterations if result is not None else 0
+        print(
+            f"{'time dependent ' + name:30} {visited / 5:9.0f} visited edges, {elapsed / 5 * 1000:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
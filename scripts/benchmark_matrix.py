@@ -0,0 +1,69 @@
+import random
+import time
+
+from typing import List, Optional, Tuple
+
+from _bench import arg
+
+from modules.graph import CompactGraph, NodeId, compact_graph_from_multidigraph, edge_index
+from modules.matrix import dump_matrix, travel_matrix
+from modules.routing import dijkstra
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def single_route(
+    graph: CompactGraph, source: NodeId, destination: NodeId
+) -> Optional[Tuple[float, float]]:
+    """
+    One request as it runs today, a Dijkstra search and the walk of `reconstruct_path`.
+    """
+    result = dijkstra(graph, source, destination)
+    if result is None:
+        return None
+    dist, hours, node = 0.0, 0.0, destination
+    while node != source:
+        previous = result.path[node]
+        edge = edge_index(graph, (previous, node))
+        assert edge is not None
+        length = float(graph.length[edge])
+        dist += length / 1000
+        hours += (length / 1000) / float(graph.maxspeed[edge])
+        node = previous
+    return hours, dist
+
+
+def main() -> None:
+    side = arg(1, 150)
+    size = arg(2, 100)
+    samples = arg(3, 50)
+    G = synthetic_multidigraph(side)
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    random.seed(2)
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    sources: List[Optional[NodeId]] = [random.choice(node_ids) for _ in range(size)]
+    destinations: List[Optional[NodeId]] = [random.choice(node_ids) for _ in range(size)]
+
+    start = time.perf_counter()
+    matrix = travel_matrix(graph, sources, destinations)
+    dump_matrix("benchmark", matrix)
+    batch_time = time.perf_counter() - start
+    print(f"Batch {size}x{size}: {batch_time:.2f} s")
+
+    # Every single request would be its own search, only a sample is run.
+    pairs = [(random.randrange(size), random.randrange(size)) for _ in range(samples)]
+    start = time.perf_counter()
+    for row, column in pairs:
+        single_route(graph, sources[row], destinations[column])  # type: ignore
+    single_time = (time.perf_counter() - start) / samples
+    print(
+        f"Single requests: {single_time * 1000:.1f} ms each, "
+        f"{single_time * size * size:.0f} s for {size * size} (searches only, "
+        f"no Step Functions or plots), {single_time * size * size / batch_time:.0f}x the batch"
+    )
+
+
+if __name__ == "__main__":
+    main()
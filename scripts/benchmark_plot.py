@@ -0,0 +1,195 @@
+import io
+import multiprocessing
+import random
+import resource
+import time
+
+from _bench import arg
+
+import matplotlib.pyplot as plt
+import matplotlib.image as mpimg
+import numpy as np
+import osmnx as ox
+from pathlib import Path
+from shapely.geometry import LineString
+
+from typing import Dict, List, Set, Tuple
+
+from modules.graph import (
+    EdgeId,
+    NodeId,
+    compact_graph_from_multidigraph,
+    dump_compact_graph,
+    edge_mask,
+    edge_sources,
+    open_compact_graph,
+)
+from modules.geometry import (
+    build_edge_geometry,
+    dump_edge_geometry,
+    open_edge_geometry,
+)
+from modules.plot import (
+    POINT_ALPHA,
+    POINT_SIZE,
+    NODE_ALPHA,
+    NODE_SIZE,
+    PathEdge,
+    UnvisitedEdge,
+    ActiveEdge,
+    VisitedEdge,
+)
+from lambdas.plotPath.render import edge_classes, render_graph
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+DIRECTORY = Path("/tmp/benchmark_plot")
+TITLE = "Distance: 1.0 km\nTime: 1 min 0 sec"
+
+
+def search_edges(edge_ids: List[EdgeId]) -> Tuple[Set[EdgeId], Set[EdgeId], Set[EdgeId]]:
+    random.seed(3)
+    sample = random.sample(edge_ids, len(edge_ids) // 4)
+    path = set(sample[:50])
+    visited = set(sample[50: len(sample) // 2])
+    active = set(sample[len(sample) // 2:])
+    return path, visited, active
+
+
+def legacy_plot(
+    source: NodeId, destination: NodeId, edges: Tuple[Set[EdgeId], Set[EdgeId], Set[EdgeId]]
+) -> bytes:
+    """
+    Previous `save_graph`, parsing the GraphML and styling every edge in Python.
+    """
+    edges_in_path, visited, active = edges
+    graph = ox.load_graphml((DIRECTORY / "graph.graphml").as_posix())
+    node_size: List[float] = []
+    node_alpha: List[float] = []
+    node_color: List[str] = []
+    for node in graph.nodes:
+        if node in (source, destination):
+            node_size.append(POINT_SIZE)
+            node_alpha.append(POINT_ALPHA)
+            node_color.append("blue" if node == source else "red")
+        else:
+            node_size.append(NODE_SIZE)
+            node_alpha.append(NODE_ALPHA)
+            node_color.append("white")
+    edge_alpha: List[float] = []
+    edge_color: List[object] = []
+    edge_linewidth: List[float] = []
+    for edge in graph.edges:
+        edge_id = (edge[0], edge[1])
+        style = (
+            PathEdge
+            if edge_id in edges_in_path
+            else VisitedEdge
+            if edge_id in visited
+            else ActiveEdge
+            if edge_id in active
+            else UnvisitedEdge
+        )
+        edge_color.append(style.color)
+        edge_alpha.append(style.alpha)
+        edge_linewidth.append(style.linewidth)
+    fig, ax = ox.plot_graph(
+        graph,
+        node_size=node_size,
+        node_alpha=node_alpha,
+        edge_color=edge_color,
+        edge_alpha=edge_alpha,
+        edge_linewidth=edge_linewidth,
+        node_color=node_color,
+        bgcolor="#000000",
+        show=False,
+        close=False,
+    )
+    ax.set_title(TITLE, color="#3b528b", fontsize=10)
+    buffer = io.BytesIO()
+    plt.savefig(buffer, dpi=300, format="png")
+    plt.close()
+    return buffer.getvalue()
+
+
+def compact_plot(
+    source: NodeId, destination: NodeId, edges: Tuple[Set[EdgeId], Set[EdgeId], Set[EdgeId]]
+) -> bytes:
+    graph = open_compact_graph((DIRECTORY / "graph.bin").as_posix())
+    geometry = open_edge_geometry((DIRECTORY / "geometry.bin").as_posix())
+    source_index = int(np.searchsorted(graph.node_ids, source))
+    destination_index = int(np.searchsorted(graph.node_ids, destination))
+    edges_in_path, visited, active = edges
+    fig, dpi = render_graph(
+        graph,
+        edge_classes(graph, edges_in_path, edge_mask(graph, visited), edge_mask(graph, active)),
+        source_index,
+        destination_index,
+        TITLE,
+        geometry,
+    )
+    buffer = io.BytesIO()
+    fig.savefig(buffer, dpi=dpi, format="png")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def run(
+    name: str,
+    source: NodeId,
+    destination: NodeId,
+    edges: Tuple[Set[EdgeId], Set[EdgeId], Set[EdgeId]],
+    results: "multiprocessing.Queue[Dict[str, float]]",
+) -> None:
+    plot = legacy_plot if name == "legacy" else compact_plot
+    start = time.perf_counter()
+    image = plot(source, destination, edges)
+    elapsed = time.perf_counter() - start
+    (DIRECTORY / f"{name}.png").write_bytes(image)
+    # Kilobytes on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put({"time": elapsed, "peak": peak})
+
+
+def main() -> None:
+    side = arg(1, 100)
+    G = synthetic_multidigraph(side)
+    G.graph["crs"] = "epsg:4326"
+    # Bend every other edge so the geometry blob is exercised.
+    for index, (u, v, data) in enumerate(G.edges(data=True)):
+        if index % 2 == 0:
+            x1, y1, x2, y2 = G.nodes[u]["x"], G.nodes[u]["y"], G.nodes[v]["x"], G.nodes[v]["y"]
+            middle = ((x1 + x2) / 2 + (y2 - y1) / 4, (y1 + y2) / 2 + (x1 - x2) / 4)
+            data["geometry"] = LineString([(x1, y1), middle, (x2, y2)])
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    DIRECTORY.mkdir(parents=True, exist_ok=True)
+    ox.save_graphml(G, (DIRECTORY / "graph.graphml").as_posix())
+    (DIRECTORY / "graph.bin").write_bytes(dump_compact_graph(graph))
+    (DIRECTORY / "geometry.bin").write_bytes(dump_edge_geometry(build_edge_geometry(G, graph)))
+
+    sources = graph.node_ids[edge_sources(graph)].tolist()
+    targets = graph.node_ids[graph.targets].tolist()
+    edges = search_edges(list(zip(sources, targets)))
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+
+    context = multiprocessing.get_context("spawn")
+    for name in ["legacy", "compact"]:
+        results: "multiprocessing.Queue[Dict[str, float]]" = context.Queue()
+        process = context.Process(target=run, args=(name, source, destination, edges, results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(f"{name:8} {result['time'] * 1000:8.0f} ms, peak RSS {result['peak']:6.0f} MiB")
+
+    legacy = mpimg.imread(DIRECTORY / "legacy.png")
+    compact = mpimg.imread(DIRECTORY / "compact.png")
+    if legacy.shape != compact.shape:
+        print(f"Sizes differ: {legacy.shape} against {compact.shape}")
+    else:
+        print(f"Mean pixel difference: {np.abs(legacy - compact).mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
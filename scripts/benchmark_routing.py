@@ -0,0 +1,42 @@
+import random
+import time
+
+from typing import List, Tuple
+
+from _bench import arg
+
+from modules.graph import NodeId, compact_graph_from_multidigraph
+from modules.routing import SEARCHES
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 200)
+    queries = arg(2, 20)
+    G = synthetic_multidigraph(side)
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    random.seed(1)
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    pairs: List[Tuple[NodeId, NodeId]] = [
+        (random.choice(node_ids), random.choice(node_ids)) for _ in range(queries)
+    ]
+
+    for name, search in SEARCHES.items():
+        start = time.perf_counter()
+        visited = 0
+        for source, destination in pairs:
+            result = search(graph, source, destination)
+            if result is not None:
+                visited += len(result.visited)
+        elapsed = (time.perf_counter() - start) / len(pairs)
+        print(
+            f"{name:24} {elapsed * 1000:8.2f} ms/query, "
+            f"{visited / len(pairs):10.0f} visited edges/query"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import random
+import time
+
+import osmnx as ox
+
+from _bench import arg
+
+from modules.graph import compact_graph_from_multidigraph
+from modules.spatial import (
+    build_spatial_index,
+    dump_spatial_index,
+    load_spatial_index,
+    nearest_node,
+    snap,
+)
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 300)
+    points = arg(2, 10_000)
+    G = synthetic_multidigraph(side)
+    G.graph["crs"] = "epsg:4326"
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes")
+
+    start = time.perf_counter()
+    raw_index = dump_spatial_index(build_spatial_index(graph))
+    print(f"Build:          {(time.perf_counter() - start) * 1000:8.2f} ms, {len(raw_index) / 2**20:.2f} MiB")
+
+    start = time.perf_counter()
+    index = load_spatial_index(raw_index)
+    print(f"Load:           {(time.perf_counter() - start) * 1000:8.2f} ms, rebuilding the tree")
+
+    random.seed(2)
+    lat = [random.uniform(graph.lat.min(), graph.lat.max()) for _ in range(points)]
+    lon = [random.uniform(graph.lon.min(), graph.lon.max()) for _ in range(points)]
+
+    start = time.perf_counter()
+    snap(index, lat, lon)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for point_lat, point_lon in zip(lat[:100], lon[:100]):
+        nearest_node(index, point_lat, point_lon)
+    single_time = (time.perf_counter() - start) / 100
+
+    start = time.perf_counter()
+    ox.nearest_nodes(G, lon, lat)
+    osmnx_time = time.perf_counter() - start
+
+    print(f"Batch snap:     {batch_time / points * 1e6:8.2f} us/point")
+    print(f"Single snap:    {single_time * 1e6:8.2f} us/point")
+    print(f"osmnx:          {osmnx_time / points * 1e6:8.2f} us/point, rebuilding its tree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import io
+import json
+import time
+
+from typing import Dict, List, Set, Tuple
+
+from _bench import arg
+
+from modules.graph import EdgeId, NodeId, compact_graph_from_multidigraph
+from modules.routing import dijkstra
+from modules.trace import dump_trace, load_trace
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def load_json(raw_json: Dict[str, str]) -> Tuple[Dict[NodeId, NodeId], Set[EdgeId], Set[EdgeId]]:
+    """
+    Same decoding plotPath did before, into Python sets.
+    """
+    path: Dict[NodeId, NodeId] = {int(k): v for k, v in json.loads(raw_json["path"]).items()}
+    raw_visited: List[List[NodeId]] = json.loads(raw_json["visited"])
+    raw_active: List[List[NodeId]] = json.loads(raw_json["active"])
+    return path, {(k[0], k[1]) for k in raw_visited}, {(k[0], k[1]) for k in raw_active}
+
+
+def main() -> None:
+    side = arg(1, 300)
+    graph = compact_graph_from_multidigraph(synthetic_multidigraph(side), max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    # Corner to corner, so the search covers most of the graph.
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+    solution = dijkstra(graph, source, destination)
+    assert solution is not None
+    print(f"Search with {len(solution.visited)} visited and {len(solution.active)} active edges")
+
+    raw_json = {
+        "path": json.dumps(solution.path),
+        "visited": json.dumps(solution.visited),
+        "active": json.dumps(solution.active),
+    }
+    raw_trace = dump_trace(graph, solution)
+    json_size = sum(len(data) for data in raw_json.values())
+    print(f"JSON size:    {json_size / 2**20:8.2f} MiB")
+    print(f"Trace size:   {len(raw_trace) / 2**20:8.2f} MiB")
+
+    start = time.perf_counter()
+    load_json(raw_json)
+    json_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load_trace(graph, io.BytesIO(raw_trace))
+    trace_time = time.perf_counter() - start
+
+    print(f"JSON decode:  {json_time * 1000:8.2f} ms")
+    print(f"Trace decode: {trace_time * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import tempfile
+import time
+
+import numpy as np
+from pathlib import Path
+
+from _bench import arg
+
+from modules.graph import compact_graph_from_multidigraph
+from modules.routing import a_star, time_dependent_a_star
+from modules.traffic import (
+    WEEK_BUCKETS,
+    bind_profiles,
+    dump_speed_profiles,
+    format_departure,
+    open_speed_profiles,
+    parse_departure,
+    typical_profiles,
+    with_overrides,
+)
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+
+def main() -> None:
+    side = arg(1, 200)
+    G = synthetic_multidigraph(side)
+    graph = compact_graph_from_multidigraph(G, max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+    source, destination = int(graph.node_ids[0]), int(graph.node_ids[-1])
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = f"{directory}/profiles.bin"
+        with open(filename, "wb") as f:
+            f.write(dump_speed_profiles(typical_profiles()))
+        start = time.perf_counter()
+        profiles = bind_profiles(graph, open_speed_profiles(filename))
+        print(
+            f"Profiles of {Path(filename).stat().st_size} bytes memory-mapped in "
+            f"{(time.perf_counter() - start) * 1000:.2f} ms"
+        )
+
+        start = time.perf_counter()
+        static = a_star(graph, source, destination)
+        static_time = time.perf_counter() - start
+        assert static is not None
+        for raw_departure in ["2024-05-13T03:00", "2024-05-13T08:00", "2024-05-13T17:30", "2024-05-18T13:00"]:
+            departure = parse_departure(raw_departure)
+            start = time.perf_counter()
+            fastest = time_dependent_a_star(graph, profiles, source, destination, departure)
+            search_time = time.perf_counter() - start
+            # Edge times of the buckets are kept, as in a warm lambda.
+            start = time.perf_counter()
+            time_dependent_a_star(graph, profiles, source, destination, departure)
+            warm_time = time.perf_counter() - start
+            assert fastest is not None
+            print(
+                f"{format_departure(departure)}: {fastest.weight * 60:6.1f} min "
+                f"({fastest.weight / static.weight:.2f}x free flow), A* {search_time * 1000:6.0f} ms, "
+                f"{warm_time * 1000:6.0f} ms warm, against {static_time * 1000:6.0f} ms static"
+            )
+
+        # A closed road at rush hour pushes the route elsewhere.
+        departure = parse_departure("2024-05-13T08:00")
+        route = time_dependent_a_star(graph, profiles, source, destination, departure)
+        assert route is not None
+        node = destination
+        blocked = (route.path[node], node)
+        jammed = with_overrides(typical_profiles(), {blocked: np.full(WEEK_BUCKETS, 0.01)})
+        with open(filename, "wb") as f:
+            f.write(dump_speed_profiles(jammed))
+        jammed_profiles = bind_profiles(graph, open_speed_profiles(filename))
+        detour = time_dependent_a_star(graph, jammed_profiles, source, destination, departure)
+        assert detour is not None
+        print(f"Override on {blocked}: {route.weight * 60:.1f} min, detour {detour.weight * 60:.1f} min")
+
+
+if __name__ == "__main__":
+    main()
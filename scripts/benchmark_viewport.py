@@ -0,0 +1,67 @@
+import io
+import time
+
+from _bench import arg
+
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+from pathlib import Path
+
+from typing import Dict, Optional, Set, Tuple
+
+from modules.graph import EdgeId, compact_graph_from_multidigraph, edge_mask
+from modules.routing import a_star
+from lambdas.plotPath.render import (
+    BASEMAP_GRID,
+    Basemap,
+    edge_classes,
+    render_basemap,
+    render_graph,
+)
+
+from benchmark_graph_model import synthetic_multidigraph, max_speed
+
+TITLE = "Distance: 1.0 km\nTime: 1 min 0 sec"
+
+
+def main() -> None:
+    side = arg(1, 150)
+    graph = compact_graph_from_multidigraph(synthetic_multidigraph(side), max_speed)
+    print(f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges")
+
+    # A route of a few blocks in the middle of the city.
+    source_index = (side // 2) * side + side // 2
+    destination_index = source_index + 5 * side + 5
+    source, destination = int(graph.node_ids[source_index]), int(graph.node_ids[destination_index])
+    result = a_star(graph, source, destination)
+    assert result is not None
+    path: Set[EdgeId] = {(u, v) for v, u in result.path.items()}
+    classes = edge_classes(graph, path, edge_mask(graph, result.visited), edge_mask(graph, result.active))
+
+    start = time.perf_counter()
+    bounds, raw_tiles = render_basemap(graph)
+    print(f"Basemap: {time.perf_counter() - start:8.2f} s, {sum(map(len, raw_tiles.values())) / 2**20:.2f} MiB")
+    tiles = {key: mpimg.imread(io.BytesIO(tile)) for key, tile in raw_tiles.items()}
+    basemap = Basemap(bounds=bounds, rows=BASEMAP_GRID, cols=BASEMAP_GRID, load_tile=lambda row, col: tiles[(row, col)])
+
+    modes: Dict[str, Tuple[bool, Optional[Basemap]]] = {
+        "full": (False, None),
+        "full + basemap": (False, basemap),
+        "crop": (True, None),
+        "crop + basemap": (True, basemap),
+    }
+    for name, (crop, mode_basemap) in modes.items():
+        start = time.perf_counter()
+        fig, dpi = render_graph(
+            graph, classes, source_index, destination_index, TITLE, crop=crop, basemap=mode_basemap
+        )
+        buffer = io.BytesIO()
+        fig.savefig(buffer, dpi=dpi, format="png")
+        plt.close(fig)
+        (Path("/tmp") / f"viewport-{name.replace(' + ', '-')}.png").write_bytes(buffer.getvalue())
+        elapsed = time.perf_counter() - start
+        print(f"{name:16} {elapsed * 1000:8.0f} ms, {len(buffer.getvalue()) / 2**10:8.0f} KiB at {dpi} dpi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import random
+import time
+
+import numpy as np
+from networkx import MultiDiGraph
+
+from typing import List, Tuple
+
+from _bench import arg
+
+from modules.graph import NodeId, edge_index, graph_nbytes
+from modules.routing import SEARCHES
+from modules.weights import HIGHWAYS, ROUTING_PROFILES, profile_weights
+from lambdas.getGraph.modules.ingestion import ingest_graph
+
+from benchmark_graph_model import synthetic_multidigraph
+
+
+def add_highways(G: MultiDiGraph, side: int, every: int) -> None:
+    """
+    Turns every `every`-th row and column of the grid into a fast motorway.
+    """
+    base_id = 25_000_000
+    for u, v, data in G.edges(data=True):
+        row_u, col_u = divmod(u - base_id, side)
+        row_v, col_v = divmod(v - base_id, side)
+        on_row = row_u == row_v and row_u % every == 0
+        on_col = col_u == col_v and col_u % every == 0
+        data["highway"] = "motorway" if on_row or on_col else random.choice(["residential", "secondary"])
+        if on_row or on_col:
+            data["maxspeed"] = "120"
+
+
+def main() -> None:
+    side = arg(1, 150)
+    queries = arg(2, 10)
+    G = synthetic_multidigraph(side)
+    random.seed(2)
+    add_highways(G, side, 25)
+    graph = ingest_graph(G)
+    print(
+        f"Graph with {len(graph.node_ids)} nodes and {len(graph.targets)} edges, "
+        f"{graph_nbytes(graph) / 2**20:.1f} MiB"
+    )
+
+    node_ids: List[NodeId] = graph.node_ids.tolist()
+    pairs: List[Tuple[NodeId, NodeId]] = [
+        (random.choice(node_ids), random.choice(node_ids)) for _ in range(queries)
+    ]
+    for profile, routing_profile in ROUTING_PROFILES.items():
+        start = time.perf_counter()
+        weights = profile_weights(graph, profile, routing_profile.weights(graph))
+        column_time = time.perf_counter() - start
+
+        highway_share: List[float] = []
+        times = {name: 0.0 for name in ["dijkstra", "a_star", "bidirectional_a_star"]}
+        for source, destination in pairs:
+            for name in times:
+                start = time.perf_counter()
+                result = SEARCHES[name](graph, source, destination, weights)
+                times[name] += time.perf_counter() - start
+                assert result is not None
+            node, highway, length = destination, 0.0, 0.0
+            while node != source:
+                edge = edge_index(graph, (result.path[node], node))
+                assert edge is not None
+                length += float(graph.length[edge])
+                highway += float(graph.length[edge]) * (int(graph.highway[edge]) in HIGHWAYS)
+                node = result.path[node]
+            highway_share.append(highway / max(length, 1e-9))
+        searches = ", ".join(f"{name} {elapsed / len(pairs) * 1000:.1f} ms" for name, elapsed in times.items())
+        print(
+            f"{profile:15} column {weights.values.nbytes / 2**20:.2f} MiB in {column_time * 1000:.1f} ms, "
+            f"{np.mean(highway_share):6.1%} on highways, {searches}"
+        )
+
+
+if __name__ == "__main__":
+    main()
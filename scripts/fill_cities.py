@@ -1,10 +1,15 @@
 import json
-import requests
-import time
+import os
 
 from typing import List, Dict, Optional
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+import _bench  # noqa: F401
+
+from modules.geocoding import GeocodingClient, SQLiteStore
+
+GEOCODING_CACHE_FILE = os.environ.get("GEOCODING_CACHE_FILE", "geocoding.sqlite")
+
+geocoder = GeocodingClient(SQLiteStore(GEOCODING_CACHE_FILE))
 
 
 def get_lat_lon(city: str, country: str) -> Optional[Dict[str, str]]:
@@ -19,19 +24,13 @@ def get_lat_lon(city: str, country: str) -> Optional[Dict[str, str]]:
         A dictionary containing latitude (lat) and longitude (lon) if successful,
         None otherwise.
     """
-    params = {"city": city, "country": country, "format": "json"}
-    headers = {"User-Agent": "GraphMapsApplication/1.0"}
-
-    response = requests.get(NOMINATIM_URL, params=params, headers=headers)
-
-    if response.status_code == 200:
-        data: Optional[List[Dict[str, str]]] = response.json()
-        if data:
-            return {"lat": data[0]["lat"], "lon": data[0]["lon"]}
-        else:
-            print(f"No results found for {city}, {country}")
+    data = geocoder.search({"city": city, "country": country})
+    if data is None:
+        print(f"Error retrieving data for {city}, {country}")
+    elif data:
+        return {"lat": data[0]["lat"], "lon": data[0]["lon"]}
     else:
-        print(f"Error retrieving data for {city}, {country}: {response.status_code}")
+        print(f"No results found for {city}, {country}")
     return None
 
 
@@ -45,7 +44,6 @@ def main() -> None:
             lat_lon = get_lat_lon(city["city"], city["country"])
             if lat_lon:
                 city.update(lat_lon)
-            time.sleep(2)
         cities_with_lat_lon.append(city)
 
     with open("cities.json", "w") as f:
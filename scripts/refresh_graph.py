@@ -0,0 +1,130 @@
+import argparse
+import json
+import time
+
+from pathlib import Path
+from uuid import uuid4
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from upload_graph import Storage, get_place, open_storage, write_json
+
+from modules.boundaries import add_boundary, build_boundary, dump_boundaries, load_boundaries
+from modules.delta import apply_deltas, delta_key, diff_graphs, dump_delta, load_delta
+from modules.geometry import EdgeGeometry, build_edge_geometry, load_edge_geometry
+from modules.graph import CompactGraph, load_compact_graph
+
+
+def read_object(storage: Storage, key: str) -> bytes:
+    body = storage.read_object(key)
+    if body is None:
+        raise ValueError(f"Missing {key}")
+    return body
+
+
+def read_version(
+    storage: Storage, graph_id: str, version: int
+) -> Tuple[CompactGraph, Optional[EdgeGeometry]]:
+    """
+    Graph and edge geometry of a city as readers compose them, base and deltas.
+    """
+    raw_geometry = storage.read_object(f"geometry-{graph_id}.bin")
+    return apply_deltas(
+        load_compact_graph(read_object(storage, f"graph-{graph_id}.bin")),
+        [load_delta(read_object(storage, delta_key(graph_id, delta))) for delta in range(1, version + 1)],
+        None if raw_geometry is None else load_edge_geometry(raw_geometry),
+    )
+
+
+def refresh_city(storage: Storage, country: str, city: str, graph_id: str, version: int) -> int:
+    """
+    Stores the changes of the OpenStreetMap network since `version` as the next delta.
+    """
+    from lambdas.getGraph.utils import fetch_city_graph, generate_graph
+
+    start = time.perf_counter()
+    graph, geometry = read_version(storage, graph_id, version)
+    G = fetch_city_graph(country, city)
+    new = generate_graph(G)
+    delta = diff_graphs(graph, new, version + 1, build_edge_geometry(G, new), geometry)
+    if len(delta) == 0:
+        print(f"{city}, {country} is up to date at version {version}")
+        return version
+
+    body = dump_delta(delta)
+    storage.put_object(delta_key(graph_id, delta.version), body)
+    storage.put_item({"Country": country, "City": city, "GraphId": graph_id, "Version": delta.version})
+    print(
+        f"Refreshed {city}, {country} to version {delta.version}: {len(delta.node_ids)} nodes "
+        f"and {len(delta.edges)} edges upserted, {len(delta.removed_nodes)} nodes and "
+        f"{len(delta.removed_edges)} edges removed, {len(body) / 2**10:.1f} KiB "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+    return delta.version
+
+
+def compact_city(
+    storage: Storage, country: str, city: str, graph_id: str, version: int
+) -> str:
+    """
+    Merges the deltas into a new base, under a new id so no cached base goes stale.
+    """
+    from lambdas.getGraph.utils import BOUNDARIES_KEY, graph_files
+
+    graph, geometry = read_version(storage, graph_id, version)
+    new_id = uuid4().hex
+    for key, body in graph_files(graph, new_id, geometry, hierarchy=True, landmarks=True).items():
+        storage.put_object(key, body)
+    storage.put_item({"Country": country, "City": city, "GraphId": new_id})
+
+    raw_boundaries = storage.read_object(BOUNDARIES_KEY)
+    boundaries = {} if raw_boundaries is None else load_boundaries(raw_boundaries)
+    boundary = build_boundary(country, city, new_id, graph)
+    if boundary is not None:
+        add_boundary(boundaries, boundary)
+        storage.put_object(BOUNDARIES_KEY, dump_boundaries(boundaries))
+    print(f"Compacted {city}, {country} at version {version} into {new_id}")
+    return new_id
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Refreshes the graphs of the uploaded cities in cities.json with deltas"
+    )
+    parser.add_argument("--compact", action="store_true",
+                        help="only merge the deltas of every city into a new base")
+    parser.add_argument("--max-deltas", type=int, default=10,
+                        help="compact cities once they have this many deltas")
+    parser.add_argument("--dry-run", type=Path, metavar="DIRECTORY",
+                        help="use the local directory of an upload_graph.py dry run")
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    storage, state_file = open_storage(arguments.dry_run)
+    cities_data: List[Dict[str, Any]] = json.loads(state_file.read_text())
+    for city_data in cities_data:
+        if not city_data.get("uploaded", False) or "graph_id" not in city_data:
+            continue
+        city, country = get_place(city_data["lat"], city_data["lon"])
+        if city is None or country is None:
+            continue
+        graph_id: str = city_data["graph_id"]
+        version: int = city_data.get("version", 0)
+        try:
+            if not arguments.compact:
+                version = refresh_city(storage, country, city, graph_id, version)
+                city_data["version"] = version
+                write_json(state_file, cities_data)
+            if version > 0 and (arguments.compact or version >= arguments.max_deltas):
+                city_data.update(
+                    graph_id=compact_city(storage, country, city, graph_id, version), version=0
+                )
+                write_json(state_file, cities_data)
+        except Exception as err:
+            print(f"Failed to refresh {city}, {country}: {err}")
+
+
+if __name__ == "__main__":
+    main()
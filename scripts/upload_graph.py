@@ -1,61 +1,301 @@
+import argparse
 import boto3
+import io
 import json
-import requests
+import multiprocessing
 import os
-import sys
+import shutil
+import time
 
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
+from multiprocessing.synchronize import Semaphore
+from uuid import uuid4
 
-from typing import List, Dict, Tuple, Optional
+from typing import Any, Callable, Dict, List, Optional, Protocol, Set, Tuple
 
-sys.path.append((Path.cwd() / ".." / "infra/lib/sfnStack").absolute().as_posix())
+import _bench  # noqa: F401
 
-from modules.graph import Graph
-from lambdas.getGraph.lambda_function import download_graph, store_graph, generate_graph
+from modules.boundaries import (
+    CityBoundary,
+    add_boundary,
+    build_boundary,
+    dump_boundaries,
+    load_boundaries,
+)
+from modules.geometry import build_edge_geometry
+from modules.graphml import write_graphml
+from modules.geocoding import GeocodingClient, SQLiteStore
 
-GRAPHS_TABLE_NAME = os.environ["GRAPHS_TABLE_NAME"]
-GRAPHS_BUCKET_NAME = os.environ["GRAPHS_BUCKET"]
+GEOCODING_CACHE_FILE = os.environ.get("GEOCODING_CACHE_FILE", "geocoding.sqlite")
+CITIES_FILE = "cities.json"
+# getGraph utils create their AWS clients on import, a dry run never calls them.
+DRY_RUN_ENVIRONMENT = {
+    "GRAPHS_TABLE_NAME": "graphsTable",
+    "GRAPHS_BUCKET": "graphs",
+    "PATHS_BUCKET": "paths",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
 
-dynamodb = boto3.resource("dynamodb")
-graphs_table = dynamodb.Table(GRAPHS_TABLE_NAME)
-s3 = boto3.resource("s3")
-graphs_bucket = s3.Bucket(GRAPHS_BUCKET_NAME)
+# Created on first use, worker processes never geocode.
+geocoder: Optional[GeocodingClient] = None
+# Set in every worker process by `init_worker`.
+download_slots: Optional[Semaphore] = None
 
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse?format=json"
-HEADERS = {"User-Agent": "GraphMapsApplication/1.0"}
+class Storage(Protocol):
+    def put_object(self, key: str, body: bytes) -> None:
+        ...
+
+    def read_object(self, key: str) -> Optional[bytes]:
+        ...
+
+    def put_item(self, item: Dict[str, Any]) -> None:
+        ...
+
+
+class AwsStorage:
+    def __init__(self, bucket_name: str, table_name: str) -> None:
+        self.bucket = boto3.resource("s3").Bucket(bucket_name)
+        self.table = boto3.resource("dynamodb").Table(table_name)
+
+    def put_object(self, key: str, body: bytes) -> None:
+        self.bucket.put_object(Key=key, Body=body)
+
+    def read_object(self, key: str) -> Optional[bytes]:
+        try:
+            body: bytes = self.bucket.Object(key).get()["Body"].read()
+            return body
+        except self.bucket.meta.client.exceptions.NoSuchKey:
+            return None
+
+    def put_item(self, item: Dict[str, Any]) -> None:
+        self.table.put_item(Item=item)
+
+
+class LocalStorage:
+    """
+    Stand-in for the graphs bucket and table in dry runs, everything goes to `directory`.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.bucket = directory / "bucket"
+        self.bucket.mkdir(parents=True, exist_ok=True)
+        self.table = directory / f"{DRY_RUN_ENVIRONMENT['GRAPHS_TABLE_NAME']}.json"
+
+    def put_object(self, key: str, body: bytes) -> None:
+        (self.bucket / key).write_bytes(body)
+
+    def read_object(self, key: str) -> Optional[bytes]:
+        path = self.bucket / key
+        return path.read_bytes() if path.exists() else None
+
+    def put_item(self, item: Dict[str, Any]) -> None:
+        items: Dict[str, Dict[str, Any]] = (
+            json.loads(self.table.read_text()) if self.table.exists() else {}
+        )
+        items[f"{item['Country']}/{item['City']}"] = item
+        write_json(self.table, items)
+
+
+@dataclass
+class PreparedCity:
+    index: int
+    country: str
+    city: str
+    graph_id: str
+    files: Dict[str, bytes]
+    boundary: Optional[CityBoundary]
+    download_time: float
+    convert_time: float
+
+
+def write_json(path: Path, data: Any) -> None:
+    """
+    Replaces `path` atomically, an interrupted run never leaves it half written.
+    """
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(data, indent=2))
+    os.replace(temporary, path)
 
 
 def get_place(lat: str, lon: str) -> Tuple[Optional[str], Optional[str]]:
-    url = f"{NOMINATIM_URL}&lat={lat}&lon={lon}"
-    response = requests.get(url, headers=HEADERS)
-    data: Dict[str, Dict[str, str]] = response.json()
-    if "address" not in data:
+    global geocoder
+    if geocoder is None:
+        geocoder = GeocodingClient(SQLiteStore(GEOCODING_CACHE_FILE))
+    data = geocoder.reverse(float(lat), float(lon))
+    if data is None or "address" not in data:
         print("Not possible to get the address")
         return (None, None)
-    address: Dict[str, str] = data["address"]
+    address = data["address"]
     city = address.get("city", None)
     country = address.get("country", None)
     return (city, country)
 
 
+def open_storage(dry_run: Optional[Path]) -> Tuple[Storage, Path]:
+    """
+    Storage of a run and the copy of `cities.json` keeping its progress.
+
+    Dry runs keep both in their directory, apart from the real cities.json.
+    The getGraph utils are imported after this, they read the environment.
+    """
+    if dry_run is None:
+        return AwsStorage(os.environ["GRAPHS_BUCKET"], os.environ["GRAPHS_TABLE_NAME"]), Path(CITIES_FILE)
+    for name, value in DRY_RUN_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    state_file = dry_run / CITIES_FILE
+    if not state_file.exists():
+        dry_run.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(CITIES_FILE, state_file)
+    return LocalStorage(dry_run), state_file
+
+
+def init_worker(slots: Semaphore) -> None:
+    global download_slots
+    download_slots = slots
+
+
+def prepare_city(index: int, country: str, city: str) -> PreparedCity:
+    """
+    Downloads and converts a city in a worker process.
+
+    Downloads wait for a slot, so Overpass and the Nominatim calls osmnx makes
+    see no more concurrent requests than `--downloads`.
+    """
+    from lambdas.getGraph.utils import fetch_city_graph, generate_graph, graph_files
+
+    assert download_slots is not None
+    start = time.perf_counter()
+    with download_slots:
+        G = fetch_city_graph(country, city)
+    download_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph_id = uuid4().hex
+    graph = generate_graph(G)
+    files = graph_files(graph, graph_id, build_edge_geometry(G, graph), hierarchy=True, landmarks=True)
+    graphml = io.BytesIO()
+    write_graphml(G, graphml)
+    files[f"{graph_id}.graphml.gz"] = graphml.getvalue()
+    boundary = build_boundary(country, city, graph_id, graph)
+    return PreparedCity(
+        index=index,
+        country=country,
+        city=city,
+        graph_id=graph_id,
+        files=files,
+        boundary=boundary,
+        download_time=download_time,
+        convert_time=time.perf_counter() - start,
+    )
+
+
+def upload_city(storage: Storage, prepared: PreparedCity) -> Tuple[PreparedCity, float, int]:
+    start = time.perf_counter()
+    uploaded_bytes = 0
+    for key, body in prepared.files.items():
+        storage.put_object(key, body)
+        uploaded_bytes += len(body)
+    return prepared, time.perf_counter() - start, uploaded_bytes
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Uploads the graphs of every city in cities.json")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="processes converting graphs")
+    parser.add_argument("--uploads", type=int, default=4, help="threads uploading graphs")
+    parser.add_argument("--downloads", type=int, default=1, help="concurrent OpenStreetMap downloads")
+    parser.add_argument("--dry-run", type=Path, metavar="DIRECTORY",
+                        help="store everything in a local directory instead of S3 and DynamoDB")
+    return parser.parse_args()
+
+
+def upload_cities(
+    storage: Storage,
+    state_file: Path,
+    workers: int,
+    uploads: int,
+    downloads: int,
+    prepare: Callable[[int, str, str], PreparedCity] = prepare_city,
+) -> None:
+    """
+    Uploads the cities of `state_file` not uploaded yet, marking each one as it is done.
+    """
+    from lambdas.getGraph.utils import BOUNDARIES_KEY
+
+    cities_data: List[Dict[str, Any]] = json.loads(state_file.read_text())
+    raw_boundaries = storage.read_object(BOUNDARIES_KEY)
+    boundaries = {} if raw_boundaries is None else load_boundaries(raw_boundaries)
+
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    uploaded_cities, uploaded_bytes = 0, 0
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(context.Semaphore(downloads),),
+    ) as processes, ThreadPoolExecutor(uploads) as threads:
+        pending: Set[Future[Any]] = set()
+        names: Dict[Future[Any], str] = {}
+        for index, city_data in enumerate(cities_data):
+            if city_data.get("uploaded", False):
+                continue
+            # Reverse geocoding stays in this process, behind the client's rate limit.
+            city, country = get_place(city_data["lat"], city_data["lon"])
+            if city is None or country is None:
+                continue
+            print(f"Queueing {city}, {country}")
+            future = processes.submit(prepare, index, country, city)
+            names[future] = f"{city}, {country}"
+            pending.add(future)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = names.pop(future)
+                try:
+                    result = future.result()
+                except Exception as err:
+                    print(f"Failed to upload {name}: {err}")
+                    continue
+                if isinstance(result, PreparedCity):
+                    upload = threads.submit(upload_city, storage, result)
+                    names[upload] = name
+                    pending.add(upload)
+                    continue
+
+                prepared, upload_time, city_bytes = result
+                storage.put_item(
+                    {"Country": prepared.country, "City": prepared.city, "GraphId": prepared.graph_id}
+                )
+                if prepared.boundary is not None:
+                    add_boundary(boundaries, prepared.boundary)
+                    storage.put_object(BOUNDARIES_KEY, dump_boundaries(boundaries))
+                cities_data[prepared.index].update(uploaded=True, graph_id=prepared.graph_id)
+                write_json(state_file, cities_data)
+
+                uploaded_cities += 1
+                uploaded_bytes += city_bytes
+                print(
+                    f"Uploaded {prepared.city}, {prepared.country}: "
+                    f"download {prepared.download_time:.1f} s, convert {prepared.convert_time:.1f} s, "
+                    f"upload {upload_time:.1f} s, {city_bytes / 2**20:.1f} MiB"
+                )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Uploaded {uploaded_cities} cities in {elapsed:.0f} s: "
+        f"{uploaded_cities / elapsed * 60:.1f} cities/min, {uploaded_bytes / 2**20 / elapsed:.1f} MiB/s"
+    )
+
+
 def main() -> None:
-    with open("cities.json", "r") as f:
-        cities_data: List[Dict[str, str]] = json.load(f)
-
-    for city_data in cities_data:
-        if city_data.get("uploaded", False):
-            continue
-        city, country = get_place(city_data["lat"], city_data["lon"])
-        print(f"Uploading {city}, {country}")
-        if city is None or country is None:
-            continue
-        G, graph_id = download_graph(country=country, city=city)
-        graph: Graph = generate_graph(G)
-        store_graph(graph, graph_id)
-        graphs_table.put_item(
-            Item={"Country": country, "City": city, "GraphId": graph_id}
-        )
+    arguments = parse_arguments()
+    storage, state_file = open_storage(arguments.dry_run)
+    upload_cities(storage, state_file, arguments.workers, arguments.uploads, arguments.downloads)
 
 
 if __name__ == "__main__":